@@ -0,0 +1,72 @@
+"""
+アーカイブ入力のベンチマーク
+同じJPEGをディレクトリ・ZIP（無圧縮）・TARから読み込んでreduceする時間を比較する
+
+使用方法:
+    python benchmarks/bench_archive.py [ファイル数] [並列数]
+"""
+
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from PIL import Image
+
+from sentei_pictures.api import reduce_directory
+from sentei_pictures.core.image_processor import ImageProcessor
+from sentei_pictures.core.worker_pool import WorkerPool
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<28} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        originals = Path(tmp) / "originals"
+        originals.mkdir()
+        for i in range(count):
+            Image.effect_noise((2400, 1600), 64).convert("RGB").save(
+                originals / f"IMG_{i:05d}.JPG", quality=90
+            )
+        with zipfile.ZipFile(Path(tmp) / "shoot.zip", "w") as zf:
+            for path in sorted(originals.iterdir()):
+                zf.write(path, f"shoot/{path.name}")
+        with tarfile.open(Path(tmp) / "shoot.tar", "w") as tf:
+            for path in sorted(originals.iterdir()):
+                tf.add(path, f"shoot/{path.name}")
+
+        processor = ImageProcessor(max_long_side=1200)
+        pool = WorkerPool(max_workers=workers)
+        try:
+            print(f"{count}ファイル, {pool.max_workers}プロセス")
+            # プロセスの起動を計測に含めない
+            list(reduce_directory(originals, Path(tmp), processor, files=[], pool=pool))
+            for label, source in (
+                ("ディレクトリ", originals),
+                ("ZIP（無圧縮）", Path(tmp) / "shoot.zip"),
+                ("TAR", Path(tmp) / "shoot.tar"),
+            ):
+                output = Path(tmp) / f"out-{source.suffix or 'dir'}"
+                output.mkdir()
+                timed(
+                    label,
+                    lambda: list(
+                        reduce_directory(source, output, processor, pool=pool)
+                    ),
+                )
+        finally:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+カタログのベンチマーク
+大量の元画像があるディレクトリで、ディレクトリ走査とカタログの一覧・検索の時間を比較する
+
+使用方法:
+    python benchmarks/bench_catalog.py [ファイル数]
+"""
+
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from sentei_pictures.core.catalog import Catalog
+from sentei_pictures.core.file_matcher import FileMatcher
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<36} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lookups = 1000
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48)).save(buffer, "JPEG")
+    data = buffer.getvalue()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        originals = Path(tmp) / "original"
+        originals.mkdir()
+        for i in range(count):
+            (originals / f"IMG_{i:06d}.JPG").write_bytes(data)
+        names = [f"img_{i:06d}.jpg" for i in range(0, count, count // lookups or 1)]
+
+        print(f"{count}ファイル, 検索{len(names)}件")
+        timed("走査: get_jpeg_files", lambda: FileMatcher.get_jpeg_files(originals))
+        timed(
+            "走査: find_matching_file",
+            lambda: [FileMatcher.find_matching_file(n, originals) for n in names[:20]],
+        )
+        print(f"  （走査の検索は{min(20, len(names))}件のみ）")
+
+        with Catalog(Path(tmp) / "catalog.db") as catalog:
+            timed("カタログ: 初回構築", lambda: catalog.refresh(originals))
+            timed(
+                "カタログ: 2回目の一覧",
+                lambda: FileMatcher.get_jpeg_files(originals, catalog),
+            )
+            timed(
+                "カタログ: find_matching_file",
+                lambda: [
+                    FileMatcher.find_matching_file(n, originals, catalog) for n in names
+                ],
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+ヘッダーパーサーのベンチマーク
+大量のJPEGで、Pillow（Image.open + getexif）と簡易パーサーのメタデータ取得時間を比較する
+
+使用方法:
+    python benchmarks/bench_header.py [ファイル数]
+"""
+
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from sentei_pictures.core.header_parser import read_header, read_headers
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<36} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def read_with_pillow(path: Path):
+    with Image.open(path) as img:
+        exif = img.getexif()
+        return img.size, exif.get(0x0112), exif.get_ifd(0x8769).get(0x9003)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x0132] = "2024:05:01 10:00:00"
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480)).save(buffer, "JPEG", exif=exif)
+    data = buffer.getvalue()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(count):
+            path = Path(tmp) / f"IMG_{i:06d}.JPG"
+            path.write_bytes(data)
+            paths.append(path)
+
+        print(f"{count}ファイル")
+        timed(
+            "Pillow: Image.open + getexif", lambda: [read_with_pillow(p) for p in paths]
+        )
+        timed("簡易パーサー: read_header", lambda: [read_header(p) for p in paths])
+        timed("簡易パーサー: read_headers（並列）", lambda: read_headers(paths))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+共有メモリのパイプラインのベンチマーク
+同じJPEGを単一プロセス・スレッド・プロセスプール・復号と保存を分けたパイプライン
+（画素をpickleで渡す場合と共有メモリで渡す場合）でreduceする時間を比較する
+
+使用方法:
+    python benchmarks/bench_pipeline.py [ファイル数] [並列数]
+"""
+
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from sentei_pictures.api import reduce_directory, reduce_file
+from sentei_pictures.core.image_processor import ImageProcessor
+from sentei_pictures.core.pipeline import ShmPipeline, SlabPool
+from sentei_pictures.core.worker_pool import WorkerPool, default_workers
+
+
+class PicklePipeline(ShmPipeline):
+    """スラブを小さくして、すべての画素をpickleで渡すパイプライン（比較用）"""
+
+    def slabs_for(self, processor) -> SlabPool:
+        if self._slabs is None:
+            self._slabs = SlabPool(self.slab_count, 1)
+        return self._slabs
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<32} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def run_pipeline(pipeline, originals, files, output, processor):
+    # プロセスの起動を計測に含めない
+    pipeline.decode_pool.submit(int).result()
+    pipeline.encode_pool.submit(int).result()
+    return lambda: list(
+        reduce_directory(originals, output, processor, files=files, pipeline=pipeline)
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else default_workers()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        originals = Path(tmp) / "originals"
+        originals.mkdir()
+        for i in range(count):
+            # 6000×4000（2400万画素）。縮小後の3000×2000はRGBXで24MB
+            Image.effect_noise((1500, 1000), 40 + i % 20).convert("RGB").resize(
+                (6000, 4000)
+            ).save(originals / f"IMG_{i:05d}.JPG", quality=90)
+
+        processor = ImageProcessor(max_long_side=3000)
+        files = sorted(originals.iterdir())
+        decode_workers = max(1, (workers + 1) // 2)
+        encode_workers = max(1, workers // 2)
+        print(
+            f"{count}ファイル, {workers}並列（パイプラインは復号{decode_workers}"
+            f"・保存{encode_workers}プロセス）"
+        )
+
+        def output(name):
+            directory = Path(tmp) / name
+            directory.mkdir()
+            return directory
+
+        single = output("single")
+        timed(
+            "単一プロセス",
+            lambda: list(reduce_directory(originals, single, processor, files=files)),
+        )
+
+        threaded = output("threads")
+        with ThreadPoolExecutor(workers) as executor:
+            timed(
+                "スレッド",
+                lambda: list(
+                    executor.map(
+                        lambda f: reduce_file(processor, f, threaded / f.name), files
+                    )
+                ),
+            )
+
+        pool = WorkerPool(max_workers=workers)
+        try:
+            pooled = output("pool")
+            # プロセスの起動を計測に含めない
+            pool.submit(int).result()
+            timed(
+                "プロセスプール（1ファイル1プロセス）",
+                lambda: list(
+                    reduce_directory(
+                        originals, pooled, processor, files=files, pool=pool
+                    )
+                ),
+            )
+        finally:
+            pool.shutdown()
+
+        for label, cls, name in (
+            ("パイプライン（pickle）", PicklePipeline, "pickle"),
+            ("パイプライン（共有メモリ）", ShmPipeline, "shm"),
+        ):
+            pipeline = cls(decode_workers, encode_workers)
+            try:
+                timed(
+                    label,
+                    run_pipeline(pipeline, originals, files, output(name), processor),
+                )
+            finally:
+                pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
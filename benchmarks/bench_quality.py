@@ -0,0 +1,89 @@
+"""
+画質目標（SSIM）のベンチマーク
+固定品質と画質目標で同じ画像群を軽量化し、出力サイズ・SSIM・処理時間を比較する
+
+使用方法:
+    python benchmarks/bench_quality.py [JPEGのディレクトリ] [目標SSIM] [固定品質]
+
+ディレクトリを省略すると、平坦な背景と細かい模様の画像を生成して使う。
+"""
+
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from sentei_pictures.core.file_matcher import FileMatcher
+from sentei_pictures.core.image_processor import ImageProcessor
+from sentei_pictures.core.quality import DEFAULT_TARGET_SSIM, luma, ssim
+
+
+def make_corpus(directory: Path, count: int = 24):
+    """平坦な背景（スタジオ）と細かい模様（木の葉）の画像を交互に生成"""
+    for i in range(count):
+        if i % 2:
+            img = Image.effect_noise((1600, 1200), 40 + i).convert("RGB")
+            img = img.filter(ImageFilter.GaussianBlur(0.6))
+        else:
+            img = Image.linear_gradient("L").resize((1600, 1200)).convert("RGB")
+            draw = ImageDraw.Draw(img)
+            draw.ellipse((500, 300, 1100, 900), fill=(180, 120, 90))
+        img.save(directory / f"IMG_{i:04d}.JPG", quality=95)
+
+
+def run(processor: ImageProcessor, files):
+    """全ファイルを軽量化し、(合計バイト数, SSIMのリスト, 秒) を返す"""
+    total = 0
+    scores = []
+    elapsed = 0.0
+    for path in files:
+        buffer = io.BytesIO()
+        start = time.perf_counter()
+        _, new_size = processor.reduce_image(path, buffer)
+        elapsed += time.perf_counter() - start
+        total += buffer.tell()
+        with Image.open(path) as img:
+            reference = img.convert("RGB").resize(new_size, Image.Resampling.LANCZOS)
+        buffer.seek(0)
+        with Image.open(buffer) as output:
+            scores.append(ssim(luma(reference), luma(output)))
+    return total, scores, elapsed
+
+
+def main():
+    target = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TARGET_SSIM
+    quality = int(sys.argv[3]) if len(sys.argv) > 3 else 87
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            directory = Path(sys.argv[1])
+        else:
+            directory = Path(tmp)
+            make_corpus(directory)
+        files = sorted(FileMatcher.get_jpeg_files(directory))
+
+        fixed = run(ImageProcessor(max_long_side=1200, quality=quality), files)
+        targeted = run(
+            ImageProcessor(max_long_side=1200, quality=quality, target_ssim=target),
+            files,
+        )
+
+    print(f"{len(files)}ファイル, 固定品質{quality}% / 目標SSIM {target}")
+    for label, (total, scores, elapsed) in (
+        (f"固定品質{quality}%", fixed),
+        (f"目標SSIM {target}", targeted),
+    ):
+        print(
+            f"{label:<16} {total / 1024 / 1024:8.2f} MB  "
+            f"SSIM 平均 {sum(scores) / len(scores):.4f} 最小 {min(scores):.4f}  "
+            f"{elapsed:6.1f} 秒"
+        )
+    saved = fixed[0] - targeted[0]
+    print(f"削減: {saved / 1024 / 1024:.2f} MB ({saved / max(fixed[0], 1):.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+起動時間ベンチマーク
+`sentei --help` の実行時間（インタープリターの起動を含む）を計測する
+
+使用方法:
+    python benchmarks/bench_startup.py [繰り返し回数]
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+
+# console_scriptsのエントリーポイントと同じ呼び出し方
+_ENTRY = (
+    "import sys; from sentei_pictures.cli.main import main; sys.argv[1:] = {!r}; main()"
+)
+
+COMMANDS = {
+    "python -c pass": [sys.executable, "-c", "pass"],
+    "sentei --help": [sys.executable, "-c", _ENTRY.format(["--help"])],
+    "sentei reduce --help": [sys.executable, "-c", _ENTRY.format(["reduce", "--help"])],
+}
+
+
+def measure(command, repeat: int) -> float:
+    """コマンドの実行時間の中央値（秒）を返す"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, capture_output=True, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for label, command in COMMANDS.items():
+        print(f"{label:<24} {measure(command, repeat) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
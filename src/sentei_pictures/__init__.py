@@ -10,7 +10,17 @@ __version__ = "0.1.0"
 __author__ = "Claude Code Assistant"
 __email__ = "noreply@anthropic.com"
 
-from .core.file_matcher import FileMatcher
-from .core.image_processor import ImageProcessor
-
 __all__ = ["ImageProcessor", "FileMatcher"]
+
+
+def __getattr__(name):
+    # CLIの起動を速くするため、Pillow等の読み込みは実際に使われるまで遅延させる
+    if name == "ImageProcessor":
+        from .core.image_processor import ImageProcessor
+
+        return ImageProcessor
+    if name == "FileMatcher":
+        from .core.file_matcher import FileMatcher
+
+        return FileMatcher
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,845 @@
+"""
+ストリーミングAPI
+reduce/choice処理を結果レコードのジェネレーターとして提供する
+
+標準出力には何も書き込まないため、CLI・GUI・他サービスへの組み込みで共通に利用できる。
+"""
+
+import copy
+import io
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Tuple, Union
+
+from .core.archive import ArchiveMember, is_archive_source
+from .core.file_matcher import FileMatcher
+from .core.storage import Storage, StorageObject
+from .core.sync import SYNC_UNCHANGED
+
+if TYPE_CHECKING:
+    from .core.archive import ArchiveWriter
+    from .core.autotune import AutoTuner
+    from .core.catalog import Catalog
+    from .core.contact_sheet import ContactSheet
+    from .core.copier import AdaptiveCopier
+    from .core.image_processor import ImageProcessor
+    from .core.pipeline import ShmPipeline
+    from .core.sync import SyncPolicy
+    from .core.throttle import Throttle
+    from .core.worker_pool import WorkerPool
+
+# 結果ステータス
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_NOT_FOUND = "not_found"
+
+
+class CancelToken:
+    """処理のキャンセルを通知するトークン（スレッドセーフ）"""
+
+    __slots__ = ("_event",)
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """キャンセルを要求"""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """キャンセルが要求されたかどうか"""
+        return self._event.is_set()
+
+
+class _FileResult:
+    """ファイル1件分の処理結果（共通部分）"""
+
+    __slots__ = (
+        "index",
+        "total",
+        "path",
+        "output_path",
+        "status",
+        "bytes_in",
+        "bytes_out",
+        "elapsed",
+        "error",
+        "worker",
+    )
+
+    def __init__(
+        self,
+        index: int,
+        total: int,
+        path: Path,
+        output_path: Optional[Path] = None,
+        status: str = STATUS_OK,
+        bytes_in: int = 0,
+        bytes_out: int = 0,
+        elapsed: float = 0.0,
+        error: Optional[str] = None,
+    ):
+        self.index = index
+        self.total = total
+        self.path = path
+        self.output_path = output_path
+        self.status = status
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.elapsed = elapsed
+        self.error = error
+        # 処理したワーカー（"<プロセスID>/<スレッド名>"）。稼働率の集計に使う
+        self.worker: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """処理に成功したかどうか"""
+        return self.status == STATUS_OK
+
+    def as_dict(self) -> dict:
+        """JSONに変換できる辞書に変換（パスは文字列、タプルはリスト）"""
+        data = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                value = getattr(self, name)
+                if isinstance(value, (Path, ArchiveMember, StorageObject)):
+                    value = str(value)
+                elif isinstance(value, tuple):
+                    value = list(value)
+                data[name] = value
+        return data
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}({self.index}/{self.total} {self.path.name} "
+            f"status={self.status!r})"
+        )
+
+
+class ReduceResult(_FileResult):
+    """
+    reduce処理の結果レコード
+
+    qualityは保存したJPEG品質、ssimは画質目標を使った場合の縮小後の画像とのSSIM
+    （固定品質の場合None）、tileはコンタクトシートのタイル（作らない場合None）
+    """
+
+    __slots__ = ("original_size", "new_size", "quality", "ssim", "tile")
+
+    def __init__(
+        self,
+        *args,
+        original_size: Optional[Tuple[int, int]] = None,
+        new_size: Optional[Tuple[int, int]] = None,
+        quality: Optional[int] = None,
+        ssim: Optional[float] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.original_size = original_size
+        self.new_size = new_size
+        self.quality = quality
+        self.ssim = ssim
+        self.tile = None
+
+    @property
+    def resized(self) -> bool:
+        """リサイズが行われたかどうか"""
+        return self.ok and self.original_size != self.new_size
+
+    def as_dict(self) -> dict:
+        """JSONに変換できる辞書に変換（タイルの画素は含めない）"""
+        data = super().as_dict()
+        del data["tile"]
+        return data
+
+
+class ChoiceResult(_FileResult):
+    """
+    choice処理の結果レコード（pathは選定ファイル、source_pathは元画像）
+
+    checksumはチェックサム付きでコピーした場合のハッシュ（16進文字列）、
+    sync_actionは差分同期での扱い（"added" / "updated" / "unchanged"、同期しない場合None）
+    """
+
+    __slots__ = ("source_path", "checksum", "sync_action")
+
+    def __init__(
+        self,
+        *args,
+        source_path: Optional[Path] = None,
+        checksum: Optional[str] = None,
+        sync_action: Optional[str] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.source_path = source_path
+        self.checksum = checksum
+        self.sync_action = sync_action
+
+
+def _worker_name() -> str:
+    """結果レコードに記録するワーカー名"""
+    return f"{os.getpid()}/{threading.current_thread().name}"
+
+
+def reduce_file(
+    processor: "ImageProcessor", input_path: Path, output_path: Path
+) -> ReduceResult:
+    """
+    1ファイルを軽量化して結果レコードを返す（例外は送出しない）
+
+    Args:
+        processor: 画像プロセッサー
+        input_path: 入力ファイルパス
+        output_path: 出力ファイルパス
+
+    Returns:
+        ReduceResult: index/totalは0のままの結果レコード
+    """
+    start = time.perf_counter()
+    result = ReduceResult(0, 0, input_path, output_path)
+    result.worker = _worker_name()
+    try:
+        result.bytes_in = input_path.stat().st_size
+        stats = {}
+        result.original_size, result.new_size = processor.reduce_image(
+            input_path, output_path, stats
+        )
+        result.quality, result.ssim = stats.get("quality"), stats.get("ssim")
+        result.tile = stats.get("tile")
+        result.bytes_out = output_path.stat().st_size
+    except Exception as e:
+        result.status = STATUS_FAILED
+        result.error = str(e)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def reduce_to_bytes(
+    processor: "ImageProcessor", input_path: Path
+) -> Tuple[ReduceResult, Optional[bytes]]:
+    """
+    1ファイルをメモリ上で軽量化して結果レコードとデータを返す（例外は送出しない）
+
+    アーカイブに書き込む場合に使う。ワーカープロセスで実行できる。
+
+    Args:
+        processor: 画像プロセッサー
+        input_path: 入力ファイルパス
+
+    Returns:
+        Tuple[ReduceResult, Optional[bytes]]: 結果レコード（output_pathはアーカイブ内の
+            ファイル名）とJPEGデータ（失敗した場合はNone）
+    """
+    start = time.perf_counter()
+    result = ReduceResult(0, 0, input_path, Path(input_path.name))
+    result.worker = _worker_name()
+    data = None
+    try:
+        result.bytes_in = input_path.stat().st_size
+        buffer = io.BytesIO()
+        stats = {}
+        result.original_size, result.new_size = processor.reduce_image(
+            input_path, buffer, stats
+        )
+        result.quality, result.ssim = stats.get("quality"), stats.get("ssim")
+        result.tile = stats.get("tile")
+        data = buffer.getvalue()
+        result.bytes_out = len(data)
+    except Exception as e:
+        result.status = STATUS_FAILED
+        result.error = str(e)
+    result.elapsed = time.perf_counter() - start
+    return result, data
+
+
+def reduce_directory(
+    input_dir: Path,
+    output_dir: Path,
+    processor: Optional["ImageProcessor"] = None,
+    cancel: Optional[CancelToken] = None,
+    files: Optional[Iterable[Path]] = None,
+    pool: Optional["WorkerPool"] = None,
+    catalog: Optional["Catalog"] = None,
+    archive: Optional["ArchiveWriter"] = None,
+    throttle: Optional["Throttle"] = None,
+    tuner: Optional["AutoTuner"] = None,
+    pipeline: Optional["ShmPipeline"] = None,
+    contact_sheet: Optional["ContactSheet"] = None,
+) -> Iterator[ReduceResult]:
+    """
+    ディレクトリ内のJPEGファイルを軽量化し、1ファイルごとに結果を返す
+
+    Args:
+        input_dir: 入力ディレクトリ（.zip / .tar の場合は展開せずに読み込む。
+            ストレージの場合はストレージ上のファイルを範囲読み込みで読む）
+        output_dir: 出力ディレクトリ（ストレージの場合はメモリ上で軽量化した結果を
+            書き込む。pipelineとは併用できない）
+        processor: 画像プロセッサー（省略時はデフォルト設定）
+        cancel: キャンセルトークン。キャンセル後は次のファイルに進まずに終了する
+        files: 処理対象ファイル（省略時はinput_dirのJPEGファイル）
+        pool: ワーカープール。指定時は並列に処理する（結果は入力順に返す）
+        catalog: 元画像カタログ。指定時はinput_dirの一覧をカタログから取得する
+        archive: 指定時はoutput_dirではなくアーカイブに書き込む
+            （結果レコードのoutput_pathはアーカイブ内のファイル名）
+        throttle: 指定時は帯域・ロードアベレージで次のファイルの投入を待ち、
+            読み書きしたバイト数を記録する（バックグラウンド処理）
+        tuner: 指定時はプールに同時に投入するファイル数をtuner.valueにし、
+            処理速度を記録して調整する（poolの指定時のみ）
+        pipeline: 指定時はpoolの代わりに、復号・縮小と保存を別のワーカープロセスで行い
+            画素を共有メモリで渡す（結果は入力順に返す。archiveとは併用できない）
+        contact_sheet: 指定時は縮小した画素からワーカーでタイルを作り、入力順に
+            コンタクトシートへ追加する（閉じるのは呼び出し側）
+
+    Yields:
+        ReduceResult: 処理結果レコード
+
+    Raises:
+        ArchiveError: アーカイブへの書き込みに失敗した場合
+        ValueError: pipelineとarchive、またはpipelineとストレージの出力先を指定した場合
+    """
+    if pipeline is not None and archive is not None:
+        raise ValueError("共有メモリのパイプラインはアーカイブへの書き込みと併用できません")
+    if pipeline is not None and isinstance(output_dir, Storage):
+        raise ValueError("共有メモリのパイプラインはストレージへの書き込みと併用できません")
+    if processor is None:
+        from .core.image_processor import ImageProcessor
+
+        processor = ImageProcessor()
+    if contact_sheet is not None and processor.tile_size != contact_sheet.tile_size:
+        # 渡されたプロセッサーは変更しない
+        processor = copy.copy(processor)
+        processor.tile_size = contact_sheet.tile_size
+    targets = (
+        list(files)
+        if files is not None
+        else FileMatcher.get_jpeg_files(input_dir, catalog)
+    )
+    total = len(targets)
+    if cancel is not None and cancel.cancelled:
+        return
+
+    if archive is not None or isinstance(output_dir, Storage):
+        yield from _reduce_into_archive(
+            processor,
+            targets,
+            cancel,
+            pool,
+            archive if archive is not None else output_dir,
+            throttle,
+            tuner,
+            contact_sheet,
+        )
+        return
+
+    gated = _gated(targets, throttle, cancel)
+    if pipeline is not None:
+        results = _reduce_pipelined(pipeline, processor, gated, output_dir, cancel)
+    elif pool is None:
+        results = (
+            reduce_file(processor, input_file, output_dir / input_file.name)
+            for input_file in gated
+        )
+    else:
+        results = _map_ordered(
+            pool,
+            reduce_file,
+            ((processor, f, output_dir / f.name) for f in gated),
+            cancel,
+            tuner,
+        )
+
+    for index, result in enumerate(results, 1):
+        result.index = index
+        result.total = total
+        if throttle is not None:
+            throttle.account(
+                result.bytes_in + result.bytes_out, reserved=result.bytes_in
+            )
+        if tuner is not None and pool is not None:
+            tuner.record(1, result.bytes_in)
+        _add_tile(contact_sheet, result)
+        yield result
+        if cancel is not None and cancel.cancelled:
+            return
+
+
+def _add_tile(contact_sheet: Optional["ContactSheet"], result: ReduceResult):
+    """結果のタイルをコンタクトシートに追加して結果から外す（失敗したファイルは除く）"""
+    if contact_sheet is not None and result.tile is not None:
+        contact_sheet.add(result.output_path.name, result.tile)
+    result.tile = None
+
+
+def _reduce_into_archive(
+    processor: "ImageProcessor",
+    targets: list,
+    cancel: Optional[CancelToken],
+    pool: Optional["WorkerPool"],
+    archive: Union["ArchiveWriter", Storage],
+    throttle: Optional["Throttle"] = None,
+    tuner: Optional["AutoTuner"] = None,
+    contact_sheet: Optional["ContactSheet"] = None,
+) -> Iterator[ReduceResult]:
+    """
+    メモリ上で軽量化した結果を入力順にアーカイブ（またはストレージ）へ渡す
+
+    並列時にメモリ上に保持するデータは、_map_orderedの投入数とアーカイブの書き込み待ちの
+    上限までになる。ストレージへの書き込みに失敗したファイルは失敗として結果に記録する
+    （output_pathはストレージ上のファイル）。
+    """
+    total = len(targets)
+    gated = _gated(targets, throttle, cancel)
+    if pool is None:
+        results = (reduce_to_bytes(processor, f) for f in gated)
+    else:
+        results = _map_ordered(
+            pool, reduce_to_bytes, ((processor, f) for f in gated), cancel, tuner
+        )
+
+    for index, (result, data) in enumerate(results, 1):
+        result.index = index
+        result.total = total
+        if throttle is not None:
+            throttle.account(
+                result.bytes_in + result.bytes_out, reserved=result.bytes_in
+            )
+        if tuner is not None and pool is not None:
+            tuner.record(1, result.bytes_in)
+        if isinstance(archive, Storage):
+            _write_to_storage(archive, result, data)
+        elif data is not None:
+            archive.add_bytes(result.output_path.name, data)
+        _add_tile(contact_sheet, result)
+        yield result
+        if cancel is not None and cancel.cancelled:
+            return
+
+
+def _write_to_storage(storage: Storage, result: ReduceResult, data: Optional[bytes]):
+    """軽量化したデータをストレージに書き込み、結果のoutput_pathを書き込み先にする"""
+    result.output_path = storage / result.path.name
+    if data is None:
+        return
+    try:
+        storage.write_bytes(result.path.name, data)
+    except Exception as e:
+        result.status = STATUS_FAILED
+        result.error = str(e)
+
+
+def _gated(
+    targets: list, throttle: Optional["Throttle"], cancel: Optional[CancelToken]
+) -> Iterator[Path]:
+    """
+    処理対象を順に返す（throttleの指定時は投入してよくなるまで待ち、
+    入力ファイルのサイズを帯域から差し引いてから返す）
+    """
+    for target in targets:
+        if throttle is not None:
+            throttle.wait(cancel)
+        if cancel is not None and cancel.cancelled:
+            return
+        if throttle is not None:
+            throttle.reserve(_input_size(target))
+        yield target
+
+
+def _input_size(path) -> int:
+    """入力ファイルのサイズ（取得できなければ0。処理時のbytes_inと同じ値になる）"""
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _map_ordered(
+    pool: "WorkerPool",
+    fn,
+    arguments: Iterable,
+    cancel: Optional[CancelToken],
+    tuner: Optional["AutoTuner"] = None,
+) -> Iterator:
+    """
+    ワーカープールでfnを並列実行し、入力順に結果を返す
+
+    メモリを抑えるため、同時に投入するタスク数はワーカー数の2倍までにする。
+    tunerの指定時は実行中のタスクをtuner.value件までにし、どのタスクが終わっても
+    次を投入する（完了済みで順番待ちの結果もワーカー数の2倍までにする）。
+    キャンセル時は未着手のタスクを取り消して終了する。
+    """
+    pending = deque()
+    remaining = iter(arguments)
+    window = pool.max_workers * 2
+
+    def fill():
+        running = len(pending)
+        if tuner is not None:
+            running = sum(1 for future in pending if not future.done())
+        limit = window if tuner is None else tuner.value
+        while running < limit and len(pending) < window:
+            if cancel and cancel.cancelled:
+                return
+            args = next(remaining, None)
+            if args is None:
+                return
+            pending.append(pool.submit(fn, *args))
+            running += 1
+
+    try:
+        while True:
+            fill()
+            if not pending:
+                return
+            head = pending[0]
+            while tuner is not None and not head.done():
+                wait(
+                    [future for future in pending if not future.done()],
+                    return_when=FIRST_COMPLETED,
+                )
+                fill()
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class _PipelineTask:
+    """共有メモリのパイプラインで処理中のファイル"""
+
+    __slots__ = ("result", "future", "slab", "frame")
+
+    def __init__(self, result: ReduceResult, future, slab: str):
+        self.result = result
+        # 実行中の段階（復号または保存）。終わったらNone
+        self.future = future
+        self.slab: Optional[str] = slab
+        self.frame = None
+
+
+def _reduce_pipelined(
+    pipeline: "ShmPipeline",
+    processor: "ImageProcessor",
+    targets: Iterable[Path],
+    output_dir: Path,
+    cancel: Optional[CancelToken],
+) -> Iterator[ReduceResult]:
+    """
+    復号・縮小と保存を別のワーカープールで行い、入力順に結果を返す
+
+    同時に処理するファイルはスラブの数までにし、保存が終わったスラブを次のファイルに
+    使い回す（完了済みで順番待ちの結果はスラブの数の2倍まで）。
+    終了・キャンセル時は未着手のタスクを取り消し、実行中のタスクを待ってスラブを返す。
+    """
+    from .core.pipeline import decode_to_slab, encode_from_slab
+
+    slabs = pipeline.slabs_for(processor)
+    remaining = iter(targets)
+    pending = deque()
+    window = len(slabs) * 2
+
+    def fill():
+        while slabs.available and len(pending) < window:
+            if cancel and cancel.cancelled:
+                return
+            input_file = next(remaining, None)
+            if input_file is None:
+                return
+            slab = slabs.acquire()
+            result = ReduceResult(0, 0, input_file, output_dir / input_file.name)
+            future = pipeline.decode_pool.submit(
+                decode_to_slab, processor, input_file, slab
+            )
+            pending.append(_PipelineTask(result, future, slab))
+
+    def advance(task: _PipelineTask):
+        """終わった段階を次に進める（保存が終わったらスラブを返す）"""
+        future, task.future = task.future, None
+        result = task.result
+        try:
+            value = future.result()
+        except Exception as e:
+            result.status = STATUS_FAILED
+            result.error = str(e)
+        else:
+            if task.frame is None:
+                task.frame = frame = value
+                result.bytes_in = frame.bytes_in
+                result.original_size, result.new_size = (
+                    frame.original_size,
+                    frame.new_size,
+                )
+                result.elapsed = frame.elapsed
+                result.worker = frame.worker
+                task.future = pipeline.encode_pool.submit(
+                    encode_from_slab, processor, frame, result.output_path
+                )
+                return
+            stats, result.bytes_out, elapsed = value
+            result.quality, result.ssim = stats.get("quality"), stats.get("ssim")
+            result.tile = stats.get("tile")
+            result.elapsed += elapsed
+        slabs.release(task.slab)
+        task.slab = None
+
+    try:
+        while True:
+            fill()
+            if not pending:
+                return
+            while pending[0].future is not None:
+                wait(
+                    [task.future for task in pending if task.future is not None],
+                    return_when=FIRST_COMPLETED,
+                )
+                for task in pending:
+                    if task.future is not None and task.future.done():
+                        advance(task)
+                fill()
+            yield pending.popleft().result
+    finally:
+        # 実行中のタスクがスラブに書き込み終えるまで待ってから返す
+        wait(
+            [
+                task.future
+                for task in pending
+                if task.future is not None and not task.future.cancel()
+            ]
+        )
+        for task in pending:
+            if task.slab is not None:
+                slabs.release(task.slab)
+
+
+def _copy_to_output(
+    result: "ChoiceResult",
+    original_file: Optional[Path],
+    output_dir: Path,
+    copier: Optional["AdaptiveCopier"] = None,
+    sync: Optional["SyncPolicy"] = None,
+    archive: Optional["ArchiveWriter"] = None,
+) -> "ChoiceResult":
+    """
+    検索済みの元画像を出力ディレクトリにコピーして結果レコードに記録する
+
+    syncを指定した場合、出力先に同一のファイルがあればコピーしない（bytes_outは0）。
+    archiveを指定した場合はアーカイブに追加する（output_pathはアーカイブ内のファイル名）。
+    output_dirがストレージの場合はストレージに書き込む（同じサービスの元画像は
+    サーバー側でコピーする）。
+    """
+    start = time.perf_counter()
+    result.worker = _worker_name()
+    if original_file is None:
+        result.status = STATUS_NOT_FOUND
+    else:
+        result.source_path = original_file
+        result.output_path = output_dir / original_file.name
+        try:
+            if archive is not None:
+                result.output_path = Path(original_file.name)
+                result.bytes_in = result.bytes_out = original_file.stat().st_size
+                archive.add_file(original_file.name, original_file)
+                result.elapsed += time.perf_counter() - start
+                return result
+            if isinstance(output_dir, Storage):
+                size = output_dir.put(original_file, original_file.name)
+                result.bytes_in = result.bytes_out = size
+                result.elapsed += time.perf_counter() - start
+                return result
+            if isinstance(original_file, (ArchiveMember, StorageObject)):
+                # アーカイブ内・ストレージ上の元画像は書き出す（copier・syncは使わない）
+                size = original_file.extract(result.output_path)
+                result.bytes_in = result.bytes_out = size
+                result.elapsed += time.perf_counter() - start
+                return result
+            if sync is not None:
+                result.sync_action = sync.action(original_file, result.output_path)
+                if result.sync_action == SYNC_UNCHANGED:
+                    result.bytes_in = original_file.stat().st_size
+                    result.elapsed += time.perf_counter() - start
+                    return result
+            if copier is None:
+                shutil.copy2(original_file, result.output_path)
+                size = result.output_path.stat().st_size
+            else:
+                size, result.checksum = copier.copy(original_file, result.output_path)
+            result.bytes_in = result.bytes_out = size
+        except Exception as e:
+            result.status = STATUS_FAILED
+            result.error = str(e)
+    result.elapsed += time.perf_counter() - start
+    return result
+
+
+def copy_original(
+    selected_file: Path,
+    original_dir: Path,
+    output_dir: Path,
+    catalog: Optional["Catalog"] = None,
+) -> ChoiceResult:
+    """
+    選定ファイルに対応する元画像を検索してコピーする（例外は送出しない）
+
+    Args:
+        selected_file: 選定ファイル
+        original_dir: 元画像ディレクトリ
+        output_dir: 出力ディレクトリ
+        catalog: 元画像カタログ（指定時はカタログから検索）
+
+    Returns:
+        ChoiceResult: index/totalは0のままの結果レコード
+    """
+    start = time.perf_counter()
+    result = ChoiceResult(0, 0, selected_file)
+    original_file = FileMatcher.find_matching_file(
+        selected_file.name, original_dir, catalog
+    )
+    result.elapsed = time.perf_counter() - start
+    return _copy_to_output(result, original_file, output_dir)
+
+
+def choose(
+    original_dir: Path,
+    output_dir: Path,
+    selected_dir: Path,
+    cancel: Optional[CancelToken] = None,
+    files: Optional[Iterable[Path]] = None,
+    catalog: Optional["Catalog"] = None,
+    copier: Optional["AdaptiveCopier"] = None,
+    sync: Optional["SyncPolicy"] = None,
+    archive: Optional["ArchiveWriter"] = None,
+) -> Iterator[ChoiceResult]:
+    """
+    選定ファイルに対応する元画像をコピーし、1ファイルごとに結果を返す
+
+    Args:
+        original_dir: 元画像ディレクトリ（.zip / .tar の場合は展開せずに読み込む。
+            ストレージも指定できる）
+        output_dir: 出力ディレクトリ（ストレージも指定できる）
+        selected_dir: 選定ファイルのディレクトリ
+        cancel: キャンセルトークン。キャンセル後は次のファイルに進まずに終了する
+        files: 選定ファイル（省略時はselected_dirの画像ファイル）
+        catalog: 元画像カタログ（指定時は元画像をカタログから検索）
+        copier: 並列コピー。指定時は並列にコピーする（結果は入力順に返す）
+        sync: 差分同期の判定方法。指定時は出力先の同一ファイルのコピーを省略する
+        archive: 指定時はoutput_dirではなくアーカイブに追加する（copier・syncは使わない）
+
+    Yields:
+        ChoiceResult: 処理結果レコード
+
+    Raises:
+        ValueError: archiveとsync、またはアーカイブ・ストレージの元画像・出力先と
+            syncを同時に指定した場合
+    """
+    targets = (
+        list(files) if files is not None else FileMatcher.get_image_files(selected_dir)
+    )
+    yield from _choose_paths(
+        targets, original_dir, output_dir, cancel, catalog, copier, sync, archive
+    )
+
+
+def choose_names(
+    original_dir: Path,
+    output_dir: Path,
+    names: Iterable[str],
+    cancel: Optional[CancelToken] = None,
+    catalog: Optional["Catalog"] = None,
+    copier: Optional["AdaptiveCopier"] = None,
+    sync: Optional["SyncPolicy"] = None,
+    archive: Optional["ArchiveWriter"] = None,
+) -> Iterator[ChoiceResult]:
+    """
+    選定リストのファイル名に対応する元画像をコピーし、1ファイルごとに結果を返す
+
+    選定フォルダーは使わない。結果レコードのpathはファイル名だけのパスになる。
+
+    Args:
+        original_dir: 元画像ディレクトリ（.zip / .tar の場合は展開せずに読み込む。
+            ストレージも指定できる）
+        output_dir: 出力ディレクトリ（ストレージも指定できる）
+        names: 選定したファイル名（selection.read_selectionの結果など）
+        cancel: キャンセルトークン。キャンセル後は次のファイルに進まずに終了する
+        catalog: 元画像カタログ（指定時は元画像の索引をカタログから作成）
+        copier: 並列コピー。指定時は並列にコピーする（結果は入力順に返す）
+        sync: 差分同期の判定方法。指定時は出力先の同一ファイルのコピーを省略する
+        archive: 指定時はoutput_dirではなくアーカイブに追加する（copier・syncは使わない）
+
+    Yields:
+        ChoiceResult: 処理結果レコード
+
+    Raises:
+        ValueError: archiveとsync、またはアーカイブ・ストレージの元画像・出力先と
+            syncを同時に指定した場合
+    """
+    targets = [Path(name) for name in names]
+    yield from _choose_paths(
+        targets, original_dir, output_dir, cancel, catalog, copier, sync, archive
+    )
+
+
+def _choose_paths(
+    targets: list,
+    original_dir: Path,
+    output_dir: Path,
+    cancel: Optional[CancelToken],
+    catalog: Optional["Catalog"],
+    copier: Optional["AdaptiveCopier"] = None,
+    sync: Optional["SyncPolicy"] = None,
+    archive: Optional["ArchiveWriter"] = None,
+) -> Iterator[ChoiceResult]:
+    """
+    元画像ディレクトリの索引を一度だけ作成し、各選定ファイルの元画像をコピーする
+
+    ファイルごとに元画像ディレクトリを走査しないため、数万件の選定でも走査は1回で済む。
+    アーカイブに追加する場合は書き込みスレッドが1つのため、並列コピーは使わない。
+    元画像ディレクトリがアーカイブの場合も、アーカイブを順に読むため並列コピーは使わない。
+    ストレージの場合は並列コピーの各スレッドがストレージの読み書き（コピー）を行う。
+    """
+    if archive is not None and sync is not None:
+        raise ValueError("アーカイブへの出力では差分同期を使えません")
+    source_archive = is_archive_source(original_dir)
+    if source_archive and sync is not None:
+        raise ValueError("アーカイブの元画像では差分同期を使えません")
+    if sync is not None and (
+        isinstance(original_dir, Storage) or isinstance(output_dir, Storage)
+    ):
+        raise ValueError("ストレージの元画像・出力先では差分同期を使えません")
+    total = len(targets)
+    if not targets or (cancel is not None and cancel.cancelled):
+        return
+    index = FileMatcher.build_index(original_dir, catalog)
+
+    if copier is not None and archive is None and not source_archive:
+        arguments = (
+            (
+                ChoiceResult(number, total, selected_file),
+                index.find(selected_file.name),
+                output_dir,
+                copier,
+                sync,
+            )
+            for number, selected_file in enumerate(targets, 1)
+        )
+        cancelled = (lambda: cancel.cancelled) if cancel is not None else None
+        yield from copier.map(_copy_to_output, arguments, cancelled)
+        return
+
+    for number, selected_file in enumerate(targets, 1):
+        if cancel is not None and cancel.cancelled:
+            return
+        result = ChoiceResult(number, total, selected_file)
+        yield _copy_to_output(
+            result,
+            index.find(selected_file.name),
+            output_dir,
+            sync=sync,
+            archive=archive,
+        )
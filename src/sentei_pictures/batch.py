@@ -0,0 +1,250 @@
+"""
+バッチジョブファイル
+TOMLで記述した複数のreduce/choice/workflowジョブを1つのスケジューラーでまとめて実行する
+
+ジョブファイルの例:
+    [scheduler]
+    workers = 8             # 共有ワーカープールのプロセス数
+    concurrent_jobs = 2     # 同時に実行するジョブ数
+    policy = "fair"         # "priority" または "fair"
+    copies = 4              # choiceで同時に実行するコピーの数
+    autotune = true         # workers（上限）・copiesを処理速度から自動調整する
+
+    [defaults]              # 全ジョブ共通のImageProcessor設定
+    quality = 87
+    max_long_side = 3000
+    color = "srgb"          # 埋め込みICCプロファイルの扱い（"none" / "srgb" / "preserve"）
+    target_ssim = 0.98      # 画像ごとにSSIMがこの値以上になる最小の品質を選ぶ（NumPyが必要）
+
+    [[jobs]]
+    name = "wedding-a"
+    kind = "reduce"
+    input_dir = "wedding/original"     # 相対パスはジョブファイルからの相対
+    output_dir = "wedding/reduced"
+    quality = 80
+    priority = 5
+    group = "wedding"
+"""
+
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+from .jobs import (
+    JOB_FAILED,
+    JOB_KINDS,
+    POLICIES,
+    POLICY_PRIORITY,
+    Job,
+    JobScheduler,
+    validate_job,
+)
+
+if TYPE_CHECKING:
+    from .core.autotune import BatchTuning
+    from .core.worker_pool import WorkerPool
+
+# ジョブ定義のうちパラメーター以外のキー
+JOB_META_KEYS = ("name", "kind", "priority", "group")
+
+# ImageProcessorの設定キー
+SETTINGS_KEYS = ("quality", "max_long_side", "color", "target_ssim")
+
+
+def _load_toml(path: Path) -> dict:
+    """TOMLファイルを読み込む（Python 3.11未満ではtomliを使う）"""
+    try:
+        import tomllib
+    except ModuleNotFoundError:
+        try:
+            import tomli as tomllib
+        except ModuleNotFoundError:
+            raise RuntimeError(
+                "Python 3.11未満でジョブファイルを読み込むには tomli をインストールしてください"
+            ) from None
+
+    with open(path, "rb") as f:
+        try:
+            return tomllib.load(f)
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError(f"ジョブファイルの形式が正しくありません: {e}") from None
+
+
+class BatchJob:
+    """ジョブファイルの1ジョブ分の定義"""
+
+    __slots__ = ("name", "kind", "priority", "group", "params")
+
+    def __init__(
+        self, name: str, kind: str, priority: int, group: Optional[str], params: dict
+    ):
+        self.name = name
+        self.kind = kind
+        self.priority = priority
+        self.group = group
+        self.params = params
+
+
+class BatchFile:
+    """読み込んだジョブファイル"""
+
+    def __init__(
+        self,
+        jobs: List[BatchJob],
+        workers: Optional[int] = None,
+        concurrent_jobs: int = 1,
+        policy: str = POLICY_PRIORITY,
+        copies: Optional[int] = None,
+        autotune: bool = False,
+    ):
+        """
+        Args:
+            jobs: ジョブ定義（ファイルに書かれた順）
+            workers: 共有ワーカープールのプロセス数（省略時はCPUコア数。
+                自動調整では上限）
+            concurrent_jobs: 同時に実行するジョブ数
+            policy: スケジューリング方針
+            copies: choiceで同時に実行するコピーの数（省略時は並列コピーなし）
+            autotune: ワーカー数・コピーの並列数を処理速度から自動調整する
+        """
+        self.jobs = jobs
+        self.workers = workers
+        self.concurrent_jobs = concurrent_jobs
+        self.policy = policy
+        self.copies = copies
+        self.autotune = autotune
+
+    @classmethod
+    def load(cls, path: Path) -> "BatchFile":
+        """
+        ジョブファイルを読み込んで検証
+
+        Args:
+            path: ジョブファイル（TOML）
+
+        Returns:
+            BatchFile: 読み込んだジョブファイル
+
+        Raises:
+            ValueError: 内容が不正な場合（どのジョブかをメッセージに含む）
+        """
+        path = Path(path)
+        data = _load_toml(path)
+        base_dir = path.resolve().parent
+
+        scheduler = data.get("scheduler", {})
+        policy = scheduler.get("policy", POLICY_PRIORITY)
+        if policy not in POLICIES:
+            raise ValueError(f"不明なスケジューリング方針です: {policy}")
+        copies = scheduler.get("copies")
+        if copies is not None and (not isinstance(copies, int) or copies < 1):
+            raise ValueError(f"copies には1以上の整数を指定してください: {copies}")
+        autotune = scheduler.get("autotune", False)
+        if not isinstance(autotune, bool):
+            raise ValueError(f"autotune には true / false を指定してください: {autotune}")
+        defaults = data.get("defaults", {})
+        unknown = set(defaults) - set(SETTINGS_KEYS)
+        if unknown:
+            raise ValueError(f"[defaults] の不明なキーです: {', '.join(sorted(unknown))}")
+
+        entries = data.get("jobs", [])
+        if not entries:
+            raise ValueError("[[jobs]] が1つもありません")
+
+        jobs = []
+        names = set()
+        for number, entry in enumerate(entries, 1):
+            name = str(entry.get("name", f"job{number}"))
+            if name in names:
+                raise ValueError(f"ジョブ名が重複しています: {name}")
+            names.add(name)
+
+            kind = entry.get("kind", "reduce")
+            priority = entry.get("priority", 0)
+            group = entry.get("group")
+            params = {**defaults}
+            try:
+                for key, value in entry.items():
+                    if key in JOB_META_KEYS:
+                        continue
+                    if key.endswith("_dir"):
+                        if not isinstance(value, str):
+                            raise ValueError(f"{key} にはパスを文字列で指定してください: {value!r}")
+                        value = str(base_dir / Path(value).expanduser())
+                    params[key] = value
+
+                validate_job(kind, params, priority, group)
+                unknown = set(params) - set(JOB_KINDS[kind]) - set(SETTINGS_KEYS)
+                if unknown:
+                    raise ValueError(f"不明なキーです: {', '.join(sorted(unknown))}")
+            except ValueError as e:
+                raise ValueError(f"ジョブ {name}: {e}") from None
+
+            jobs.append(
+                BatchJob(
+                    name,
+                    kind,
+                    priority,
+                    group,
+                    params,
+                )
+            )
+
+        return cls(
+            jobs,
+            workers=scheduler.get("workers"),
+            concurrent_jobs=int(scheduler.get("concurrent_jobs", 1)),
+            policy=policy,
+            copies=copies,
+            autotune=autotune,
+        )
+
+
+def run_batch(
+    batch: BatchFile,
+    pool: Optional["WorkerPool"] = None,
+    on_finish: Optional[Callable[[Job], None]] = None,
+    poll_interval: float = 0.2,
+    tuning: Optional["BatchTuning"] = None,
+) -> List[Job]:
+    """
+    全ジョブを1つのスケジューラーで実行して終了を待つ
+
+    Ctrl+C（KeyboardInterrupt）では待機中・実行中のジョブをキャンセルしてから再送出する。
+
+    Args:
+        batch: ジョブファイル
+        pool: 全ジョブで共有するワーカープール（省略時は並列処理なし）
+        on_finish: ジョブが終了するたびに呼ばれるコールバック
+        poll_interval: ジョブの終了を確認する間隔（秒）
+        tuning: 指定時はワーカー数・コピーの並列数を自動調整する
+            （batch.autotuneに応じて呼び出し側で作成する）
+
+    Returns:
+        List[Job]: ジョブファイルの順に並べた終了済みのジョブ
+    """
+    scheduler = JobScheduler(
+        pool, batch.concurrent_jobs, batch.policy, tuning, batch.copies
+    )
+    jobs = [
+        scheduler.submit(spec.kind, spec.params, spec.priority, spec.group, spec.name)
+        for spec in batch.jobs
+    ]
+
+    scheduler.start()
+    try:
+        pending = list(jobs)
+        while pending:
+            time.sleep(poll_interval)
+            if not scheduler.alive:
+                # 実行スレッドが止まった場合は残りのジョブを失敗として終える
+                for job in pending:
+                    if not job.finished:
+                        job.set_state(JOB_FAILED, "ジョブ実行スレッドが停止しました")
+            for job in [job for job in pending if job.finished]:
+                pending.remove(job)
+                if on_finish is not None:
+                    on_finish(job)
+    finally:
+        scheduler.shutdown()
+    return jobs
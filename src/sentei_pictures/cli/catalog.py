@@ -0,0 +1,70 @@
+"""
+元画像カタログCLI
+元画像ディレクトリをカタログに登録・更新します。
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from .reduce import add_catalog_argument
+
+DESCRIPTION = "元画像ディレクトリをカタログ（SQLite）に登録・更新します。"
+
+EPILOG = """例:
+  sentei catalog --catalog ~/sentei.db /nas/original/2024-*
+  sentei catalog --catalog ~/sentei.db --hash /nas/original/wedding
+
+  export SENTEI_CATALOG=~/sentei.db
+  sentei reduce /nas/original/wedding /nas/reduced/wedding"""
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """catalogコマンドの引数を追加"""
+    parser.add_argument("directories", nargs="+", type=Path, help="元画像ディレクトリ")
+    add_catalog_argument(parser)
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="ディレクトリの更新日時に関わらず全ファイルを確認",
+    )
+    parser.add_argument("--hash", action="store_true", help="ファイル内容のSHA-256も記録")
+
+
+def execute(args: argparse.Namespace) -> int:
+    """
+    解析済みの引数でカタログを更新
+
+    Args:
+        args: add_argumentsで定義した引数
+
+    Returns:
+        int: 終了コード
+    """
+    from ..core.catalog import open_catalog
+
+    catalog = open_catalog(args.catalog)
+    if catalog is None:
+        print("エラー: --catalog または環境変数 SENTEI_CATALOG でカタログを指定してください。")
+        return 1
+
+    exit_code = 0
+    with catalog:
+        for directory in args.directories:
+            if not directory.is_dir():
+                print(f"エラー: ディレクトリが存在しません: {directory}")
+                exit_code = 1
+                continue
+
+            start = time.perf_counter()
+            stats = catalog.refresh(directory, full=args.full, hashes=args.hash)
+            elapsed = time.perf_counter() - start
+            if stats.skipped:
+                print(f"{directory}: 変更なし ({elapsed:.2f}秒)")
+            else:
+                print(
+                    f"{directory}: 追加 {stats.added}, 更新 {stats.updated}, "
+                    f"削除 {stats.removed}, 変更なし {stats.unchanged} "
+                    f"({elapsed:.2f}秒)"
+                )
+    return exit_code
@@ -3,91 +3,603 @@
 選定したファイルと同じ名前の元画像をコピーします。
 """
 
-import shutil
+import argparse
 import sys
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
 
+from ..api import STATUS_NOT_FOUND, choose, choose_names
 from ..core.file_matcher import FileMatcher
+from ..core.storage import Storage
 from .input_handler import InputHandler
+from .reduce import (
+    add_archive_arguments,
+    add_catalog_argument,
+    check_archive_arguments,
+    close_archive,
+    location,
+    open_archive,
+)
 
+if TYPE_CHECKING:
+    from ..core.archive import ArchiveWriter
+    from ..core.catalog import Catalog
+    from ..core.copier import AdaptiveCopier
+    from ..core.sync import SyncPolicy
 
-def print_usage():
-    """使用方法を表示"""
-    print("使用方法:")
-    print("  1. 対話型: sentei-choice")
-    print(
-        "  2. コマンドライン: sentei-choice <本体の画像があるパス> " "<選定後のファイルを保存するパス> <選定したファイルがあるパス>"
+DESCRIPTION = "選定したファイルと同じ名前の元画像をコピーします。"
+
+EPILOG = """例:
+  sentei-choice
+  sentei-choice /path/to/original /path/to/selected /path/to/reduced
+
+  # 選定フォルダーの代わりに選定リストを使う
+  sentei-choice /path/to/original /path/to/selected --list picks.txt
+  sentei-choice /path/to/original /path/to/selected --list picks.csv --min-rating 3
+  sentei-choice /path/to/original /path/to/selected --list /path/to/xmp --label Red
+
+選定リストはテキスト（1行1ファイル名）、CSV（filename/rating/label列）、
+XMPサイドカー（ファイルまたはディレクトリ。xmp:Rating / xmp:Label）に対応します。
+コピーは転送速度を測りながら並列数（最大 --copy-jobs）を自動で調整します。
+--sync では保存先に同じファイル（サイズ・更新日時が一致）があるものはコピーせず、
+--prune を付けると選定から外れたファイルを削除（delete）または .deselected に退避（quarantine）します。
+保存先の拡張子が .zip / .tar の場合は、元画像をアーカイブに直接書き込みます（--volume-size で分割）。
+本体の画像に .zip / .tar を指定すると、展開せずにアーカイブ内の元画像を取り出します。
+本体の画像・保存先には s3://バケット/プレフィックス も指定できます（boto3が必要）。
+両方が同じS3互換ストレージの場合は、元画像をダウンロードせずにサーバー側でコピーします。
+引数を省略すると対話型で入力します。"""
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """choiceコマンドの引数を追加"""
+    parser.add_argument(
+        "original_dir",
+        nargs="?",
+        type=location,
+        help="本体の画像があるパス（.zip / .tar・s3:// も可）",
+    )
+    parser.add_argument(
+        "output_dir", nargs="?", type=location, help="選定後のファイルを保存するパス（s3:// も可）"
+    )
+    parser.add_argument("selected_dir", nargs="?", type=Path, help="選定したファイルがあるパス")
+    parser.add_argument(
+        "--list",
+        dest="selection",
+        type=Path,
+        metavar="PATH",
+        help="選定フォルダーの代わりに使う選定リスト（テキスト・CSV・XMP）",
     )
-    print("")
-    print("例:")
-    print("  sentei-choice")
-    print("  sentei-choice /path/to/original /path/to/selected /path/to/reduced")
+    parser.add_argument(
+        "--min-rating",
+        type=int,
+        metavar="N",
+        help="選定リストの評価がN以上のものだけ（CSV・XMP）",
+    )
+    parser.add_argument(
+        "--label",
+        action="append",
+        dest="labels",
+        metavar="LABEL",
+        help="選定リストのカラーラベルで絞り込み（複数指定可、CSV・XMP）",
+    )
+    add_copy_arguments(parser)
+    add_sync_arguments(parser)
+    add_archive_arguments(parser)
+    add_catalog_argument(parser)
 
 
-def main():
-    """choice機能のメインエントリーポイント"""
-    # コマンドライン引数がある場合は従来通り
-    if len(sys.argv) == 4:
-        original_dir = Path(sys.argv[1])
-        output_dir = Path(sys.argv[2])
-        selected_dir = Path(sys.argv[3])
+def add_sync_arguments(parser: argparse.ArgumentParser):
+    """差分同期の引数（--sync / --sync-hash / --prune）を追加"""
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="保存先に同じファイル（サイズ・更新日時が一致）があればコピーしない",
+    )
+    parser.add_argument(
+        "--sync-hash",
+        action="store_true",
+        help="--sync の比較でハッシュも確認する（両方のファイルを読むため遅い）",
+    )
+    parser.add_argument(
+        "--prune",
+        choices=("delete", "quarantine"),
+        help="選定から外れた保存先のファイルを削除・退避する（--sync と一緒に指定）",
+    )
+
+
+def get_sync(args: argparse.Namespace) -> Optional["SyncPolicy"]:
+    """
+    引数から差分同期の判定方法を作成
+
+    Returns:
+        Optional[SyncPolicy]: --sync / --sync-hash がない場合はNone
+    """
+    if not (args.sync or args.sync_hash):
+        return None
+
+    from ..core.sync import SyncPolicy
+
+    return SyncPolicy(checksum="sha256" if args.sync_hash else None)
+
+
+def add_copy_arguments(parser: argparse.ArgumentParser):
+    """並列コピーの引数（--copy-jobs / --buffer-size）を追加"""
+    parser.add_argument(
+        "--copy-jobs",
+        type=int,
+        metavar="N",
+        help="同時に実行するコピーの最大数（デフォルト: 8、1で並列コピーなし）",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        type=int,
+        metavar="MB",
+        help="指定したサイズ（MB）のバッファで読み書きする（ネットワークドライブ向け）",
+    )
+    parser.add_argument(
+        "--checksum",
+        choices=("sha256", "blake2b"),
+        help="コピーしながらハッシュを計算し、保存先にSHA256SUMS（B2SUMS）を書き出す",
+    )
+
+
+def get_copier(args: argparse.Namespace) -> Optional["AdaptiveCopier"]:
+    """
+    引数から並列コピーを作成
+
+    Returns:
+        Optional[AdaptiveCopier]: 並列コピー（--copy-jobs 1 で --checksum なしの場合はNone）
+    """
+    from ..core.copier import DEFAULT_MAX_COPIES, AdaptiveCopier
+
+    max_copies = args.copy_jobs or DEFAULT_MAX_COPIES
+    if max_copies <= 1 and args.checksum is None:
+        return None
+    buffer_size = args.buffer_size * 1024 * 1024 if args.buffer_size else None
+    return AdaptiveCopier(
+        max_copies=max_copies, buffer_size=buffer_size, checksum=args.checksum
+    )
+
+
+def execute(args: argparse.Namespace) -> int:
+    """
+    解析済みの引数でchoiceを実行
+
+    Args:
+        args: add_argumentsで定義した引数
+
+    Returns:
+        int: 終了コード
+    """
+    if args.prune and not (args.sync or args.sync_hash):
+        print("エラー: --prune は --sync と一緒に指定してください。")
+        return 1
+    if not check_archive_arguments(args.output_dir, args):
+        return 1
+    if _is_archive(args.output_dir) and (args.sync or args.sync_hash or args.checksum):
+        print("エラー: 保存先がアーカイブの場合は --sync / --checksum を使えません。")
+        return 1
+    if _is_archive_source(args.original_dir) and (
+        args.sync or args.sync_hash or args.checksum
+    ):
+        print("エラー: 本体の画像がアーカイブの場合は --sync / --checksum を使えません。")
+        return 1
+    if (
+        isinstance(args.original_dir, Storage) or isinstance(args.output_dir, Storage)
+    ) and (args.sync or args.sync_hash or args.checksum):
+        print("エラー: 本体の画像・保存先がストレージの場合は --sync / --checksum を使えません。")
+        return 1
+    if args.selection is not None:
+        return execute_selection(args)
+    if args.min_rating is not None or args.labels:
+        print("エラー: --min-rating / --label は --list と一緒に指定してください。")
+        return 1
+
+    if args.selected_dir is not None:
+        original_dir = args.original_dir
+        output_dir = args.output_dir
+        selected_dir = args.selected_dir
 
         # ディレクトリの存在チェック
-        if not original_dir.exists() or not original_dir.is_dir():
+        if not _original_exists(original_dir):
             print(f"エラー: 本体の画像ディレクトリが存在しません: {original_dir}")
-            sys.exit(1)
+            return 1
 
         if not selected_dir.exists() or not selected_dir.is_dir():
             print(f"エラー: 選定したファイルのディレクトリが存在しません: {selected_dir}")
-            sys.exit(1)
+            return 1
 
-        # 出力ディレクトリの作成
-        output_dir.mkdir(parents=True, exist_ok=True)
-    elif len(sys.argv) == 1:
+        # 出力ディレクトリの作成（アーカイブの場合はrunで作成する）
+        if not _is_archive(output_dir) and not isinstance(output_dir, Storage):
+            output_dir.mkdir(parents=True, exist_ok=True)
+    elif args.original_dir is None:
         # 引数がない場合は対話型
         original_dir, output_dir, selected_dir = InputHandler.get_choice_input()
     else:
-        print("エラー: 引数の数が正しくありません。")
-        print_usage()
-        sys.exit(1)
+        print("エラー: 引数の数が正しくありません。--help で使用方法を確認してください。")
+        return 1
+
+    from ..core.catalog import open_catalog
+
+    catalog = open_catalog(args.catalog)
+    try:
+        return run(
+            original_dir,
+            output_dir,
+            selected_dir,
+            catalog,
+            _get_copier(args, original_dir, output_dir),
+            get_sync(args),
+            args.prune,
+            args.volume_size,
+        )
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+
+def execute_selection(args: argparse.Namespace) -> int:
+    """
+    選定リストを使ってchoiceを実行
+
+    Args:
+        args: add_argumentsで定義した引数（selectionを指定済み）
 
+    Returns:
+        int: 終了コード
+    """
+    if args.original_dir is None or args.output_dir is None or args.selected_dir:
+        print("エラー: --list を使う場合は本体の画像のパスと保存先のパスだけを指定してください。")
+        return 1
+    if not _original_exists(args.original_dir):
+        print(f"エラー: 本体の画像ディレクトリが存在しません: {args.original_dir}")
+        return 1
+    if not args.selection.exists():
+        print(f"エラー: 選定リストが存在しません: {args.selection}")
+        return 1
+
+    from ..core.selection import read_selection
+
+    try:
+        names = read_selection(args.selection, args.min_rating, args.labels)
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        print(f"エラー: 選定リストを読み込めません: {e}")
+        return 1
+
+    if not _is_archive(args.output_dir) and not isinstance(args.output_dir, Storage):
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    from ..core.catalog import open_catalog
+
+    catalog = open_catalog(args.catalog)
+    try:
+        return run_names(
+            args.original_dir,
+            args.output_dir,
+            names,
+            catalog,
+            _get_copier(args, args.original_dir, args.output_dir),
+            get_sync(args),
+            args.prune,
+            args.volume_size,
+        )
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+
+def run_names(
+    original_dir: Path,
+    output_dir: Path,
+    names: List[str],
+    catalog: Optional["Catalog"] = None,
+    copier: Optional["AdaptiveCopier"] = None,
+    sync: Optional["SyncPolicy"] = None,
+    prune: Optional[str] = None,
+    volume_size: Optional[int] = None,
+) -> int:
+    """
+    選定リストのファイル名でchoice処理を実行して結果を表示
+
+    Args:
+        original_dir: 元画像ディレクトリ
+        output_dir: 出力ディレクトリ（拡張子が .zip / .tar ならアーカイブに書き込む。
+            ストレージも指定できる）
+        names: 選定したファイル名
+        catalog: 元画像カタログ（省略時はディレクトリを1回走査して検索）
+        copier: 並列コピー（省略時は1ファイルずつコピー）
+        sync: 差分同期の判定方法（省略時は常にコピー）
+        prune: 選定から外れた保存先のファイルの扱い（"delete" / "quarantine"）
+        volume_size: アーカイブのボリュームの最大サイズ（MB、省略時は分割しない）
+
+    Returns:
+        int: 終了コード
+    """
+    if not names:
+        print("選定リストに該当するファイルがありませんでした。")
+        return 0
+
+    print(f"選定リストの{len(names)}個のファイルを処理します...")
+    archive = open_archive(output_dir, volume_size)
+    results = choose_names(
+        original_dir,
+        output_dir,
+        names,
+        catalog=catalog,
+        copier=copier,
+        sync=sync,
+        archive=archive,
+    )
+    return _print_archived_results(
+        results, len(names), output_dir, copier, prune, archive
+    )
+
+
+def run(
+    original_dir: Path,
+    output_dir: Path,
+    selected_dir: Path,
+    catalog: Optional["Catalog"] = None,
+    copier: Optional["AdaptiveCopier"] = None,
+    sync: Optional["SyncPolicy"] = None,
+    prune: Optional[str] = None,
+    volume_size: Optional[int] = None,
+) -> int:
+    """
+    choice処理を実行して結果を表示
+
+    Args:
+        original_dir: 元画像ディレクトリ
+        output_dir: 出力ディレクトリ（拡張子が .zip / .tar ならアーカイブに書き込む。
+            ストレージも指定できる）
+        selected_dir: 選定ファイルのディレクトリ
+        catalog: 元画像カタログ（省略時はディレクトリを走査して検索）
+        copier: 並列コピー（省略時は1ファイルずつコピー）
+        sync: 差分同期の判定方法（省略時は常にコピー）
+        prune: 選定から外れた保存先のファイルの扱い（"delete" / "quarantine"）
+        volume_size: アーカイブのボリュームの最大サイズ（MB、省略時は分割しない）
+
+    Returns:
+        int: 終了コード
+    """
     # 選定されたファイルを取得
     selected_files = FileMatcher.get_image_files(selected_dir)
 
     if not selected_files:
         print(f"選定されたファイルが見つかりませんでした: {selected_dir}")
-        sys.exit(0)
+        return 0
 
     print(f"{len(selected_files)}個の選定されたファイルを処理します...")
+    archive = open_archive(output_dir, volume_size)
+    results = choose(
+        original_dir,
+        output_dir,
+        selected_dir,
+        files=selected_files,
+        catalog=catalog,
+        copier=copier,
+        sync=sync,
+        archive=archive,
+    )
+    return _print_archived_results(
+        results, len(selected_files), output_dir, copier, prune, archive
+    )
+
+
+def _is_archive(output: Optional[Path]) -> bool:
+    """保存先がアーカイブ（.zip / .tar）かどうか"""
+    from ..core.archive import is_archive_path
+
+    return output is not None and is_archive_path(output)
+
+
+def _is_archive_source(original_dir: Optional[Path]) -> bool:
+    """本体の画像が既存のアーカイブ（.zip / .tar）かどうか"""
+    from ..core.archive import is_archive_source
+
+    return original_dir is not None and is_archive_source(original_dir)
+
+
+def _original_exists(original_dir: Path) -> bool:
+    """本体の画像（ディレクトリ・アーカイブ・ストレージ）があるかどうか"""
+    if isinstance(original_dir, Storage):
+        # ストレージは一覧を取得するまで確認しない（プレフィックスはディレクトリではない）
+        return True
+    return original_dir.is_dir() or _is_archive_source(original_dir)
+
+
+def _get_copier(
+    args: argparse.Namespace, original_dir: Path, output_dir: Path
+) -> Optional["AdaptiveCopier"]:
+    """並列コピーを作成（アーカイブから読む・アーカイブに書く場合は使わない）"""
+    if _is_archive(output_dir) or _is_archive_source(original_dir):
+        return None
+    return get_copier(args)
+
+
+def _print_archived_results(
+    results,
+    total: int,
+    output_dir: Path,
+    copier: Optional["AdaptiveCopier"],
+    prune: Optional[str],
+    archive: Optional["ArchiveWriter"],
+) -> int:
+    """_print_resultsで結果を表示し、アーカイブに書き込んだ場合は閉じて表示"""
+    if archive is None:
+        return _print_results(results, total, output_dir, copier, prune)
+
+    from ..core.archive import ArchiveError
+
+    try:
+        code = _print_results(results, total, output_dir, copier, prune)
+    except ArchiveError:
+        # 書き込みの失敗はclose_archiveで表示する
+        code = 1
+    return close_archive(archive) or code
+
+
+def _format_rate(num_bytes: int, seconds: float) -> str:
+    """転送速度をMB/sで表示する文字列に変換"""
+    if seconds <= 0:
+        return "-"
+    return f"{num_bytes / (1024 * 1024) / seconds:.1f} MB/s"
+
+
+def _print_results(
+    results,
+    total: int,
+    output_dir: Path,
+    copier: Optional["AdaptiveCopier"] = None,
+    prune: Optional[str] = None,
+) -> int:
+    """
+    choiceの結果を入力順に1件ずつ表示し、最後に集計を表示
+
+    差分同期の場合は差分を表示し、pruneを指定していれば選定から外れたファイルを
+    削除・退避する。チェックサム付きでコピーした場合や削除した場合はマニフェストを更新する。
+    """
+    from ..core.sync import SYNC_ADDED, SYNC_UNCHANGED, SYNC_UPDATED
 
+    start = time.perf_counter()
+    copied_bytes = 0
+    checksums = {}
+    kept = set()
+    actions = {SYNC_ADDED: 0, SYNC_UPDATED: 0, SYNC_UNCHANGED: 0}
     success_count = 0
+    failed_count = 0
     not_found_files = []
 
-    for i, selected_file in enumerate(selected_files, 1):
-        print(f"[{i}/{len(selected_files)}] {selected_file.name} に対応する元画像を検索中...")
+    for result in results:
+        print(f"[{result.index}/{result.total}] {result.path.name} に対応する元画像を検索しました")
 
-        # 対応する元画像を検索
-        original_file = FileMatcher.find_matching_file(selected_file.name, original_dir)
+        if result.ok:
+            success_count += 1
+            kept.add(result.output_path.name)
+            if result.sync_action is not None:
+                actions[result.sync_action] += 1
+            if result.sync_action == SYNC_UNCHANGED:
+                print(f"  → {result.source_path.name} は変更なし（コピーを省略）")
+                continue
+            rate = _format_rate(result.bytes_out, result.elapsed)
+            print(f"  → {result.source_path.name} をコピーしました ({rate})")
+            copied_bytes += result.bytes_out
+            if result.checksum is not None:
+                checksums[result.output_path.name] = result.checksum
+        elif result.status == STATUS_NOT_FOUND:
+            print("  → 対応する元画像が見つかりませんでした")
+            not_found_files.append(result.path.name)
+        else:
+            failed_count += 1
+            print(f"  → エラー: {result.source_path} のコピーに失敗しました: {result.error}")
+
+    print(f"\n完了: {success_count}/{total}個のファイルをコピーしました。")
+    transfer = (
+        f"転送: {copied_bytes / (1024 * 1024):.1f} MB, "
+        f"{_format_rate(copied_bytes, time.perf_counter() - start)}"
+    )
+    if copier is not None:
+        transfer += f"（並列数 {copier.stats.concurrency}）"
+    print(transfer)
 
-        if original_file:
-            output_file = output_dir / original_file.name
-            try:
-                shutil.copy2(original_file, output_file)
-                print(f"  → {original_file.name} をコピーしました")
-                success_count += 1
-            except Exception as e:
-                print(f"  → エラー: {original_file} のコピーに失敗しました: {e}")
+    pruned = []
+    if prune is not None:
+        if failed_count:
+            print("コピーに失敗したファイルがあるため、選定から外れたファイルは残します。")
         else:
-            print("  → 対応する元画像が見つかりませんでした")
-            not_found_files.append(selected_file.name)
+            pruned = _prune(output_dir, kept, not_found_files, prune)
+    if any(actions.values()) or prune is not None:
+        print(
+            f"差分: 追加 {actions[SYNC_ADDED]}, 更新 {actions[SYNC_UPDATED]}, "
+            f"変更なし {actions[SYNC_UNCHANGED]}, "
+            f"{'退避' if prune == 'quarantine' else '削除'} {len(pruned)}"
+        )
 
-    print(f"\n完了: {success_count}/{len(selected_files)}個のファイルをコピーしました。")
+    if not isinstance(output_dir, Storage):
+        # ストレージの保存先にはマニフェストを置かない（--checksumは使えない）
+        _update_manifest(output_dir, checksums, kept, pruned, copier)
 
     if not_found_files:
         print(f"\n見つからなかったファイル ({len(not_found_files)}個):")
         for filename in not_found_files:
             print(f"  - {filename}")
 
+    return 0
+
+
+def _prune(
+    output_dir: Path, kept: set, not_found_files: List[str], mode: str
+) -> List[Path]:
+    """選定から外れた保存先のファイルを削除・退避して表示"""
+    from ..core.sync import QUARANTINE_DIR, find_deselected, prune_outputs
+
+    # 元画像が見つからなかった選定のファイルは、保存先に残っていても消さない
+    protect = [Path(name).stem for name in not_found_files]
+    pruned = prune_outputs(find_deselected(output_dir, kept, protect), mode)
+    for path in pruned:
+        if mode == "quarantine":
+            print(f"  選定から外れたため {QUARANTINE_DIR} に退避: {path.name}")
+        else:
+            print(f"  選定から外れたため削除: {path.name}")
+    return pruned
+
+
+def _update_manifest(
+    output_dir: Path,
+    checksums: dict,
+    kept: set,
+    pruned: List[Path],
+    copier: Optional["AdaptiveCopier"],
+):
+    """
+    保存先のマニフェストにコピーしたファイルを記録し、削除・退避したファイルを取り除く
+
+    差分同期でコピーを省略したファイルがマニフェストになければ、保存先のファイルから計算する。
+    """
+    from ..core.checksum import (
+        file_checksum,
+        find_manifest,
+        manifest_path,
+        read_manifest,
+        update_manifest,
+    )
+
+    algorithm = copier.checksum if copier is not None else None
+    if algorithm is None:
+        # チェックサムなしの実行でも、既存のマニフェストから削除したファイルは取り除く
+        found = find_manifest(output_dir)
+        if found is None or not pruned:
+            return
+        algorithm = found[1]
+    else:
+        path = manifest_path(output_dir, algorithm)
+        recorded = read_manifest(path) if path.exists() else {}
+        for name in sorted(kept - recorded.keys() - checksums.keys()):
+            checksums[name] = file_checksum(output_dir / name, algorithm)
+
+    manifest = update_manifest(
+        output_dir, checksums, algorithm, removed=[path.name for path in pruned]
+    )
+    print(f"マニフェスト: {manifest} ({len(checksums)}件を記録)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """単独コマンド用の引数パーサーを作成"""
+    parser = argparse.ArgumentParser(
+        prog="sentei-choice",
+        description=DESCRIPTION,
+        epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    add_arguments(parser)
+    return parser
+
+
+def main(argv=None):
+    """choice機能のメインエントリーポイント"""
+    sys.exit(execute(build_parser().parse_args(argv)))
+
 
 if __name__ == "__main__":
     main()
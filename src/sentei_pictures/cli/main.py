@@ -1,13 +1,16 @@
 """
 写真処理ユーティリティ統合メニュー
-reduce.pyとchoice.pyを統合的に実行できます。
+reduce/choiceをサブコマンドまたは対話型メニューから実行できます。
+
+起動を速くするため、Pillowとtkinterは実際に必要なコマンドの実行時にのみ読み込む。
+（typingも読み込み時間が無視できないため、このモジュールでは使用しない）
 """
 
+import argparse
+import importlib
 import sys
 
-from .choice import main as choice_main
-from .input_handler import InputHandler
-from .reduce import main as reduce_main
+from .. import __version__
 
 
 def print_main_menu():
@@ -21,8 +24,68 @@ def print_main_menu():
     print()
 
 
-def main():
-    """メインエントリーポイント"""
+# サブコマンド名 → (実装モジュール, ヘルプ)
+# 各モジュールは add_arguments(parser) と execute(args) -> int を提供する
+COMMANDS = {
+    "reduce": ("sentei_pictures.cli.reduce", "画像軽量化（リサイズ・品質調整）"),
+    "choice": ("sentei_pictures.cli.choice", "選定画像のコピー"),
+    "gui": ("sentei_pictures.gui.gui_main", "GUIを起動"),
+    "serve": ("sentei_pictures.cli.serve", "ジョブサーバーを起動"),
+    "catalog": ("sentei_pictures.cli.catalog", "元画像カタログの登録・更新"),
+    "run": ("sentei_pictures.cli.run", "ジョブファイル（TOML）の一括実行"),
+    "shard": ("sentei_pictures.cli.shard", "複数ワーカーでのシャード分散reduce"),
+    "verify": ("sentei_pictures.cli.verify", "納品フォルダーのチェックサム検証"),
+}
+
+
+def build_parser(command=None) -> argparse.ArgumentParser:
+    """
+    サブコマンド付きの引数パーサーを作成
+
+    Args:
+        command: 実行するサブコマンド名。このコマンドのモジュールだけを読み込む
+
+    Returns:
+        argparse.ArgumentParser: 引数パーサー
+    """
+    parser = argparse.ArgumentParser(
+        prog="sentei",
+        description="写真処理ユーティリティ",
+        epilog="サブコマンドを省略すると対話型メニューを表示します。",
+    )
+    parser.add_argument("--version", action="version", version=__version__)
+    subparsers = parser.add_subparsers(dest="command", metavar="<command>")
+
+    for name, (module_name, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(
+            name, help=help_text, formatter_class=argparse.RawDescriptionHelpFormatter
+        )
+        if name != command:
+            continue
+
+        module = importlib.import_module(module_name)
+        subparser.description = getattr(module, "DESCRIPTION", help_text)
+        epilog = getattr(module, "EPILOG", None)
+        if epilog:
+            subparser.epilog = epilog.replace(f"sentei-{name}", f"sentei {name}")
+        module.add_arguments(subparser)
+        subparser.set_defaults(handler=module.execute)
+
+    return parser
+
+
+def _shutdown_shared_pool():
+    """起動済みの共有ワーカープールを終了"""
+    if "sentei_pictures.core.worker_pool" in sys.modules:
+        from ..core.worker_pool import shutdown_shared_pools
+
+        shutdown_shared_pools()
+
+
+def interactive_menu():
+    """対話型メニューを実行"""
+    from .input_handler import InputHandler
+
     while True:
         print_main_menu()
 
@@ -30,23 +93,24 @@ def main():
             command = input("コマンドを入力 (1/2/3 または reduce/choice/exit): ").strip().lower()
         except KeyboardInterrupt:
             print("\n終了します。")
+            _shutdown_shared_pool()
             sys.exit(0)
 
         if command in ["1", "reduce"]:
             print()
             try:
-                # reduce機能の対話型機能を呼び出し
-                input_dir, output_dir = InputHandler.get_reduce_input()
-
-                # reduce機能のメイン処理部分を実行
-                # sys.argvを一時的に設定してreduce_main()を呼び出し
-                original_argv = sys.argv
-                sys.argv = ["sentei-reduce", str(input_dir), str(output_dir)]
-                try:
-                    reduce_main()
-                finally:
-                    sys.argv = original_argv
+                from ..core.catalog import get_shared_catalog
+                from ..core.worker_pool import get_shared_pool
+                from .reduce import run as reduce_run
 
+                input_dir, output_dir = InputHandler.get_reduce_input()
+                # 2回目以降の実行では起動済みのワーカーをそのまま使う
+                reduce_run(
+                    input_dir,
+                    output_dir,
+                    get_shared_pool(),
+                    catalog=get_shared_catalog(),
+                )
             except KeyboardInterrupt:
                 print("\n処理を中止しました。")
             except Exception as e:
@@ -59,22 +123,18 @@ def main():
         elif command in ["2", "choice"]:
             print()
             try:
-                # choice機能の対話型機能を呼び出し
-                original_dir, output_dir, selected_dir = InputHandler.get_choice_input()
-
-                # choice機能のメイン処理部分を実行
-                original_argv = sys.argv
-                sys.argv = [
-                    "sentei-choice",
-                    str(original_dir),
-                    str(output_dir),
-                    str(selected_dir),
-                ]
-                try:
-                    choice_main()
-                finally:
-                    sys.argv = original_argv
+                from ..core.catalog import get_shared_catalog
+                from ..core.copier import AdaptiveCopier
+                from .choice import run as choice_run
 
+                original_dir, output_dir, selected_dir = InputHandler.get_choice_input()
+                choice_run(
+                    original_dir,
+                    output_dir,
+                    selected_dir,
+                    get_shared_catalog(),
+                    AdaptiveCopier(),
+                )
             except KeyboardInterrupt:
                 print("\n処理を中止しました。")
             except Exception as e:
@@ -86,6 +146,7 @@ def main():
 
         elif command in ["3", "exit", "quit"]:
             print("終了します。")
+            _shutdown_shared_pool()
             sys.exit(0)
 
         else:
@@ -93,5 +154,19 @@ def main():
             print()
 
 
+def main(argv=None):
+    """メインエントリーポイント"""
+    if argv is None:
+        argv = sys.argv[1:]
+    command = next((arg for arg in argv if not arg.startswith("-")), None)
+    args = build_parser(command).parse_args(argv)
+
+    if args.command is None:
+        interactive_menu()
+        return
+
+    sys.exit(args.handler(args))
+
+
 if __name__ == "__main__":
     main()
@@ -3,68 +3,599 @@
 JPEGファイルを指定した品質で圧縮して保存します。
 """
 
+import argparse
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
+from ..api import ReduceResult, reduce_directory
 from ..core.file_matcher import FileMatcher
-from ..core.image_processor import ImageProcessor
+from ..core.storage import Storage, open_location
+from ..core.worker_pool import WorkerPool
 from .input_handler import InputHandler
 
+if TYPE_CHECKING:
+    from ..core.archive import ArchiveWriter
+    from ..core.catalog import Catalog
+    from ..core.contact_sheet import ContactSheet
+    from ..core.pipeline import ShmPipeline
+    from ..core.throttle import Throttle
 
-def print_usage():
-    """使用方法を表示"""
-    print("使用方法:")
-    print("  1. 対話型: sentei-reduce")
-    print("  2. コマンドライン: sentei-reduce <画像があるパス> <軽量化した画像を保存するパス>")
-    print("")
-    print("例:")
-    print("  sentei-reduce")
-    print("  sentei-reduce /path/to/original /path/to/reduced")
+DESCRIPTION = "JPEGファイルを指定した品質で圧縮して保存します。"
 
+EPILOG = """例:
+  sentei-reduce
+  sentei-reduce /path/to/original /path/to/reduced
+  sentei-reduce -j 4 /path/to/original /path/to/reduced
+  sentei-reduce -j 8 --pipeline /path/to/original /path/to/reduced
+  sentei-reduce --plan /path/to/original /path/to/reduced
+  sentei-reduce /path/to/original /path/to/delivery.zip --volume-size 2000
+  sentei-reduce /path/to/shoot.zip /path/to/reduced
+  sentei-reduce --background --io-limit 10 /mnt/nas/shoot /path/to/reduced
+  sentei-reduce --contact-sheet /path/to/sheet.pdf /path/to/original /path/to/reduced
+  sentei-reduce s3://bucket/shoot/original s3://bucket/shoot/reduced
 
-def main():
-    """reduce機能のメインエントリーポイント"""
-    # コマンドライン引数がある場合は従来通り
-    if len(sys.argv) == 3:
-        input_dir = Path(sys.argv[1])
-        output_dir = Path(sys.argv[2])
+保存先の拡張子が .zip / .tar の場合は、ディレクトリではなくアーカイブに直接書き込みます。
+入力に .zip / .tar を指定すると、展開せずにアーカイブ内のJPEGファイルを読み込みます。
+入力・保存先には s3://バケット/プレフィックス も指定できます（boto3が必要。
+S3互換ストレージのエンドポイントは環境変数 SENTEI_S3_ENDPOINT で指定）。
+引数を省略すると対話型で入力します。"""
 
-        # 入力ディレクトリの存在チェック
-        if not input_dir.exists() or not input_dir.is_dir():
-            print(f"エラー: 入力ディレクトリが存在しません: {input_dir}")
-            sys.exit(1)
 
-        # 出力ディレクトリの作成
-        output_dir.mkdir(parents=True, exist_ok=True)
-    elif len(sys.argv) == 1:
+def add_arguments(parser: argparse.ArgumentParser):
+    """reduceコマンドの引数を追加"""
+    parser.add_argument(
+        "input_dir",
+        nargs="?",
+        type=location,
+        help="画像があるパス（.zip / .tar・s3:// も可）",
+    )
+    parser.add_argument(
+        "output_dir", nargs="?", type=location, help="軽量化した画像を保存するパス（s3:// も可）"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="並列に処理するプロセス数（デフォルト: CPUコア数、1で並列処理なし）",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="処理せずに出力サイズ・処理時間・空き容量の見積もりだけを表示",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="復号・縮小と保存を別のプロセスで行い、画素を共有メモリで渡す" "（-j のプロセス数を半分ずつに分ける）",
+    )
+    add_settings_arguments(parser)
+    add_archive_arguments(parser)
+    add_contact_sheet_arguments(parser)
+    add_background_arguments(parser)
+    add_catalog_argument(parser)
+
+
+def add_contact_sheet_arguments(parser: argparse.ArgumentParser):
+    """コンタクトシートの引数を追加"""
+    parser.add_argument(
+        "--contact-sheet",
+        type=Path,
+        metavar="PATH",
+        help="縮小した画像からファイル名付きのコンタクトシートを作成"
+        "（.pdf は1つのPDF、.jpg はページごとに PATH_001.jpg, ...）",
+    )
+    parser.add_argument(
+        "--contact-grid",
+        default="5x6",
+        metavar="COLSxROWS",
+        help="コンタクトシートの1ページの列数x行数（デフォルト: 5x6）",
+    )
+
+
+def open_contact_sheet(
+    args: argparse.Namespace, title: str
+) -> Optional["ContactSheet"]:
+    """
+    コンタクトシートの引数からコンタクトシートを作成
+
+    Returns:
+        Optional[ContactSheet]: 指定されていない場合None
+
+    Raises:
+        ValueError: 引数が正しくない場合
+    """
+    if args.contact_sheet is None:
+        return None
+    from ..core.contact_sheet import ContactSheet, parse_grid
+
+    columns, rows = parse_grid(args.contact_grid)
+    return ContactSheet(args.contact_sheet, columns, rows, title=title)
+
+
+def add_archive_arguments(parser: argparse.ArgumentParser):
+    """アーカイブ出力の引数を追加"""
+    parser.add_argument(
+        "--volume-size",
+        type=int,
+        metavar="MB",
+        help="アーカイブ（保存先が .zip / .tar）を指定したサイズ（MB）ごとのボリュームに分割",
+    )
+
+
+def location(text: str):
+    """
+    パス・ストレージのURL（s3://バケット/プレフィックス）の引数を変換（argparseのtype）
+
+    Returns:
+        Union[Path, Storage]: URLの場合はS3Storage
+    """
+    try:
+        return open_location(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def check_archive_arguments(output: Optional[Path], args: argparse.Namespace) -> bool:
+    """
+    アーカイブ出力の引数を検証してエラーを表示
+
+    Returns:
+        bool: 正しければTrue
+    """
+    from ..core.archive import is_archive_path
+
+    if args.volume_size is not None:
+        if output is None or not is_archive_path(output):
+            print("エラー: --volume-size は保存先が .zip / .tar の場合に指定してください。")
+            return False
+        if args.volume_size <= 0:
+            print("エラー: --volume-size には1以上を指定してください。")
+            return False
+    return True
+
+
+def open_archive(
+    output: Path, volume_size: Optional[int] = None
+) -> Optional["ArchiveWriter"]:
+    """
+    保存先がアーカイブ（.zip / .tar）ならアーカイブを開く
+
+    Args:
+        output: 保存先
+        volume_size: ボリュームの最大サイズ（MB、省略時は分割しない）
+
+    Returns:
+        Optional[ArchiveWriter]: 保存先がディレクトリの場合はNone
+    """
+    from ..core.archive import ArchiveWriter, is_archive_path
+
+    if not is_archive_path(output):
+        return None
+    output.parent.mkdir(parents=True, exist_ok=True)
+    return ArchiveWriter(output, volume_size * 1024 * 1024 if volume_size else None)
+
+
+def close_archive(archive: "ArchiveWriter") -> int:
+    """
+    アーカイブを閉じて書き込んだボリュームを表示
+
+    Returns:
+        int: 終了コード（書き込みに失敗した場合は1）
+    """
+    from ..core.archive import ArchiveError
+
+    try:
+        volumes = archive.close()
+    except ArchiveError as e:
+        print(f"エラー: アーカイブへの書き込みに失敗しました: {e}")
+        return 1
+    for volume in volumes:
+        size_mb = volume.stat().st_size / (1024 * 1024)
+        print(f"アーカイブ: {volume} ({size_mb:.1f}MB)")
+    return 0
+
+
+def add_background_arguments(parser: argparse.ArgumentParser):
+    """バックグラウンド処理の引数を追加"""
+    from ..core.throttle import DEFAULT_IO_LIMIT_MB
+
+    parser.add_argument(
+        "--background",
+        action="store_true",
+        help="CPU・I/O優先度を下げ、読み書きの帯域を制限して他の作業を妨げないように処理"
+        f"（帯域のデフォルト: {DEFAULT_IO_LIMIT_MB:g}MB/s）",
+    )
+    parser.add_argument(
+        "--io-limit",
+        type=float,
+        metavar="MB/S",
+        help="読み込み・書き込みの合計の帯域の上限（MB/s、0で制限なし）",
+    )
+    parser.add_argument(
+        "--pause-load",
+        type=float,
+        metavar="LOAD",
+        help="CPUあたりのロードアベレージがこの値（例: 0.8）を超えている間は一時停止",
+    )
+
+
+def get_throttle(args: argparse.Namespace) -> Optional["Throttle"]:
+    """
+    バックグラウンド処理の引数から帯域・負荷の制限を作成
+
+    Returns:
+        Optional[Throttle]: 制限しない場合None
+
+    Raises:
+        ValueError: 引数が正しくない場合
+    """
+    from ..core.throttle import DEFAULT_IO_LIMIT_MB, Throttle, load_per_cpu
+
+    io_limit = args.io_limit
+    if io_limit is None and args.background:
+        io_limit = DEFAULT_IO_LIMIT_MB
+    if io_limit is not None and io_limit < 0:
+        raise ValueError("--io-limit には0以上を指定してください。")
+    if args.pause_load is not None:
+        if args.pause_load <= 0:
+            raise ValueError("--pause-load には0より大きい値を指定してください。")
+        if load_per_cpu() is None:
+            raise ValueError("この環境ではロードアベレージを取得できないため --pause-load は使えません。")
+    if not io_limit and args.pause_load is None:
+        return None
+    return Throttle(
+        io_limit * 1024 * 1024 if io_limit else None, pause_load=args.pause_load
+    )
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser):
+    """ImageProcessorの設定に対応する引数を追加"""
+    parser.add_argument(
+        "-q", "--quality", type=int, default=87, help="JPEG品質（1-100、デフォルト: 87）"
+    )
+    parser.add_argument(
+        "--max-long-side",
+        type=int,
+        default=3000,
+        help="長辺の最大ピクセル数（デフォルト: 3000）",
+    )
+    parser.add_argument(
+        "--color",
+        choices=("none", "srgb", "preserve"),
+        default="none",
+        help="埋め込みICCプロファイルの扱い。srgb: sRGBに変換、preserve: そのまま埋め込む、" "none: 破棄（デフォルト）",
+    )
+    parser.add_argument(
+        "--target-ssim",
+        type=float,
+        metavar="SSIM",
+        help="縮小後の画像と比べたSSIMがこの値（例: 0.98）以上になる最小の品質を" "画像ごとに選ぶ（-q は最初に試す品質。NumPyが必要）",
+    )
+
+
+def add_catalog_argument(parser: argparse.ArgumentParser):
+    """元画像カタログの引数を追加"""
+    parser.add_argument(
+        "--catalog",
+        type=Path,
+        default=None,
+        metavar="DB",
+        help="元画像カタログ（SQLite）。2回目以降の一覧・検索を高速化" "（環境変数 SENTEI_CATALOG でも指定可）",
+    )
+
+
+def get_settings(args: argparse.Namespace) -> dict:
+    """add_settings_argumentsの引数からImageProcessorの設定を取得"""
+    return {
+        "max_long_side": args.max_long_side,
+        "quality": args.quality,
+        "color": args.color,
+        "target_ssim": args.target_ssim,
+    }
+
+
+def execute(args: argparse.Namespace) -> int:
+    """
+    解析済みの引数でreduceを実行
+
+    Args:
+        args: add_argumentsで定義した引数
+
+    Returns:
+        int: 終了コード
+    """
+    from ..core.archive import is_archive_path, is_archive_source
+
+    if args.input_dir is not None and args.output_dir is not None:
+        input_dir = args.input_dir
+        output_dir = args.output_dir
+
+        # 入力ディレクトリ（またはアーカイブ）の存在チェック
+        if not (
+            isinstance(input_dir, Storage)
+            or input_dir.is_dir()
+            or is_archive_source(input_dir)
+        ):
+            print(f"エラー: 入力ディレクトリが存在しません: {input_dir}")
+            return 1
+    elif args.input_dir is None:
         # 引数がない場合は対話型
         input_dir, output_dir = InputHandler.get_reduce_input()
     else:
-        print("エラー: 引数の数が正しくありません。")
-        print_usage()
-        sys.exit(1)
+        print("エラー: 引数の数が正しくありません。--help で使用方法を確認してください。")
+        return 1
+    if not check_archive_arguments(output_dir, args):
+        return 1
+    if args.pipeline and is_archive_path(output_dir):
+        print("エラー: --pipeline は保存先が .zip / .tar の場合には使えません。")
+        return 1
+    if isinstance(output_dir, Storage) and (args.pipeline or args.plan):
+        print("エラー: 保存先がストレージの場合は --pipeline / --plan を使えません。")
+        return 1
+    try:
+        throttle = get_throttle(args)
+        contact_sheet = open_contact_sheet(args, input_dir.name)
+    except ValueError as e:
+        print(f"エラー: {e}")
+        return 1
+    if args.target_ssim is not None:
+        from ..core.quality import check_target_ssim
+
+        try:
+            check_target_ssim(args.target_ssim)
+        except (ValueError, ImportError) as e:
+            print(f"エラー: {e}")
+            return 1
+
+    from ..core.catalog import open_catalog
+
+    settings = get_settings(args)
+    volume_size = args.volume_size
+    # アーカイブ・ストレージの入力はカタログを使わない（一覧はセントラルディレクトリ・
+    # ストレージの一覧から作成する）
+    catalog = (
+        None
+        if isinstance(input_dir, Storage) or is_archive_source(input_dir)
+        else open_catalog(args.catalog)
+    )
+    try:
+        if args.plan:
+            # アーカイブの場合は置き場所の空き容量を調べる
+            target = output_dir.parent if is_archive_path(output_dir) else output_dir
+            return plan(input_dir, target, args.jobs, settings, catalog)
+
+        # 出力ディレクトリの作成（アーカイブの場合はrunで作成する）
+        if not (isinstance(output_dir, Storage) or is_archive_path(output_dir)):
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+        if args.background:
+            from ..core.throttle import lower_priority
+
+            # 並列なしの場合はこのプロセスで処理する。ワーカーはプールの起動時に下げる
+            lower_priority()
+            print("バックグラウンドで処理します（優先度を下げて実行）。")
+
+        if args.pipeline:
+            pipeline = create_pipeline(args.jobs, args.background)
+            try:
+                return run(
+                    input_dir,
+                    output_dir,
+                    settings=settings,
+                    catalog=catalog,
+                    throttle=throttle,
+                    pipeline=pipeline,
+                    contact_sheet=contact_sheet,
+                )
+            finally:
+                pipeline.close()
+
+        if args.jobs == 1:
+            return run(
+                input_dir,
+                output_dir,
+                settings=settings,
+                catalog=catalog,
+                volume_size=volume_size,
+                throttle=throttle,
+                contact_sheet=contact_sheet,
+            )
+
+        pool = WorkerPool(max_workers=args.jobs, background=args.background)
+        try:
+            return run(
+                input_dir,
+                output_dir,
+                pool,
+                settings,
+                catalog,
+                volume_size,
+                throttle,
+                contact_sheet=contact_sheet,
+            )
+        finally:
+            pool.shutdown()
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+
+def run(
+    input_dir: Path,
+    output_dir: Path,
+    pool: Optional[WorkerPool] = None,
+    settings: Optional[dict] = None,
+    catalog: Optional["Catalog"] = None,
+    volume_size: Optional[int] = None,
+    throttle: Optional["Throttle"] = None,
+    pipeline: Optional["ShmPipeline"] = None,
+    contact_sheet: Optional["ContactSheet"] = None,
+) -> int:
+    """
+    reduce処理を実行して結果を表示
+
+    Args:
+        input_dir: 入力ディレクトリ
+        output_dir: 出力ディレクトリ（拡張子が .zip / .tar ならアーカイブに書き込む。
+            ストレージも指定できる）
+        pool: ワーカープール（省略時は並列処理なし）
+        settings: ImageProcessorの設定（省略時はデフォルト）
+        catalog: 元画像カタログ（省略時はディレクトリを走査）
+        volume_size: アーカイブのボリュームの最大サイズ（MB、省略時は分割しない）
+        throttle: 帯域・負荷の制限（省略時は制限しない）
+        pipeline: 共有メモリのパイプライン（指定時はpoolの代わりに使う）
+        contact_sheet: 縮小した画像を並べるコンタクトシート（終了時に閉じる）
+
+    Returns:
+        int: 終了コード
+    """
+    # Pillowはコマンド実行時にのみ読み込む
+    from ..core.archive import ArchiveError
+    from ..core.image_processor import ImageProcessor
 
     # JPEGファイルを検索
-    jpeg_files = FileMatcher.get_jpeg_files(input_dir)
+    jpeg_files = FileMatcher.get_jpeg_files(input_dir, catalog)
 
     if not jpeg_files:
         print(f"JPEGファイルが見つかりませんでした: {input_dir}")
-        sys.exit(0)
+        return 0
 
     print(f"{len(jpeg_files)}個のJPEGファイルを処理します...")
 
     # 画像プロセッサーを初期化
-    processor = ImageProcessor()
+    processor = ImageProcessor(**(settings or {}))
     success_count = 0
+    archive = open_archive(output_dir, volume_size)
 
-    for i, input_file in enumerate(jpeg_files, 1):
-        output_file = output_dir / input_file.name
-        print(f"[{i}/{len(jpeg_files)}] {input_file.name} を処理中...")
-
-        if processor.process_image(input_file, output_file):
-            success_count += 1
+    try:
+        for result in reduce_directory(
+            input_dir,
+            output_dir,
+            processor,
+            files=jpeg_files,
+            pool=pool,
+            archive=archive,
+            throttle=throttle,
+            pipeline=pipeline,
+            contact_sheet=contact_sheet,
+        ):
+            print(f"[{result.index}/{result.total}] {result.path.name} を処理しました")
+            print_reduce_result(result, processor.quality)
+            if result.ok:
+                success_count += 1
+    except ArchiveError:
+        # 書き込みの失敗はclose_archiveで表示する
+        pass
+    if archive is not None and close_archive(archive):
+        return 1
+    if contact_sheet is not None and contact_sheet.close():
+        print(contact_sheet.summary_line())
 
     print(f"完了: {success_count}/{len(jpeg_files)}個のファイルを軽量化しました。")
+    if throttle is not None:
+        print(throttle.summary_line())
+    return 0
+
+
+def create_pipeline(jobs: Optional[int], background: bool = False) -> "ShmPipeline":
+    """
+    -j のプロセス数を復号・縮小と保存に半分ずつ分けたパイプラインを作成
+
+    Args:
+        jobs: 合計のプロセス数（省略時はCPUコア数、それぞれ最低1）
+        background: ワーカープロセスのCPU・I/O優先度を下げる
+
+    Returns:
+        ShmPipeline: 共有メモリのパイプライン
+    """
+    from ..core.pipeline import ShmPipeline
+    from ..core.worker_pool import default_workers
+
+    jobs = jobs or default_workers()
+    return ShmPipeline(
+        max(1, (jobs + 1) // 2), max(1, jobs // 2), background=background
+    )
+
+
+def plan(
+    input_dir: Path,
+    output_dir: Path,
+    jobs: Optional[int] = None,
+    settings: Optional[dict] = None,
+    catalog: Optional["Catalog"] = None,
+) -> int:
+    """
+    reduce処理の見積もりを表示（ファイルは書き込まない）
+
+    Args:
+        input_dir: 入力ディレクトリ
+        output_dir: 出力ディレクトリ
+        jobs: 並列に処理するプロセス数（省略時はCPUコア数）
+        settings: ImageProcessorの設定（省略時はデフォルト）
+        catalog: 元画像カタログ（省略時はヘッダーを読んで集計）
+
+    Returns:
+        int: 終了コード（空き容量が不足する見込みなら1）
+    """
+    from ..core.image_processor import ImageProcessor
+    from ..core.planner import plan_reduce
+    from ..core.worker_pool import default_workers
+
+    jpeg_files = FileMatcher.get_jpeg_files(input_dir, catalog)
+    if not jpeg_files:
+        print(f"JPEGファイルが見つかりませんでした: {input_dir}")
+        return 0
+
+    print(f"{len(jpeg_files)}個のJPEGファイルを見積もります...")
+    estimate = plan_reduce(
+        jpeg_files,
+        ImageProcessor(**(settings or {})),
+        output_dir,
+        workers=jobs or default_workers(),
+        catalog=catalog,
+    )
+    for line in estimate.summary_lines():
+        print(line)
+    return 0 if estimate.fits else 1
+
+
+def print_reduce_result(result: ReduceResult, quality: int):
+    """reduce結果の詳細を表示"""
+    if not result.ok:
+        print(f"エラー: {result.path} の処理に失敗しました: {result.error}")
+        return
+
+    if result.resized:
+        (width, height), (new_width, new_height) = result.original_size, result.new_size
+        print(f"  リサイズ: {width}x{height} → {new_width}x{new_height}")
+
+    file_size_mb = result.bytes_out / (1024 * 1024)
+    if result.ssim is not None:
+        print(
+            f"  品質{result.quality}%（SSIM {result.ssim:.3f}）で保存完了 "
+            f"(ファイルサイズ: {file_size_mb:.1f}MB)"
+        )
+        return
+    print(f"  品質{quality}%で保存完了 (ファイルサイズ: {file_size_mb:.1f}MB)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """単独コマンド用の引数パーサーを作成"""
+    parser = argparse.ArgumentParser(
+        prog="sentei-reduce",
+        description=DESCRIPTION,
+        epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    add_arguments(parser)
+    return parser
+
+
+def main(argv=None):
+    """reduce機能のメインエントリーポイント"""
+    sys.exit(execute(build_parser().parse_args(argv)))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,197 @@
+"""
+バッチ実行CLI
+ジョブファイル（TOML）に記述した複数のジョブを共有ワーカープールでまとめて実行します。
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+DESCRIPTION = "ジョブファイル（TOML）に記述した複数のジョブを共有ワーカープールでまとめて実行します。"
+
+EPILOG = """例:
+  sentei run jobs.toml
+  sentei run jobs.toml -j 8 --concurrent-jobs 2 --policy fair
+  sentei run jobs.toml --autotune
+
+ジョブファイルの例:
+  [scheduler]
+  concurrent_jobs = 2
+  policy = "fair"
+  copies = 4                 # choiceで同時に実行するコピーの数
+
+  [defaults]
+  quality = 87
+
+  [[jobs]]
+  name = "wedding"
+  kind = "workflow"          # reduce / choice / workflow
+  original_dir = "/nas/wedding/original"
+  reduced_dir = "/nas/wedding/reduced"
+  selected_dir = "/nas/wedding/selected"
+  output_dir = "/nas/wedding/final"
+  priority = 5
+
+--autotune（または [scheduler] の autotune = true）では、ワーカー数（-j / workers が上限）と
+choiceのコピーの並列数を処理速度から調整し、確定した値を [scheduler] の設定として表示します。"""
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """runコマンドの引数を追加"""
+    parser.add_argument("job_file", type=Path, help="ジョブファイル（TOML）")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="共有ワーカープールのプロセス数（ジョブファイルの workers より優先）",
+    )
+    parser.add_argument(
+        "--concurrent-jobs",
+        type=int,
+        default=None,
+        help="同時に実行するジョブ数（ジョブファイルの concurrent_jobs より優先）",
+    )
+    parser.add_argument(
+        "--policy",
+        choices=("priority", "fair"),
+        default=None,
+        help="スケジューリング方針（ジョブファイルの policy より優先）",
+    )
+    parser.add_argument(
+        "--autotune",
+        action="store_true",
+        help="ワーカー数・コピーの並列数を処理速度から自動調整（-j は上限）",
+    )
+
+
+def execute(args: argparse.Namespace) -> int:
+    """
+    解析済みの引数でジョブファイルを実行
+
+    Args:
+        args: add_argumentsで定義した引数
+
+    Returns:
+        int: 終了コード（失敗したジョブがあれば1）
+    """
+    from ..batch import BatchFile, run_batch
+    from ..core.autotune import BatchTuning
+    from ..core.copier import DEFAULT_MAX_COPIES
+    from ..core.worker_pool import WorkerPool
+    from ..jobs import JOB_DONE
+
+    try:
+        batch = BatchFile.load(args.job_file)
+    except FileNotFoundError:
+        print(f"エラー: ジョブファイルが存在しません: {args.job_file}")
+        return 1
+    except (ValueError, RuntimeError) as e:
+        print(f"エラー: {e}")
+        return 1
+
+    if args.jobs is not None:
+        batch.workers = args.jobs
+    if args.concurrent_jobs is not None:
+        batch.concurrent_jobs = args.concurrent_jobs
+    if args.policy is not None:
+        batch.policy = args.policy
+    if args.autotune:
+        batch.autotune = True
+
+    print(
+        f"{len(batch.jobs)}個のジョブを実行します "
+        f"(同時実行 {batch.concurrent_jobs}, 方針 {batch.policy})"
+    )
+    pool = None if batch.workers == 1 else WorkerPool(max_workers=batch.workers)
+    tuning = None
+    if batch.autotune:
+        tuning = BatchTuning(
+            pool.max_workers if pool is not None else 1,
+            DEFAULT_MAX_COPIES,
+            on_decision=lambda decision: print(f"自動調整: {decision}"),
+        )
+    started_at = time.time()
+    try:
+        jobs = run_batch(batch, pool, on_finish=print_job_line, tuning=tuning)
+    except KeyboardInterrupt:
+        print("\n中断しました。")
+        return 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print_summary(jobs, time.time() - started_at)
+    if tuning is not None:
+        print_tuning(tuning)
+    return 0 if all(job.state == JOB_DONE and not job.failed for job in jobs) else 1
+
+
+def _rate(count: float, seconds: float) -> float:
+    return count / seconds if seconds > 0 else 0.0
+
+
+def _elapsed(job) -> float:
+    """ジョブの実行時間（秒、実行されなかった場合は0）"""
+    if job.started_at is None or job.finished_at is None:
+        return 0.0
+    return job.finished_at - job.started_at
+
+
+def print_job_line(job):
+    """終了したジョブを1行で表示"""
+    line = (
+        f"[{job.state}] {job.name} ({job.kind}) "
+        f"{job.succeeded}/{job.total}件 {_elapsed(job):.1f}秒"
+    )
+    if job.failed or job.not_found:
+        line += f" 失敗 {job.failed}件, 見つからない {job.not_found}件"
+    if job.error:
+        line += f" エラー: {job.error}"
+    print(line)
+
+
+def print_tuning(tuning):
+    """自動調整の結果をジョブファイルに書ける形で表示"""
+    lines = tuning.summary_lines()
+    if not lines:
+        print("\n自動調整: 測定に必要なファイル数に達しませんでした")
+        return
+    print("\n=== 自動調整の結果（ジョブファイルの [scheduler] に書けます） ===")
+    for line in lines:
+        print(line)
+
+
+def print_summary(jobs, wall_seconds: float):
+    """全ジョブの集計とスループットを表示"""
+    mb = 1024 * 1024
+    print("\n=== サマリー ===")
+    print(
+        f"{'ジョブ':<20} {'種別':<8} {'状態':<9} {'成功':>6} {'失敗':>6} "
+        f"{'入力MB':>9} {'出力MB':>9} {'秒':>7} {'件/秒':>7}"
+    )
+    for job in jobs:
+        elapsed = _elapsed(job)
+        print(
+            f"{job.name:<20} {job.kind:<8} {job.state:<9} {job.succeeded:>6} "
+            f"{job.failed + job.not_found:>6} {job.bytes_in / mb:>9.1f} "
+            f"{job.bytes_out / mb:>9.1f} {elapsed:>7.1f} "
+            f"{_rate(job.done, elapsed):>7.1f}"
+        )
+
+    files = sum(job.done for job in jobs)
+    bytes_in = sum(job.bytes_in for job in jobs)
+    bytes_out = sum(job.bytes_out for job in jobs)
+    states = {}
+    for job in jobs:
+        states[job.state] = states.get(job.state, 0) + 1
+    print(
+        f"\nジョブ: {len(jobs)}件 ("
+        + ", ".join(f"{state} {count}" for state, count in sorted(states.items()))
+        + ")"
+    )
+    print(f"ファイル: {files}件, 入力 {bytes_in / mb:.1f}MB → 出力 {bytes_out / mb:.1f}MB")
+    print(
+        f"全体: {wall_seconds:.1f}秒, {_rate(files, wall_seconds):.1f}件/秒, "
+        f"{_rate(bytes_in / mb, wall_seconds):.1f}MB/秒"
+    )
@@ -0,0 +1,64 @@
+"""
+ジョブサーバーCLI
+reduce/choiceジョブをlocalhostのHTTPで受け付けるデーモンを起動します。
+"""
+
+import argparse
+
+DESCRIPTION = "reduce/choiceジョブをlocalhostのHTTPで受け付けるデーモンを起動します。"
+
+EPILOG = """例:
+  sentei serve
+  sentei serve --port 8765 -j 8 --concurrent-jobs 2
+
+  curl -X POST localhost:8765/jobs \\
+    -d '{"kind": "reduce", "input_dir": "/original", "output_dir": "/reduced"}'
+  curl localhost:8765/jobs/<id>/events
+  curl -X POST localhost:8765/jobs/<id>/cancel"""
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """serveコマンドの引数を追加"""
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるホスト")
+    parser.add_argument("--port", type=int, default=8765, help="待ち受けるポート")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="共有ワーカープールのプロセス数（デフォルト: CPUコア数）",
+    )
+    parser.add_argument("--concurrent-jobs", type=int, default=1, help="同時に実行するジョブ数")
+
+
+def execute(args: argparse.Namespace) -> int:
+    """
+    解析済みの引数でサーバーを起動（Ctrl+Cで終了）
+
+    Args:
+        args: add_argumentsで定義した引数
+
+    Returns:
+        int: 終了コード
+    """
+    from ..core.worker_pool import WorkerPool
+    from ..jobs import JobScheduler
+    from ..server import create_server
+
+    pool = WorkerPool(max_workers=args.jobs)
+    scheduler = JobScheduler(pool, max_concurrent_jobs=args.concurrent_jobs)
+    try:
+        server = create_server(args.host, args.port, scheduler)
+    except OSError as e:
+        print(f"エラー: サーバーを起動できません: {e}")
+        return 1
+
+    print(f"ジョブサーバーを起動しました: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n終了します。")
+    finally:
+        server.server_close()
+        pool.shutdown()
+    return 0
@@ -0,0 +1,162 @@
+"""
+シャード分散処理CLI
+共有の作業ディレクトリを介して、複数のワーカープロセス（複数ホスト可）でreduceを分担します。
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from .reduce import add_settings_arguments, get_settings
+
+DESCRIPTION = "共有の作業ディレクトリを介して、複数のワーカープロセス（複数ホスト可）でreduceを分担します。"
+
+EPILOG = """例:
+  sentei shard init /nas/original /nas/reduced /nas/work --shard-size 200
+  sentei shard work /nas/work -j 8        # 各ホストで実行
+  sentei shard status /nas/work --watch 5"""
+
+
+def positive_int(text: str) -> int:
+    """1以上の整数の引数を変換（argparseのtype）"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"1以上の整数を指定してください: {text}")
+    return value
+
+
+def positive_float(text: str) -> float:
+    """0より大きい数値の引数を変換（argparseのtype）"""
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"0より大きい値を指定してください: {text}")
+    return value
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """shardコマンドの引数を追加"""
+    subparsers = parser.add_subparsers(dest="shard_command", metavar="<action>")
+    subparsers.required = True
+
+    init_parser = subparsers.add_parser("init", help="作業ディレクトリを作成")
+    init_parser.add_argument("input_dir", type=Path, help="画像があるパス")
+    init_parser.add_argument("output_dir", type=Path, help="軽量化した画像を保存するパス")
+    init_parser.add_argument("workdir", type=Path, help="共有の作業ディレクトリ")
+    init_parser.add_argument(
+        "--shard-size", type=positive_int, default=200, help="1シャードあたりのファイル数"
+    )
+    init_parser.add_argument(
+        "--lease", type=positive_float, default=60.0, help="リースの有効期間（秒）"
+    )
+    add_settings_arguments(init_parser)
+
+    work_parser = subparsers.add_parser("work", help="ワーカーとしてシャードを処理")
+    work_parser.add_argument("workdir", type=Path, help="共有の作業ディレクトリ")
+    work_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="並列に処理するプロセス数（デフォルト: CPUコア数、1で並列処理なし）",
+    )
+    work_parser.add_argument("--worker-id", default=None, help="ワーカーID")
+
+    status_parser = subparsers.add_parser("status", help="全体の進捗とスループットを表示")
+    status_parser.add_argument("workdir", type=Path, help="共有の作業ディレクトリ")
+    status_parser.add_argument(
+        "--watch", type=float, default=None, metavar="SEC", help="指定秒ごとに表示を更新"
+    )
+
+
+def execute(args: argparse.Namespace) -> int:
+    """
+    解析済みの引数でshardを実行
+
+    Args:
+        args: add_argumentsで定義した引数
+
+    Returns:
+        int: 終了コード
+    """
+    from ..sharding import ShardWorkDir, run_worker
+
+    if args.shard_command == "init":
+        if not args.input_dir.is_dir():
+            print(f"エラー: 入力ディレクトリが存在しません: {args.input_dir}")
+            return 1
+        try:
+            workdir = ShardWorkDir.create(
+                args.workdir,
+                args.input_dir,
+                args.output_dir,
+                get_settings(args),
+                shard_size=args.shard_size,
+                lease_seconds=args.lease,
+            )
+        except (FileExistsError, ValueError) as e:
+            print(f"エラー: {e}")
+            return 1
+        print(
+            f"{workdir.config['total_files']}個のファイルを"
+            f"{len(workdir.shard_ids())}個のシャードに分割しました: {workdir.path}"
+        )
+        return 0
+
+    try:
+        workdir = ShardWorkDir(args.workdir)
+        workdir.config
+    except FileNotFoundError as e:
+        print(f"エラー: {e}")
+        return 1
+
+    if args.shard_command == "status":
+        while True:
+            print_status(workdir)
+            if args.watch is None or workdir.status().complete:
+                return 0
+            time.sleep(args.watch)
+            print()
+
+    from ..core.worker_pool import WorkerPool
+
+    pool = None if args.jobs == 1 else WorkerPool(max_workers=args.jobs)
+    try:
+        completed = run_worker(
+            args.workdir,
+            worker=args.worker_id,
+            pool=pool,
+            on_result=_print_result,
+        )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print(f"完了: このワーカーで{completed}個のシャードを処理しました。")
+    return 0
+
+
+def _print_result(result):
+    """ワーカーの処理結果を1行で表示"""
+    if result.ok:
+        print(f"{result.path.name} ({result.bytes_out / (1024 * 1024):.1f}MB)")
+    else:
+        print(f"エラー: {result.path} の処理に失敗しました: {result.error}")
+
+
+def print_status(workdir):
+    """作業ディレクトリ全体の進捗とスループットを表示"""
+    status = workdir.status()
+    print(
+        f"シャード: {status.done_shards}/{status.total_shards}完了 "
+        f"(処理中 {status.leased_shards}, 期限切れ {status.expired_leases})"
+    )
+    print(
+        f"ファイル: {status.done_files}/{status.total_files} " f"(失敗 {status.failed_files})"
+    )
+    print(
+        f"スループット: {status.files_per_second:.1f}ファイル/秒, "
+        f"{status.mb_per_second:.1f}MB/秒"
+    )
+    if status.eta_seconds is not None and not status.complete:
+        print(f"残り時間: 約{status.eta_seconds / 60:.1f}分")
+    for worker, files in sorted(status.workers.items()):
+        print(f"  {worker}: {files}ファイル")
@@ -0,0 +1,94 @@
+"""
+納品フォルダー検証CLI
+マニフェスト（SHA256SUMS / B2SUMS）に記録したハッシュと各ファイルを照合します。
+"""
+
+import argparse
+from pathlib import Path
+
+DESCRIPTION = "マニフェスト（SHA256SUMS / B2SUMS）に記録したハッシュと納品フォルダーの各ファイルを照合します。"
+
+EPILOG = """例:
+  sentei choice --checksum sha256 /nas/original /delivery/client /nas/selected
+  sentei verify /delivery/client
+  sentei verify /delivery/client --manifest /backup/SHA256SUMS -j 16"""
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """verifyコマンドの引数を追加"""
+    parser.add_argument("directory", type=Path, help="納品フォルダー")
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=None,
+        help="マニフェストのパス（デフォルト: フォルダー内のSHA256SUMS / B2SUMS）",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="同時に読むファイル数（デフォルト: 8）",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="マニフェストにないファイルがあっても失敗にする",
+    )
+
+
+def execute(args: argparse.Namespace) -> int:
+    """
+    解析済みの引数で納品フォルダーを検証
+
+    Args:
+        args: add_argumentsで定義した引数
+
+    Returns:
+        int: 終了コード（不一致・欠落があれば1）
+    """
+    from ..core.checksum import (
+        DEFAULT_VERIFY_WORKERS,
+        VERIFY_EXTRA,
+        VERIFY_MISMATCH,
+        VERIFY_MISSING,
+        VERIFY_OK,
+        verify_directory,
+    )
+
+    labels = {
+        VERIFY_MISMATCH: "不一致",
+        VERIFY_MISSING: "見つかりません",
+        VERIFY_EXTRA: "マニフェストにありません",
+    }
+
+    if not args.directory.is_dir():
+        print(f"エラー: ディレクトリが存在しません: {args.directory}")
+        return 1
+
+    counts = {}
+    try:
+        for result in verify_directory(
+            args.directory,
+            manifest=args.manifest,
+            max_workers=args.jobs or DEFAULT_VERIFY_WORKERS,
+        ):
+            counts[result.status] = counts.get(result.status, 0) + 1
+            if result.status != VERIFY_OK:
+                detail = f" ({result.error})" if result.error else ""
+                print(f"{labels[result.status]}: {result.name}{detail}")
+    except (OSError, ValueError) as e:
+        print(f"エラー: {e}")
+        return 1
+
+    checked = sum(n for status, n in counts.items() if status != VERIFY_EXTRA)
+    print(
+        f"\n検証: {checked}個, 一致 {counts.get(VERIFY_OK, 0)}, "
+        f"不一致 {counts.get(VERIFY_MISMATCH, 0)}, 欠落 {counts.get(VERIFY_MISSING, 0)}, "
+        f"マニフェスト外 {counts.get(VERIFY_EXTRA, 0)}"
+    )
+
+    failed = checked - counts.get(VERIFY_OK, 0)
+    if args.strict:
+        failed += counts.get(VERIFY_EXTRA, 0)
+    return 1 if failed else 0
@@ -0,0 +1,631 @@
+"""
+アーカイブ入出力
+reduce/choiceの出力を1ファイルずつディスクに書かずに、ZIP（無圧縮）またはTARへ直接書き込む。
+また、ZIP/TARを展開せずに元画像ディレクトリとして読み込む
+
+JPEGは再圧縮しても小さくならないため、ZIPは無圧縮（ZIP_STORED）で書き込む。
+書き込みは1つの書き込みスレッドで行い、並列にエンコードした結果をキューで受け取る。
+キューに溜める量には上限があり、書き込みが追いつかない場合は追加する側が待つ。
+
+読み込みでは、一覧をZIPのセントラルディレクトリ・TARのヘッダーだけから作成し、
+各ファイルはシーク可能なストリームとして必要な部分だけを読む。
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from .storage import StorageObject
+
+# 対応する形式（拡張子）
+ARCHIVE_ZIP = ".zip"
+ARCHIVE_TAR = ".tar"
+ARCHIVE_SUFFIXES = (ARCHIVE_ZIP, ARCHIVE_TAR)
+
+# 書き込み待ちにできるデータ量とエントリー数の上限
+DEFAULT_MAX_PENDING_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_PENDING_ITEMS = 256
+
+# ファイルから書き込む場合の読み込み単位
+_CHUNK_SIZE = 1024 * 1024
+
+# ZIPの日時の下限（1980年より前は表せない）
+_ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+class ArchiveError(OSError):
+    """アーカイブへの書き込みに失敗した（書き込みスレッドの例外を原因に持つ）"""
+
+
+def is_archive_path(path: Path) -> bool:
+    """出力先がアーカイブ（.zip / .tar）かどうか"""
+    return (
+        isinstance(path, (str, os.PathLike))
+        and Path(path).suffix.lower() in ARCHIVE_SUFFIXES
+    )
+
+
+def is_archive_source(path: Path) -> bool:
+    """入力（元画像ディレクトリ）が既存のアーカイブ（.zip / .tar）かどうか"""
+    return is_archive_path(path) and os.path.isfile(path)
+
+
+class ArchiveMember:
+    """
+    アーカイブ内のファイル（入力ファイルのPathの代わりに使う）
+
+    name・stem・suffix・stat()はPathと同じように使える。内容はopen()で読む。
+    ワーカープロセスに渡せるよう、アーカイブのパスと位置だけを持つ。
+    """
+
+    __slots__ = ("archive", "member", "size", "mtime", "offset")
+
+    def __init__(
+        self,
+        archive: Path,
+        member: str,
+        size: int,
+        mtime: float,
+        offset: Optional[int] = None,
+    ):
+        """
+        Args:
+            archive: アーカイブのパス
+            member: アーカイブ内のパス
+            size: ファイルサイズ
+            mtime: 更新日時
+            offset: TARの場合はデータの開始位置（ZIPはNone）
+        """
+        self.archive = Path(archive)
+        self.member = member
+        self.size = size
+        self.mtime = mtime
+        self.offset = offset
+
+    @property
+    def name(self) -> str:
+        """ファイル名（アーカイブ内のディレクトリを除く）"""
+        return self.member.rsplit("/", 1)[-1]
+
+    @property
+    def stem(self) -> str:
+        return Path(self.name).stem
+
+    @property
+    def suffix(self) -> str:
+        return Path(self.name).suffix
+
+    def _key(self) -> Tuple[str, str]:
+        return str(self.archive), self.member
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ArchiveMember) and self._key() == other._key()
+
+    def __lt__(self, other: "ArchiveMember") -> bool:
+        return self._key() < other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __str__(self) -> str:
+        return f"{self.archive}/{self.member}"
+
+    def __repr__(self) -> str:
+        return f"ArchiveMember({str(self)!r})"
+
+    def is_file(self) -> bool:
+        return True
+
+    def exists(self) -> bool:
+        return True
+
+    def stat(self) -> os.stat_result:
+        """Path.statの代わり（サイズと更新日時だけが意味を持つ）"""
+        return os.stat_result((0o100644, 0, 0, 1, 0, 0, self.size) + (self.mtime,) * 3)
+
+    def open(self, mode: str = "rb") -> BinaryIO:
+        """
+        内容を読むシーク可能なストリームを開く（全体をメモリに読み込まない）
+
+        Raises:
+            ValueError: 読み込み以外のモードを指定した場合
+        """
+        if mode != "rb":
+            raise ValueError("アーカイブ内のファイルは読み込み（rb）でのみ開けます")
+        if self.offset is not None:
+            return io.BufferedReader(
+                _FileWindow(self.archive, self.offset, self.size), _CHUNK_SIZE
+            )
+        return _open_zip(self.archive).open(self.member)
+
+    def read_bytes(self) -> bytes:
+        """内容をすべて読む"""
+        with self.open() as f:
+            return f.read()
+
+    def extract(self, destination: Path) -> int:
+        """
+        内容をファイルに書き出し、更新日時を設定する
+
+        Returns:
+            int: 書き出したバイト数
+        """
+        with self.open() as src, open(destination, "wb") as dst:
+            shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+        os.utime(destination, (self.mtime, self.mtime))
+        return os.stat(destination).st_size
+
+
+def open_input(path: Union[Path, ArchiveMember]) -> BinaryIO:
+    """入力ファイルを読み込み用に開く（アーカイブ内・ストレージ上のファイルにも対応）"""
+    if isinstance(path, (ArchiveMember, StorageObject)):
+        return path.open()
+    return open(path, "rb")
+
+
+def open_source(path: Union[Path, ArchiveMember]):
+    """
+    Image.openに渡す入力を用意する（withで使う）
+
+    通常のファイルはパスのまま渡し、アーカイブ内・ストレージ上のファイルは
+    ストリームを開いてwithを抜けるときに閉じる。
+    """
+    if isinstance(path, (ArchiveMember, StorageObject)):
+        return path.open()
+    return contextlib.nullcontext(path)
+
+
+class _FileWindow(io.RawIOBase):
+    """ファイルの一部分（TAR内のファイル）を1つのファイルとして読む"""
+
+    def __init__(self, path: Path, offset: int, size: int):
+        self._file = open(path, "rb")
+        self._offset = offset
+        self._size = size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError(f"負の位置にはシークできません: {offset}")
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        remaining = self._size - self._position
+        if remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:remaining]
+        self._file.seek(self._offset + self._position)
+        n = self._file.readinto(view)
+        self._position += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+# ZIPを開いたもの（プロセスごと）。forkしたプロセスではファイル位置を共有するため開き直す
+_zip_files: Dict[str, Tuple[int, Tuple[int, int], zipfile.ZipFile]] = {}
+_zip_files_lock = threading.Lock()
+
+
+def _open_zip(path: Path) -> zipfile.ZipFile:
+    """読み込み用のZipFileを取得（同じプロセスで変更されていなければ使い回す）"""
+    key = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _zip_files_lock:
+        cached = _zip_files.get(key)
+        if cached is not None and cached[:2] == (os.getpid(), version):
+            return cached[2]
+        zf = zipfile.ZipFile(path)
+        _zip_files[key] = (os.getpid(), version, zf)
+        return zf
+
+
+def _zip_members(path: Path) -> List[ArchiveMember]:
+    members = []
+    for info in _open_zip(path).infolist():
+        if info.is_dir():
+            continue
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+        members.append(ArchiveMember(path, info.filename, info.file_size, mtime))
+    return members
+
+
+def _tar_members(path: Path) -> List[ArchiveMember]:
+    members = []
+    # 無圧縮のTARはヘッダーを順に読み、データ部分は読み飛ばす
+    with tarfile.open(path, "r:") as tf:
+        for info in tf:
+            if info.isreg() and not info.issparse():
+                members.append(
+                    ArchiveMember(
+                        path, info.name, info.size, info.mtime, info.offset_data
+                    )
+                )
+    return members
+
+
+class ArchiveSource:
+    """アーカイブ内のファイルの一覧（ディレクトリ構造は無視してファイル名で扱う）"""
+
+    # 一覧に含めないディレクトリ（macOSのリソースフォーク）
+    IGNORED_PREFIXES = ("__MACOSX/",)
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: アーカイブのパス（.zip / .tar）
+
+        Raises:
+            ValueError: 拡張子が .zip / .tar でない場合
+            ArchiveError: アーカイブを読めない場合
+        """
+        self.path = Path(path)
+        suffix = self.path.suffix.lower()
+        if suffix not in ARCHIVE_SUFFIXES:
+            raise ValueError(f"対応していないアーカイブ形式です: {self.path.name}")
+        try:
+            members = (_zip_members if suffix == ARCHIVE_ZIP else _tar_members)(
+                self.path
+            )
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            raise ArchiveError(f"アーカイブを読めません: {self.path}: {e}") from e
+        self.members: List[ArchiveMember] = [
+            m
+            for m in members
+            if not m.member.startswith(self.IGNORED_PREFIXES)
+            and not m.name.startswith("._")
+        ]
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def image_files(self) -> List[ArchiveMember]:
+        """画像ファイル（FileMatcher.get_image_filesと同じ条件）"""
+        from .file_matcher import FileMatcher
+
+        return [m for m in self.members if FileMatcher.is_image_file(m.name)]
+
+    def jpeg_files(self) -> List[ArchiveMember]:
+        """JPEGファイル（FileMatcher.get_jpeg_filesと同じ条件）"""
+        from .listing import JPEG_SUFFIXES
+
+        return [m for m in self.members if m.suffix in JPEG_SUFFIXES]
+
+
+_sources: Dict[str, Tuple[Tuple[int, int], ArchiveSource]] = {}
+_sources_lock = threading.Lock()
+
+
+def open_archive_source(path: Path) -> ArchiveSource:
+    """
+    アーカイブの一覧を取得（更新日時とサイズが前回と同じなら読み直さない）
+
+    Raises:
+        FileNotFoundError: アーカイブが存在しない場合
+        ArchiveError: アーカイブを読めない場合
+    """
+    key = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _sources_lock:
+        cached = _sources.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    source = ArchiveSource(path)
+    with _sources_lock:
+        _sources[key] = (version, source)
+    return source
+
+
+class _ZipVolume:
+    """無圧縮ZIPの1ボリューム"""
+
+    # 終端レコード（ZIP64を含む）の大きさ
+    end_overhead = 22 + 56 + 20
+
+    def __init__(self, path: Path):
+        self._file = open(path, "wb")
+        self._zip = zipfile.ZipFile(self._file, "w", zipfile.ZIP_STORED)
+        self._central = 0
+
+    def entry_overhead(self, name: str) -> int:
+        """エントリー1件分のヘッダー（ローカルヘッダー・セントラルディレクトリ）の大きさ"""
+        length = len(name.encode("utf-8"))
+        return 30 + length + 20 + 46 + length + 28
+
+    def size(self) -> int:
+        """書き込み済みの大きさ（セントラルディレクトリを含む）"""
+        return self._file.tell() + self._central
+
+    def add(self, name: str, size: int, mtime: float, source: Union[bytes, BinaryIO]):
+        """エントリーを追加"""
+        info = zipfile.ZipInfo(name, max(time.localtime(mtime)[:6], _ZIP_EPOCH))
+        info.compress_type = zipfile.ZIP_STORED
+        info.file_size = size
+        with self._zip.open(info, "w", force_zip64=size >= zipfile.ZIP64_LIMIT) as f:
+            if isinstance(source, bytes):
+                f.write(source)
+            else:
+                shutil.copyfileobj(source, f, _CHUNK_SIZE)
+        self._central += 46 + len(name.encode("utf-8")) + 28
+
+    def close(self):
+        try:
+            self._zip.close()
+        finally:
+            self._file.close()
+
+
+class _TarVolume:
+    """TARの1ボリューム"""
+
+    # 終端（512バイト×2）とレコード境界までの埋め草
+    end_overhead = tarfile.RECORDSIZE
+
+    def __init__(self, path: Path):
+        self._tar = tarfile.open(path, "w", format=tarfile.PAX_FORMAT)
+
+    def entry_overhead(self, name: str) -> int:
+        """エントリー1件分のヘッダー（長い名前の拡張ヘッダーを含む）と埋め草の大きさ"""
+        header = tarfile.BLOCKSIZE
+        if len(name.encode("utf-8")) > 100 or not name.isascii():
+            header += 3 * tarfile.BLOCKSIZE
+        return header + tarfile.BLOCKSIZE
+
+    def size(self) -> int:
+        """書き込み済みの大きさ"""
+        return self._tar.offset
+
+    def add(self, name: str, size: int, mtime: float, source: Union[bytes, BinaryIO]):
+        """エントリーを追加"""
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = mtime
+        info.mode = 0o644
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        self._tar.addfile(info, source)
+
+    def close(self):
+        self._tar.close()
+
+
+class ArchiveWriter:
+    """
+    ZIP（無圧縮）・TARへの書き込み（複数スレッドから追加可）
+
+    volume_sizeを指定すると、各ボリュームが指定サイズを超えないよう
+    name.001.zip, name.002.zip, ... に分割する（それぞれ単独で展開できる）。
+    1ファイルだけでvolume_sizeを超える場合は、そのファイルだけのボリュームになる。
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        volume_size: Optional[int] = None,
+        max_pending_bytes: int = DEFAULT_MAX_PENDING_BYTES,
+        max_pending_items: int = DEFAULT_MAX_PENDING_ITEMS,
+    ):
+        """
+        Args:
+            path: アーカイブのパス（拡張子 .zip / .tar で形式を決める）
+            volume_size: ボリュームの最大サイズ（バイト）。省略時は分割しない
+            max_pending_bytes: 書き込み待ちにできるデータ量
+            max_pending_items: 書き込み待ちにできるエントリー数
+
+        Raises:
+            ValueError: 拡張子が .zip / .tar でない場合
+        """
+        self.path = Path(path)
+        suffix = self.path.suffix.lower()
+        if suffix not in ARCHIVE_SUFFIXES:
+            raise ValueError(f"対応していないアーカイブ形式です: {self.path.name}")
+        self._volume_class = _ZipVolume if suffix == ARCHIVE_ZIP else _TarVolume
+        self.volume_size = volume_size
+        self.max_pending_bytes = max_pending_bytes
+        self.max_pending_items = max_pending_items
+        # 書き込んだボリュームのパス
+        self.volumes: List[Path] = []
+        self.entries = 0
+
+        self._volume = None
+        self._volume_entries = 0
+        self._names = set()
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._pending_bytes = 0
+        self._closing = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            # 処理側の例外を優先し、書き込みの例外では上書きしない
+            try:
+                self.close()
+            except Exception:
+                pass
+
+    def add_bytes(self, name: str, data: bytes, mtime: Optional[float] = None):
+        """
+        メモリ上のデータをエントリーとして追加（書き込み待ちが上限なら空くまで待つ）
+
+        Args:
+            name: アーカイブ内のファイル名
+            data: ファイルの内容
+            mtime: 更新日時（省略時は現在時刻）
+
+        Raises:
+            ValueError: 同じ名前のエントリーを追加した場合
+            ArchiveError: 書き込みスレッドで書き込みに失敗していた場合
+        """
+        self._put((name, data, mtime), len(data))
+
+    def add_file(self, name: str, path: Path):
+        """
+        ファイルをエントリーとして追加（内容は書き込みスレッドが読む）
+
+        Args:
+            name: アーカイブ内のファイル名
+            path: 追加するファイル（更新日時も引き継ぐ。アーカイブ内のファイルも可）
+
+        Raises:
+            ValueError: 同じ名前のエントリーを追加した場合
+            ArchiveError: 書き込みスレッドで書き込みに失敗していた場合
+        """
+        if not isinstance(path, ArchiveMember):
+            path = Path(path)
+        self._put((name, path, None), 0)
+
+    def _put(self, item: tuple, cost: int):
+        with self._condition:
+            if self._closing:
+                raise ValueError("アーカイブは閉じられています")
+            if item[0] in self._names:
+                raise ValueError(f"アーカイブ内のファイル名が重複しています: {item[0]}")
+            while (
+                self._error is None
+                and self._queue
+                and (
+                    self._pending_bytes + cost > self.max_pending_bytes
+                    or len(self._queue) >= self.max_pending_items
+                )
+            ):
+                self._condition.wait()
+            if self._error is not None:
+                raise ArchiveError(str(self._error)) from self._error
+            self._names.add(item[0])
+            self._queue.append((item, cost))
+            self._pending_bytes += cost
+            self._condition.notify_all()
+
+    def close(self) -> List[Path]:
+        """
+        書き込み待ちのエントリーをすべて書き込んでアーカイブを閉じる
+
+        Returns:
+            List[Path]: 書き込んだボリューム
+
+        Raises:
+            ArchiveError: 書き込みに失敗した場合
+        """
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        self._thread.join()
+        if self._error is not None:
+            raise ArchiveError(str(self._error)) from self._error
+        return self.volumes
+
+    def _run(self):
+        try:
+            while True:
+                with self._condition:
+                    while not self._queue and not self._closing:
+                        self._condition.wait()
+                    if not self._queue:
+                        break
+                    item, cost = self._queue[0]
+
+                self._write(*item)
+
+                with self._condition:
+                    self._queue.popleft()
+                    self._pending_bytes -= cost
+                    self._condition.notify_all()
+            if self._volume is None:
+                # 空のアーカイブも作成する
+                self._open_volume()
+        except BaseException as e:
+            with self._condition:
+                self._error = e
+                self._queue.clear()
+                self._pending_bytes = 0
+                self._condition.notify_all()
+        finally:
+            if self._volume is not None:
+                try:
+                    self._volume.close()
+                except Exception as e:
+                    if self._error is None:
+                        self._error = e
+
+    def _open_volume(self):
+        if self._volume is not None:
+            self._volume.close()
+        if self.volume_size is None:
+            path = self.path
+        else:
+            number = len(self.volumes) + 1
+            path = self.path.with_name(
+                f"{self.path.stem}.{number:03d}{self.path.suffix}"
+            )
+        self._volume = self._volume_class(path)
+        self._volume_entries = 0
+        self.volumes.append(path)
+
+    def _write(
+        self,
+        name: str,
+        source: Union[bytes, Path, ArchiveMember],
+        mtime: Optional[float],
+    ):
+        if isinstance(source, bytes):
+            size = len(source)
+        else:
+            stat = source.stat()
+            size, mtime = stat.st_size, stat.st_mtime
+        if mtime is None:
+            mtime = time.time()
+
+        if self._volume is None:
+            self._open_volume()
+        elif self.volume_size is not None and self._volume_entries:
+            needed = (
+                self._volume.size()
+                + self._volume.entry_overhead(name)
+                + size
+                + self._volume.end_overhead
+            )
+            if needed > self.volume_size:
+                self._open_volume()
+
+        if isinstance(source, bytes):
+            self._volume.add(name, size, mtime, source)
+        else:
+            with open_input(source) as f:
+                self._volume.add(name, size, mtime, f)
+        self._volume_entries += 1
+        self.entries += 1
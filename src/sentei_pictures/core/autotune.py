@@ -0,0 +1,274 @@
+"""
+並列数の自動調整
+測定した処理速度（件/秒・MB/秒）から並列数を山登りで調整する
+
+ConcurrencyTunerは直前の測定値と比べて並列数を動かし続ける（コピーの転送速度の追従用）。
+AutoTunerは処理したファイルを一定件数ずつの区間に分けて速度を測り、最も速い並列数の
+両隣を測り終えたらその並列数に確定して以後は動かさない。
+確定までの判断は記録しておき、ジョブファイルの設定（workers・copies）に書き写せる。
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# この割合以上速くならなければ改善とみなさない
+_TOLERANCE = 0.05
+
+# 1回の測定に使うファイル数の下限（並列数の2倍の方が多ければそちら）
+SAMPLE_FILES = 16
+
+# 確定までの最大の測定回数（最初の慣らし区間を除く）
+MAX_SAMPLES = 12
+
+_MB = 1024 * 1024
+
+
+class ConcurrencyTuner:
+    """
+    転送速度の測定値から並列数を山登りで調整する
+
+    現在の方向（増やす・減らす）に1つずつ動かし、速度が改善しなければ方向を反転する。
+    """
+
+    def __init__(self, minimum: int, maximum: int, initial: int):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.value = min(max(initial, self.minimum), self.maximum)
+        self.best_rate = 0.0
+        self.best_value = self.value
+        self._direction = 1
+        self._previous_rate: Optional[float] = None
+
+    def update(self, rate: float) -> int:
+        """
+        現在の並列数での転送速度を記録して次の並列数を決める
+
+        Args:
+            rate: 現在の並列数で測定した転送速度（バイト/秒）
+
+        Returns:
+            int: 次の並列数
+        """
+        if rate > self.best_rate:
+            self.best_rate = rate
+            self.best_value = self.value
+
+        previous = self._previous_rate
+        self._previous_rate = rate
+        if previous is not None and rate < previous * (1 + _TOLERANCE):
+            # 改善しなかったので方向を反転
+            self._direction = -self._direction
+
+        value = self.value + self._direction
+        if not self.minimum <= value <= self.maximum:
+            self._direction = -self._direction
+            value = self.value + self._direction
+        self.value = min(max(value, self.minimum), self.maximum)
+        return self.value
+
+
+class TuningDecision:
+    """自動調整の1回分の判断"""
+
+    __slots__ = ("name", "value", "files_per_second", "mb_per_second", "next_value")
+
+    def __init__(
+        self,
+        name: str,
+        value: int,
+        files_per_second: float,
+        mb_per_second: float,
+        next_value: Optional[int],
+    ):
+        self.name = name
+        self.value = value
+        self.files_per_second = files_per_second
+        self.mb_per_second = mb_per_second
+        # 確定した場合None
+        self.next_value = next_value
+
+    def __str__(self) -> str:
+        measured = (
+            f"{self.name} {self.value}: "
+            f"{self.files_per_second:.1f}件/秒, {self.mb_per_second:.1f}MB/秒"
+        )
+        if self.next_value is None:
+            return measured
+        return f"{measured} → {self.next_value}"
+
+
+class AutoTuner(ConcurrencyTuner):
+    """
+    ファイルごとの記録から速度を測って並列数を調整し、最も速い並列数に確定する
+
+    最も速い並列数の隣で未測定の方へ1つずつ動かし（最初は増やす方向）、
+    両隣を測り終えるか測定回数がmax_samplesに達したら最も速い並列数に確定する。
+    速度はバイト数がわかる場合はMB/秒、わからない場合は件/秒で比べる。
+    最初の区間はプロセスの起動などを含むため測定に使わない。
+    record()は複数のスレッドから呼んでよい。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        minimum: int,
+        maximum: int,
+        initial: int,
+        sample_files: int = SAMPLE_FILES,
+        max_samples: int = MAX_SAMPLES,
+        on_decision: Optional[Callable[[TuningDecision], None]] = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        """
+        Args:
+            name: ログに表示する名前（ジョブファイルの設定名）
+            minimum: 並列数の最小
+            maximum: 並列数の最大
+            initial: 最初の並列数
+            sample_files: 1回の測定に使うファイル数の下限
+            max_samples: 確定までの最大の測定回数
+            on_decision: 判断のたびに呼ばれるコールバック
+            clock: 現在時刻（秒）を返す関数
+        """
+        super().__init__(minimum, maximum, initial)
+        self.name = name
+        self.sample_files = sample_files
+        self.max_samples = max_samples
+        self.on_decision = on_decision
+        self.settled = self.minimum == self.maximum
+        self.decisions: List[TuningDecision] = []
+        # 並列数ごとの測定値（バイト/秒または件/秒）
+        self.rates: Dict[int, float] = {}
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._warmed_up = False
+        self._start_sample()
+
+    def _start_sample(self):
+        self._sample_start = self._clock()
+        self._files = 0
+        self._bytes = 0
+
+    def update(self, rate: float) -> int:
+        """
+        現在の並列数での速度を記録して次の並列数を決める（両隣を測り終えたら確定）
+
+        Args:
+            rate: 現在の並列数で測定した速度
+
+        Returns:
+            int: 次の並列数
+        """
+        self.rates[self.value] = rate
+        if rate > self.best_rate:
+            self.best_rate = rate
+            self.best_value = self.value
+
+        for step in (self._direction, -self._direction):
+            candidate = self.best_value + step
+            if (
+                self.minimum <= candidate <= self.maximum
+                and candidate not in self.rates
+            ):
+                self._direction = step
+                self.value = candidate
+                return self.value
+        self.value = self.best_value
+        self.settled = True
+        return self.value
+
+    def record(self, files: int = 1, nbytes: int = 0) -> Optional[TuningDecision]:
+        """
+        処理したファイルを記録し、区間が終われば並列数を見直す
+
+        Args:
+            files: 処理したファイル数
+            nbytes: 処理したバイト数
+
+        Returns:
+            Optional[TuningDecision]: 並列数を見直した場合はその判断
+        """
+        with self._lock:
+            if self.settled:
+                return None
+            self._files += files
+            self._bytes += nbytes
+            if self._files < max(self.sample_files, self.value * 2):
+                return None
+            elapsed = max(self._clock() - self._sample_start, 1e-9)
+            files_rate = self._files / elapsed
+            bytes_rate = self._bytes / elapsed
+            if not self._warmed_up:
+                self._warmed_up = True
+                self._start_sample()
+                return None
+
+            measured = self.value
+            self.update(bytes_rate if self._bytes else files_rate)
+            if len(self.decisions) + 1 >= self.max_samples:
+                self.value = self.best_value
+                self.settled = True
+            decision = TuningDecision(
+                self.name,
+                measured,
+                files_rate,
+                bytes_rate / _MB,
+                None if self.settled else self.value,
+            )
+            self.decisions.append(decision)
+            self._start_sample()
+
+        if self.on_decision is not None:
+            self.on_decision(decision)
+        return decision
+
+
+class BatchTuning:
+    """
+    バッチ全体で共有する自動調整（ワーカー数とコピーの並列数）
+
+    workersは共有ワーカープールに同時に投入するファイル数（プロセス数が上限）、
+    copiesはchoiceで同時に実行するコピーの数（先読みの深さ）を調整する。
+    同時に実行するジョブが複数ある場合、workersはジョブごとの投入数になる。
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_copies: int,
+        on_decision: Optional[Callable[[TuningDecision], None]] = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        """
+        Args:
+            max_workers: ワーカー数の上限（共有ワーカープールのプロセス数）
+            max_copies: コピーの並列数の上限
+            on_decision: 判断のたびに呼ばれるコールバック
+            clock: 現在時刻（秒）を返す関数
+        """
+        self.workers = AutoTuner(
+            "workers",
+            1,
+            max_workers,
+            max(1, max_workers // 2),
+            on_decision=on_decision,
+            clock=clock,
+        )
+        self.copies = AutoTuner(
+            "copies", 1, max_copies, 2, on_decision=on_decision, clock=clock
+        )
+
+    def summary_lines(self) -> List[str]:
+        """ジョブファイルの [scheduler] に書ける設定（確定していなければその旨）"""
+        lines = []
+        for tuner in (self.workers, self.copies):
+            if not tuner.decisions:
+                continue
+            line = (
+                f"{tuner.name} = {tuner.best_value if tuner.settled else tuner.value}"
+            )
+            if not tuner.settled:
+                line += "  # 未確定"
+            lines.append(line)
+        return lines
@@ -0,0 +1,431 @@
+"""
+元画像カタログ
+元画像ディレクトリのファイル情報（パス・サイズ・更新日時・画像サイズ・撮影日時・ハッシュ）を
+SQLiteに保存し、ディレクトリの再スキャンと再statを省略する
+
+ディレクトリの更新日時が前回と同じ場合はディレクトリを一覧せずにカタログの内容を返す。
+ファイルの追加・削除・リネーム（保存時の置き換えを含む）はディレクトリの更新日時が変わるため検出できる。
+その場で上書きされたファイルも確実に検出したい場合は full=True で再スキャンする。
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .file_matcher import FileMatcher
+from .header_parser import read_headers
+
+# カタログファイルのパスを指定する環境変数
+ENV_CATALOG = "SENTEI_CATALOG"
+
+SCHEMA_VERSION = 1
+
+JPEG_SUFFIXES = (".jpg", ".jpeg", ".JPG", ".JPEG")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    stem TEXT NOT NULL,
+    stem_lower TEXT NOT NULL,
+    suffix TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    captured_at TEXT,
+    sha256 TEXT,
+    PRIMARY KEY (directory, name)
+);
+CREATE INDEX IF NOT EXISTS files_stem ON files (directory, stem_lower);
+"""
+
+_ENTRY_COLUMNS = "name, size, mtime_ns, width, height, captured_at, sha256"
+
+
+class CatalogEntry:
+    """カタログに保存された1ファイル分の情報"""
+
+    __slots__ = ("path", "size", "mtime_ns", "width", "height", "captured_at", "sha256")
+
+    def __init__(
+        self,
+        path: Path,
+        size: int,
+        mtime_ns: int,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        captured_at: Optional[str] = None,
+        sha256: Optional[str] = None,
+    ):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.width = width
+        self.height = height
+        self.captured_at = captured_at
+        self.sha256 = sha256
+
+    @property
+    def dimensions(self) -> Optional[Tuple[int, int]]:
+        """(width, height)（画像として読めなかった場合はNone）"""
+        if self.width is None or self.height is None:
+            return None
+        return self.width, self.height
+
+
+class RefreshStats:
+    """refreshの結果（skippedの場合はディレクトリを一覧していないため件数はすべて0）"""
+
+    __slots__ = ("skipped", "added", "updated", "removed", "unchanged")
+
+    def __init__(self):
+        self.skipped = False
+        self.added = 0
+        self.updated = 0
+        self.removed = 0
+        self.unchanged = 0
+
+
+def read_image_header(path: Path) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+    """
+    Pillowで画像のヘッダーから画像サイズと撮影日時を読む（画素データはデコードしない）
+
+    header_parserで読めない形式・ファイルのフォールバックとして使う。
+
+    Returns:
+        Tuple: (width, height, 撮影日時)。読めない項目はNone
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            exif = img.getexif()
+            captured_at = exif.get_ifd(0x8769).get(36867) or exif.get(306)
+    except Exception:
+        return None, None, None
+    if isinstance(captured_at, bytes):
+        captured_at = captured_at.decode("ascii", "replace")
+    return width, height, captured_at.strip("\x00 ") if captured_at else None
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """ファイル内容のSHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Catalog:
+    """元画像ディレクトリのSQLiteカタログ（複数スレッドから使用可）"""
+
+    def __init__(self, db_path: Path):
+        """
+        Args:
+            db_path: カタログファイル（存在しなければ作成）
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self._lock, self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, SCHEMA_VERSION):
+                # 形式が変わったカタログは作り直す（元画像から再構築できる）
+                self._conn.executescript("DROP TABLE files; DROP TABLE directories;")
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        """カタログを閉じる"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _key(directory: Path) -> str:
+        return os.path.abspath(directory)
+
+    def refresh(
+        self, directory: Path, full: bool = False, hashes: bool = False
+    ) -> RefreshStats:
+        """
+        ディレクトリの変更をカタログに反映
+
+        ディレクトリの更新日時が前回と同じなら何もしない。変わっていれば一覧し、
+        サイズと更新日時が変わったファイルだけヘッダーを読み直す。
+
+        Args:
+            directory: 元画像ディレクトリ
+            full: 更新日時に関わらず一覧して全ファイルをstatで確認する
+            hashes: ハッシュが未計算のファイルのSHA-256を計算する
+
+        Returns:
+            RefreshStats: 追加・更新・削除したファイル数
+
+        Raises:
+            FileNotFoundError: ディレクトリが存在しない場合
+        """
+        stats = RefreshStats()
+        key = self._key(directory)
+        # 一覧の途中で変更されても次回に検出できるよう、一覧の前に取得する
+        directory_mtime = os.stat(directory).st_mtime_ns
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns FROM directories WHERE path = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] == directory_mtime and not full:
+                missing_hashes = (
+                    hashes
+                    and self._conn.execute(
+                        "SELECT EXISTS (SELECT 1 FROM files "
+                        "WHERE directory = ? AND sha256 IS NULL)",
+                        (key,),
+                    ).fetchone()[0]
+                )
+                if not missing_hashes:
+                    stats.skipped = True
+                    return stats
+
+            existing = {
+                name: (size, mtime_ns, sha256)
+                for name, size, mtime_ns, sha256 in self._conn.execute(
+                    "SELECT name, size, mtime_ns, sha256 FROM files "
+                    "WHERE directory = ?",
+                    (key,),
+                )
+            }
+
+        changed = []
+        upserts = []
+        seen = set()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or not FileMatcher.is_image_file(entry.name):
+                    continue
+                name = entry.name
+                seen.add(name)
+                stat = entry.stat()
+                old = existing.get(name)
+                if old is not None and old[:2] == (stat.st_size, stat.st_mtime_ns):
+                    if hashes and old[2] is None:
+                        sha256 = file_sha256(Path(entry.path))
+                        with self._lock, self._conn:
+                            self._conn.execute(
+                                "UPDATE files SET sha256 = ? "
+                                "WHERE directory = ? AND name = ?",
+                                (sha256, key, name),
+                            )
+                        stats.updated += 1
+                    else:
+                        stats.unchanged += 1
+                    continue
+
+                changed.append((Path(entry.path), stat))
+                if old is None:
+                    stats.added += 1
+                else:
+                    stats.updated += 1
+
+        # 追加・変更されたファイルのヘッダーはまとめて並列に読む
+        headers = read_headers([path for path, _ in changed])
+        for (path, stat), header in zip(changed, headers):
+            if header is not None:
+                width, height, captured_at = (
+                    header.width,
+                    header.height,
+                    header.captured_at,
+                )
+            else:
+                width, height, captured_at = read_image_header(path)
+            stem, suffix = os.path.splitext(path.name)
+            upserts.append(
+                (
+                    key,
+                    path.name,
+                    stem,
+                    stem.lower(),
+                    suffix,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    width,
+                    height,
+                    captured_at,
+                    file_sha256(path) if hashes else None,
+                )
+            )
+
+        removed = [(key, name) for name in existing if name not in seen]
+        stats.removed = len(removed)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                upserts,
+            )
+            self._conn.executemany(
+                "DELETE FROM files WHERE directory = ? AND name = ?", removed
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO directories VALUES (?, ?)",
+                (key, directory_mtime),
+            )
+        return stats
+
+    def entries(self, directory: Path, refresh: bool = True) -> List[CatalogEntry]:
+        """
+        ディレクトリの画像ファイルの情報を名前順で取得
+
+        Args:
+            directory: 元画像ディレクトリ
+            refresh: 取得前にrefreshする
+
+        Returns:
+            List[CatalogEntry]: ファイル情報（パスはdirectory基準）
+        """
+        if refresh:
+            self.refresh(directory)
+        directory = Path(directory)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM files WHERE directory = ? ORDER BY name",
+                (self._key(directory),),
+            ).fetchall()
+        return [CatalogEntry(directory / row[0], *row[1:]) for row in rows]
+
+    def files(
+        self, directory: Path, jpeg_only: bool = False, refresh: bool = True
+    ) -> List[Path]:
+        """
+        ディレクトリの画像ファイル（jpeg_onlyならJPEGファイル）を名前順で取得
+
+        Args:
+            directory: 元画像ディレクトリ
+            jpeg_only: JPEGファイルだけを返す
+            refresh: 取得前にrefreshする
+
+        Returns:
+            List[Path]: ファイルパス
+        """
+        if refresh:
+            self.refresh(directory)
+        query = "SELECT name FROM files WHERE directory = ?"
+        if jpeg_only:
+            query += f" AND suffix IN ({', '.join('?' * len(JPEG_SUFFIXES))})"
+        directory = Path(directory)
+        with self._lock:
+            rows = self._conn.execute(
+                query + " ORDER BY name",
+                (self._key(directory), *(JPEG_SUFFIXES if jpeg_only else ())),
+            ).fetchall()
+        return [directory / name for (name,) in rows]
+
+    def lookup(self, paths: Iterable[Path]) -> Dict[Path, CatalogEntry]:
+        """
+        カタログ済みのファイルの情報をまとめて取得（refreshはしない）
+
+        Args:
+            paths: ファイルパス
+
+        Returns:
+            Dict[Path, CatalogEntry]: カタログにあったファイルの情報
+        """
+        by_directory: Dict[Path, List[Path]] = {}
+        for path in paths:
+            by_directory.setdefault(Path(path).parent, []).append(Path(path))
+
+        found = {}
+        for directory, targets in by_directory.items():
+            entries = {
+                entry.path.name: entry
+                for entry in self.entries(directory, refresh=False)
+            }
+            for path in targets:
+                if path.name in entries:
+                    found[path] = entries[path.name]
+        return found
+
+    def find_matching_file(
+        self, filename: str, search_dir: Path, refresh: bool = True
+    ) -> Optional[Path]:
+        """
+        FileMatcher.find_matching_fileと同じ規則で、カタログから元画像を検索
+
+        Args:
+            filename: 検索対象のファイル名
+            search_dir: 元画像ディレクトリ
+            refresh: 検索前にrefreshする
+
+        Returns:
+            Optional[Path]: 見つかったファイルパス or None
+        """
+        if refresh:
+            self.refresh(search_dir)
+        stem = Path(filename).stem
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, stem FROM files WHERE directory = ? AND stem_lower = ?",
+                (self._key(search_dir), stem.lower()),
+            ).fetchall()
+        if not rows:
+            return None
+        # ORDER BYを付けると主キーのインデックスが選ばれるため、並べ替えはここで行う
+        rows.sort()
+
+        # 完全一致、拡張子違い、大文字小文字違いの順に優先
+        names = [name for name, _ in rows]
+        if filename in names:
+            return Path(search_dir) / filename
+        for name, row_stem in rows:
+            if row_stem == stem:
+                return Path(search_dir) / name
+        return Path(search_dir) / rows[0][0]
+
+
+def open_catalog(path: Optional[Path] = None) -> Optional[Catalog]:
+    """
+    カタログを開く
+
+    Args:
+        path: カタログファイル（省略時は環境変数 SENTEI_CATALOG）
+
+    Returns:
+        Optional[Catalog]: カタログ（どちらも指定されていなければNone）
+    """
+    path = path or os.environ.get(ENV_CATALOG)
+    return Catalog(Path(path)) if path else None
+
+
+_shared_catalog: Optional[Catalog] = None
+_shared_catalog_lock = threading.Lock()
+
+
+def get_shared_catalog() -> Optional[Catalog]:
+    """
+    環境変数 SENTEI_CATALOG で指定されたカタログを取得（未指定ならNone）
+
+    GUIなど、引数でカタログを指定しない呼び出し元で使う。
+    """
+    global _shared_catalog
+    path = os.environ.get(ENV_CATALOG)
+    if not path:
+        return None
+    with _shared_catalog_lock:
+        if _shared_catalog is None or _shared_catalog.db_path != Path(path):
+            _shared_catalog = open_catalog(Path(path))
+        return _shared_catalog
@@ -0,0 +1,282 @@
+"""
+チェックサム付きコピーと納品用マニフェスト
+コピーしながらハッシュを計算し、出力フォルダーに SHA256SUMS 形式のマニフェストを書き出す
+
+コピー後に sha256sum で全ファイルを読み直す必要がないよう、コピーで読んだデータから
+そのままハッシュを求める。マニフェストは sha256sum -c / b2sum -c でも検証できる。
+"""
+
+import hashlib
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# アルゴリズム → マニフェストのファイル名
+ALGORITHMS = {"sha256": "SHA256SUMS", "blake2b": "B2SUMS"}
+DEFAULT_ALGORITHM = "sha256"
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_VERIFY_WORKERS = 8
+
+# 検証結果のステータス
+VERIFY_OK = "ok"
+VERIFY_MISMATCH = "mismatch"
+VERIFY_MISSING = "missing"
+VERIFY_EXTRA = "extra"
+
+
+def new_hash(algorithm: str):
+    """
+    ハッシュオブジェクトを作成
+
+    Raises:
+        ValueError: 対応していないアルゴリズムの場合
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"対応していないチェックサムです: {algorithm}")
+    return hashlib.new(algorithm)
+
+
+def copy_with_checksum(
+    source: Path,
+    destination: Path,
+    algorithm: str = DEFAULT_ALGORITHM,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+) -> Tuple[int, str]:
+    """
+    ファイルをコピーしながらハッシュを計算する（読み込みは1回だけ、shutil.copy2相当）
+
+    読み込んだバッファをそのままハッシュに渡して書き込み、書き込んだバイト数と
+    コピー先のサイズが読み込んだバイト数と一致することを確認する。
+
+    Args:
+        source: コピー元
+        destination: コピー先
+        algorithm: "sha256" または "blake2b"
+        buffer_size: 読み書きのバッファサイズ
+
+    Returns:
+        Tuple[int, str]: (コピーしたバイト数, ハッシュの16進文字列)
+
+    Raises:
+        OSError: コピー先のサイズが一致しない場合など
+    """
+    digest = new_hash(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    copied = 0
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        while True:
+            n = src.readinto(buffer)
+            if not n:
+                break
+            chunk = view[:n]
+            digest.update(chunk)
+            written = dst.write(chunk)
+            if written != n:
+                raise OSError(f"書き込みが途中で終了しました: {destination}")
+            copied += n
+    shutil.copystat(source, destination)
+
+    size = os.stat(destination).st_size
+    if size != copied:
+        raise OSError(f"コピー先のサイズが一致しません: {destination} ({size} != {copied})")
+    return copied, digest.hexdigest()
+
+
+def file_checksum(
+    path: Path,
+    algorithm: str = DEFAULT_ALGORITHM,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+) -> str:
+    """ファイル内容のハッシュを16進文字列で取得"""
+    digest = new_hash(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def manifest_path(directory: Path, algorithm: str = DEFAULT_ALGORITHM) -> Path:
+    """出力フォルダーのマニフェストのパス"""
+    new_hash(algorithm)
+    return Path(directory) / ALGORITHMS[algorithm]
+
+
+def find_manifest(directory: Path) -> Optional[Tuple[Path, str]]:
+    """
+    フォルダー内のマニフェストを探す
+
+    Returns:
+        Optional[Tuple[Path, str]]: (マニフェストのパス, アルゴリズム)。ない場合None
+    """
+    for algorithm, name in ALGORITHMS.items():
+        path = Path(directory) / name
+        if path.is_file():
+            return path, algorithm
+    return None
+
+
+def read_manifest(path: Path) -> Dict[str, str]:
+    """
+    マニフェスト（"<ハッシュ>  <ファイル名>" の行）を読み込む
+
+    Returns:
+        Dict[str, str]: ファイル名 → ハッシュ
+
+    Raises:
+        ValueError: 行の形式が正しくない場合
+    """
+    entries = {}
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            digest, separator, name = line.partition(" ")
+            # "  name"（テキスト）と " *name"（バイナリ）の両方の形式がある
+            if not separator or not name or name[0] not in " *":
+                raise ValueError(f"{path}:{number}: マニフェストの形式が正しくありません")
+            entries[name[1:]] = digest.lower()
+    return entries
+
+
+def write_manifest(path: Path, entries: Dict[str, str]):
+    """
+    マニフェストをファイル名順で書き出す（一時ファイルに書いてから置き換える）
+
+    Args:
+        path: マニフェストのパス
+        entries: ファイル名 → ハッシュ
+    """
+    path = Path(path)
+    temporary = path.with_name(f".{path.name}.tmp")
+    with open(temporary, "w", encoding="utf-8", newline="\n") as f:
+        for name in sorted(entries):
+            f.write(f"{entries[name]}  {name}\n")
+    os.replace(temporary, path)
+
+
+def update_manifest(
+    directory: Path,
+    entries: Dict[str, str],
+    algorithm: str = DEFAULT_ALGORITHM,
+    removed: Iterable[str] = (),
+) -> Path:
+    """
+    出力フォルダーのマニフェストに今回コピーしたファイルを追加・更新する
+
+    Args:
+        directory: 出力フォルダー
+        entries: ファイル名 → ハッシュ
+        algorithm: ハッシュのアルゴリズム
+        removed: マニフェストから取り除くファイル名（選定から外れたファイルなど）
+
+    Returns:
+        Path: マニフェストのパス
+    """
+    path = manifest_path(directory, algorithm)
+    merged = read_manifest(path) if path.exists() else {}
+    for name in removed:
+        merged.pop(name, None)
+    merged.update(entries)
+    write_manifest(path, merged)
+    return path
+
+
+class VerifyResult:
+    """マニフェストの1件の検証結果"""
+
+    __slots__ = ("name", "status", "expected", "actual", "error")
+
+    def __init__(
+        self,
+        name: str,
+        status: str,
+        expected: Optional[str] = None,
+        actual: Optional[str] = None,
+        error: Optional[str] = None,
+    ):
+        self.name = name
+        self.status = status
+        self.expected = expected
+        self.actual = actual
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """検証に成功したかどうか"""
+        return self.status == VERIFY_OK
+
+
+def _verify_file(
+    directory: Path, name: str, expected: str, algorithm: str
+) -> VerifyResult:
+    path = directory / name
+    if not path.is_file():
+        return VerifyResult(name, VERIFY_MISSING, expected)
+    try:
+        actual = file_checksum(path, algorithm)
+    except OSError as e:
+        return VerifyResult(name, VERIFY_MISSING, expected, error=str(e))
+    status = VERIFY_OK if actual == expected else VERIFY_MISMATCH
+    return VerifyResult(name, status, expected, actual)
+
+
+def verify_directory(
+    directory: Path,
+    manifest: Optional[Path] = None,
+    algorithm: Optional[str] = None,
+    max_workers: int = DEFAULT_VERIFY_WORKERS,
+) -> Iterator[VerifyResult]:
+    """
+    マニフェストの各ファイルを並列に読み直してハッシュを検証する
+
+    マニフェストに記載されていないファイル（マニフェスト自身を除く）はVERIFY_EXTRAとして返す。
+
+    Args:
+        directory: 納品フォルダー
+        manifest: マニフェストのパス（省略時はフォルダー内のSHA256SUMS/B2SUMS）
+        algorithm: ハッシュのアルゴリズム（省略時はマニフェストのファイル名から判定）
+        max_workers: 同時に読むファイル数
+
+    Yields:
+        VerifyResult: ファイル名順の検証結果
+
+    Raises:
+        FileNotFoundError: マニフェストが見つからない場合
+        ValueError: アルゴリズムを判定できない場合やマニフェストの形式が正しくない場合
+    """
+    directory = Path(directory)
+    if manifest is None:
+        found = find_manifest(directory)
+        if found is None:
+            raise FileNotFoundError(f"マニフェストが見つかりません: {directory}")
+        manifest, detected = found
+        algorithm = algorithm or detected
+    elif algorithm is None:
+        names = {name: key for key, name in ALGORITHMS.items()}
+        if Path(manifest).name not in names:
+            raise ValueError(f"チェックサムの種類を判定できません: {manifest}")
+        algorithm = names[Path(manifest).name]
+    new_hash(algorithm)
+
+    entries = read_manifest(manifest)
+    names = sorted(entries)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        yield from executor.map(
+            lambda name: _verify_file(directory, name, entries[name], algorithm), names
+        )
+
+    manifest_names = set(ALGORITHMS.values()) | {Path(manifest).name}
+    for path in sorted(directory.iterdir()):
+        if path.is_file() and path.name not in entries:
+            if path.name not in manifest_names and not path.name.startswith("."):
+                yield VerifyResult(path.name, VERIFY_EXTRA)
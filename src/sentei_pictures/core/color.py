@@ -0,0 +1,137 @@
+"""
+カラーマネジメント
+埋め込みICCプロファイルの画像をsRGBに変換する、またはプロファイルを保持する
+
+ImageCmsの変換オブジェクトの作成は1回数ミリ秒〜数十ミリ秒かかるため、
+(元プロファイル, 入力モード, 変換先) ごとに1回だけ作成してプロセス内で使い回す。
+ワーカープールの各プロセスはそれぞれキャッシュを持つ。
+"""
+
+import hashlib
+import io
+import threading
+from typing import Dict, Optional, Tuple
+
+# カラーマネジメントの方法
+COLOR_NONE = "none"  # プロファイルを無視して破棄する（従来の動作）
+COLOR_SRGB = "srgb"  # sRGBに変換し、sRGBプロファイルを埋め込む
+COLOR_PRESERVE = "preserve"  # 変換せずに元のプロファイルを埋め込む
+COLOR_MODES = (COLOR_NONE, COLOR_SRGB, COLOR_PRESERVE)
+
+# 変換できる入力モード
+_TRANSFORM_MODES = ("RGB", "CMYK", "L")
+
+_transforms: Dict[Tuple[bytes, str], Optional[object]] = {}
+_transforms_lock = threading.Lock()
+_srgb = None
+
+
+def check_color_mode(color: str):
+    """
+    カラーマネジメントの方法を検証
+
+    Raises:
+        ValueError: 不明な方法の場合
+    """
+    if color not in COLOR_MODES:
+        raise ValueError(f"不明なカラーマネジメントの方法です: {color}（{' / '.join(COLOR_MODES)}）")
+
+
+def _srgb_profile():
+    """sRGBプロファイル（ImageCmsProfile, ICCのバイト列）"""
+    global _srgb
+    if _srgb is None:
+        from PIL import ImageCms
+
+        profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+        _srgb = (profile, profile.tobytes())
+    return _srgb
+
+
+def srgb_icc() -> bytes:
+    """埋め込み用のsRGBプロファイル"""
+    return _srgb_profile()[1]
+
+
+def is_srgb(profile) -> bool:
+    """プロファイルがsRGBかどうか（説明で判定）"""
+    from PIL import ImageCms
+
+    try:
+        description = ImageCms.getProfileDescription(profile)
+    except ImageCms.PyCMSError:
+        return False
+    return "srgb" in description.replace(" ", "").lower()
+
+
+def get_transform(icc_profile: bytes, mode: str):
+    """
+    ICCプロファイルからsRGBへの変換オブジェクトを取得（キャッシュ済みなら再利用）
+
+    Args:
+        icc_profile: 画像に埋め込まれたICCプロファイル
+        mode: 画像のモード（"RGB" / "CMYK" / "L"）
+
+    Returns:
+        ImageCms.ImageCmsTransform: 変換オブジェクト。プロファイルがsRGBの場合、
+            または壊れている・モードと合わない場合はNone（変換しない）
+    """
+    key = (hashlib.sha1(icc_profile).digest(), mode)
+    with _transforms_lock:
+        if key in _transforms:
+            return _transforms[key]
+
+    from PIL import ImageCms
+
+    try:
+        source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+        if mode == "RGB" and is_srgb(source):
+            transform = None
+        else:
+            transform = ImageCms.buildTransform(
+                source,
+                _srgb_profile()[0],
+                mode,
+                "RGB",
+                renderingIntent=ImageCms.Intent.PERCEPTUAL,
+            )
+    except (ImageCms.PyCMSError, OSError):
+        # 壊れたプロファイルや画像のモードと合わないプロファイルは無視する（従来の動作）
+        transform = None
+    with _transforms_lock:
+        return _transforms.setdefault(key, transform)
+
+
+def clear_transform_cache():
+    """変換オブジェクトのキャッシュを空にする"""
+    with _transforms_lock:
+        _transforms.clear()
+
+
+def transform_cache_size() -> int:
+    """キャッシュ済みの変換オブジェクトの数"""
+    with _transforms_lock:
+        return len(_transforms)
+
+
+def to_srgb(img, icc_profile: Optional[bytes]):
+    """
+    画像をsRGBに変換
+
+    Args:
+        img: PIL.Image
+        icc_profile: 画像に埋め込まれていたICCプロファイル
+
+    Returns:
+        PIL.Image: sRGBのRGB画像。プロファイルがない・sRGB・変換できないモードの
+            場合は元の画像（sRGBとみなす）
+    """
+    if not icc_profile or img.mode not in _TRANSFORM_MODES:
+        return img
+    transform = get_transform(icc_profile, img.mode)
+    if transform is None:
+        return img
+
+    from PIL import ImageCms
+
+    return ImageCms.applyTransform(img, transform)
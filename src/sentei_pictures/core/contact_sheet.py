@@ -0,0 +1,230 @@
+"""
+コンタクトシート
+reduceで縮小した画素から作ったタイルを、ファイル名付きでページに並べて保存する
+
+元画像を復号し直さないよう、タイルはワーカーで縮小後の画像から作る（make_tile）。
+ページは1枚ずつ組み立て、埋まったら書き出して破棄するため、メモリ使用量は撮影の
+枚数によらない。保存先が .pdf の場合は1つのPDFにページを追加していき、
+.jpg の場合はページごとに sheet_001.jpg, sheet_002.jpg, ... に保存する。
+"""
+
+from pathlib import Path
+from typing import List, Tuple
+
+# タイルの長辺（ピクセル）
+TILE_SIZE = 300
+
+# 1ページの列数・行数
+DEFAULT_COLUMNS = 5
+DEFAULT_ROWS = 6
+
+# タイルの間隔・ページの余白（ピクセル）
+MARGIN = 16
+
+# ファイル名の欄・見出しの高さ（ピクセル）
+LABEL_HEIGHT = 22
+HEADER_HEIGHT = 40
+
+# PDFのページ幅（A4、インチ）。ページの幅がこの幅になる解像度で保存する
+PDF_PAGE_INCHES = 8.27
+
+# ページのJPEG品質
+SHEET_QUALITY = 85
+
+SHEET_EXTENSIONS = {".pdf", ".jpg", ".jpeg"}
+
+
+def is_sheet_path(path: Path) -> bool:
+    """コンタクトシートの保存先に使える拡張子（.pdf / .jpg）かどうか"""
+    return Path(path).suffix.lower() in SHEET_EXTENSIONS
+
+
+def make_tile(img, tile_size: int):
+    """
+    縮小済みの画像からコンタクトシートのタイルを作る
+
+    Args:
+        img: 縮小済みの画像（ImageProcessorが保存した画像）
+        tile_size: タイルの長辺（ピクセル）
+
+    Returns:
+        Image: 長辺がtile_size以下のRGB画像
+    """
+    from PIL import Image
+
+    width, height = img.size
+    scale = tile_size / max(width, height)
+    if scale < 1:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        # 縮小率が大きいので、整数倍の縮小を先に行って速くする
+        img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    return img.convert("RGB")
+
+
+def parse_grid(text: str) -> Tuple[int, int]:
+    """
+    "5x6" 形式の列数・行数を解析
+
+    Raises:
+        ValueError: 形式が正しくない場合
+    """
+    columns, separator, rows = text.lower().partition("x")
+    try:
+        grid = int(columns), int(rows)
+    except ValueError:
+        grid = (0, 0)
+    if not separator or min(grid) < 1:
+        raise ValueError(f"列数x行数（例: 5x6）で指定してください: {text}")
+    return grid
+
+
+class ContactSheet:
+    """
+    タイルを順にページへ並べて保存するコンタクトシート
+
+    add()でタイルを追加し、最後にclose()で途中のページを書き出す。
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        columns: int = DEFAULT_COLUMNS,
+        rows: int = DEFAULT_ROWS,
+        tile_size: int = TILE_SIZE,
+        title: str = "",
+    ):
+        """
+        Args:
+            path: 保存先（.pdf は1つのファイル、.jpg はページごとのファイル）
+            columns: 1ページの列数
+            rows: 1ページの行数
+            tile_size: タイルの長辺（ピクセル）
+            title: ページの見出し（撮影名など）
+
+        Raises:
+            ValueError: 保存先の拡張子・列数・行数が正しくない場合
+        """
+        if not is_sheet_path(path):
+            raise ValueError(f"コンタクトシートの保存先は .pdf / .jpg にしてください: {path}")
+        if columns < 1 or rows < 1:
+            raise ValueError("コンタクトシートの列数・行数には1以上を指定してください")
+        self.path = Path(path)
+        self.columns = columns
+        self.rows = rows
+        self.tile_size = tile_size
+        self.title = title
+        # 書き出したファイル（PDFの場合は1つ）
+        self.files: List[Path] = []
+        self.page_count = 0
+        self.tiles = 0
+        self._page = None
+        self._draw = None
+        self._slot = 0
+        self._font = None
+
+    @property
+    def cell_size(self) -> Tuple[int, int]:
+        """1つのタイルの区画（ファイル名の欄を含む）の大きさ"""
+        return self.tile_size + MARGIN, self.tile_size + LABEL_HEIGHT + MARGIN
+
+    @property
+    def page_size(self) -> Tuple[int, int]:
+        """ページの大きさ（ピクセル）"""
+        cell_width, cell_height = self.cell_size
+        return (
+            MARGIN + self.columns * cell_width,
+            HEADER_HEIGHT + MARGIN + self.rows * cell_height,
+        )
+
+    def add(self, name: str, tile):
+        """
+        タイルを次の区画に貼り付ける（ページが埋まったら書き出す）
+
+        Args:
+            name: ファイル名（タイルの下に表示する）
+            tile: make_tileで作ったタイル
+        """
+        if self._page is None:
+            self._new_page()
+        column, row = self._slot % self.columns, self._slot // self.columns
+        cell_width, cell_height = self.cell_size
+        left = MARGIN + column * cell_width
+        top = HEADER_HEIGHT + MARGIN + row * cell_height
+        # 区画の中央に貼り付ける
+        self._page.paste(
+            tile,
+            (
+                left + (self.tile_size - tile.width) // 2,
+                top + (self.tile_size - tile.height) // 2,
+            ),
+        )
+        self._draw.text(
+            (left, top + self.tile_size + 4),
+            self._fit(name),
+            fill="black",
+            font=self._font,
+        )
+        self._slot += 1
+        self.tiles += 1
+        if self._slot == self.columns * self.rows:
+            self._flush()
+
+    def close(self) -> List[Path]:
+        """
+        途中のページを書き出して終了
+
+        Returns:
+            List[Path]: 書き出したファイル（PDFの場合は1つ）
+        """
+        if self._page is not None:
+            self._flush()
+        return self.files
+
+    def _new_page(self):
+        from PIL import Image, ImageDraw, ImageFont
+
+        if self._font is None:
+            self._font = ImageFont.load_default()
+        self._page = Image.new("RGB", self.page_size, "white")
+        self._draw = ImageDraw.Draw(self._page)
+        number = self.page_count + 1
+        header = f"{self.title}  p.{number}" if self.title else f"p.{number}"
+        self._draw.text((MARGIN, MARGIN), header, fill="black", font=self._font)
+        self._slot = 0
+
+    def _fit(self, name: str) -> str:
+        """区画の幅に収まるようファイル名を切り詰める"""
+        if self._draw.textlength(name, font=self._font) <= self.tile_size:
+            return name
+        while name and self._draw.textlength(name + "...", font=self._font) > (
+            self.tile_size
+        ):
+            name = name[:-1]
+        return name + "..."
+
+    def _flush(self):
+        """組み立て中のページを書き出して破棄する"""
+        page, self._page, self._draw = self._page, None, None
+        self.page_count += 1
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.suffix.lower() == ".pdf":
+            # 2ページ目以降は既存のPDFに追加する（前のページは読み込まない）
+            page.save(
+                self.path,
+                "PDF",
+                append=self.page_count > 1,
+                resolution=page.width / PDF_PAGE_INCHES,
+            )
+            if self.page_count == 1:
+                self.files.append(self.path)
+            return
+        output = self.path.with_name(
+            f"{self.path.stem}_{self.page_count:03d}{self.path.suffix}"
+        )
+        page.save(output, "JPEG", quality=SHEET_QUALITY)
+        self.files.append(output)
+
+    def summary_line(self) -> str:
+        """書き出したコンタクトシートの表示"""
+        files = ", ".join(str(path) for path in self.files)
+        return f"コンタクトシート: {files}（{self.page_count}ページ、{self.tiles}枚）"
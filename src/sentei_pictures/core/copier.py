@@ -0,0 +1,205 @@
+"""
+並列ファイルコピー
+スレッドプールで複数のファイルを同時にコピーし、転送速度（MB/s）を測りながら並列数を調整する
+
+NASやUSB接続のディスクでは1本のコピーでは帯域を使い切れないため、
+同時に実行するコピーの数を増減させて最も速い並列数を探す。
+"""
+
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from .autotune import AutoTuner, ConcurrencyTuner
+
+DEFAULT_MAX_COPIES = 8
+DEFAULT_INITIAL_COPIES = 2
+
+# 並列数を見直す間隔（秒）
+DEFAULT_SAMPLE_SECONDS = 1.0
+
+_MB = 1024 * 1024
+
+
+class CopyStats:
+    """コピー全体の集計"""
+
+    __slots__ = ("files", "bytes", "elapsed", "concurrency", "history")
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.concurrency = 0
+        # (並列数, MB/s) の測定履歴
+        self.history: List[Tuple[int, float]] = []
+
+    @property
+    def rate_mb(self) -> float:
+        """全体の転送速度（MB/s）"""
+        return self.bytes / _MB / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class AdaptiveCopier:
+    """転送速度に応じて並列数を調整するファイルコピー"""
+
+    def __init__(
+        self,
+        max_copies: int = DEFAULT_MAX_COPIES,
+        min_copies: int = 1,
+        initial_copies: int = DEFAULT_INITIAL_COPIES,
+        buffer_size: Optional[int] = None,
+        sample_seconds: float = DEFAULT_SAMPLE_SECONDS,
+        checksum: Optional[str] = None,
+        tuner: Optional[ConcurrencyTuner] = None,
+    ):
+        """
+        Args:
+            max_copies: 同時に実行するコピーの最大数
+            min_copies: 同時に実行するコピーの最小数
+            initial_copies: 最初の並列数
+            buffer_size: 指定時はこのサイズのバッファで読み書きする
+                （省略時はshutil.copy2。OSの高速コピーが使える場合はこちらが速い）
+            sample_seconds: 並列数を見直す間隔（秒）
+            checksum: 指定時（"sha256" / "blake2b"）はコピーしながらハッシュを計算する
+            tuner: 並列数の調整（省略時はmin_copies〜max_copiesで調整し続ける）。
+                AutoTunerを渡すとファイル数で区切って測定し、最も速い並列数に確定する
+
+        Raises:
+            ValueError: 対応していないチェックサムの場合
+        """
+        if checksum is not None:
+            from .checksum import new_hash
+
+            new_hash(checksum)
+        self.tuner = tuner or ConcurrencyTuner(min_copies, max_copies, initial_copies)
+        self.buffer_size = buffer_size
+        self.sample_seconds = sample_seconds
+        self.checksum = checksum
+        self.stats = CopyStats()
+        self._lock = threading.Lock()
+        self._sample_start = time.perf_counter()
+        self._sample_bytes = 0
+
+    @property
+    def concurrency(self) -> int:
+        """現在の並列数"""
+        return self.tuner.value
+
+    def copy(self, source: Path, destination: Path) -> Tuple[int, Optional[str]]:
+        """
+        ファイルをコピーして更新日時等もコピーする（shutil.copy2相当）
+
+        Args:
+            source: コピー元
+            destination: コピー先
+
+        Returns:
+            Tuple[int, Optional[str]]: (コピーしたバイト数, ハッシュ。checksum未指定時None)
+        """
+        digest = None
+        if self.checksum is not None:
+            from .checksum import DEFAULT_BUFFER_SIZE, copy_with_checksum
+
+            size, digest = copy_with_checksum(
+                source,
+                destination,
+                self.checksum,
+                self.buffer_size or DEFAULT_BUFFER_SIZE,
+            )
+        else:
+            if self.buffer_size is None:
+                shutil.copy2(source, destination)
+            else:
+                with open(source, "rb") as src, open(destination, "wb") as dst:
+                    shutil.copyfileobj(src, dst, self.buffer_size)
+                shutil.copystat(source, destination)
+            size = Path(destination).stat().st_size
+        self._record(size)
+        return size, digest
+
+    def _record(self, size: int):
+        """転送量を記録し、測定間隔が経過していれば並列数を見直す"""
+        with self._lock:
+            self.stats.files += 1
+            self.stats.bytes += size
+            if isinstance(self.tuner, AutoTuner):
+                decision = self.tuner.record(1, size)
+                if decision is not None:
+                    self.stats.history.append((decision.value, decision.mb_per_second))
+                return
+            self._sample_bytes += size
+            now = time.perf_counter()
+            elapsed = now - self._sample_start
+            if elapsed < self.sample_seconds:
+                return
+            rate = self._sample_bytes / elapsed
+            self.stats.history.append((self.tuner.value, rate / _MB))
+            self.tuner.update(rate)
+            self._sample_start = now
+            self._sample_bytes = 0
+
+    def map(
+        self,
+        fn: Callable,
+        arguments: Iterable[tuple],
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Iterator:
+        """
+        fnをスレッドプールで並列実行し、入力順に結果を返す
+
+        fnの中でcopy()を呼ぶと、その転送速度で並列数が調整される。
+        完了順に関わらず結果は入力順に返すため、表示や集計の順序は変わらない。
+
+        Args:
+            fn: 実行する関数
+            arguments: fnの引数のタプル
+            cancelled: Trueを返したら未着手のタスクを投入せずに終了する
+
+        Yields:
+            fnの戻り値（入力順）
+        """
+        start = time.perf_counter()
+        self._sample_start = start
+        pending = deque()
+        remaining = iter(arguments)
+        # 先頭のファイルが遅い場合に完了済みの結果を保持しておく上限
+        window = self.tuner.maximum * 4
+        executor = ThreadPoolExecutor(
+            max_workers=self.tuner.maximum, thread_name_prefix="sentei-copy"
+        )
+
+        def fill():
+            running = sum(1 for future in pending if not future.done())
+            while running < self.concurrency and len(pending) < window:
+                if cancelled is not None and cancelled():
+                    return
+                args = next(remaining, None)
+                if args is None:
+                    return
+                pending.append(executor.submit(fn, *args))
+                running += 1
+
+        try:
+            fill()
+            while pending:
+                head = pending[0]
+                while not head.done():
+                    wait(
+                        [future for future in pending if not future.done()],
+                        return_when=FIRST_COMPLETED,
+                    )
+                    fill()
+                pending.popleft()
+                fill()
+                yield head.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self.stats.elapsed += time.perf_counter() - start
+            self.stats.concurrency = self.concurrency
@@ -1,10 +1,64 @@
 """
 ファイルマッチング機能
 選定された画像に対応する元画像を検索する
+
+ディレクトリの代わりにアーカイブ（.zip / .tar）を指定した場合は、
+アーカイブ内のファイル（archive.ArchiveMember）を返す。
+ストレージ（storage.Storage）を指定した場合はストレージ上のファイル
+（storage.StorageObject）を返す。
 """
 
+import os
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from .archive import is_archive_source
+from .storage import Storage
+
+if TYPE_CHECKING:
+    from .catalog import Catalog
+
+
+class FileIndex:
+    """
+    ディレクトリの画像ファイルの索引
+
+    ファイル名ごとにディレクトリを走査するfind_matching_fileと違い、
+    一度だけ作成して多数のファイル名をまとめて検索するために使う。
+    """
+
+    __slots__ = ("directory", "_by_name", "_by_stem", "_by_stem_lower")
+
+    def __init__(self, directory: Path, paths: Iterable[Path]):
+        self.directory = (
+            directory if isinstance(directory, Storage) else Path(directory)
+        )
+        self._by_name: Dict[str, Path] = {}
+        self._by_stem: Dict[str, Path] = {}
+        self._by_stem_lower: Dict[str, Path] = {}
+        # 同じstemが複数ある場合は名前順で最初のファイルを使う
+        for path in sorted(paths):
+            self._by_name[path.name] = path
+            self._by_stem.setdefault(path.stem, path)
+            self._by_stem_lower.setdefault(path.stem.lower(), path)
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def find(self, filename: str) -> Optional[Path]:
+        """
+        find_matching_fileと同じ規則でファイル名に一致するファイルを検索
+
+        Args:
+            filename: 検索対象のファイル名
+
+        Returns:
+            Optional[Path]: 見つかったファイルパス or None
+        """
+        if filename in self._by_name:
+            return self._by_name[filename]
+        stem = Path(filename).stem
+        return self._by_stem.get(stem) or self._by_stem_lower.get(stem.lower())
 
 
 class FileMatcher:
@@ -30,17 +84,25 @@ class FileMatcher:
         }
 
     @staticmethod
-    def find_matching_file(filename: str, search_dir: Path) -> Optional[Path]:
+    def find_matching_file(
+        filename: str, search_dir: Path, catalog: Optional["Catalog"] = None
+    ) -> Optional[Path]:
         """
         ファイル名に一致するファイルを検索（大文字小文字・拡張子を考慮）
 
         Args:
             filename: 検索対象のファイル名
             search_dir: 検索ディレクトリ
+            catalog: 指定時はディレクトリを走査せずにカタログから検索
 
         Returns:
             Optional[Path]: 見つかったファイルパス or None
         """
+        if _is_archive(search_dir) or isinstance(search_dir, Storage):
+            return FileMatcher.build_index(search_dir).find(filename)
+        if catalog is not None:
+            return catalog.find_matching_file(filename, search_dir)
+
         base_name = Path(filename).stem
 
         # まず完全一致を試す
@@ -67,6 +129,25 @@ class FileMatcher:
 
         return None
 
+    @staticmethod
+    def build_index(directory: Path, catalog: Optional["Catalog"] = None) -> FileIndex:
+        """
+        ディレクトリの画像ファイルの索引を作成（走査は1回だけ）
+
+        Args:
+            directory: 検索ディレクトリ（アーカイブの場合はセントラルディレクトリ・
+                ヘッダー、ストレージの場合は一覧から作成し、カタログは使わない）
+            catalog: 指定時はディレクトリを走査せずにカタログから作成
+
+        Returns:
+            FileIndex: 画像ファイルの索引
+        """
+        if _is_archive(directory) or isinstance(directory, Storage):
+            return FileIndex(directory, FileMatcher.get_image_files(directory))
+        if catalog is not None:
+            return FileIndex(directory, catalog.files(directory))
+        return FileIndex(directory, FileMatcher.get_image_files(directory))
+
     @staticmethod
     def get_image_files(directory: Path) -> List[Path]:
         """
@@ -78,6 +159,13 @@ class FileMatcher:
         Returns:
             List[Path]: 画像ファイルのリスト
         """
+        if _is_archive(directory):
+            from .archive import open_archive_source
+
+            return open_archive_source(directory).image_files()
+        if isinstance(directory, Storage):
+            return directory.image_files()
+
         image_files = []
         for file_path in directory.iterdir():
             if file_path.is_file() and FileMatcher.is_image_file(file_path.name):
@@ -85,19 +173,36 @@ class FileMatcher:
         return image_files
 
     @staticmethod
-    def get_jpeg_files(directory: Path) -> List[Path]:
+    def get_jpeg_files(
+        directory: Path, catalog: Optional["Catalog"] = None
+    ) -> List[Path]:
         """
         ディレクトリからJPEGファイルを取得
 
         Args:
             directory: 検索ディレクトリ
+            catalog: 指定時は変更があった場合だけ走査し、カタログから取得
 
         Returns:
             List[Path]: JPEGファイルのリスト
         """
+        if _is_archive(directory):
+            from .archive import open_archive_source
+
+            return open_archive_source(directory).jpeg_files()
+        if isinstance(directory, Storage):
+            return directory.jpeg_files()
+        if catalog is not None:
+            return catalog.files(directory, jpeg_only=True)
+
         jpeg_extensions = {".jpg", ".jpeg", ".JPG", ".JPEG"}
         jpeg_files = []
         for file_path in directory.iterdir():
             if file_path.is_file() and file_path.suffix in jpeg_extensions:
                 jpeg_files.append(file_path)
         return jpeg_files
+
+
+def _is_archive(path: Path) -> bool:
+    """ディレクトリの代わりにアーカイブ（.zip / .tar）が指定されたかどうか"""
+    return isinstance(path, (str, os.PathLike)) and is_archive_source(path)
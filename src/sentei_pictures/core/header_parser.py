@@ -0,0 +1,266 @@
+"""
+画像ヘッダーの簡易パーサー
+JPEG/PNG/GIF/BMPの先頭部分だけを読み、画像サイズ・EXIFの向き・撮影日時を取得する
+
+Pillowのプラグイン機構を通さないため、大量のファイルのメタデータを集める用途
+（並べ替え・見積もり・カタログ）で Image.open より高速に動作する。
+読めない形式や壊れたファイルではNoneを返すので、呼び出し側でPillowにフォールバックする。
+"""
+
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+
+from .archive import open_input
+
+# JPEGのSOFマーカー（DHT/JPG/DACを除くC0〜CF）
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7}
+_SOF_MARKERS |= {0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# EXIFタグ
+_TAG_ORIENTATION = 0x0112
+_TAG_DATETIME = 0x0132
+_TAG_EXIF_IFD = 0x8769
+_TAG_DATETIME_ORIGINAL = 0x9003
+
+# PNGのeXIfチャンクの最大長（これより長いEXIFは読まない）
+_MAX_EXIF_CHUNK = 0xFFFF
+
+DEFAULT_WORKERS = 8
+
+
+class ImageHeader:
+    """ヘッダーから読み取った画像の情報"""
+
+    __slots__ = ("format", "width", "height", "orientation", "captured_at")
+
+    def __init__(
+        self,
+        format: str,
+        width: int,
+        height: int,
+        orientation: Optional[int] = None,
+        captured_at: Optional[str] = None,
+    ):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.orientation = orientation
+        self.captured_at = captured_at
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height)（Image.sizeと同じ、向きを適用する前のサイズ）"""
+        return self.width, self.height
+
+    @property
+    def display_size(self) -> Tuple[int, int]:
+        """EXIFの向きを適用した表示上のサイズ"""
+        if self.orientation in (5, 6, 7, 8):
+            return self.height, self.width
+        return self.width, self.height
+
+
+def _parse_exif(data: bytes) -> Tuple[Optional[int], Optional[str]]:
+    """
+    EXIF（TIFF形式）から向きと撮影日時を取得
+
+    Returns:
+        Tuple: (向き, 撮影日時)。DateTimeOriginalがなければDateTimeを使う
+    """
+    if len(data) < 8 or data[:2] not in (b"II", b"MM"):
+        return None, None
+    endian = "<" if data[:2] == b"II" else ">"
+
+    def read_ifd(offset: int) -> dict:
+        if offset + 2 > len(data):
+            return {}
+        (count,) = struct.unpack_from(endian + "H", data, offset)
+        entries = {}
+        for i in range(count):
+            entry = offset + 2 + i * 12
+            if entry + 12 > len(data):
+                break
+            tag, kind, number = struct.unpack_from(endian + "HHI", data, entry)
+            entries[tag] = (kind, number, entry + 8)
+        return entries
+
+    def read_ascii(entry) -> Optional[str]:
+        kind, number, value_offset = entry
+        if kind != 2:
+            return None
+        if number > 4:
+            (value_offset,) = struct.unpack_from(endian + "I", data, value_offset)
+        raw = data[value_offset : value_offset + number]
+        return raw.split(b"\x00", 1)[0].decode("ascii", "replace").strip() or None
+
+    (ifd0_offset,) = struct.unpack_from(endian + "I", data, 4)
+    ifd0 = read_ifd(ifd0_offset)
+
+    orientation = None
+    if _TAG_ORIENTATION in ifd0 and ifd0[_TAG_ORIENTATION][0] == 3:
+        (orientation,) = struct.unpack_from(
+            endian + "H", data, ifd0[_TAG_ORIENTATION][2]
+        )
+
+    captured_at = None
+    if _TAG_EXIF_IFD in ifd0:
+        (exif_offset,) = struct.unpack_from(endian + "I", data, ifd0[_TAG_EXIF_IFD][2])
+        exif_ifd = read_ifd(exif_offset)
+        if _TAG_DATETIME_ORIGINAL in exif_ifd:
+            captured_at = read_ascii(exif_ifd[_TAG_DATETIME_ORIGINAL])
+    if captured_at is None and _TAG_DATETIME in ifd0:
+        captured_at = read_ascii(ifd0[_TAG_DATETIME])
+    return orientation, captured_at
+
+
+def _read_jpeg(f: BinaryIO) -> Optional[ImageHeader]:
+    """JPEGのマーカーを順にたどり、SOFまでのAPP1(EXIF)とSOFを読む"""
+    orientation = captured_at = None
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        while code == 0xFF:
+            # マーカー前のフィルバイト
+            byte = f.read(1)
+            if not byte:
+                return None
+            code = byte[0]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        if code in (0xD9, 0xDA):
+            # SOFより前に画像データまたは終端に到達
+            return None
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        (length,) = struct.unpack(">H", length_bytes)
+        if length < 2:
+            return None
+
+        if code in _SOF_MARKERS:
+            segment = f.read(5)
+            if len(segment) < 5:
+                return None
+            height, width = struct.unpack(">HH", segment[1:5])
+            return ImageHeader("JPEG", width, height, orientation, captured_at)
+
+        if code == 0xE1 and orientation is None and captured_at is None:
+            segment = f.read(length - 2)
+            if segment.startswith(b"Exif\x00\x00"):
+                try:
+                    orientation, captured_at = _parse_exif(segment[6:])
+                except struct.error:
+                    pass
+            continue
+        f.seek(length - 2, 1)
+
+
+def _read_png(f: BinaryIO) -> Optional[ImageHeader]:
+    """PNGのIHDRとIDATより前のeXIfチャンクを読む"""
+    f.seek(8)
+    ihdr = f.read(25)
+    if len(ihdr) < 25 or ihdr[4:8] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", ihdr[8:16])
+    header = ImageHeader("PNG", width, height)
+
+    # IHDR（長さ・種類・データ13バイト・CRC）の後のチャンク
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return header
+        length, kind = struct.unpack(">I4s", chunk)
+        if kind in (b"IDAT", b"IEND"):
+            return header
+        if kind == b"eXIf" and length <= _MAX_EXIF_CHUNK:
+            try:
+                header.orientation, header.captured_at = _parse_exif(f.read(length))
+            except struct.error:
+                pass
+            return header
+        f.seek(length + 4, 1)
+
+
+def _read_gif(f: BinaryIO) -> Optional[ImageHeader]:
+    """GIFの論理画面サイズを読む"""
+    f.seek(6)
+    data = f.read(4)
+    if len(data) < 4:
+        return None
+    width, height = struct.unpack("<HH", data)
+    return ImageHeader("GIF", width, height)
+
+
+def _read_bmp(f: BinaryIO) -> Optional[ImageHeader]:
+    """BMPのDIBヘッダーから画像サイズを読む"""
+    f.seek(14)
+    data = f.read(12)
+    if len(data) < 12:
+        return None
+    (dib_size,) = struct.unpack("<I", data[:4])
+    if dib_size == 12:
+        # BITMAPCOREHEADER
+        width, height = struct.unpack("<HH", data[4:8])
+    elif dib_size >= 40:
+        width, height = struct.unpack("<ii", data[4:12])
+    else:
+        return None
+    # 高さが負の場合はトップダウン形式
+    return ImageHeader("BMP", width, abs(height))
+
+
+def read_header(path: Path) -> Optional[ImageHeader]:
+    """
+    画像のヘッダーから画像サイズ・向き・撮影日時を取得
+
+    Args:
+        path: 画像ファイルパス（アーカイブ内のファイルも可）
+
+    Returns:
+        Optional[ImageHeader]: 読み取った情報（対応外の形式や壊れたファイルはNone）
+    """
+    try:
+        with open_input(path) as f:
+            signature = f.read(8)
+            if signature[:3] == b"\xff\xd8\xff":
+                header = _read_jpeg(f)
+            elif signature == b"\x89PNG\r\n\x1a\n":
+                header = _read_png(f)
+            elif signature[:6] in (b"GIF87a", b"GIF89a"):
+                header = _read_gif(f)
+            elif signature[:2] == b"BM":
+                header = _read_bmp(f)
+            else:
+                return None
+    except (OSError, struct.error, IndexError):
+        return None
+
+    if header is None or header.width <= 0 or header.height <= 0:
+        return None
+    return header
+
+
+def read_headers(
+    paths: Iterable[Path], max_workers: int = DEFAULT_WORKERS
+) -> List[Optional[ImageHeader]]:
+    """
+    複数の画像のヘッダーをスレッドプールで並列に読む（I/O待ちが主のため）
+
+    Args:
+        paths: 画像ファイルパス
+        max_workers: スレッド数
+
+    Returns:
+        List[Optional[ImageHeader]]: pathsと同じ順の結果
+    """
+    paths = list(paths)
+    if max_workers <= 1 or len(paths) <= 1:
+        return [read_header(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(read_header, paths))
@@ -4,22 +4,62 @@ JPEGファイルの軽量化・リサイズ処理を行う
 """
 
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import BinaryIO, Optional, Tuple, Union
 
 from PIL import Image
 
+from .archive import open_source
+from .color import COLOR_NONE, COLOR_PRESERVE, COLOR_SRGB, check_color_mode
+from .header_parser import read_header
+from .large_image import (
+    LARGE_IMAGE_PIXELS,
+    draft_large,
+    is_large,
+    open_image,
+    resize_in_strips,
+)
+
 
 class ImageProcessor:
     """画像処理を行うクラス"""
 
-    def __init__(self, max_long_side: int = 3000, quality: int = 87):
+    def __init__(
+        self,
+        max_long_side: int = 3000,
+        quality: int = 87,
+        color: str = COLOR_NONE,
+        target_ssim: Optional[float] = None,
+        large_image_pixels: Optional[int] = LARGE_IMAGE_PIXELS,
+        tile_size: Optional[int] = None,
+    ):
         """
         Args:
             max_long_side: 長辺の最大ピクセル数
-            quality: JPEG品質（1-100）
+            quality: JPEG品質（1-100）。target_ssim指定時は最初に試す品質
+            color: 埋め込みICCプロファイルの扱い。"none"は破棄、"srgb"はsRGBに変換、
+                "preserve"は変換せずに埋め込む
+            target_ssim: 指定時は縮小後の画像と比べたSSIMがこの値以上になる
+                最小の品質を画像ごとに選ぶ（NumPyが必要）
+            large_image_pixels: この画素数以上の画像はメモリ使用量を抑えて縮小する
+                （復号時の縮小と帯ごとの縮小）。Noneで常に通常の処理
+            tile_size: 指定時は保存した画像から長辺がこの大きさのコンタクトシートの
+                タイルを作り、statsの"tile"に書き込む
+
+        Raises:
+            ValueError: colorまたはtarget_ssimが不正な場合
+            ImportError: target_ssim指定時にNumPyがない場合
         """
+        check_color_mode(color)
+        if target_ssim is not None:
+            from .quality import check_target_ssim
+
+            check_target_ssim(target_ssim)
         self.max_long_side = max_long_side
         self.quality = quality
+        self.color = color
+        self.target_ssim = target_ssim
+        self.large_image_pixels = large_image_pixels
+        self.tile_size = tile_size
 
     @staticmethod
     def is_jpeg_file(filename: str) -> bool:
@@ -27,6 +67,193 @@ class ImageProcessor:
         jpeg_extensions = {".jpg", ".jpeg", ".JPG", ".JPEG"}
         return Path(filename).suffix in jpeg_extensions
 
+    def calculate_size(self, width: int, height: int) -> Tuple[int, int]:
+        """
+        アスペクト比を保持したリサイズ後のサイズを計算
+
+        Args:
+            width: 元画像の幅
+            height: 元画像の高さ
+
+        Returns:
+            Tuple[int, int]: (width, height)。リサイズ不要なら元のサイズ
+        """
+        if max(width, height) <= self.max_long_side:
+            return width, height
+
+        if width > height:
+            return self.max_long_side, int(height * self.max_long_side / width)
+        return int(width * self.max_long_side / height), self.max_long_side
+
+    def reduce_image(
+        self,
+        input_path: Path,
+        output: Union[Path, BinaryIO],
+        stats: Optional[dict] = None,
+    ) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        画像をリサイズして品質を調整して保存（表示・例外処理なし）
+
+        Args:
+            input_path: 入力ファイルパス（アーカイブ内のファイルも可）
+            output: 出力ファイルパスまたは書き込み可能なバイナリストリーム
+            stats: 指定時は保存した品質（"quality"）、画質目標を使った場合は
+                SSIM（"ssim"）と試しエンコードの回数（"trials"）、tile_sizeの指定時は
+                コンタクトシートのタイル（"tile"）を書き込む
+
+        Returns:
+            Tuple[Tuple[int, int], Tuple[int, int]]: (元のサイズ, 保存したサイズ)
+
+        Raises:
+            Exception: 読み込み・変換・保存に失敗した場合
+        """
+        with open_source(input_path) as source, open_image(source) as img:
+            original_size, new_size, img, options = self._prepare(img)
+            self.encode_image(img, output, options, stats)
+
+        return original_size, new_size
+
+    def decode_image(self, input_path: Path):
+        """
+        画像を読み込んで縮小・色変換する（保存はencode_imageで行う）
+
+        復号と保存を別のプロセスで行う場合に使う（core.pipeline）。
+
+        Args:
+            input_path: 入力ファイルパス（アーカイブ内のファイルも可）
+
+        Returns:
+            (元のサイズ, 保存するサイズ, 画素を読み込んだ画像, 保存のオプション)
+
+        Raises:
+            Exception: 読み込み・変換に失敗した場合
+        """
+        with open_source(input_path) as source, open_image(source) as img:
+            original_size, new_size, img, options = self._prepare(img)
+            # ファイルを閉じる前に画素を読み込んでおく（縮小しない場合）
+            img.load()
+        return original_size, new_size, img, options
+
+    def _prepare(self, img):
+        """
+        開いた画像を縮小・モード変換し、カラーマネジメントを行う
+
+        Returns:
+            (元のサイズ, 保存するサイズ, 変換した画像, 保存のオプション)
+        """
+        icc_profile = img.info.get("icc_profile") if self.color != COLOR_NONE else None
+
+        if self.large_image_pixels is not None and is_large(
+            img.size, self.large_image_pixels
+        ):
+            original_size, new_size, img = self._reduce_large(img)
+        else:
+            # RGB形式に変換（JPEGはRGBのみサポート）
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGB")
+
+            # リサイズが必要かチェック
+            original_size = img.size
+            new_size = self.calculate_size(*original_size)
+
+            if new_size != original_size:
+                # アスペクト比を保持してリサイズ
+                img = img.resize(new_size, Image.Resampling.LANCZOS)
+
+        # カラーマネジメント（縮小後の画素だけを変換する）
+        options = {}
+        if icc_profile and self.color == COLOR_SRGB:
+            from .color import srgb_icc, to_srgb
+
+            img = to_srgb(img, icc_profile)
+            options["icc_profile"] = srgb_icc() if img.mode == "RGB" else icc_profile
+        elif icc_profile and self.color == COLOR_PRESERVE:
+            options["icc_profile"] = icc_profile
+
+        return original_size, new_size, img, options
+
+    def encode_image(
+        self,
+        img,
+        output: Union[Path, BinaryIO],
+        options: Optional[dict] = None,
+        stats: Optional[dict] = None,
+    ):
+        """
+        縮小済みの画像をJPEGで保存
+
+        Args:
+            img: decode_imageで変換した画像
+            output: 出力ファイルパスまたは書き込み可能なバイナリストリーム
+            options: decode_imageが返した保存のオプション
+            stats: reduce_imageと同じ
+
+        Raises:
+            Exception: 保存に失敗した場合
+        """
+        options = options or {}
+        if self.target_ssim is None:
+            img.save(output, "JPEG", quality=self.quality, optimize=True, **options)
+            if stats is not None:
+                stats["quality"] = self.quality
+        else:
+            self._save_with_target(img, output, options, stats)
+        if self.tile_size is not None and stats is not None:
+            from .contact_sheet import make_tile
+
+            stats["tile"] = make_tile(img, self.tile_size)
+
+    def _reduce_large(self, img):
+        """
+        大きな画像を省メモリで縮小（復号時の縮小と帯ごとの縮小）
+
+        Returns:
+            (元のサイズ, 保存するサイズ, 縮小した画像)
+        """
+        original_size = img.size
+        new_size = self.calculate_size(*original_size)
+        if new_size != original_size:
+            img = draft_large(img, new_size)
+            # パレット・2値の画像はPillowがLANCZOSではなくNEARESTで縮小するため、
+            # 縮小前に変換する
+            if img.mode == "P":
+                img = img.convert("RGB")
+            elif img.mode == "1":
+                img = img.convert("L")
+            if img.size != new_size:
+                img = resize_in_strips(img, new_size)
+        # RGBA・LAの変換は縮小後の画像で行う
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGB")
+        return original_size, new_size, img
+
+    def _save_with_target(
+        self,
+        img,
+        output: Union[Path, BinaryIO],
+        options: dict,
+        stats: Optional[dict],
+    ):
+        """SSIMが目標値以上になる最小の品質を選んで保存"""
+        from .quality import choose_quality, encode_jpeg
+
+        if img.mode not in ("RGB", "L", "CMYK"):
+            img = img.convert("RGB")
+        choice = choose_quality(
+            img,
+            self.target_ssim,
+            start=self.quality,
+            encode=lambda quality, optimize: encode_jpeg(
+                img, quality, optimize, **options
+            ),
+        )
+        if isinstance(output, (str, Path)):
+            Path(output).write_bytes(choice.data)
+        else:
+            output.write(choice.data)
+        if stats is not None:
+            stats.update(quality=choice.quality, ssim=choice.ssim, trials=choice.trials)
+
     def process_image(self, input_path: Path, output_path: Path) -> bool:
         """
         画像をリサイズして品質を調整して保存
@@ -39,33 +266,15 @@ class ImageProcessor:
             bool: 処理成功時True
         """
         try:
-            with Image.open(input_path) as img:
-                # RGB形式に変換（JPEGはRGBのみサポート）
-                if img.mode in ("RGBA", "LA", "P"):
-                    img = img.convert("RGB")
-
-                # リサイズが必要かチェック
-                width, height = img.size
-                long_side = max(width, height)
-
-                if long_side > self.max_long_side:
-                    # アスペクト比を保持してリサイズ
-                    if width > height:
-                        new_width = self.max_long_side
-                        new_height = int(height * self.max_long_side / width)
-                    else:
-                        new_height = self.max_long_side
-                        new_width = int(width * self.max_long_side / height)
-
-                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    print(f"  リサイズ: {width}x{height} → {new_width}x{new_height}")
-
-                # 品質を調整しながら保存
-                img.save(output_path, "JPEG", quality=self.quality, optimize=True)
-
-                # ファイルサイズをチェックして表示
-                file_size_mb = output_path.stat().st_size / (1024 * 1024)
-                print(f"  品質{self.quality}%で保存完了 (ファイルサイズ: {file_size_mb:.1f}MB)")
+            (width, height), (new_width, new_height) = self.reduce_image(
+                input_path, output_path
+            )
+            if (new_width, new_height) != (width, height):
+                print(f"  リサイズ: {width}x{height} → {new_width}x{new_height}")
+
+            # ファイルサイズをチェックして表示
+            file_size_mb = output_path.stat().st_size / (1024 * 1024)
+            print(f"  品質{self.quality}%で保存完了 (ファイルサイズ: {file_size_mb:.1f}MB)")
 
             return True
         except Exception as e:
@@ -82,8 +291,13 @@ class ImageProcessor:
         Returns:
             Optional[Tuple[int, int]]: (width, height) or None
         """
+        # JPEG/PNG/GIF/BMPはヘッダーだけを読む高速な方法で取得
+        header = read_header(file_path)
+        if header is not None:
+            return header.size
+
         try:
-            with Image.open(file_path) as img:
+            with open_source(file_path) as source, Image.open(source) as img:
                 return img.size
         except Exception:
             return None
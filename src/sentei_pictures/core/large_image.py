@@ -0,0 +1,162 @@
+"""
+大きな画像の省メモリ処理
+パノラマ・スティッチ画像など画素数の多い画像を、メモリ使用量を抑えて縮小する
+
+通常の処理では元画像全体のRGBバッファと、LANCZOS縮小の中間バッファ
+（出力の幅×元画像の高さ）を確保するため、30,000×8,000の画像では1GBを超える。
+画素数がLARGE_IMAGE_PIXELS以上の画像は次のように処理する。
+
+1. JPEGは復号時に縮小する（draft。DCTで1/2・1/4・1/8に縮小して復号）。
+   画質のため、出力の DRAFT_GAP 倍以上の大きさで復号する
+2. LANCZOS縮小を出力の帯ごとに行い、中間バッファを STRIP_BYTES 以下にする
+
+復号時の縮小は最大1/8のため、復号後の大きさは出力の大きさ（長辺の最大ピクセル数）と
+MAX_LARGE_IMAGE_PIXELS / 64 のどちらか大きい方で決まり、元画像の大きさには比例しない。
+JPEG以外の形式は復号時に縮小できないため、帯ごとの縮小だけを行う。
+"""
+
+import os
+import struct
+from typing import Tuple
+
+# これ以上の画素数の画像は省メモリで処理する
+LARGE_IMAGE_PIXELS = 40_000_000
+
+# 省メモリで処理する画像の画素数の上限（これを超える画像は展開爆弾とみなす）
+MAX_LARGE_IMAGE_PIXELS = 1_000_000_000
+
+# 出力の何倍以上の大きさで復号するか
+DRAFT_GAP = 2
+
+# 帯ごとの縮小で使う中間バッファの大きさ（バイト）
+STRIP_BYTES = 16 * 1024 * 1024
+
+
+def is_large(size: Tuple[int, int], threshold: int = LARGE_IMAGE_PIXELS) -> bool:
+    """省メモリで処理する大きさの画像かどうか"""
+    return size[0] * size[1] >= threshold
+
+
+def open_image(source):
+    """
+    Image.openで画像を開く（Pillowの展開爆弾の上限を超える大きな画像も開く）
+
+    Pillowの上限（既定で約1.8億画素）を超える画像は、MAX_LARGE_IMAGE_PIXELS以下なら開く。
+    開くだけでは復号しないため、大きな画像はdraft_largeで縮小して復号すること。
+
+    Args:
+        source: ファイルパスまたはシーク可能なバイナリストリーム
+
+    Returns:
+        PIL.Image: 開いた画像（withで使う）
+
+    Raises:
+        PIL.Image.DecompressionBombError: MAX_LARGE_IMAGE_PIXELSを超える場合
+    """
+    from PIL import Image
+
+    try:
+        return Image.open(source)
+    except Image.DecompressionBombError:
+        pass
+
+    # Image.MAX_IMAGE_PIXELSはプロセス全体の設定で、変更すると他のスレッドの
+    # Image.openでも展開爆弾の検査が外れるため、上限を変えずに形式ごとの読み込みを直接使う
+    img = _open_unchecked(source)
+    if img.size[0] * img.size[1] <= MAX_LARGE_IMAGE_PIXELS:
+        return img
+    img.close()
+    raise Image.DecompressionBombError(
+        f"画像の画素数が上限を超えています: {img.size[0]}x{img.size[1]}"
+        f"（上限 {MAX_LARGE_IMAGE_PIXELS}画素）"
+    )
+
+
+def _open_unchecked(source):
+    """Image.openと同じ順に形式を試して開く（展開爆弾の検査をしない）"""
+    from PIL import Image, UnidentifiedImageError
+
+    if hasattr(source, "read"):
+        fp, filename, exclusive = source, "", False
+    else:
+        filename = os.path.realpath(os.fspath(source))
+        fp, exclusive = open(filename, "rb"), True
+    try:
+        fp.seek(0)
+        prefix = fp.read(16)
+        Image.init()
+        for format_id in Image.ID:
+            factory, accept = Image.OPEN[format_id]
+            result = not accept or accept(prefix)
+            # 文字列は形式が一致したが開けない理由（Image.openでは警告になる）
+            if not result or isinstance(result, str):
+                continue
+            fp.seek(0)
+            try:
+                img = factory(fp, filename)
+            except (SyntaxError, IndexError, TypeError, struct.error):
+                continue
+            # Image.openと同様に、パスから開いたファイルは画像を閉じるときに閉じる
+            img._exclusive_fp = exclusive
+            return img
+    except BaseException:
+        if exclusive:
+            fp.close()
+        raise
+    if exclusive:
+        fp.close()
+    raise UnidentifiedImageError(f"画像を開けません: {source}")
+
+
+def draft_large(img, size: Tuple[int, int]):
+    """
+    JPEGを出力の大きさに合わせて縮小して復号するよう設定する（復号前に呼ぶ）
+
+    Args:
+        img: 開いただけの画像
+        size: 出力の大きさ
+
+    Returns:
+        PIL.Image: imgそのもの（JPEGの場合はsizeが縮小後の大きさに変わる）
+    """
+    if img.format == "JPEG":
+        requested = (size[0] * DRAFT_GAP, size[1] * DRAFT_GAP)
+        # YCbCr→RGB・グレースケール以外（CMYKなど）はモードを変えない
+        img.draft(img.mode if img.mode in ("RGB", "L") else None, requested)
+    return img
+
+
+def resize_in_strips(img, size: Tuple[int, int], strip_bytes: int = STRIP_BYTES):
+    """
+    出力の帯ごとにLANCZOSで縮小する（Image.resizeと同じ結果で中間バッファが小さい）
+
+    帯の境界でもフィルターは帯の外の画素を使うため、つなぎ目は生じない。
+
+    Args:
+        img: 縮小する画像
+        size: 出力の大きさ
+        strip_bytes: 1つの帯の中間バッファ（出力の幅×元画像の帯の高さ）の上限
+
+    Returns:
+        PIL.Image: 縮小した画像
+    """
+    from PIL import Image
+
+    width, height = img.size
+    out_width, out_height = size
+    scale = height / out_height
+    # Pillowは2バンド以上の画像を1画素4バイトで保持する
+    pixel_bytes = 1 if len(img.getbands()) == 1 else 4
+    row_bytes = out_width * pixel_bytes * max(scale, 1.0)
+    rows = max(1, int(strip_bytes / row_bytes))
+
+    output = Image.new(img.mode, size)
+    for top in range(0, out_height, rows):
+        bottom = min(top + rows, out_height)
+        strip = img.resize(
+            (out_width, bottom - top),
+            Image.Resampling.LANCZOS,
+            box=(0, top * scale, width, bottom * scale),
+        )
+        output.paste(strip, (0, top))
+    return output
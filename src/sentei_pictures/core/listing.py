@@ -0,0 +1,241 @@
+"""
+ディレクトリ一覧のキャッシュとバックグラウンド走査
+GUIのプレビューで入力のたびにディレクトリを走査してUIが止まるのを防ぐ
+
+一覧はディレクトリの更新日時をキーにキャッシュし、プレビューで走査した一覧を
+処理開始時にも使う（ディレクトリが変わっていなければstat 1回だけで済む）。
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from .file_matcher import FileMatcher
+
+if TYPE_CHECKING:
+    from .catalog import Catalog
+
+# 一覧の種類
+LIST_IMAGES = "images"
+LIST_JPEG = "jpeg"
+LIST_KINDS = (LIST_IMAGES, LIST_JPEG)
+
+JPEG_SUFFIXES = {".jpg", ".jpeg", ".JPG", ".JPEG"}
+
+
+class ScanCancelled(Exception):
+    """走査が新しい要求で取り消された"""
+
+
+def scan_directory(
+    directory: Path,
+    kind: str = LIST_IMAGES,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> List[Path]:
+    """
+    ディレクトリの画像ファイル（kindが"jpeg"ならJPEGファイル）を取得
+
+    FileMatcher.get_image_files / get_jpeg_files と同じ条件で一覧する。
+
+    Args:
+        directory: 検索ディレクトリ
+        kind: "images" または "jpeg"
+        cancelled: Trueを返すと走査を中止する（ファイルごとに確認）
+
+    Returns:
+        List[Path]: ファイルのリスト
+
+    Raises:
+        ScanCancelled: cancelledがTrueを返した場合
+        ValueError: kindが不明な場合
+    """
+    if kind not in LIST_KINDS:
+        raise ValueError(f"不明な一覧の種類です: {kind}")
+
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if cancelled is not None and cancelled():
+                raise ScanCancelled(str(directory))
+            if kind == LIST_JPEG:
+                matched = os.path.splitext(entry.name)[1] in JPEG_SUFFIXES
+            else:
+                matched = FileMatcher.is_image_file(entry.name)
+            if matched and entry.is_file():
+                files.append(Path(entry.path))
+    return files
+
+
+class ListingCache:
+    """ディレクトリの更新日時をキーにした一覧のキャッシュ（複数スレッドから使用可）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[int, List[Path]]] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        """キャッシュを空にする"""
+        with self._lock:
+            self._entries.clear()
+
+    def files(
+        self,
+        directory: Path,
+        kind: str = LIST_IMAGES,
+        catalog: Optional["Catalog"] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> List[Path]:
+        """
+        ディレクトリの一覧を取得（更新日時が前回と同じなら走査しない）
+
+        ファイルの追加・削除・リネームはディレクトリの更新日時が変わるため検出できる。
+
+        Args:
+            directory: 検索ディレクトリ
+            kind: "images" または "jpeg"
+            catalog: 指定時はカタログから取得（カタログ側で更新日時を確認する）
+            cancelled: Trueを返すと走査を中止する
+
+        Returns:
+            List[Path]: ファイルのリスト（呼び出し側で変更してよいコピー）
+
+        Raises:
+            FileNotFoundError: ディレクトリが存在しない場合
+            ScanCancelled: 走査を中止した場合
+        """
+        if catalog is not None:
+            return catalog.files(directory, jpeg_only=kind == LIST_JPEG)
+
+        key = (os.path.abspath(directory), kind)
+        # 走査の途中で変更されても次回に検出できるよう、走査の前に取得する
+        mtime_ns = os.stat(directory).st_mtime_ns
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return list(cached[1])
+
+        files = scan_directory(directory, kind, cancelled)
+        with self._lock:
+            self._entries[key] = (mtime_ns, files)
+        return list(files)
+
+    def image_files(
+        self, directory: Path, catalog: Optional["Catalog"] = None
+    ) -> List[Path]:
+        """FileMatcher.get_image_filesのキャッシュ付き版"""
+        return self.files(directory, LIST_IMAGES, catalog)
+
+    def jpeg_files(
+        self, directory: Path, catalog: Optional["Catalog"] = None
+    ) -> List[Path]:
+        """FileMatcher.get_jpeg_filesのキャッシュ付き版"""
+        return self.files(directory, LIST_JPEG, catalog)
+
+
+_shared_listing: Optional[ListingCache] = None
+_shared_listing_lock = threading.Lock()
+
+
+def get_shared_listing() -> ListingCache:
+    """
+    プロセス共有の一覧キャッシュを取得
+
+    GUIのプレビューと処理開始時の一覧で同じキャッシュを使うために使う。
+    """
+    global _shared_listing
+    with _shared_listing_lock:
+        if _shared_listing is None:
+            _shared_listing = ListingCache()
+        return _shared_listing
+
+
+class DirectoryScanner:
+    """
+    ディレクトリの一覧をバックグラウンドで取得する
+
+    新しい要求が来ると、実行中・待機中の古い要求は取り消される（結果は通知しない）。
+    走査は1スレッドで順に行い、要求がなくなるとスレッドは終了する。
+    """
+
+    def __init__(self, cache: Optional[ListingCache] = None):
+        """
+        Args:
+            cache: 一覧キャッシュ（省略時はget_shared_listing）
+        """
+        self.cache = cache if cache is not None else get_shared_listing()
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._pending = None
+        self._thread: Optional[threading.Thread] = None
+
+    def request(
+        self,
+        directory: Path,
+        callback: Callable[[int, Optional[List[Path]], Optional[Exception]], None],
+        kind: str = LIST_IMAGES,
+        catalog: Optional["Catalog"] = None,
+    ) -> int:
+        """
+        一覧の取得を要求する
+
+        callbackはワーカースレッドから (要求番号, 一覧, 例外) で呼ばれる。
+        一覧が取得できた場合は例外がNone、失敗した場合は一覧がNone。
+        取り消された要求のcallbackは呼ばれない。
+
+        Args:
+            directory: 検索ディレクトリ
+            callback: 結果を受け取る関数
+            kind: "images" または "jpeg"
+            catalog: 指定時はカタログから取得
+
+        Returns:
+            int: 要求番号（is_currentで結果が最新かどうかを確認するために使う）
+        """
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, directory, kind, catalog, callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+            return self._generation
+
+    def cancel(self):
+        """実行中・待機中の要求を取り消す"""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def is_current(self, token: int) -> bool:
+        """要求番号が最新の要求かどうか"""
+        return token == self._generation
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._pending is None:
+                    self._thread = None
+                    return
+                token, directory, kind, catalog, callback = self._pending
+                self._pending = None
+
+            try:
+                files = self.cache.files(
+                    directory,
+                    kind,
+                    catalog,
+                    cancelled=lambda: not self.is_current(token),
+                )
+                error = None
+            except ScanCancelled:
+                continue
+            except Exception as e:
+                files, error = None, e
+
+            if self.is_current(token):
+                callback(token, files, error)
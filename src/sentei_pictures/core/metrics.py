@@ -0,0 +1,187 @@
+"""
+処理速度の集計
+reduce/choiceの結果レコードから処理速度・残り時間・ワーカーごとの稼働率・
+削減容量・処理時間の分布を集計する
+
+ログの文字列ではなく結果レコード（api.ReduceResult / ChoiceResult）から集計するため、
+GUI以外の呼び出し元でも使える。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+_MB = 1024 * 1024
+
+# 速度を求める直近の期間（秒）
+DEFAULT_WINDOW = 5.0
+
+# 処理時間の分布の区切り（秒）。区切りの数+1個の区間に分ける
+HISTOGRAM_EDGES = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+
+
+def histogram_labels(edges=HISTOGRAM_EDGES) -> List[str]:
+    """処理時間の分布の各区間の表示名（例: "<0.05s", "0.05-0.1s", "≥5s"）"""
+    labels = [f"<{edges[0]:g}s"]
+    labels += [f"{low:g}-{high:g}s" for low, high in zip(edges, edges[1:])]
+    labels.append(f"≥{edges[-1]:g}s")
+    return labels
+
+
+class MetricsSnapshot:
+    """ある時点の集計結果"""
+
+    __slots__ = (
+        "done",
+        "total",
+        "failed",
+        "elapsed",
+        "files_per_second",
+        "mb_per_second",
+        "eta",
+        "bytes_saved",
+        "utilisation",
+        "histogram",
+    )
+
+    def __init__(self):
+        self.done = 0
+        self.total = 0
+        self.failed = 0
+        self.elapsed = 0.0
+        self.files_per_second = 0.0
+        self.mb_per_second = 0.0
+        # 残り時間（秒）。速度が0または全体数が不明の場合はNone
+        self.eta: Optional[float] = None
+        self.bytes_saved = 0
+        # ワーカー名 → 稼働率（0〜1）。ワーカーが最初に結果を返した順
+        self.utilisation: Dict[str, float] = {}
+        self.histogram: List[int] = []
+
+    def summary_lines(self) -> List[str]:
+        """表示用の要約（CLI・GUI共通）"""
+        eta = "--" if self.eta is None else format_duration(self.eta)
+        lines = [
+            f"速度: {self.files_per_second:.1f}件/秒, {self.mb_per_second:.1f}MB/秒"
+            f"  残り: {eta}",
+            f"削減: {self.bytes_saved / _MB:.1f}MB  失敗: {self.failed}件",
+        ]
+        if self.utilisation:
+            lines.append(
+                "稼働率: "
+                + ", ".join(
+                    f"W{number} {rate:.0%}"
+                    for number, rate in enumerate(self.utilisation.values(), 1)
+                )
+            )
+        return lines
+
+
+def format_duration(seconds: float) -> str:
+    """秒数を「1時間02分」「3分05秒」「12秒」の形式にする"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}時間{minutes:02d}分"
+    if minutes:
+        return f"{minutes}分{seconds:02d}秒"
+    return f"{seconds}秒"
+
+
+class ThroughputMeter:
+    """
+    結果レコードから処理速度などを集計する（複数スレッドから使用可）
+
+    recordは結果ごとに呼ばれるため軽くし、集計はsnapshotでまとめて行う。
+    """
+
+    def __init__(
+        self,
+        total: int = 0,
+        window: float = DEFAULT_WINDOW,
+        edges=HISTOGRAM_EDGES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            total: 全体のファイル数（残り時間の計算に使う。後から変更してよい）
+            window: 速度を求める直近の期間（秒）
+            edges: 処理時間の分布の区切り（秒）
+            clock: 現在時刻（秒）を返す関数
+        """
+        self.total = total
+        self.window = window
+        self.edges = tuple(edges)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._started = clock()
+        self._recent = deque()
+        self._done = 0
+        self._failed = 0
+        self._bytes_saved = 0
+        self._busy: Dict[str, float] = {}
+        self._histogram = [0] * (len(self.edges) + 1)
+        # snapshotの結果を再利用するかどうかの判定に使う
+        self.version = 0
+
+    def record(self, result):
+        """
+        結果レコードを1件集計する
+
+        Args:
+            result: api.ReduceResult / ChoiceResult（bytes_in, bytes_out, elapsed,
+                worker, okを使う）
+        """
+        now = self._clock()
+        # 変更なしで省略したコピー（bytes_outが0）は転送量に含めない
+        processed = result.bytes_in if result.bytes_out else 0
+        bucket = 0
+        while bucket < len(self.edges) and result.elapsed >= self.edges[bucket]:
+            bucket += 1
+        worker = getattr(result, "worker", None) or "main"
+
+        with self._lock:
+            self._recent.append((now, processed))
+            self._done += 1
+            if not result.ok:
+                self._failed += 1
+            elif result.bytes_out:
+                self._bytes_saved += max(result.bytes_in - result.bytes_out, 0)
+            self._busy[worker] = self._busy.get(worker, 0.0) + result.elapsed
+            self._histogram[bucket] += 1
+            self.version += 1
+
+    def snapshot(self) -> MetricsSnapshot:
+        """現時点の集計結果"""
+        now = self._clock()
+        snapshot = MetricsSnapshot()
+        with self._lock:
+            while self._recent and self._recent[0][0] < now - self.window:
+                self._recent.popleft()
+            recent_files = len(self._recent)
+            recent_bytes = sum(size for _, size in self._recent)
+            snapshot.done = self._done
+            snapshot.failed = self._failed
+            snapshot.bytes_saved = self._bytes_saved
+            busy = dict(self._busy)
+            snapshot.histogram = list(self._histogram)
+
+        snapshot.total = self.total
+        snapshot.elapsed = now - self._started
+        span = min(self.window, snapshot.elapsed)
+        if span > 0:
+            snapshot.files_per_second = recent_files / span
+            snapshot.mb_per_second = recent_bytes / _MB / span
+        remaining = self.total - snapshot.done
+        if self.total and remaining <= 0:
+            snapshot.eta = 0.0
+        elif self.total and snapshot.files_per_second > 0:
+            snapshot.eta = remaining / snapshot.files_per_second
+        if snapshot.elapsed > 0:
+            snapshot.utilisation = {
+                worker: min(seconds / snapshot.elapsed, 1.0)
+                for worker, seconds in busy.items()
+            }
+        return snapshot
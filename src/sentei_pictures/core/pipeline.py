@@ -0,0 +1,259 @@
+"""
+共有メモリのパイプライン
+復号・縮小と保存（JPEGエンコード）を別のワーカープロセスで行い、画素を共有メモリで渡す
+
+縮小した画素（長辺3000pxで最大36MB）をプロセス間でpickleすると、送る側・受け取る側の
+コピーと転送で並列化の効果が相殺される。このため親プロセスが共有メモリの領域（スラブ）を
+あらかじめ確保して使い回し、復号側はスラブに画素を書き込んで名前・モード・サイズだけを返す。
+保存側はスラブをImage.frombufferでコピーせずに画像として参照してエンコードする。
+
+- スラブの数だけのファイルを同時に処理する（保存が終わったスラブを次のファイルに使う）
+- RGBはPillowの内部表現と同じRGBX（1画素4バイト）で置く。L・CMYK以外のモードや
+  スラブに収まらない画像はpickleで渡す
+- 復号側・保存側のワーカーはスラブをプロセスごとに一度だけ開いて使い回す
+"""
+
+import os
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .worker_pool import WorkerPool
+
+# 保存前のモード → スラブに置くモード（Image.frombufferでコピーせずに参照できるもの）
+SLAB_MODES = {"RGB": "RGBX", "L": "L", "CMYK": "CMYK"}
+
+# 1画素の最大バイト数（RGBX・CMYK）
+_MAX_PIXEL_BYTES = 4
+
+# ワーカーで開いたスラブ（名前 → SharedMemory）
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def slab_bytes(max_long_side: int) -> int:
+    """長辺がmax_long_side以下の画像を置けるスラブの大きさ（バイト）"""
+    return max_long_side * max_long_side * _MAX_PIXEL_BYTES
+
+
+class SlabPool:
+    """
+    使い回す共有メモリの領域（スラブ）
+
+    親プロセスで作成し、acquire・releaseも親プロセスだけで呼ぶ。
+    ワーカーにはスラブの名前を渡す。
+    """
+
+    def __init__(self, count: int, size: int):
+        """
+        Args:
+            count: スラブの数（同時に処理するファイル数の上限）
+            size: 1つのスラブの大きさ（バイト）
+        """
+        self.size = size
+        self._slabs: List[shared_memory.SharedMemory] = []
+        self._free = deque()
+        try:
+            for _ in range(max(1, count)):
+                self._slabs.append(shared_memory.SharedMemory(create=True, size=size))
+        except Exception:
+            self.close()
+            raise
+        self._free.extend(slab.name for slab in self._slabs)
+
+    def __len__(self) -> int:
+        return len(self._slabs)
+
+    @property
+    def available(self) -> int:
+        """空いているスラブの数"""
+        return len(self._free)
+
+    def acquire(self) -> Optional[str]:
+        """空いているスラブの名前を取得（空いていなければNone）"""
+        return self._free.popleft() if self._free else None
+
+    def release(self, name: str):
+        """使い終わったスラブを返す"""
+        self._free.append(name)
+
+    def close(self):
+        """すべてのスラブを解放する"""
+        for slab in self._slabs:
+            slab.close()
+            slab.unlink()
+        self._slabs = []
+        self._free.clear()
+
+
+class Frame:
+    """
+    復号・縮小した画像（保存側に渡す）
+
+    slabがNoneの場合、画素はdataに入っている（pickleで渡す）。
+    """
+
+    __slots__ = (
+        "slab",
+        "mode",
+        "size",
+        "data",
+        "options",
+        "original_size",
+        "new_size",
+        "bytes_in",
+        "elapsed",
+        "worker",
+    )
+
+    def __init__(
+        self,
+        mode: str,
+        size: Tuple[int, int],
+        options: dict,
+        original_size: Tuple[int, int],
+        new_size: Tuple[int, int],
+    ):
+        self.slab: Optional[str] = None
+        self.mode = mode
+        self.size = size
+        self.data: Optional[bytes] = None
+        self.options = options
+        self.original_size = original_size
+        self.new_size = new_size
+        self.bytes_in = 0
+        self.elapsed = 0.0
+        self.worker: Optional[str] = None
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """スラブを開く（プロセスごとに一度だけ）"""
+    slab = _attached.get(name)
+    if slab is None:
+        slab = _attached[name] = shared_memory.SharedMemory(name=name)
+    return slab
+
+
+def decode_to_slab(processor, input_path: Path, slab: str) -> Frame:
+    """
+    画像を復号・縮小してスラブに書き込む（復号側のワーカーで実行する）
+
+    Args:
+        processor: 画像プロセッサー
+        input_path: 入力ファイルパス
+        slab: 書き込むスラブの名前
+
+    Returns:
+        Frame: スラブに置いた画像（置けない場合はdataに画素を入れる）
+
+    Raises:
+        Exception: 読み込み・変換に失敗した場合
+    """
+    start = time.perf_counter()
+    bytes_in = input_path.stat().st_size
+    original_size, new_size, img, options = processor.decode_image(input_path)
+    mode = SLAB_MODES.get(img.mode)
+    target = _attach(slab) if mode is not None else None
+    # スラブに置くモードは1バンド1バイトなので、バンド数が1画素のバイト数になる
+    if target is not None and img.width * img.height * len(mode) <= target.size:
+        frame = Frame(mode, img.size, options, original_size, new_size)
+        data = img.tobytes("raw", mode)
+        target.buf[: len(data)] = data
+        frame.slab = slab
+    else:
+        frame = Frame(img.mode, img.size, options, original_size, new_size)
+        frame.data = img.tobytes()
+    frame.bytes_in = bytes_in
+    frame.elapsed = time.perf_counter() - start
+    frame.worker = f"{os.getpid()}/decode"
+    return frame
+
+
+def encode_from_slab(
+    processor, frame: Frame, output_path: Path
+) -> Tuple[dict, int, float]:
+    """
+    スラブの画素をコピーせずに参照してJPEGで保存する（保存側のワーカーで実行する）
+
+    Args:
+        processor: 画像プロセッサー
+        frame: decode_to_slabが返した画像
+        output_path: 出力ファイルパス
+
+    Returns:
+        Tuple[dict, int, float]: (reduce_imageと同じstats, 出力のバイト数, 処理時間)
+
+    Raises:
+        Exception: 保存に失敗した場合
+    """
+    from PIL import Image
+
+    start = time.perf_counter()
+    stats = {}
+    if frame.slab is None:
+        img = Image.frombytes(frame.mode, frame.size, frame.data)
+    else:
+        buffer = _attach(frame.slab).buf
+        img = Image.frombuffer(frame.mode, frame.size, buffer, "raw", frame.mode, 0, 1)
+    try:
+        processor.encode_image(img, output_path, frame.options, stats)
+    finally:
+        # スラブを参照している画像を先に破棄する（参照中はスラブを閉じられない）
+        del img
+    return stats, output_path.stat().st_size, time.perf_counter() - start
+
+
+class ShmPipeline:
+    """
+    復号側・保存側のワーカープールとスラブ
+
+    reduce_directoryのpipelineに渡す。スラブは最初の実行時に画像プロセッサーの
+    長辺の上限から大きさを決めて確保し、close()まで使い回す。
+    """
+
+    def __init__(
+        self,
+        decode_workers: Optional[int] = None,
+        encode_workers: Optional[int] = None,
+        slabs: Optional[int] = None,
+        background: bool = False,
+    ):
+        """
+        Args:
+            decode_workers: 復号・縮小のプロセス数（省略時はCPUコア数の半分、最低1）
+            encode_workers: 保存のプロセス数（省略時は復号と同じ）
+            slabs: スラブの数（省略時は復号・保存のプロセス数の合計）
+            background: ワーカープロセスのCPU・I/O優先度を下げる
+        """
+        self.decode_workers = decode_workers or max(1, (os.cpu_count() or 1) // 2)
+        self.encode_workers = encode_workers or self.decode_workers
+        self.slab_count = slabs or self.decode_workers + self.encode_workers
+        self.decode_pool = WorkerPool(self.decode_workers, background=background)
+        self.encode_pool = WorkerPool(self.encode_workers, background=background)
+        self._slabs: Optional[SlabPool] = None
+
+    def slabs_for(self, processor) -> SlabPool:
+        """
+        processorの出力が収まるスラブを取得（足りなければ確保し直す）
+
+        確保し直すのは前回の実行が終わってから（スラブがすべて空いている場合）に限る。
+        """
+        size = slab_bytes(processor.max_long_side)
+        if self._slabs is not None and self._slabs.size < size:
+            # ワーカーが開いたままの古いスラブはプロセスの終了で解放される
+            self.decode_pool.shutdown()
+            self.encode_pool.shutdown()
+            self._slabs.close()
+            self._slabs = None
+        if self._slabs is None:
+            self._slabs = SlabPool(self.slab_count, size)
+        return self._slabs
+
+    def close(self):
+        """ワーカープロセスを終了してスラブを解放する"""
+        self.decode_pool.shutdown()
+        self.encode_pool.shutdown()
+        if self._slabs is not None:
+            self._slabs.close()
+            self._slabs = None
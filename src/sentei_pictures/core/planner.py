@@ -0,0 +1,210 @@
+"""
+処理計画（ドライラン）
+画像のヘッダーだけを読んで対象を集計し、少数のサンプルを実際にエンコードして
+出力サイズ・処理時間・出力先の空き容量を見積もる
+"""
+
+import io
+import shutil
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+from .image_processor import ImageProcessor
+
+if TYPE_CHECKING:
+    from .catalog import Catalog
+
+DEFAULT_SAMPLE_SIZE = 12
+
+# 1つの層でサンプルのエンコードを試すファイル数の上限
+MAX_SAMPLE_ATTEMPTS = 3
+
+
+class PlanEstimate:
+    """reduce処理の見積もり"""
+
+    def __init__(self):
+        self.file_count = 0
+        self.unreadable = 0
+        self.bytes_in = 0
+        self.megapixels = 0.0
+        self.sample_count = 0
+        self.skipped_strata = 0
+        self.estimated_bytes_out = 0
+        self.estimated_seconds = 0.0
+        self.workers = 1
+        self.free_bytes: Optional[int] = None
+
+    @property
+    def headroom_bytes(self) -> Optional[int]:
+        """出力後に残る空き容量（出力先が不明ならNone）"""
+        if self.free_bytes is None:
+            return None
+        return self.free_bytes - self.estimated_bytes_out
+
+    @property
+    def fits(self) -> bool:
+        """出力先の空き容量が足りる見込みかどうか（不明な場合はTrue）"""
+        headroom = self.headroom_bytes
+        return headroom is None or headroom >= 0
+
+    def summary_lines(self) -> List[str]:
+        """見積もりを表示用の行で返す"""
+        mb = 1024 * 1024
+        duration = format_duration(self.estimated_seconds)
+        lines = [
+            f"対象: {self.file_count}個 ({self.bytes_in / mb:.1f}MB, "
+            f"{self.megapixels:.0f}メガピクセル)",
+            f"推定出力サイズ: {self.estimated_bytes_out / mb:.1f}MB "
+            f"(サンプル{self.sample_count}個から推定)",
+            f"推定処理時間: {duration} ({self.workers}並列)",
+        ]
+        if self.unreadable:
+            lines.append(f"読み取れないファイル: {self.unreadable}個")
+        if self.skipped_strata:
+            basis = "他の層の比率で補って推定" if self.sample_count else "入力サイズで推定"
+            lines.append(f"サンプルを処理できなかった層: {self.skipped_strata}個 ({basis})")
+        if self.free_bytes is not None:
+            status = "" if self.fits else " ※空き容量が不足する見込みです"
+            lines.append(
+                f"出力先の空き容量: {self.free_bytes / mb:.0f}MB "
+                f"(処理後 {self.headroom_bytes / mb:.0f}MB){status}"
+            )
+        return lines
+
+
+def format_duration(seconds: float) -> str:
+    """秒数を「1時間2分」「3分4秒」の形式に変換"""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}時間{seconds % 3600 // 60}分"
+    if seconds >= 60:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    return f"{seconds}秒"
+
+
+def free_space(path: Path) -> Optional[int]:
+    """パス（未作成なら存在する親ディレクトリ）のファイルシステムの空き容量"""
+    path = Path(path).absolute()
+    for candidate in (path, *path.parents):
+        if candidate.exists():
+            try:
+                return shutil.disk_usage(candidate).free
+            except OSError:
+                return None
+    return None
+
+
+def plan_reduce(
+    files: List[Path],
+    processor: ImageProcessor,
+    output_dir: Optional[Path] = None,
+    workers: int = 1,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    catalog: Optional["Catalog"] = None,
+    cancel=None,
+) -> Optional[PlanEstimate]:
+    """
+    reduce処理の出力サイズ・処理時間・空き容量を見積もる
+
+    ファイルを画素数順に並べてsample_size個の層に分け、各層の中央のファイルを
+    現在の設定でメモリ上にエンコードする（失敗したら中央に近いファイルで試し直す）。
+    層ごとに入力バイト当たりの出力バイト数とメガピクセル当たりの処理時間を求め、
+    層全体に外挿する。サンプルを処理できなかった層は、他の層の比率で補う。
+
+    Args:
+        files: 処理対象のファイル
+        processor: 見積もりに使う設定の画像プロセッサー
+        output_dir: 出力ディレクトリ（省略時は空き容量を調べない）
+        workers: 並列に処理するプロセス数
+        sample_size: エンコードするサンプル数
+        catalog: 元画像カタログ（カタログ済みのファイルはヘッダーを読まない）
+        cancel: キャンセルトークン（cancelledがTrueになったら見積もりをやめる）
+
+    Returns:
+        Optional[PlanEstimate]: 見積もり（キャンセルされた場合はNone）
+    """
+    estimate = PlanEstimate()
+    estimate.workers = max(1, min(workers, len(files) or 1))
+    if output_dir is not None:
+        estimate.free_bytes = free_space(output_dir)
+
+    # ヘッダーだけを読んで画素数とファイルサイズを集計
+    known = catalog.lookup(files) if catalog is not None else {}
+    entries = []
+    for path in files:
+        if cancel is not None and cancel.cancelled:
+            return None
+        entry = known.get(path)
+        if entry is not None:
+            size, bytes_in = entry.dimensions, entry.size
+        else:
+            size, bytes_in = processor.get_image_info(path), None
+        if size is None:
+            estimate.unreadable += 1
+            continue
+        if bytes_in is None:
+            bytes_in = path.stat().st_size
+        megapixels = size[0] * size[1] / 1_000_000
+        entries.append((megapixels, bytes_in, path))
+    estimate.file_count = len(entries)
+    estimate.bytes_in = sum(entry[1] for entry in entries)
+    estimate.megapixels = sum(entry[0] for entry in entries)
+    if not entries:
+        return estimate
+
+    entries.sort(key=lambda entry: entry[0])
+    strata = min(sample_size, len(entries))
+    total_seconds = 0.0
+    sampled_bytes_in = 0
+    sampled_megapixels = 0.0
+    for number in range(strata):
+        stratum = entries[
+            number * len(entries) // strata : (number + 1) * len(entries) // strata
+        ]
+        middle = len(stratum) // 2
+        candidates = sorted(range(len(stratum)), key=lambda i: abs(i - middle))
+        sample = None
+        for index in candidates[:MAX_SAMPLE_ATTEMPTS]:
+            if cancel is not None and cancel.cancelled:
+                return None
+            megapixels, bytes_in, path = stratum[index]
+            buffer = io.BytesIO()
+            started = time.perf_counter()
+            try:
+                processor.reduce_image(path, buffer)
+            except Exception:
+                continue
+            seconds = time.perf_counter() - started
+            sample = (megapixels, bytes_in, buffer.tell(), seconds)
+            break
+        if sample is None:
+            estimate.skipped_strata += 1
+            continue
+        megapixels, bytes_in, bytes_out, seconds = sample
+        estimate.sample_count += 1
+
+        stratum_bytes_in = sum(entry[1] for entry in stratum)
+        stratum_megapixels = sum(entry[0] for entry in stratum)
+        sampled_bytes_in += stratum_bytes_in
+        sampled_megapixels += stratum_megapixels
+        estimate.estimated_bytes_out += int(
+            stratum_bytes_in * bytes_out / max(bytes_in, 1)
+        )
+        total_seconds += stratum_megapixels * seconds / max(megapixels, 1e-6)
+
+    if estimate.skipped_strata:
+        if estimate.sample_count:
+            estimate.estimated_bytes_out = int(
+                estimate.estimated_bytes_out
+                * estimate.bytes_in
+                / max(sampled_bytes_in, 1)
+            )
+            total_seconds *= estimate.megapixels / max(sampled_megapixels, 1e-6)
+        else:
+            # 1つもエンコードできなければ、出力が入力と同じサイズになると見なす
+            estimate.estimated_bytes_out = estimate.bytes_in
+
+    estimate.estimated_seconds = total_seconds / estimate.workers
+    return estimate
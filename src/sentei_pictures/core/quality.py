@@ -0,0 +1,202 @@
+"""
+画質目標による品質の自動選択
+縮小後の画像と比べたSSIMが目標値以上になる最小のJPEG品質を画像ごとに選ぶ
+
+固定の品質では、平坦な背景の画像は必要以上に大きく、細かい模様の画像は画質が不足する。
+SSIMはNumPyでベクトル化し、長辺SSIM_MAX_SIDEまで縮小した輝度だけで計算する。
+品質はメモリ上の試しエンコードで二分探索し、試行回数には上限を設ける。
+試しエンコードはハフマン表の最適化を省く（最適化しても復号結果は変わらないため）。
+
+NumPyはオプションの依存関係（pip install "sentei-pictures[quality]"）。
+"""
+
+import io
+from typing import Callable, Optional
+
+# SSIMの目標値のデフォルト
+DEFAULT_TARGET_SSIM = 0.98
+
+# 探索する品質の範囲と試しエンコードの最大回数
+MIN_QUALITY = 40
+MAX_QUALITY = 95
+MAX_TRIALS = 7
+
+# SSIMを計算する輝度画像の長辺と窓の大きさ
+SSIM_MAX_SIDE = 512
+SSIM_WINDOW = 7
+
+# SSIMの安定化定数（8ビットの輝度）
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def check_target_ssim(target_ssim: float):
+    """
+    SSIMの目標値とNumPyを確認
+
+    Raises:
+        ValueError: 目標値が0より大きく1以下でない場合
+        ImportError: NumPyがインストールされていない場合
+    """
+    if not 0 < target_ssim <= 1:
+        raise ValueError(f"SSIMの目標値は0より大きく1以下で指定してください: {target_ssim}")
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            "画質目標（SSIM）を使うにはNumPyをインストールしてください"
+            '（pip install "sentei-pictures[quality]"）'
+        ) from None
+
+
+def luma(img, max_side: int = SSIM_MAX_SIDE):
+    """
+    SSIMを計算するための縮小した輝度画像
+
+    Args:
+        img: PIL.Image
+        max_side: 長辺の最大ピクセル数
+
+    Returns:
+        numpy.ndarray: float64の2次元配列
+    """
+    import numpy as np
+    from PIL import Image
+
+    gray = img.convert("L")
+    width, height = gray.size
+    scale = max(width, height) / max_side
+    if scale > 1:
+        size = (max(1, round(width / scale)), max(1, round(height / scale)))
+        gray = gray.resize(size, Image.Resampling.BOX)
+    return np.asarray(gray, dtype=np.float64)
+
+
+def _box_mean(values, window: int):
+    """窓内の平均（積分画像で計算する。出力は窓が収まる範囲だけ）"""
+    import numpy as np
+
+    integral = np.pad(values.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+    total = (
+        integral[window:, window:]
+        - integral[:-window, window:]
+        - integral[window:, :-window]
+        + integral[:-window, :-window]
+    )
+    return total / (window * window)
+
+
+def ssim(reference, distorted, window: int = SSIM_WINDOW) -> float:
+    """
+    2つの輝度画像の平均SSIM（一様な窓）
+
+    Args:
+        reference: 基準の輝度画像（luma）
+        distorted: 比較する輝度画像（同じ大きさ）
+        window: 窓の大きさ（画像より大きい場合は画像の短辺）
+
+    Returns:
+        float: 平均SSIM（同一なら1.0）
+
+    Raises:
+        ValueError: 画像の大きさが異なる場合
+    """
+    if reference.shape != distorted.shape:
+        raise ValueError(f"画像の大きさが異なります: {reference.shape} != {distorted.shape}")
+    window = max(1, min(window, *reference.shape))
+    mean_r = _box_mean(reference, window)
+    mean_d = _box_mean(distorted, window)
+    # 標本分散・共分散（窓内の画素数で不偏推定にする）
+    correction = window * window / max(window * window - 1, 1)
+    var_r = (_box_mean(reference * reference, window) - mean_r * mean_r) * correction
+    var_d = (_box_mean(distorted * distorted, window) - mean_d * mean_d) * correction
+    covariance = (
+        _box_mean(reference * distorted, window) - mean_r * mean_d
+    ) * correction
+
+    numerator = (2 * mean_r * mean_d + _C1) * (2 * covariance + _C2)
+    denominator = (mean_r * mean_r + mean_d * mean_d + _C1) * (var_r + var_d + _C2)
+    return float((numerator / denominator).mean())
+
+
+class QualityChoice:
+    """選んだ品質と、その品質でエンコードしたデータ"""
+
+    __slots__ = ("quality", "ssim", "data", "trials")
+
+    def __init__(self, quality: int, ssim: float, data: bytes, trials: int):
+        self.quality = quality
+        self.ssim = ssim
+        self.data = data
+        self.trials = trials
+
+
+def encode_jpeg(img, quality: int, optimize: bool = True, **options) -> bytes:
+    """画像をメモリ上でJPEGにエンコード"""
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality, optimize=optimize, **options)
+    return buffer.getvalue()
+
+
+def choose_quality(
+    img,
+    target_ssim: float = DEFAULT_TARGET_SSIM,
+    start: Optional[int] = None,
+    min_quality: int = MIN_QUALITY,
+    max_quality: int = MAX_QUALITY,
+    max_trials: int = MAX_TRIALS,
+    encode: Optional[Callable[[int, bool], bytes]] = None,
+) -> QualityChoice:
+    """
+    SSIMが目標値以上になる最小の品質を二分探索で選ぶ
+
+    品質に対してSSIMは単調に増えるとみなす。試行回数の上限に達した場合は、
+    それまでに目標を満たした最小の品質を使う。範囲内で目標を満たさない場合は
+    max_qualityを使う。
+
+    Args:
+        img: エンコードする画像（縮小・色変換済み）
+        target_ssim: SSIMの目標値
+        start: 最初に試す品質（固定品質の設定値など。省略時は範囲の中央）
+        min_quality: 探索する品質の下限
+        max_quality: 探索する品質の上限
+        max_trials: 試しエンコードの最大回数
+        encode: (品質, ハフマン表を最適化するか) からJPEGデータを作る関数
+            （省略時はencode_jpeg）
+
+    Returns:
+        QualityChoice: 選んだ品質・SSIM・最適化してエンコードしたデータ・試行回数
+    """
+    from PIL import Image
+
+    if encode is None:
+
+        def encode(quality: int, optimize: bool) -> bytes:
+            return encode_jpeg(img, quality, optimize)
+
+    reference = luma(img)
+    scores = {}
+
+    def measure(quality: int) -> float:
+        if quality not in scores:
+            with Image.open(io.BytesIO(encode(quality, False))) as decoded:
+                scores[quality] = ssim(reference, luma(decoded))
+        return scores[quality]
+
+    low, high = min_quality, max_quality
+    best = None
+    quality = start if start is not None and low <= start <= high else None
+    while low <= high and len(scores) < max_trials:
+        if quality is None:
+            quality = (low + high) // 2
+        score = measure(quality)
+        if score >= target_ssim:
+            best = (quality, score)
+            high = quality - 1
+        else:
+            low = quality + 1
+        quality = None
+
+    if best is None:
+        best = (max_quality, measure(max_quality))
+    return QualityChoice(best[0], best[1], encode(best[0], True), len(scores))
@@ -0,0 +1,226 @@
+"""
+選定リストの読み込み
+選定結果をファイル名のリスト（テキスト・CSV）やXMPサイドカーの評価・ラベルから読み込む
+
+選定フォルダーに縮小画像のコピーを残さなくても、choiceにファイル名だけを渡せるようにする。
+"""
+
+import csv
+import itertools
+import xml.etree.ElementTree as ET
+from pathlib import Path, PureWindowsPath
+from typing import Iterable, Iterator, List, Optional
+
+XMP_SUFFIX = ".xmp"
+
+# CSVのヘッダーとして扱う列名（小文字）
+_NAME_COLUMNS = ("filename", "file", "name", "path", "ファイル名")
+_RATING_COLUMNS = ("rating", "評価")
+_LABEL_COLUMNS = ("label", "ラベル")
+
+_XMP_NS = "http://ns.adobe.com/xap/1.0/"
+_RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+
+class SelectionEntry:
+    """選定リストの1件（評価・ラベルはない場合None）"""
+
+    __slots__ = ("name", "rating", "label")
+
+    def __init__(
+        self, name: str, rating: Optional[int] = None, label: Optional[str] = None
+    ):
+        self.name = name
+        self.rating = rating
+        self.label = label
+
+    def __repr__(self) -> str:
+        return (
+            f"SelectionEntry({self.name!r}, rating={self.rating}, label={self.label!r})"
+        )
+
+
+def _file_name(value: str) -> str:
+    """パス付きの値からファイル名だけを取り出す（Windowsのパスにも対応）"""
+    return PureWindowsPath(value.strip()).name
+
+
+def _parse_rating(value: Optional[str]) -> Optional[int]:
+    if value is None or not value.strip():
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def _read_text(path: Path) -> Iterator[SelectionEntry]:
+    """1行に1ファイル名のテキスト（空行と#で始まる行は無視）"""
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield SelectionEntry(_file_name(line))
+
+
+def _read_csv(path: Path) -> Iterator[SelectionEntry]:
+    """
+    CSV（ヘッダーにfilename/rating/label等の列があればそれを使い、なければ1列目）
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = csv.reader(f)
+        first = next(rows, None)
+        if first is None:
+            return
+
+        columns = [column.strip().lower() for column in first]
+
+        def find(names) -> Optional[int]:
+            for i, column in enumerate(columns):
+                if column in names:
+                    return i
+            return None
+
+        name_index = find(_NAME_COLUMNS)
+        if name_index is None:
+            # ヘッダーなし
+            name_index, rating_index, label_index = 0, None, None
+            rows = itertools.chain([first], rows)
+        else:
+            rating_index = find(_RATING_COLUMNS)
+            label_index = find(_LABEL_COLUMNS)
+
+        for row in rows:
+            if len(row) <= name_index or not row[name_index].strip():
+                continue
+
+            def cell(index) -> Optional[str]:
+                if index is None or index >= len(row):
+                    return None
+                return row[index].strip() or None
+
+            yield SelectionEntry(
+                _file_name(row[name_index]),
+                _parse_rating(cell(rating_index)),
+                cell(label_index),
+            )
+
+
+def read_xmp(path: Path) -> SelectionEntry:
+    """
+    XMPサイドカーから評価（xmp:Rating）とカラーラベル（xmp:Label）を読む
+
+    IMG_0001.xmp / IMG_0001.CR2.xmp のどちらの命名にも対応し、
+    名前は末尾の.xmpを除いたものにする（拡張子違いはchoiceの検索で吸収される）。
+
+    Args:
+        path: XMPファイルパス
+
+    Returns:
+        SelectionEntry: 選定リストの1件
+
+    Raises:
+        ValueError: XMLとして読めない場合
+    """
+    try:
+        root = ET.parse(path).getroot()
+    except ET.ParseError as e:
+        raise ValueError(f"XMPを読み込めません: {path}: {e}") from e
+
+    rating = label = None
+    for description in root.iter(f"{{{_RDF_NS}}}Description"):
+        # 属性形式（xmp:Rating="3"）と要素形式（<xmp:Rating>3</xmp:Rating>）がある
+        if rating is None:
+            rating = _parse_rating(description.get(f"{{{_XMP_NS}}}Rating"))
+        if label is None:
+            label = description.get(f"{{{_XMP_NS}}}Label")
+        if rating is None:
+            element = description.find(f"{{{_XMP_NS}}}Rating")
+            if element is not None:
+                rating = _parse_rating(element.text)
+        if label is None:
+            element = description.find(f"{{{_XMP_NS}}}Label")
+            if element is not None:
+                label = element.text
+    return SelectionEntry(path.name[: -len(XMP_SUFFIX)], rating, label or None)
+
+
+def _read_xmp_directory(directory: Path) -> Iterator[SelectionEntry]:
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() == XMP_SUFFIX and path.is_file():
+            yield read_xmp(path)
+
+
+def read_entries(path: Path) -> Iterator[SelectionEntry]:
+    """
+    選定リストを読み込む
+
+    形式はパスから判定する:
+    ディレクトリはXMPサイドカー、.xmpはXMP 1件、.csvはCSV、それ以外は1行1ファイル名のテキスト
+
+    Args:
+        path: 選定リストのパス
+
+    Yields:
+        SelectionEntry: 選定リストの1件
+    """
+    path = Path(path)
+    if path.is_dir():
+        yield from _read_xmp_directory(path)
+    elif path.suffix.lower() == XMP_SUFFIX:
+        yield read_xmp(path)
+    elif path.suffix.lower() == ".csv":
+        yield from _read_csv(path)
+    else:
+        yield from _read_text(path)
+
+
+def filter_entries(
+    entries: Iterable[SelectionEntry],
+    min_rating: Optional[int] = None,
+    labels: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """
+    評価・ラベルで絞り込み、重複を除いたファイル名を元の順で返す
+
+    Args:
+        entries: 選定リストの各件
+        min_rating: 指定時はこの評価以上のものだけ（評価がないものは除く）
+        labels: 指定時はいずれかのラベル（大文字小文字を区別しない）のものだけ
+
+    Returns:
+        List[str]: ファイル名
+    """
+    wanted = {label.lower() for label in labels} if labels else None
+    names = []
+    seen = set()
+    for entry in entries:
+        if min_rating is not None and (
+            entry.rating is None or entry.rating < min_rating
+        ):
+            continue
+        if wanted is not None and (entry.label or "").lower() not in wanted:
+            continue
+        if entry.name not in seen:
+            seen.add(entry.name)
+            names.append(entry.name)
+    return names
+
+
+def read_selection(
+    path: Path,
+    min_rating: Optional[int] = None,
+    labels: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """
+    選定リストを読み込み、絞り込んだファイル名を返す
+
+    Args:
+        path: 選定リスト（テキスト・CSV・XMPファイル、またはXMPサイドカーのディレクトリ）
+        min_rating: 指定時はこの評価以上のものだけ
+        labels: 指定時はいずれかのラベルのものだけ
+
+    Returns:
+        List[str]: ファイル名（重複なし、リストの順）
+    """
+    return filter_entries(read_entries(path), min_rating, labels)
@@ -0,0 +1,688 @@
+"""
+ストレージ
+元画像・保存先をローカルのディレクトリとS3互換のオブジェクトストレージで同じように扱う
+
+- 一覧（list）、範囲読み込み（read_range、open_readはシーク可能なストリーム）、
+  ストリーミング書き込み（open_write）、コピー（copy）を持つ
+- StorageObjectは入力ファイルのPathの代わりに使い（archive.ArchiveMemberと同様）、
+  ImageProcessor・FileMatcherにそのまま渡せる。ワーカープロセスにも渡せる
+- S3Storageはプロセスごとにクライアントを1つ作って使い回し（コネクションプール）、
+  大きなファイルはパートを並列にアップロードする。同じサービスのオブジェクトの
+  コピーはサーバー側で行う（choiceで元画像をダウンロードしない）
+- S3互換ストレージにはboto3が必要（extras: s3）。テストではboto3のクライアントと
+  同じメソッドを持つオブジェクトをclientに渡す
+"""
+
+import io
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+S3_SCHEME = "s3://"
+
+# S3互換ストレージのエンドポイント（省略時はAWS）を指定する環境変数
+ENDPOINT_ENV = "SENTEI_S3_ENDPOINT"
+
+# プロセスごとのクライアントが保持する接続数の上限
+DEFAULT_MAX_CONNECTIONS = 32
+
+# マルチパートアップロードのパートの大きさ（S3の下限は5MB）と並列数
+PART_SIZE = 8 * 1024 * 1024
+UPLOAD_WORKERS = 4
+
+# 1回のコピーで扱える大きさ（S3の上限）。超える場合はパートごとにサーバー側でコピーする
+MAX_COPY_OBJECT = 5 * 1024 * 1024 * 1024
+COPY_PART_SIZE = 512 * 1024 * 1024
+
+# 範囲読み込みの単位（シーク可能なストリームの先読み）
+RANGE_SIZE = 4 * 1024 * 1024
+
+# ローカルのファイルを読み書きする単位
+_CHUNK_SIZE = 1024 * 1024
+
+_IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".bmp"}
+_JPEG_SUFFIXES = {".jpg", ".jpeg"}
+
+# オブジェクトがないことを表すエラーコード
+_NOT_FOUND = {"404", "NoSuchKey", "NotFound"}
+
+
+def is_storage_url(location) -> bool:
+    """場所がオブジェクトストレージのURL（s3://bucket/prefix）かどうか"""
+    return isinstance(location, str) and location.startswith(S3_SCHEME)
+
+
+def open_location(location: str) -> Union[Path, "Storage"]:
+    """
+    コマンドライン引数の場所を開く（URLならストレージ、それ以外はPath）
+
+    Args:
+        location: s3://bucket/prefix またはローカルのパス
+
+    Returns:
+        Union[Path, Storage]: S3Storageまたはパス
+    """
+    if not is_storage_url(location):
+        return Path(location)
+    bucket, _, prefix = location[len(S3_SCHEME) :].partition("/")
+    if not bucket:
+        raise ValueError(f"バケット名がありません: {location}")
+    return S3Storage(bucket, prefix, endpoint_url=os.environ.get(ENDPOINT_ENV))
+
+
+class StorageObject:
+    """
+    ストレージ上のファイル（入力ファイルのPathの代わりに使う）
+
+    name・stem・suffix・stat()はPathと同じように使える。内容はopen()で読む。
+    """
+
+    __slots__ = ("storage", "key", "size", "mtime")
+
+    def __init__(self, storage: "Storage", key: str, size: int = 0, mtime: float = 0.0):
+        """
+        Args:
+            storage: ファイルがあるストレージ
+            key: ストレージ内のキー（/区切り）
+            size: ファイルサイズ
+            mtime: 更新日時
+        """
+        self.storage = storage
+        self.key = key
+        self.size = size
+        self.mtime = mtime
+
+    @property
+    def name(self) -> str:
+        """ファイル名（キーのディレクトリを除く）"""
+        return self.key.rsplit("/", 1)[-1]
+
+    @property
+    def stem(self) -> str:
+        return Path(self.name).stem
+
+    @property
+    def suffix(self) -> str:
+        return Path(self.name).suffix
+
+    def _key(self) -> Tuple[str, str]:
+        return self.storage.url(), self.key
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, StorageObject) and self._key() == other._key()
+
+    def __lt__(self, other: "StorageObject") -> bool:
+        return self._key() < other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __str__(self) -> str:
+        return self.storage.url(self.key)
+
+    def __repr__(self) -> str:
+        return f"StorageObject({str(self)!r})"
+
+    def is_file(self) -> bool:
+        return True
+
+    def exists(self) -> bool:
+        return self.storage.stat(self.key) is not None
+
+    def stat(self) -> os.stat_result:
+        """Path.statの代わり（サイズと更新日時だけが意味を持つ）"""
+        return os.stat_result((0o100644, 0, 0, 1, 0, 0, self.size) + (self.mtime,) * 3)
+
+    def open(self, mode: str = "rb") -> BinaryIO:
+        """
+        内容を読むシーク可能なストリームを開く（必要な範囲だけを読む）
+
+        Raises:
+            ValueError: 読み込み以外のモードを指定した場合
+        """
+        if mode != "rb":
+            raise ValueError("ストレージ上のファイルは読み込み（rb）でのみ開けます")
+        return self.storage.open_read(self.key, self.size)
+
+    def read_bytes(self) -> bytes:
+        """内容をすべて読む"""
+        with self.open() as f:
+            return f.read()
+
+    def extract(self, destination: Path) -> int:
+        """
+        内容をローカルのファイルに書き出し、更新日時を設定する
+
+        Returns:
+            int: 書き出したバイト数
+        """
+        with self.open() as src, open(destination, "wb") as dst:
+            shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+        if self.mtime:
+            os.utime(destination, (self.mtime, self.mtime))
+        return os.stat(destination).st_size
+
+
+class _RangeReader(io.RawIOBase):
+    """ストレージ上のファイルを範囲読み込みで読むストリーム"""
+
+    def __init__(self, storage: "Storage", key: str, size: int):
+        self._storage = storage
+        self._key = key
+        self._size = size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self._size + offset
+        else:
+            raise ValueError(f"不正なwhence: {whence}")
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self._size - self._position)
+        if length <= 0:
+            return 0
+        data = self._storage.read_range(self._key, self._position, length)
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class Storage:
+    """
+    ストレージの共通部分
+
+    サブクラスはlist・stat・read_range・open_write・urlを実装する。
+    copyは既定ではストリームで読み書きし、サブクラスは同じストレージ内のコピーを
+    速い方法（サーバー側のコピーなど）で置き換える。
+    """
+
+    def list(self) -> Iterator[StorageObject]:
+        """直下のファイルを返す"""
+        raise NotImplementedError
+
+    def stat(self, key: str) -> Optional[StorageObject]:
+        """キーのファイル（ない場合None）"""
+        raise NotImplementedError
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        """startからlengthバイトを読む（末尾を超える分は読まない）"""
+        raise NotImplementedError
+
+    def open_write(self, key: str) -> "StorageWriter":
+        """書き込み用のストリームを開く（closeで確定、例外で抜けると破棄する）"""
+        raise NotImplementedError
+
+    def url(self, key: str = "") -> str:
+        """表示用のURL（パス）"""
+        raise NotImplementedError
+
+    @property
+    def name(self) -> str:
+        """場所の名前（ディレクトリ名・プレフィックスの最後の部分）"""
+        return self.url().rstrip("/").rsplit("/", 1)[-1]
+
+    def __str__(self) -> str:
+        return self.url()
+
+    def __truediv__(self, name: str) -> StorageObject:
+        """直下のファイル（存在しなくてもよい。Pathの / と同じように使う）"""
+        return StorageObject(self, name)
+
+    def open_read(self, key: str, size: Optional[int] = None) -> BinaryIO:
+        """
+        内容を読むシーク可能なストリームを開く（RANGE_SIZEずつ範囲読み込みする）
+
+        Raises:
+            FileNotFoundError: ファイルがない場合
+        """
+        if size is None:
+            found = self.stat(key)
+            if found is None:
+                raise FileNotFoundError(self.url(key))
+            size = found.size
+        return io.BufferedReader(_RangeReader(self, key, size), RANGE_SIZE)
+
+    def write_bytes(self, key: str, data: bytes) -> int:
+        """データを書き込む"""
+        with self.open_write(key) as f:
+            f.write(data)
+        return len(data)
+
+    def copy(self, source: StorageObject, key: str) -> int:
+        """
+        ストレージ上のファイルをkeyにコピーする
+
+        Returns:
+            int: コピーしたバイト数
+        """
+        with source.open() as src, self.open_write(key) as dst:
+            shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+        return source.size
+
+    def put(self, source, key: str) -> int:
+        """
+        ファイル（Path・アーカイブ内のファイル・ストレージ上のファイル）をkeyに書き込む
+
+        ストレージ上のファイルはcopy（同じストレージならサーバー側のコピー）で書き込む。
+
+        Returns:
+            int: 書き込んだバイト数
+        """
+        if isinstance(source, StorageObject):
+            return self.copy(source, key)
+        with source.open("rb") as src, self.open_write(key) as dst:
+            shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+            return dst.tell()
+
+    def image_files(self) -> List[StorageObject]:
+        """直下の画像ファイル"""
+        return [o for o in self.list() if o.suffix.lower() in _IMAGE_SUFFIXES]
+
+    def jpeg_files(self) -> List[StorageObject]:
+        """直下のJPEGファイル"""
+        return [o for o in self.list() if o.suffix.lower() in _JPEG_SUFFIXES]
+
+
+class StorageWriter(io.RawIOBase):
+    """
+    ストレージへの書き込み（withで使う）
+
+    close()で確定し、例外でwithを抜けた場合はabort()で書きかけの内容を破棄する。
+    """
+
+    def __init__(self):
+        self._written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._written
+
+    def abort(self):
+        """書きかけの内容を破棄する"""
+        raise NotImplementedError
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is not None:
+            self.abort()
+            return False
+        self.close()
+        return False
+
+
+class LocalStorage(Storage):
+    """ローカルのディレクトリ（キーはrootからの相対パス）"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        """キーのローカルのパス"""
+        return self.root / key
+
+    def url(self, key: str = "") -> str:
+        return str(self.path(key)) if key else str(self.root)
+
+    def list(self) -> Iterator[StorageObject]:
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    yield StorageObject(self, entry.name, stat.st_size, stat.st_mtime)
+
+    def stat(self, key: str) -> Optional[StorageObject]:
+        try:
+            stat = self.path(key).stat()
+        except FileNotFoundError:
+            return None
+        return StorageObject(self, key, stat.st_size, stat.st_mtime)
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            return f.read(length)
+
+    def open_read(self, key: str, size: Optional[int] = None) -> BinaryIO:
+        # ローカルのファイルは範囲読み込みにせずにそのまま開く
+        return open(self.path(key), "rb")
+
+    def open_write(self, key: str) -> StorageWriter:
+        return _LocalWriter(self.path(key))
+
+    def copy(self, source: StorageObject, key: str) -> int:
+        if isinstance(source.storage, LocalStorage):
+            target = self.path(key)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source.storage.path(source.key), target)
+            return target.stat().st_size
+        return super().copy(source, key)
+
+
+class _LocalWriter(StorageWriter):
+    """一時ファイルに書き、確定時に置き換える"""
+
+    def __init__(self, path: Path):
+        super().__init__()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        self._partial = path.with_name(f".{path.name}.part")
+        self._file = open(self._partial, "wb")
+
+    def write(self, data) -> int:
+        written = self._file.write(data)
+        self._written += written
+        return written
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            os.replace(self._partial, self._path)
+        super().close()
+
+    def abort(self):
+        if not self.closed:
+            self._file.close()
+            self._partial.unlink(missing_ok=True)
+        super().close()
+
+
+# プロセスごとのS3クライアント（エンドポイント・接続数 → クライアント）
+_clients: Dict[Tuple[Optional[str], int], object] = {}
+_client_lock = threading.Lock()
+
+
+def get_shared_client(endpoint_url: Optional[str] = None, max_connections: int = 32):
+    """
+    プロセスで共有するS3クライアントを取得（接続をプールして使い回す）
+
+    boto3のクライアントはスレッドから同時に使える。ワーカープロセスでは最初の
+    使用時に作成する。
+
+    Raises:
+        ImportError: boto3がインストールされていない場合
+    """
+    key = (endpoint_url, max_connections)
+    with _client_lock:
+        client = _clients.get(key)
+        if client is None:
+            try:
+                import boto3
+                from botocore.config import Config
+            except ImportError:
+                raise ImportError(
+                    "S3互換ストレージを使うにはboto3をインストールしてください"
+                    '（pip install "sentei-pictures[s3]"）'
+                ) from None
+            client = _clients[key] = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url,
+                config=Config(
+                    max_pool_connections=max_connections,
+                    retries={"mode": "adaptive"},
+                ),
+            )
+        return client
+
+
+def _is_not_found(error: Exception) -> bool:
+    """S3のエラーがオブジェクト・バケットがないことを表すかどうか"""
+    response = getattr(error, "response", None) or {}
+    return str(response.get("Error", {}).get("Code")) in _NOT_FOUND
+
+
+class S3Storage(Storage):
+    """
+    S3互換のオブジェクトストレージのバケット内のプレフィックス
+
+    ワーカープロセスに渡すとバケット・プレフィックス・エンドポイントだけを渡し、
+    各プロセスでget_shared_clientのクライアントを使う。
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client=None,
+        endpoint_url: Optional[str] = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        part_size: int = PART_SIZE,
+        upload_workers: int = UPLOAD_WORKERS,
+    ):
+        """
+        Args:
+            bucket: バケット名
+            prefix: キーのプレフィックス（ディレクトリに当たる部分）
+            client: boto3のS3クライアントと同じメソッドを持つオブジェクト
+                （省略時はget_shared_client。指定した場合はワーカープロセスに渡せない）
+            endpoint_url: S3互換ストレージのエンドポイント（省略時はAWS）
+            max_connections: クライアントが保持する接続数の上限
+            part_size: マルチパートアップロードのパートの大きさ（バイト）
+            upload_workers: パートを並列にアップロードする数
+        """
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.endpoint_url = endpoint_url
+        self.max_connections = max_connections
+        self.part_size = part_size
+        self.upload_workers = upload_workers
+        self._client = client
+
+    def __getstate__(self):
+        if self._client is not None:
+            raise TypeError("clientを指定したS3Storageはワーカープロセスに渡せません")
+        return self.__dict__.copy()
+
+    @property
+    def client(self):
+        """S3クライアント"""
+        if self._client is not None:
+            return self._client
+        return get_shared_client(self.endpoint_url, self.max_connections)
+
+    def _full_key(self, key: str) -> str:
+        return self.prefix + key
+
+    def url(self, key: str = "") -> str:
+        return f"{S3_SCHEME}{self.bucket}/{self._full_key(key)}"
+
+    def list(self) -> Iterator[StorageObject]:
+        arguments = {"Bucket": self.bucket, "Prefix": self.prefix, "Delimiter": "/"}
+        while True:
+            response = self.client.list_objects_v2(**arguments)
+            for item in response.get("Contents", ()):
+                key = item["Key"][len(self.prefix) :]
+                if key:
+                    yield StorageObject(
+                        self, key, item["Size"], item["LastModified"].timestamp()
+                    )
+            if not response.get("IsTruncated"):
+                return
+            arguments["ContinuationToken"] = response["NextContinuationToken"]
+
+    def stat(self, key: str) -> Optional[StorageObject]:
+        try:
+            response = self.client.head_object(
+                Bucket=self.bucket, Key=self._full_key(key)
+            )
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+        return StorageObject(
+            self, key, response["ContentLength"], response["LastModified"].timestamp()
+        )
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        response = self.client.get_object(
+            Bucket=self.bucket,
+            Key=self._full_key(key),
+            Range=f"bytes={start}-{start + length - 1}",
+        )
+        with response["Body"] as body:
+            return body.read()
+
+    def open_write(self, key: str) -> StorageWriter:
+        return _MultipartWriter(self, self._full_key(key))
+
+    def copy(self, source: StorageObject, key: str) -> int:
+        """同じサービス（同じクライアント）のオブジェクトはサーバー側でコピーする"""
+        other = source.storage
+        if not isinstance(other, S3Storage) or other.client is not self.client:
+            return super().copy(source, key)
+        copy_source = {"Bucket": other.bucket, "Key": other._full_key(source.key)}
+        size = source.size or other.stat(source.key).size
+        if size <= MAX_COPY_OBJECT:
+            self.client.copy_object(
+                Bucket=self.bucket, Key=self._full_key(key), CopySource=copy_source
+            )
+        else:
+            self._copy_parts(copy_source, self._full_key(key), size)
+        return size
+
+    def _copy_parts(self, copy_source: dict, full_key: str, size: int):
+        """5GBを超えるオブジェクトをパートごとに並列にサーバー側でコピーする"""
+        upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=full_key
+        )["UploadId"]
+
+        def copy_part(number: int, start: int) -> dict:
+            end = min(start + COPY_PART_SIZE, size) - 1
+            response = self.client.upload_part_copy(
+                Bucket=self.bucket,
+                Key=full_key,
+                UploadId=upload_id,
+                PartNumber=number,
+                CopySource=copy_source,
+                CopySourceRange=f"bytes={start}-{end}",
+            )
+            return {"PartNumber": number, "ETag": response["CopyPartResult"]["ETag"]}
+
+        try:
+            with ThreadPoolExecutor(self.upload_workers) as executor:
+                parts = list(
+                    executor.map(
+                        copy_part,
+                        range(1, (size + COPY_PART_SIZE - 1) // COPY_PART_SIZE + 1),
+                        range(0, size, COPY_PART_SIZE),
+                    )
+                )
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=full_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=full_key, UploadId=upload_id
+            )
+            raise
+
+
+class _MultipartWriter(StorageWriter):
+    """
+    S3へのストリーミング書き込み
+
+    part_size未満ならput_objectで1回で書き込む。超えたらマルチパートアップロードを始め、
+    埋まったパートをupload_workers個まで並列にアップロードする（メモリ上に持つパートは
+    アップロード中のものと書き込み中のものだけ）。
+    """
+
+    def __init__(self, storage: S3Storage, full_key: str):
+        super().__init__()
+        self._storage = storage
+        self._client = storage.client
+        self._key = full_key
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures = []
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._written += len(data)
+        while len(self._buffer) >= self._storage.part_size:
+            part = bytes(self._buffer[: self._storage.part_size])
+            del self._buffer[: self._storage.part_size]
+            self._upload(part)
+        return len(data)
+
+    def _upload(self, part: bytes):
+        """パートを並列のアップロードに投入する（並列数を超える場合は1つ終わるまで待つ）"""
+        storage = self._storage
+        if self._upload_id is None:
+            self._upload_id = self._client.create_multipart_upload(
+                Bucket=storage.bucket, Key=self._key
+            )["UploadId"]
+            self._executor = ThreadPoolExecutor(storage.upload_workers)
+        running = [future for future in self._futures if not future.done()]
+        if len(running) >= storage.upload_workers:
+            running[0].result()
+        number = len(self._futures) + 1
+        self._futures.append(self._executor.submit(self._upload_part, number, part))
+
+    def _upload_part(self, number: int, part: bytes) -> dict:
+        response = self._client.upload_part(
+            Bucket=self._storage.bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            PartNumber=number,
+            Body=part,
+        )
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    def close(self):
+        if self.closed:
+            return
+        bucket = self._storage.bucket
+        try:
+            if self._upload_id is None:
+                self._client.put_object(
+                    Bucket=bucket, Key=self._key, Body=bytes(self._buffer)
+                )
+            else:
+                if self._buffer:
+                    self._upload(bytes(self._buffer))
+                parts = [future.result() for future in self._futures]
+                self._client.complete_multipart_upload(
+                    Bucket=bucket,
+                    Key=self._key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+                self._executor.shutdown()
+        except BaseException:
+            self.abort()
+            raise
+        self._buffer = bytearray()
+        super().close()
+
+    def abort(self):
+        if self.closed:
+            return
+        if self._upload_id is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._client.abort_multipart_upload(
+                Bucket=self._storage.bucket, Key=self._key, UploadId=self._upload_id
+            )
+        self._buffer = bytearray()
+        super().close()
@@ -0,0 +1,157 @@
+"""
+choiceの差分同期
+保存先に同じファイルがあればコピーを省略し、選定から外れたファイルを削除・退避する
+
+選定を何度も修正する場合に、変更のあったファイルだけをコピーするために使う。
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from .file_matcher import FileMatcher
+
+# 同期での各ファイルの扱い
+SYNC_ADDED = "added"
+SYNC_UPDATED = "updated"
+SYNC_UNCHANGED = "unchanged"
+
+# 選定から外れたファイルの扱い
+PRUNE_DELETE = "delete"
+PRUNE_QUARANTINE = "quarantine"
+PRUNE_MODES = (PRUNE_DELETE, PRUNE_QUARANTINE)
+
+# 退避先（保存先の中の隠しフォルダー）
+QUARANTINE_DIR = ".deselected"
+
+# 更新日時の比較で許容する差（秒）。FAT/exFATの更新日時は2秒単位のため
+DEFAULT_MTIME_WINDOW = 2.0
+
+
+class SyncPolicy:
+    """保存先のファイルが元画像と同一かどうかの判定方法"""
+
+    __slots__ = ("checksum", "mtime_window")
+
+    def __init__(
+        self,
+        checksum: Optional[str] = None,
+        mtime_window: float = DEFAULT_MTIME_WINDOW,
+    ):
+        """
+        Args:
+            checksum: 指定時（"sha256" / "blake2b"）はサイズと更新日時が一致した場合に
+                両方のファイルのハッシュも比較する
+            mtime_window: 更新日時の比較で許容する差（秒）
+
+        Raises:
+            ValueError: 対応していないチェックサムの場合
+        """
+        if checksum is not None:
+            from .checksum import new_hash
+
+            new_hash(checksum)
+        self.checksum = checksum
+        self.mtime_window = mtime_window
+
+    def is_unchanged(self, source: Path, destination: Path) -> bool:
+        """
+        保存先のファイルが元画像と同一かどうか（サイズ・更新日時、指定時はハッシュ）
+
+        Args:
+            source: 元画像
+            destination: 保存先のファイル
+
+        Returns:
+            bool: 同一ならTrue（保存先がない場合はFalse）
+        """
+        try:
+            source_stat = os.stat(source)
+            destination_stat = os.stat(destination)
+        except FileNotFoundError:
+            return False
+        if source_stat.st_size != destination_stat.st_size:
+            return False
+        if abs(source_stat.st_mtime - destination_stat.st_mtime) > self.mtime_window:
+            return False
+        if self.checksum is None:
+            return True
+
+        from .checksum import file_checksum
+
+        return file_checksum(source, self.checksum) == file_checksum(
+            destination, self.checksum
+        )
+
+    def action(self, source: Path, destination: Path) -> str:
+        """
+        元画像と保存先のファイルを比較して同期での扱いを決める
+
+        Returns:
+            str: "added"（保存先なし）/ "updated"（異なる）/ "unchanged"（同一）
+        """
+        if not os.path.exists(destination):
+            return SYNC_ADDED
+        if self.is_unchanged(source, destination):
+            return SYNC_UNCHANGED
+        return SYNC_UPDATED
+
+
+def find_deselected(
+    output_dir: Path, keep: Iterable[str], protect_stems: Iterable[str] = ()
+) -> List[Path]:
+    """
+    保存先の画像ファイルのうち、選定から外れたものを名前順で取得
+
+    Args:
+        output_dir: 保存先
+        keep: 今回の選定に対応する保存先のファイル名
+        protect_stems: 対象から外すファイル名の拡張子を除いた部分（大文字小文字を区別しない）。
+            元画像が見つからなかった選定のファイルを誤って消さないために使う
+
+    Returns:
+        List[Path]: 選定から外れたファイル
+    """
+    keep = set(keep)
+    protected = {stem.lower() for stem in protect_stems}
+    return [
+        path
+        for path in sorted(FileMatcher.get_image_files(output_dir))
+        if path.name not in keep and path.stem.lower() not in protected
+    ]
+
+
+def prune_outputs(paths: Iterable[Path], mode: str) -> List[Path]:
+    """
+    選定から外れたファイルを削除または退避する
+
+    退避する場合は保存先の .deselected/<日時>/ に移動する。
+
+    Args:
+        paths: find_deselectedで取得したファイル
+        mode: "delete" または "quarantine"
+
+    Returns:
+        List[Path]: 削除・退避したファイル（元のパス）
+
+    Raises:
+        ValueError: modeが不明な場合
+    """
+    if mode not in PRUNE_MODES:
+        raise ValueError(f"不明な削除方法です: {mode}")
+
+    paths = list(paths)
+    quarantine = None
+    pruned = []
+    for path in paths:
+        if mode == PRUNE_DELETE:
+            path.unlink()
+        else:
+            if quarantine is None:
+                stamp = time.strftime("%Y%m%d-%H%M%S")
+                quarantine = path.parent / QUARANTINE_DIR / stamp
+                quarantine.mkdir(parents=True, exist_ok=True)
+            os.replace(path, quarantine / path.name)
+        pruned.append(path)
+    return pruned
@@ -0,0 +1,260 @@
+"""
+バックグラウンド処理（低優先度・帯域制限）
+作業中のワークステーションや業務時間中の共有NASで、他の作業を妨げずに処理する
+
+- 優先度: プロセスのnice値を上げ、I/O優先度を下げる（Linuxはbest-effortの最低、
+  Windowsはバックグラウンドモード）。ネットワーク越しの読み書きには効かないため、
+  帯域は次のトークンバケットで制限する
+- 帯域制限: 読み込み・書き込みしたバイト数をトークンバケットで数え、
+  超過分を返すまで次のファイルの投入を待つ（平均の帯域がio_limit以下になる）。
+  入力ファイルのサイズは投入時に先に差し引き、並列処理中のファイルも上限に含める
+- 高負荷時の一時停止: CPUあたりのロードアベレージがpause_loadを超えている間は
+  次のファイルを投入しない（ロードアベレージがないWindowsでは使えない）
+"""
+
+import ctypes
+import os
+import platform
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+# --background で帯域を指定しない場合の上限（MB/s）
+DEFAULT_IO_LIMIT_MB = 20.0
+
+# トークンバケットの容量（上限の何秒分まで続けて読み書きできるか）
+BURST_SECONDS = 2.0
+
+# 待機中にキャンセル・ロードアベレージを確認する間隔（秒）
+POLL_SECONDS = 0.5
+
+# バックグラウンドで加えるnice値
+NICE_INCREMENT = 10
+
+# ioprio_setのシステムコール番号（Linux）
+_IOPRIO_SET = {
+    "x86_64": 251,
+    "amd64": 251,
+    "i386": 289,
+    "i686": 289,
+    "aarch64": 30,
+    "arm64": 30,
+    "armv7l": 314,
+    "ppc64le": 273,
+}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_BE = 2
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_LOWEST_LEVEL = 7
+
+# SetPriorityClassのバックグラウンドモード（Windows。CPU・I/O・メモリの優先度を下げる）
+_PROCESS_MODE_BACKGROUND_BEGIN = 0x00100000
+
+
+def _set_io_priority() -> bool:
+    """I/O優先度をbest-effortの最低にする（Linux以外・失敗時はFalse）"""
+    number = _IOPRIO_SET.get(platform.machine().lower())
+    if not sys.platform.startswith("linux") or number is None:
+        return False
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        value = (_IOPRIO_CLASS_BE << _IOPRIO_CLASS_SHIFT) | _IOPRIO_LOWEST_LEVEL
+        return libc.syscall(number, _IOPRIO_WHO_PROCESS, 0, value) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def lower_priority() -> bool:
+    """
+    現在のプロセスのCPU・I/O優先度を下げる（元には戻せない）
+
+    ワーカープロセスでは起動時に呼ぶ（WorkerPoolのbackground）。
+
+    Returns:
+        bool: 優先度を下げられた場合True
+    """
+    if sys.platform == "win32":
+        try:
+            kernel32 = ctypes.windll.kernel32
+            return bool(
+                kernel32.SetPriorityClass(
+                    kernel32.GetCurrentProcess(), _PROCESS_MODE_BACKGROUND_BEGIN
+                )
+            )
+        except (OSError, AttributeError):
+            return False
+
+    lowered = False
+    try:
+        os.nice(NICE_INCREMENT)
+        lowered = True
+    except OSError:
+        pass
+    return _set_io_priority() or lowered
+
+
+def load_per_cpu() -> Optional[float]:
+    """
+    CPUあたりの1分間のロードアベレージ
+
+    Returns:
+        Optional[float]: 取得できない場合（Windows）はNone
+    """
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+    return load / (os.cpu_count() or 1)
+
+
+class TokenBucket:
+    """トークンバケット（1秒あたりrateずつ、burstまで貯まる）"""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            rate: 1秒あたりに補充する量（バイト）
+            burst: 貯められる量の上限（省略時はBURST_SECONDS秒分）
+            clock: 現在時刻（秒）を返す関数
+        """
+        if rate <= 0:
+            raise ValueError(f"帯域の上限は0より大きい値を指定してください: {rate}")
+        self.rate = rate
+        self.burst = burst if burst is not None else rate * BURST_SECONDS
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """経過時間分のトークンを補充（ロック取得済みで呼ぶ）"""
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def consume(self, amount: float):
+        """
+        トークンを消費（足りなければ不足分を借りる。返すまでdelayが正になる）
+
+        Args:
+            amount: 消費する量（バイト）
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+    def delay(self) -> float:
+        """不足分を返し終えるまでの秒数（不足していなければ0）"""
+        with self._lock:
+            self._refill()
+            return max(0.0, -self._tokens / self.rate)
+
+
+class Throttle:
+    """
+    ファイルの投入を帯域・ロードアベレージで制限し、実効スループットを集計する
+
+    wait()で次のファイルの投入を待ち、reserve()で読み込むバイト数を先に差し引き、
+    処理後にaccount()で読み書きしたバイト数を記録する（先に差し引いた分は精算する）。
+    """
+
+    def __init__(
+        self,
+        io_limit: Optional[float] = None,
+        pause_load: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        load: Callable[[], Optional[float]] = load_per_cpu,
+    ):
+        """
+        Args:
+            io_limit: 読み書きの帯域の上限（バイト/秒、Noneで制限しない）
+            pause_load: CPUあたりのロードアベレージがこれを超えたら一時停止
+                （Noneで一時停止しない）
+            clock: 現在時刻（秒）を返す関数
+            sleep: 待機する関数
+            load: CPUあたりのロードアベレージを返す関数
+        """
+        self.io_limit = io_limit
+        self.pause_load = pause_load
+        self._bucket = TokenBucket(io_limit, clock=clock) if io_limit else None
+        self._clock = clock
+        self._sleep = sleep
+        self._load = load
+        self._started: Optional[float] = None
+        self.bytes = 0
+        self.throttled = 0.0
+        self.paused = 0.0
+
+    def _start(self):
+        if self._started is None:
+            self._started = self._clock()
+
+    def wait(self, cancel=None):
+        """
+        次のファイルを投入してよくなるまで待つ
+
+        Args:
+            cancel: キャンセルトークン（cancelledがTrueになったら待機をやめる）
+        """
+        self._start()
+        while self.pause_load is not None and not (cancel and cancel.cancelled):
+            load = self._load()
+            if load is None or load <= self.pause_load:
+                break
+            self._sleep(POLL_SECONDS)
+            self.paused += POLL_SECONDS
+        while self._bucket is not None and not (cancel and cancel.cancelled):
+            delay = self._bucket.delay()
+            if delay <= 0:
+                break
+            delay = min(delay, POLL_SECONDS)
+            self._sleep(delay)
+            self.throttled += delay
+
+    def reserve(self, nbytes: int):
+        """投入するファイルの読み込みバイト数を帯域から先に差し引く"""
+        self._start()
+        if self._bucket is not None:
+            self._bucket.consume(nbytes)
+
+    def account(self, nbytes: int, reserved: int = 0):
+        """
+        読み込み・書き込みしたバイト数を記録
+
+        Args:
+            nbytes: 読み込み・書き込みしたバイト数
+            reserved: reserve()で先に差し引いたバイト数（差分だけを差し引く）
+        """
+        self._start()
+        self.bytes += nbytes
+        if self._bucket is not None:
+            self._bucket.consume(nbytes - reserved)
+
+    @property
+    def elapsed(self) -> float:
+        """最初のwait/accountからの経過秒数"""
+        return 0.0 if self._started is None else self._clock() - self._started
+
+    @property
+    def throughput(self) -> float:
+        """実効スループット（バイト/秒）"""
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def summary_line(self) -> str:
+        """実効スループットと待機時間の表示"""
+        limit = (
+            f"上限 {self.io_limit / (1024 * 1024):.1f}MB/s" if self.io_limit else "帯域制限なし"
+        )
+        return (
+            f"実効スループット: {self.throughput / (1024 * 1024):.1f}MB/s（{limit}、"
+            f"読み書き {self.bytes / (1024 * 1024):.1f}MB、"
+            f"帯域制限で待機 {self.throttled:.1f}秒、高負荷で一時停止 {self.paused:.1f}秒）"
+        )
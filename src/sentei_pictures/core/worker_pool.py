@@ -0,0 +1,158 @@
+"""
+ワーカープール
+セッション中に使い回すプロセスプールを管理する
+
+プロセスは最初の投入時に起動し、ワーカーでは起動時にPillowを読み込んでおく。
+一定時間使われなければプロセスを終了し、次の投入時に再起動する。
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+# アイドル状態でプロセスを終了するまでの秒数
+DEFAULT_IDLE_TIMEOUT = 300.0
+
+
+def default_workers() -> int:
+    """デフォルトのワーカー数（CPUコア数）"""
+    return os.cpu_count() or 1
+
+
+def _init_worker(background: bool = False):
+    """ワーカープロセスの初期化（Pillowとプラグインを事前に読み込む）"""
+    from PIL import Image
+
+    Image.init()
+    if background:
+        from .throttle import lower_priority
+
+        lower_priority()
+
+
+class WorkerPool:
+    """遅延起動・アイドルタイムアウト付きのプロセスプール"""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        background: bool = False,
+    ):
+        """
+        Args:
+            max_workers: ワーカープロセス数（省略時はCPUコア数）
+            idle_timeout: アイドル状態でプロセスを終了するまでの秒数
+            background: ワーカープロセスのCPU・I/O優先度を下げる
+        """
+        self.max_workers = max_workers or default_workers()
+        self.idle_timeout = idle_timeout
+        self.background = background
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._last_used = time.monotonic()
+        self._idle_timer: Optional[threading.Timer] = None
+
+    @property
+    def started(self) -> bool:
+        """ワーカープロセスが起動済みかどうか"""
+        return self._executor is not None
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        タスクを投入（必要ならプロセスを起動する）
+
+        Args:
+            fn: ワーカーで実行する関数（pickle可能なトップレベル関数）
+
+        Returns:
+            Future: 実行結果
+        """
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.background,),
+                )
+            self._active += 1
+            future = self._executor.submit(fn, *args, **kwargs)
+
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, future: Future):
+        """タスク完了時にアイドルタイマーを設定"""
+        with self._lock:
+            self._active -= 1
+            self._last_used = time.monotonic()
+            if self._active == 0 and self._executor is not None:
+                self._schedule_idle_shutdown()
+
+    def _schedule_idle_shutdown(self):
+        """アイドルタイマーを設定（ロック取得済みで呼ぶ）"""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        self._idle_timer = threading.Timer(self.idle_timeout, self._shutdown_if_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _shutdown_if_idle(self):
+        """アイドルタイムアウトを過ぎていればプロセスを終了"""
+        with self._lock:
+            idle_for = time.monotonic() - self._last_used
+            if self._active or self._executor is None or idle_for < self.idle_timeout:
+                return
+            executor, self._executor = self._executor, None
+            self._idle_timer = None
+        executor.shutdown(wait=False)
+
+    def shutdown(self, wait: bool = True):
+        """プロセスを終了（再度submitすると再起動する）"""
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_shared_pools: Dict[bool, WorkerPool] = {}
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool(background: bool = False) -> WorkerPool:
+    """
+    セッション共有のワーカープールを取得
+
+    対話型メニューやGUIの複数回の実行で同じプールを使い回す。
+    プロセスは最初のタスク投入時に起動する。
+
+    Args:
+        background: 優先度を下げたワーカーのプールを取得する
+            （優先度は元に戻せないため、通常のプールとは別に持つ）
+
+    Returns:
+        WorkerPool: 共有プール
+    """
+    with _shared_pool_lock:
+        if background not in _shared_pools:
+            _shared_pools[background] = WorkerPool(background=background)
+        return _shared_pools[background]
+
+
+def shutdown_shared_pools(wait: bool = True):
+    """起動済みの共有ワーカープールをすべて終了"""
+    with _shared_pool_lock:
+        pools = list(_shared_pools.values())
+    for pool in pools:
+        pool.shutdown(wait=wait)
@@ -3,13 +3,13 @@
 選択した画像の元ファイルをコピーする
 """
 
-import shutil
 import threading
 import tkinter as tk
 from pathlib import Path
 from tkinter import messagebox, ttk
 
-from ..core.file_matcher import FileMatcher
+from ..core.listing import LIST_IMAGES, DirectoryScanner, get_shared_listing
+from .runners import log_not_found, run_choice
 from .widgets import DirectorySelector, ProgressWindow
 
 
@@ -114,6 +114,9 @@ class ChoiceWindow:
 
         # プレビュー更新タイマー
         self._preview_timer = None
+        # プレビューのディレクトリ走査（UIを止めないようバックグラウンドで行う）
+        self._scanner = DirectoryScanner()
+        self.window.bind("<Destroy>", self._on_destroy)
 
     def _schedule_preview_update(self, event=None):
         """プレビュー更新をスケジュール（キー入力の度に呼ばれるのを防ぐ）"""
@@ -122,31 +125,55 @@ class ChoiceWindow:
         self._preview_timer = self.window.after(500, self._update_preview)
 
     def _update_preview(self, event=None):
-        """プレビューを更新"""
-        selected_path = self.selected_selector.get_path()
-        if selected_path and selected_path.exists():
-            try:
-                selected_files = FileMatcher.get_image_files(selected_path)
-                count = len(selected_files)
-                if count > 0:
-                    self.preview_label.config(
-                        text=f"処理対象: {count}個の選定画像", foreground="blue"
-                    )
-                    self.execute_button.config(state="normal")
-                else:
-                    self.preview_label.config(
-                        text="画像ファイルが見つかりません", foreground="orange"
-                    )
-                    self.execute_button.config(state="disabled")
-            except Exception:
-                self.preview_label.config(text="ディレクトリの読み取りに失敗しました", foreground="red")
-                self.execute_button.config(state="disabled")
-        else:
+        """プレビューの更新を開始（走査はバックグラウンドで行う）"""
+        selected_path = self.selected_selector.get_entered_path()
+        if selected_path is None:
+            self._scanner.cancel()
+            self._show_no_directory()
+            return
+
+        self.preview_label.config(text="ファイルを確認中...", foreground="gray")
+        self.execute_button.config(state="disabled")
+        self._scanner.request(selected_path, self._on_scanned, LIST_IMAGES)
+
+    def _on_scanned(self, token: int, selected_files, error):
+        """走査結果をメインスレッドに渡す（ワーカースレッドから呼ばれる）"""
+        try:
+            self.window.after(0, self._show_preview, token, selected_files, error)
+        except (tk.TclError, RuntimeError):
+            # ウィンドウが閉じられた後
+            pass
+
+    def _show_preview(self, token: int, selected_files, error):
+        """走査結果をプレビューに表示（入力が変わっていれば何もしない）"""
+        if not self._scanner.is_current(token):
+            return
+        if isinstance(error, (FileNotFoundError, NotADirectoryError)):
+            self._show_no_directory()
+        elif error is not None:
+            self.preview_label.config(text="ディレクトリの読み取りに失敗しました", foreground="red")
+            self.execute_button.config(state="disabled")
+        elif selected_files:
             self.preview_label.config(
-                text="選定ディレクトリを選択すると、処理対象ファイル数が表示されます", foreground="gray"
+                text=f"処理対象: {len(selected_files)}個の選定画像", foreground="blue"
             )
+            self.execute_button.config(state="normal")
+        else:
+            self.preview_label.config(text="画像ファイルが見つかりません", foreground="orange")
             self.execute_button.config(state="disabled")
 
+    def _show_no_directory(self):
+        """ディレクトリ未選択の表示"""
+        self.preview_label.config(
+            text="選定ディレクトリを選択すると、処理対象ファイル数が表示されます", foreground="gray"
+        )
+        self.execute_button.config(state="disabled")
+
+    def _on_destroy(self, event):
+        """ウィンドウを閉じたら走査を取り消す"""
+        if event.widget is self.window:
+            self._scanner.cancel()
+
     def _execute_choice(self):
         """選定画像コピー処理を実行"""
         # 入力値の検証
@@ -188,7 +215,7 @@ class ChoiceWindow:
         try:
             # 選定されたファイルを取得
             progress_window.add_log("選定されたファイルを検索中...")
-            selected_files = FileMatcher.get_image_files(selected_dir)
+            selected_files = get_shared_listing().image_files(selected_dir)
 
             if not selected_files:
                 progress_window.add_log("選定されたファイルが見つかりませんでした")
@@ -197,65 +224,23 @@ class ChoiceWindow:
 
             progress_window.add_log(f"{len(selected_files)}個の選定されたファイルを処理します")
 
-            success_count = 0
-            not_found_files = []
-
-            for i, selected_file in enumerate(selected_files, 1):
-                if progress_window.is_cancelled:
-                    progress_window.add_log("処理がキャンセルされました")
-                    progress_window.finish(False)
-                    return
-
-                progress_window.update_progress(
-                    i - 1, len(selected_files), f"{selected_file.name} に対応する元画像を検索中..."
-                )
-                progress_window.add_log(
-                    f"[{i}/{len(selected_files)}] {selected_file.name}"
-                )
-
-                # 対応する元画像を検索
-                original_file = FileMatcher.find_matching_file(
-                    selected_file.name, original_dir
-                )
-
-                if original_file:
-                    output_file = output_dir / original_file.name
-                    try:
-                        shutil.copy2(original_file, output_file)
-                        progress_window.add_log(f"  → {original_file.name} をコピーしました")
-                        success_count += 1
-
-                        # ファイルサイズ情報を追加
-                        try:
-                            file_size_mb = output_file.stat().st_size / (1024 * 1024)
-                            progress_window.add_log(
-                                f"    (ファイルサイズ: {file_size_mb:.1f}MB)"
-                            )
-                        except Exception:
-                            pass
-
-                    except Exception as e:
-                        progress_window.add_log(
-                            f"  → エラー: {original_file} のコピーに失敗しました: {e}"
-                        )
-                else:
-                    progress_window.add_log("  → 対応する元画像が見つかりませんでした")
-                    not_found_files.append(selected_file.name)
+            success_count, not_found_files = run_choice(
+                progress_window, original_dir, output_dir, selected_dir, selected_files
+            )
+
+            if progress_window.is_cancelled:
+                progress_window.add_log("処理がキャンセルされました")
+                progress_window.finish(False)
+                return
 
             # 完了
             progress_window.update_progress(
                 len(selected_files), len(selected_files), "完了"
             )
             progress_window.add_log(
-                f"\\n完了: {success_count}/{len(selected_files)}個のファイルをコピーしました"
+                f"\n完了: {success_count}/{len(selected_files)}個のファイルをコピーしました"
             )
-
-            if not_found_files:
-                progress_window.add_log(f"\\n見つからなかったファイル ({len(not_found_files)}個):")
-                for filename in not_found_files[:10]:  # 最初の10個だけ表示
-                    progress_window.add_log(f"  - {filename}")
-                if len(not_found_files) > 10:
-                    progress_window.add_log(f"  ... 他{len(not_found_files) - 10}個")
+            log_not_found(progress_window, not_found_files, limit=10)
 
             progress_window.finish(True)
 
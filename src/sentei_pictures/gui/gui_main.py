@@ -3,10 +3,23 @@ GUI版メインエントリーポイント
 tkinterベースのグラフィカルユーザーインターフェースを起動する
 """
 
+import argparse
 import sys
 
 from .main_window import MainWindow
 
+DESCRIPTION = "tkinterベースのGUIを起動します。"
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """guiコマンドの引数を追加（引数なし）"""
+
+
+def execute(args: argparse.Namespace) -> int:
+    """解析済みの引数でGUIを起動"""
+    main()
+    return 0
+
 
 def main():
     """GUI版のメインエントリーポイント"""
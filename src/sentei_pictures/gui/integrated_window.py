@@ -3,22 +3,31 @@
 画像軽量化→選定画像コピーの一連の流れを管理する
 """
 
-import shutil
 import threading
 import tkinter as tk
 from pathlib import Path
 from tkinter import messagebox, ttk
+from typing import Optional
 
-from ..core.file_matcher import FileMatcher
-from ..core.image_processor import ImageProcessor
+from ..core.catalog import get_shared_catalog
+from ..core.listing import LIST_JPEG, DirectoryScanner, get_shared_listing
+from ..core.throttle import Throttle
+from ..core.worker_pool import WorkerPool
+from .runners import log_not_found, run_choice, run_reduce
 from .widgets import DirectorySelector, ProgressWindow, SettingsFrame
 
 
 class IntegratedWindow:
     """統合メニューウィンドウクラス"""
 
-    def __init__(self, parent: tk.Widget):
+    def __init__(self, parent: tk.Widget, pool: Optional[WorkerPool] = None):
+        """
+        Args:
+            parent: 親ウィジェット
+            pool: 軽量化に使うワーカープール（省略時は並列処理なし）
+        """
         self.parent = parent
+        self.pool = pool
         self.window = tk.Toplevel(parent)
         self.window.title("統合メニュー - 写真処理ワークフロー")
         self.window.geometry("700x600")
@@ -140,6 +149,9 @@ class IntegratedWindow:
 
         # プレビュー更新タイマー
         self._preview_timer = None
+        # プレビューのディレクトリ走査（UIを止めないようバックグラウンドで行う）
+        self._scanner = DirectoryScanner()
+        self.window.bind("<Destroy>", self._on_destroy)
 
     def _schedule_preview_update(self, event=None):
         """プレビュー更新をスケジュール"""
@@ -148,34 +160,61 @@ class IntegratedWindow:
         self._preview_timer = self.window.after(500, self._update_preview)
 
     def _update_preview(self, event=None):
-        """プレビューを更新"""
-        original_path = self.original_selector.get_path()
-        if original_path and original_path.exists():
-            try:
-                jpeg_files = FileMatcher.get_jpeg_files(original_path)
-                count = len(jpeg_files)
-                if count > 0:
-                    self.preview_label.config(
-                        text=f"処理対象: {count}個のJPEGファイル", foreground="blue"
-                    )
-                    self.execute_button.config(state="normal")
-                    self.reduce_only_button.config(state="normal")
-                else:
-                    self.preview_label.config(
-                        text="JPEGファイルが見つかりません", foreground="orange"
-                    )
-                    self.execute_button.config(state="disabled")
-                    self.reduce_only_button.config(state="disabled")
-            except Exception:
-                self.preview_label.config(text="ディレクトリの読み取りに失敗しました", foreground="red")
-                self.execute_button.config(state="disabled")
-                self.reduce_only_button.config(state="disabled")
-        else:
+        """プレビューの更新を開始（走査はバックグラウンドで行う）"""
+        original_path = self.original_selector.get_entered_path()
+        if original_path is None:
+            self._scanner.cancel()
+            self._show_no_directory()
+            return
+
+        self.preview_label.config(text="ファイルを確認中...", foreground="gray")
+        self._set_buttons_state("disabled")
+        self._scanner.request(
+            original_path, self._on_scanned, LIST_JPEG, get_shared_catalog()
+        )
+
+    def _on_scanned(self, token: int, jpeg_files, error):
+        """走査結果をメインスレッドに渡す（ワーカースレッドから呼ばれる）"""
+        try:
+            self.window.after(0, self._show_preview, token, jpeg_files, error)
+        except (tk.TclError, RuntimeError):
+            # ウィンドウが閉じられた後
+            pass
+
+    def _show_preview(self, token: int, jpeg_files, error):
+        """走査結果をプレビューに表示（入力が変わっていれば何もしない）"""
+        if not self._scanner.is_current(token):
+            return
+        if isinstance(error, (FileNotFoundError, NotADirectoryError)):
+            self._show_no_directory()
+        elif error is not None:
+            self.preview_label.config(text="ディレクトリの読み取りに失敗しました", foreground="red")
+            self._set_buttons_state("disabled")
+        elif jpeg_files:
             self.preview_label.config(
-                text="元画像ディレクトリを選択すると、処理対象ファイル数が表示されます", foreground="gray"
+                text=f"処理対象: {len(jpeg_files)}個のJPEGファイル", foreground="blue"
             )
-            self.execute_button.config(state="disabled")
-            self.reduce_only_button.config(state="disabled")
+            self._set_buttons_state("normal")
+        else:
+            self.preview_label.config(text="JPEGファイルが見つかりません", foreground="orange")
+            self._set_buttons_state("disabled")
+
+    def _show_no_directory(self):
+        """ディレクトリ未選択の表示"""
+        self.preview_label.config(
+            text="元画像ディレクトリを選択すると、処理対象ファイル数が表示されます", foreground="gray"
+        )
+        self._set_buttons_state("disabled")
+
+    def _set_buttons_state(self, state: str):
+        """実行ボタンの状態を設定"""
+        self.execute_button.config(state=state)
+        self.reduce_only_button.config(state=state)
+
+    def _on_destroy(self, event):
+        """ウィンドウを閉じたら走査を取り消す"""
+        if event.widget is self.window:
+            self._scanner.cancel()
 
     def _execute_reduce_only(self):
         """軽量化処理のみを実行"""
@@ -193,6 +232,7 @@ class IntegratedWindow:
 
         # 設定値を取得
         settings = self.settings_frame.get_settings()
+        throttle = self.settings_frame.get_throttle()
 
         # プログレスウィンドウを表示
         progress_window = ProgressWindow(self.window, "画像軽量化中...")
@@ -200,7 +240,7 @@ class IntegratedWindow:
         # バックグラウンドで処理を実行
         thread = threading.Thread(
             target=self._reduce_worker,
-            args=(original_dir, reduced_dir, settings, progress_window),
+            args=(original_dir, reduced_dir, settings, progress_window, throttle),
             daemon=True,
         )
         thread.start()
@@ -231,6 +271,7 @@ class IntegratedWindow:
 
         # 設定値を取得
         settings = self.settings_frame.get_settings()
+        throttle = self.settings_frame.get_throttle()
 
         # プログレスウィンドウを表示
         progress_window = ProgressWindow(self.window, "写真処理ワークフロー実行中...")
@@ -245,6 +286,7 @@ class IntegratedWindow:
                 final_output_dir,
                 settings,
                 progress_window,
+                throttle,
             ),
             daemon=True,
         )
@@ -256,12 +298,15 @@ class IntegratedWindow:
         reduced_dir: Path,
         settings: dict,
         progress_window: ProgressWindow,
+        throttle: Optional[Throttle] = None,
     ):
         """軽量化処理のワーカースレッド"""
         try:
             # JPEGファイルを検索
             progress_window.add_log("JPEGファイルを検索中...")
-            jpeg_files = FileMatcher.get_jpeg_files(original_dir)
+            jpeg_files = get_shared_listing().jpeg_files(
+                original_dir, get_shared_catalog()
+            )
 
             if not jpeg_files:
                 progress_window.add_log("JPEGファイルが見つかりませんでした")
@@ -270,35 +315,26 @@ class IntegratedWindow:
 
             progress_window.add_log(f"{len(jpeg_files)}個のJPEGファイルを軽量化します")
 
-            # 画像プロセッサーを初期化
-            processor = ImageProcessor(
-                max_long_side=settings["max_long_side"], quality=settings["quality"]
+            success_count = run_reduce(
+                progress_window,
+                original_dir,
+                reduced_dir,
+                jpeg_files,
+                settings,
+                label="軽量化 ",
+                pool=self.pool,
+                throttle=throttle,
             )
 
-            success_count = 0
-
-            for i, input_file in enumerate(jpeg_files, 1):
-                if progress_window.is_cancelled:
-                    progress_window.add_log("処理がキャンセルされました")
-                    progress_window.finish(False)
-                    return
-
-                output_file = reduced_dir / input_file.name
-                progress_window.update_progress(
-                    i - 1, len(jpeg_files), f"{input_file.name} を処理中..."
-                )
-                progress_window.add_log(f"[{i}/{len(jpeg_files)}] {input_file.name}")
-
-                if processor.process_image(input_file, output_file):
-                    success_count += 1
-                    progress_window.add_log("  → 完了")
-                else:
-                    progress_window.add_log("  → 失敗")
+            if progress_window.is_cancelled:
+                progress_window.add_log("処理がキャンセルされました")
+                progress_window.finish(False)
+                return
 
             # 完了
             progress_window.update_progress(len(jpeg_files), len(jpeg_files), "軽量化完了")
             progress_window.add_log(
-                f"\\n軽量化完了: {success_count}/{len(jpeg_files)}個のファイルを処理しました"
+                f"\n軽量化完了: {success_count}/{len(jpeg_files)}個のファイルを処理しました"
             )
             progress_window.finish(True)
 
@@ -314,6 +350,7 @@ class IntegratedWindow:
         final_output_dir: Path,
         settings: dict,
         progress_window: ProgressWindow,
+        throttle: Optional[Throttle] = None,
     ):
         """フルワークフローのワーカースレッド"""
         try:
@@ -322,7 +359,9 @@ class IntegratedWindow:
 
             # JPEGファイルを検索
             progress_window.add_log("JPEGファイルを検索中...")
-            jpeg_files = FileMatcher.get_jpeg_files(original_dir)
+            jpeg_files = get_shared_listing().jpeg_files(
+                original_dir, get_shared_catalog()
+            )
 
             if not jpeg_files:
                 progress_window.add_log("JPEGファイルが見つかりませんでした")
@@ -331,41 +370,33 @@ class IntegratedWindow:
 
             progress_window.add_log(f"{len(jpeg_files)}個のJPEGファイルを軽量化します")
 
-            # 画像プロセッサーを初期化
-            processor = ImageProcessor(
-                max_long_side=settings["max_long_side"], quality=settings["quality"]
-            )
-
-            reduce_success_count = 0
             total_files = len(jpeg_files)
+            reduce_success_count = run_reduce(
+                progress_window,
+                original_dir,
+                reduced_dir,
+                jpeg_files,
+                settings,
+                label="軽量化 ",
+                pool=self.pool,
+                throttle=throttle,
+                progress_total=total_files * 2,
+            )
 
-            for i, input_file in enumerate(jpeg_files, 1):
-                if progress_window.is_cancelled:
-                    progress_window.add_log("処理がキャンセルされました")
-                    progress_window.finish(False)
-                    return
-
-                output_file = reduced_dir / input_file.name
-                progress_window.update_progress(
-                    i - 1, total_files * 2, f"軽量化: {input_file.name}"
-                )
-                progress_window.add_log(f"[軽量化 {i}/{total_files}] {input_file.name}")
-
-                if processor.process_image(input_file, output_file):
-                    reduce_success_count += 1
-                    progress_window.add_log("  → 完了")
-                else:
-                    progress_window.add_log("  → 失敗")
+            if progress_window.is_cancelled:
+                progress_window.add_log("処理がキャンセルされました")
+                progress_window.finish(False)
+                return
 
             progress_window.add_log(
-                f"\\n軽量化完了: {reduce_success_count}/{total_files}個のファイルを処理しました"
+                f"\n軽量化完了: {reduce_success_count}/{total_files}個のファイルを処理しました"
             )
-            progress_window.add_log("\\n=== ステップ2: 選定画像コピーを開始 ===")
+            progress_window.add_log("\n=== ステップ2: 選定画像コピーを開始 ===")
 
             # ステップ2: 選定画像コピー
             # 選定されたファイルを取得
             progress_window.add_log("選定されたファイルを検索中...")
-            selected_files = FileMatcher.get_image_files(selected_dir)
+            selected_files = get_shared_listing().image_files(selected_dir)
 
             if not selected_files:
                 progress_window.add_log("選定されたファイルが見つかりませんでした")
@@ -375,56 +406,33 @@ class IntegratedWindow:
 
             progress_window.add_log(f"{len(selected_files)}個の選定されたファイルを処理します")
 
-            choice_success_count = 0
-            not_found_files = []
-
-            for i, selected_file in enumerate(selected_files, 1):
-                if progress_window.is_cancelled:
-                    progress_window.add_log("処理がキャンセルされました")
-                    progress_window.finish(False)
-                    return
-
-                progress_index = total_files + i - 1
-                progress_window.update_progress(
-                    progress_index, total_files * 2, f"コピー: {selected_file.name}"
-                )
-                progress_window.add_log(
-                    f"[コピー {i}/{len(selected_files)}] {selected_file.name}"
-                )
-
-                # 対応する元画像を検索
-                original_file = FileMatcher.find_matching_file(
-                    selected_file.name, original_dir
-                )
-
-                if original_file:
-                    output_file = final_output_dir / original_file.name
-                    try:
-                        shutil.copy2(original_file, output_file)
-                        progress_window.add_log(f"  → {original_file.name} をコピーしました")
-                        choice_success_count += 1
-                    except Exception as e:
-                        progress_window.add_log(f"  → エラー: コピーに失敗しました: {e}")
-                else:
-                    progress_window.add_log("  → 対応する元画像が見つかりませんでした")
-                    not_found_files.append(selected_file.name)
+            choice_success_count, not_found_files = run_choice(
+                progress_window,
+                original_dir,
+                final_output_dir,
+                selected_dir,
+                selected_files,
+                label="コピー ",
+                progress_offset=total_files,
+                progress_total=total_files * 2,
+            )
+
+            if progress_window.is_cancelled:
+                progress_window.add_log("処理がキャンセルされました")
+                progress_window.finish(False)
+                return
 
             # 最終結果
             progress_window.update_progress(
                 total_files * 2, total_files * 2, "ワークフロー完了"
             )
-            progress_window.add_log("\\n=== ワークフロー完了 ===")
+            progress_window.add_log("\n=== ワークフロー完了 ===")
             progress_window.add_log(f"軽量化: {reduce_success_count}/{total_files}個")
             progress_window.add_log(
                 f"コピー: {choice_success_count}/{len(selected_files)}個"
             )
 
-            if not_found_files:
-                progress_window.add_log(f"\\n見つからなかったファイル ({len(not_found_files)}個):")
-                for filename in not_found_files[:5]:  # 最初の5個のみ表示
-                    progress_window.add_log(f"  - {filename}")
-                if len(not_found_files) > 5:
-                    progress_window.add_log(f"  ... 他{len(not_found_files) - 5}個")
+            log_not_found(progress_window, not_found_files, limit=5)
 
             progress_window.finish(True)
 
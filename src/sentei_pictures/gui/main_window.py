@@ -6,6 +6,7 @@
 import tkinter as tk
 from tkinter import ttk
 
+from ..core.worker_pool import get_shared_pool, shutdown_shared_pools
 from .choice_window import ChoiceWindow
 from .reduce_window import ReduceWindow
 
@@ -19,6 +20,9 @@ class MainWindow:
         self.root.geometry("400x300")
         self.root.resizable(False, False)
 
+        # 画像軽量化ウィンドウで共有するワーカープール（最初の実行時に起動）
+        self.pool = get_shared_pool()
+
         # ウィンドウを画面中央に配置
         self._center_window()
 
@@ -85,7 +89,7 @@ class MainWindow:
 
     def _open_reduce_window(self):
         """画像軽量化ウィンドウを開く"""
-        ReduceWindow(self.root)
+        ReduceWindow(self.root, pool=self.pool)
 
     def _open_choice_window(self):
         """選定画像コピーウィンドウを開く"""
@@ -97,4 +101,7 @@ class MainWindow:
 
     def run(self):
         """アプリケーションを実行"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            shutdown_shared_pools(wait=False)
@@ -7,20 +7,33 @@ import threading
 import tkinter as tk
 from pathlib import Path
 from tkinter import messagebox, ttk
+from typing import Optional
 
-from ..core.file_matcher import FileMatcher
+from ..api import CancelToken
+from ..core.catalog import get_shared_catalog
 from ..core.image_processor import ImageProcessor
+from ..core.listing import LIST_JPEG, DirectoryScanner, get_shared_listing
+from ..core.planner import plan_reduce
+from ..core.throttle import Throttle
+from ..core.worker_pool import WorkerPool
+from .runners import run_reduce
 from .widgets import DirectorySelector, ProgressWindow, SettingsFrame
 
 
 class ReduceWindow:
     """画像軽量化ウィンドウクラス"""
 
-    def __init__(self, parent: tk.Widget):
+    def __init__(self, parent: tk.Widget, pool: Optional[WorkerPool] = None):
+        """
+        Args:
+            parent: 親ウィジェット
+            pool: 軽量化に使うワーカープール（省略時は並列処理なし）
+        """
         self.parent = parent
+        self.pool = pool
         self.window = tk.Toplevel(parent)
         self.window.title("画像軽量化")
-        self.window.geometry("600x400")
+        self.window.geometry("600x480")
         self.window.resizable(True, False)
 
         # ウィンドウを親の中央に配置
@@ -33,7 +46,7 @@ class ReduceWindow:
         """ウィンドウを画面中央に配置"""
         self.window.update_idletasks()
         width = 600
-        height = 400
+        height = 480
         x = (self.window.winfo_screenwidth() // 2) - (width // 2)
         y = (self.window.winfo_screenheight() // 2) - (height // 2)
         self.window.geometry(f"{width}x{height}+{x}+{y}")
@@ -101,6 +114,13 @@ class ReduceWindow:
 
         # プレビュー更新タイマー
         self._preview_timer = None
+        # プレビューのディレクトリ走査（UIを止めないようバックグラウンドで行う）
+        self._scanner = DirectoryScanner()
+        self.window.bind("<Destroy>", self._on_destroy)
+        # 実行中の見積もりの世代（古い見積もりの結果を捨てるため）
+        self._estimate_generation = 0
+        # 実行中の見積もりのキャンセルトークン（入力が変わったら止める）
+        self._estimate_cancel: Optional[CancelToken] = None
 
     def _schedule_preview_update(self, event=None):
         """プレビュー更新をスケジュール（キー入力の度に呼ばれるのを防ぐ）"""
@@ -109,31 +129,105 @@ class ReduceWindow:
         self._preview_timer = self.window.after(500, self._update_preview)
 
     def _update_preview(self, event=None):
-        """プレビューを更新"""
-        input_path = self.input_selector.get_path()
-        if input_path and input_path.exists():
-            try:
-                jpeg_files = FileMatcher.get_jpeg_files(input_path)
-                count = len(jpeg_files)
-                if count > 0:
-                    self.preview_label.config(
-                        text=f"処理対象: {count}個のJPEGファイル", foreground="blue"
-                    )
-                    self.execute_button.config(state="normal")
-                else:
-                    self.preview_label.config(
-                        text="JPEGファイルが見つかりません", foreground="orange"
-                    )
-                    self.execute_button.config(state="disabled")
-            except Exception:
-                self.preview_label.config(text="ディレクトリの読み取りに失敗しました", foreground="red")
-                self.execute_button.config(state="disabled")
-        else:
+        """プレビューの更新を開始（走査はバックグラウンドで行う）"""
+        input_path = self.input_selector.get_entered_path()
+        if input_path is None:
+            self._scanner.cancel()
+            self._cancel_estimate()
+            self._show_no_directory()
+            return
+
+        self._cancel_estimate()
+        self.preview_label.config(text="ファイルを確認中...", foreground="gray")
+        self.execute_button.config(state="disabled")
+        self._scanner.request(
+            input_path, self._on_scanned, LIST_JPEG, get_shared_catalog()
+        )
+
+    def _on_scanned(self, token: int, jpeg_files, error):
+        """走査結果をメインスレッドに渡す（ワーカースレッドから呼ばれる）"""
+        try:
+            self.window.after(0, self._show_preview, token, jpeg_files, error)
+        except (tk.TclError, RuntimeError):
+            # ウィンドウが閉じられた後
+            pass
+
+    def _show_preview(self, token: int, jpeg_files, error):
+        """走査結果をプレビューに表示（入力が変わっていれば何もしない）"""
+        if not self._scanner.is_current(token):
+            return
+        if isinstance(error, (FileNotFoundError, NotADirectoryError)):
+            self._show_no_directory()
+        elif error is not None:
+            self.preview_label.config(text="ディレクトリの読み取りに失敗しました", foreground="red")
+            self.execute_button.config(state="disabled")
+        elif jpeg_files:
             self.preview_label.config(
-                text="入力ディレクトリを選択すると、処理対象ファイル数が表示されます", foreground="gray"
+                text=f"処理対象: {len(jpeg_files)}個のJPEGファイル（見積もり中...）",
+                foreground="blue",
             )
+            self.execute_button.config(state="normal")
+            self._start_estimate(jpeg_files)
+        else:
+            self.preview_label.config(text="JPEGファイルが見つかりません", foreground="orange")
             self.execute_button.config(state="disabled")
 
+    def _show_no_directory(self):
+        """ディレクトリ未選択の表示"""
+        self.preview_label.config(
+            text="入力ディレクトリを選択すると、処理対象ファイル数が表示されます", foreground="gray"
+        )
+        self.execute_button.config(state="disabled")
+
+    def _on_destroy(self, event):
+        """ウィンドウを閉じたら走査を取り消す"""
+        if event.widget is self.window:
+            self._scanner.cancel()
+            self._cancel_estimate()
+
+    def _start_estimate(self, jpeg_files: list):
+        """出力サイズ・処理時間・空き容量の見積もりをバックグラウンドで開始"""
+        self._cancel_estimate()
+        generation = self._estimate_generation
+        cancel = self._estimate_cancel = CancelToken()
+        processor = ImageProcessor(**self.settings_frame.get_settings())
+        output_dir = self.output_selector.get_path()
+        workers = self.pool.max_workers if self.pool is not None else 1
+
+        def estimate_worker():
+            try:
+                estimate = plan_reduce(
+                    jpeg_files,
+                    processor,
+                    output_dir,
+                    workers,
+                    catalog=get_shared_catalog(),
+                    cancel=cancel,
+                )
+                if estimate is not None:
+                    self.window.after(0, self._show_estimate, generation, estimate)
+            except Exception:
+                # 見積もりに失敗しても処理対象の件数は表示済み
+                pass
+
+        threading.Thread(target=estimate_worker, daemon=True).start()
+
+    def _cancel_estimate(self):
+        """実行中の見積もりを止めて、結果を捨てる"""
+        self._estimate_generation += 1
+        if self._estimate_cancel is not None:
+            self._estimate_cancel.cancel()
+            self._estimate_cancel = None
+
+    def _show_estimate(self, generation: int, estimate):
+        """見積もり結果をプレビューに表示（入力が変わっていれば何もしない）"""
+        if generation != self._estimate_generation:
+            return
+        self.preview_label.config(
+            text="\n".join(estimate.summary_lines()),
+            foreground="blue" if estimate.fits else "red",
+        )
+
     def _execute_reduce(self):
         """軽量化処理を実行"""
         # 入力値の検証
@@ -150,6 +244,7 @@ class ReduceWindow:
 
         # 設定値を取得
         settings = self.settings_frame.get_settings()
+        throttle = self.settings_frame.get_throttle()
 
         # プログレスウィンドウを表示
         progress_window = ProgressWindow(self.window, "画像軽量化中...")
@@ -157,7 +252,7 @@ class ReduceWindow:
         # バックグラウンドで処理を実行
         thread = threading.Thread(
             target=self._reduce_worker,
-            args=(input_dir, output_dir, settings, progress_window),
+            args=(input_dir, output_dir, settings, progress_window, throttle),
             daemon=True,
         )
         thread.start()
@@ -168,12 +263,15 @@ class ReduceWindow:
         output_dir: Path,
         settings: dict,
         progress_window: ProgressWindow,
+        throttle: Optional[Throttle] = None,
     ):
         """軽量化処理のワーカースレッド"""
         try:
-            # JPEGファイルを検索
+            # JPEGファイルを検索（プレビューの一覧から変わっていなければ再走査しない）
             progress_window.add_log("JPEGファイルを検索中...")
-            jpeg_files = FileMatcher.get_jpeg_files(input_dir)
+            jpeg_files = get_shared_listing().jpeg_files(
+                input_dir, get_shared_catalog()
+            )
 
             if not jpeg_files:
                 progress_window.add_log("JPEGファイルが見つかりませんでした")
@@ -182,42 +280,25 @@ class ReduceWindow:
 
             progress_window.add_log(f"{len(jpeg_files)}個のJPEGファイルを処理します")
 
-            # 画像プロセッサーを初期化
-            processor = ImageProcessor(
-                max_long_side=settings["max_long_side"], quality=settings["quality"]
+            success_count = run_reduce(
+                progress_window,
+                input_dir,
+                output_dir,
+                jpeg_files,
+                settings,
+                pool=self.pool,
+                throttle=throttle,
             )
 
-            success_count = 0
-
-            for i, input_file in enumerate(jpeg_files, 1):
-                if progress_window.is_cancelled:
-                    progress_window.add_log("処理がキャンセルされました")
-                    progress_window.finish(False)
-                    return
-
-                output_file = output_dir / input_file.name
-                progress_window.update_progress(
-                    i - 1, len(jpeg_files), f"{input_file.name} を処理中..."
-                )
-                progress_window.add_log(f"[{i}/{len(jpeg_files)}] {input_file.name}")
-
-                if processor.process_image(input_file, output_file):
-                    success_count += 1
-                    # ファイルサイズ情報を追加
-                    try:
-                        file_size_mb = output_file.stat().st_size / (1024 * 1024)
-                        progress_window.add_log(
-                            f"  → 完了 (ファイルサイズ: {file_size_mb:.1f}MB)"
-                        )
-                    except Exception:
-                        progress_window.add_log("  → 完了")
-                else:
-                    progress_window.add_log("  → 失敗")
+            if progress_window.is_cancelled:
+                progress_window.add_log("処理がキャンセルされました")
+                progress_window.finish(False)
+                return
 
             # 完了
             progress_window.update_progress(len(jpeg_files), len(jpeg_files), "完了")
             progress_window.add_log(
-                f"\\n完了: {success_count}/{len(jpeg_files)}個のファイルを軽量化しました"
+                f"\n完了: {success_count}/{len(jpeg_files)}個のファイルを軽量化しました"
             )
             progress_window.finish(True)
 
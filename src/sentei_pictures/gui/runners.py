@@ -0,0 +1,172 @@
+"""
+GUI共通の処理ランナー
+APIのジェネレーターを消費してプログレスウィンドウに結果を表示する
+"""
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from ..api import STATUS_NOT_FOUND, choose, reduce_directory
+from ..core.catalog import get_shared_catalog
+from ..core.copier import AdaptiveCopier
+from ..core.image_processor import ImageProcessor
+from ..core.throttle import Throttle
+from ..core.worker_pool import WorkerPool, get_shared_pool
+from .widgets import ProgressWindow
+
+
+def run_reduce(
+    progress_window: ProgressWindow,
+    input_dir: Path,
+    output_dir: Path,
+    files: List[Path],
+    settings: dict,
+    label: str = "",
+    progress_offset: int = 0,
+    progress_total: Optional[int] = None,
+    pool: Optional[WorkerPool] = None,
+    throttle: Optional[Throttle] = None,
+) -> int:
+    """
+    軽量化処理を実行してプログレスウィンドウに表示
+
+    Args:
+        progress_window: プログレスウィンドウ
+        input_dir: 入力ディレクトリ
+        output_dir: 出力ディレクトリ
+        files: 処理対象ファイル
+        settings: SettingsFrameの設定値
+        label: ログの番号表示に付ける接頭辞（例: "軽量化 "）
+        progress_offset: プログレスバーの開始位置
+        progress_total: プログレスバーの全体数（省略時はファイル数）
+        pool: ワーカープール（省略時は並列処理なし）
+        throttle: バックグラウンド処理の帯域・負荷の制限。指定時は優先度を下げた
+            共有プールで処理し、最後に実効スループットを表示する
+
+    Returns:
+        int: 成功したファイル数（キャンセル時はそれまでの件数）
+    """
+    processor = ImageProcessor(**settings)
+    if throttle is not None and pool is not None:
+        pool = get_shared_pool(background=True)
+    progress_total = progress_total or len(files)
+    progress_window.metrics.total = progress_total
+    success_count = 0
+
+    for result in reduce_directory(
+        input_dir,
+        output_dir,
+        processor,
+        cancel=progress_window.cancel_token,
+        files=files,
+        pool=pool,
+        throttle=throttle,
+    ):
+        progress_window.record_result(result)
+        progress_window.update_progress(
+            progress_offset + result.index,
+            progress_total,
+            f"{result.path.name} を処理しました",
+        )
+        progress_window.add_log(
+            f"[{label}{result.index}/{result.total}] {result.path.name}"
+        )
+
+        if result.ok:
+            success_count += 1
+            file_size_mb = result.bytes_out / (1024 * 1024)
+            progress_window.add_log(f"  → 完了 (ファイルサイズ: {file_size_mb:.1f}MB)")
+        else:
+            progress_window.add_log(f"  → 失敗: {result.error}")
+
+    if throttle is not None:
+        progress_window.add_log(throttle.summary_line())
+    return success_count
+
+
+def run_choice(
+    progress_window: ProgressWindow,
+    original_dir: Path,
+    output_dir: Path,
+    selected_dir: Path,
+    files: List[Path],
+    label: str = "",
+    progress_offset: int = 0,
+    progress_total: Optional[int] = None,
+) -> Tuple[int, List[str]]:
+    """
+    選定画像コピー処理を実行してプログレスウィンドウに表示
+
+    Args:
+        progress_window: プログレスウィンドウ
+        original_dir: 元画像ディレクトリ
+        output_dir: 出力ディレクトリ
+        selected_dir: 選定ディレクトリ
+        files: 選定ファイル
+        label: ログの番号表示に付ける接頭辞（例: "コピー "）
+        progress_offset: プログレスバーの開始位置
+        progress_total: プログレスバーの全体数（省略時はファイル数）
+
+    Returns:
+        Tuple[int, List[str]]: (成功したファイル数, 見つからなかったファイル名)
+    """
+    progress_total = progress_total or len(files)
+    progress_window.metrics.total = progress_total
+    success_count = 0
+    not_found_files = []
+    copier = AdaptiveCopier()
+
+    for result in choose(
+        original_dir,
+        output_dir,
+        selected_dir,
+        cancel=progress_window.cancel_token,
+        files=files,
+        catalog=get_shared_catalog(),
+        copier=copier,
+    ):
+        progress_window.record_result(result)
+        progress_window.update_progress(
+            progress_offset + result.index,
+            progress_total,
+            f"{result.path.name} を処理しました",
+        )
+        progress_window.add_log(
+            f"[{label}{result.index}/{result.total}] {result.path.name}"
+        )
+
+        if result.ok:
+            success_count += 1
+            file_size_mb = result.bytes_out / (1024 * 1024)
+            rate = file_size_mb / result.elapsed if result.elapsed > 0 else 0.0
+            progress_window.add_log(
+                f"  → {result.source_path.name} をコピーしました "
+                f"({file_size_mb:.1f}MB, {rate:.1f}MB/s)"
+            )
+        elif result.status == STATUS_NOT_FOUND:
+            progress_window.add_log("  → 対応する元画像が見つかりませんでした")
+            not_found_files.append(result.path.name)
+        else:
+            progress_window.add_log(f"  → エラー: コピーに失敗しました: {result.error}")
+
+    stats = copier.stats
+    if stats.files:
+        progress_window.add_log(
+            f"転送: {stats.bytes / (1024 * 1024):.1f}MB, {stats.rate_mb:.1f}MB/s"
+            f"（並列数 {stats.concurrency}）"
+        )
+    return success_count, not_found_files
+
+
+def log_not_found(
+    progress_window: ProgressWindow, not_found_files: List[str], limit: int
+):
+    """見つからなかったファイルを先頭limit件だけ表示"""
+    if not not_found_files:
+        return
+
+    progress_window.add_log(f"\n見つからなかったファイル ({len(not_found_files)}個):")
+    for filename in not_found_files[:limit]:
+        progress_window.add_log(f"  - {filename}")
+    if len(not_found_files) > limit:
+        progress_window.add_log(f"  ... 他{len(not_found_files) - limit}個")
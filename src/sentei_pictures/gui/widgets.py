@@ -3,11 +3,30 @@ GUI共通ウィジェット
 ディレクトリ選択、プログレス表示などの再利用可能なコンポーネント
 """
 
+import importlib.util
 import tkinter as tk
 from pathlib import Path
 from tkinter import filedialog, messagebox, ttk
 from typing import Optional
 
+from ..api import CancelToken
+from ..core.metrics import ThroughputMeter, histogram_labels
+from ..core.quality import DEFAULT_TARGET_SSIM
+from ..core.throttle import DEFAULT_IO_LIMIT_MB, Throttle, load_per_cpu
+
+# ICCプロファイルの扱いの表示名
+COLOR_LABELS = {
+    "none": "破棄する",
+    "srgb": "sRGBに変換する",
+    "preserve": "そのまま埋め込む",
+}
+
+# 高負荷時に一時停止するCPUあたりのロードアベレージ
+PAUSE_LOAD = 0.8
+
+# 処理状況の表示を更新する間隔（ミリ秒）。結果ごとには描画しない
+METRICS_INTERVAL_MS = 500
+
 
 class DirectorySelector(ttk.Frame):
     """ディレクトリ選択ウィジェット"""
@@ -76,6 +95,16 @@ class DirectorySelector(ttk.Frame):
                 return None
             return path
 
+    def get_entered_path(self) -> Optional[Path]:
+        """
+        入力中のパスを取得（存在確認・ダイアログ表示をしない）
+
+        ネットワーク上のパスでもUIを止めないよう、プレビューではこちらを使い、
+        存在確認はバックグラウンドの走査に任せる。
+        """
+        path_str = self._path_var.get().strip()
+        return Path(path_str) if path_str else None
+
     def set_path(self, path: str):
         """パスを設定"""
         self._path_var.set(path)
@@ -88,7 +117,7 @@ class ProgressWindow:
         self.parent = parent
         self.window = tk.Toplevel(parent)
         self.window.title(title)
-        self.window.geometry("500x300")
+        self.window.geometry("520x460")
         self.window.resizable(True, True)
 
         # ウィンドウを親の中央に配置
@@ -96,7 +125,18 @@ class ProgressWindow:
         self.window.grab_set()
 
         self._setup_widgets()
-        self.is_cancelled = False
+        self.cancel_token = CancelToken()
+
+        # 処理状況（結果レコードから集計し、一定間隔で描画する）
+        self.metrics = ThroughputMeter()
+        self._rendered_version = -1
+        self._metrics_job = None
+        self._render_metrics()
+
+    @property
+    def is_cancelled(self) -> bool:
+        """キャンセルが要求されたかどうか"""
+        return self.cancel_token.cancelled
 
     def _setup_widgets(self):
         """ウィジェットを設定"""
@@ -116,6 +156,20 @@ class ProgressWindow:
         self.status_label = ttk.Label(main_frame, textvariable=self.status_var)
         self.status_label.pack(pady=(0, 10))
 
+        # 処理状況（速度・残り時間・稼働率・処理時間の分布）
+        metrics_frame = ttk.LabelFrame(main_frame, text="処理状況", padding="5")
+        metrics_frame.pack(fill=tk.X, pady=(0, 10))
+
+        self.metrics_var = tk.StringVar(value="")
+        ttk.Label(metrics_frame, textvariable=self.metrics_var, justify=tk.LEFT).pack(
+            anchor=tk.W
+        )
+
+        self.histogram_canvas = tk.Canvas(
+            metrics_frame, height=64, highlightthickness=0
+        )
+        self.histogram_canvas.pack(fill=tk.X, pady=(5, 0))
+
         # ログ表示エリア
         log_frame = ttk.Frame(main_frame)
         log_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
@@ -152,6 +206,59 @@ class ProgressWindow:
 
         self.window.update_idletasks()
 
+    def record_result(self, result):
+        """
+        結果レコードを処理状況に集計（ワーカースレッドから呼んでよい）
+
+        描画は一定間隔でメインスレッドから行うため、ここではTkを操作しない。
+        """
+        self.metrics.record(result)
+
+    def _render_metrics(self, final: bool = False):
+        """処理状況を描画し、次の描画を予約する"""
+        try:
+            snapshot = self.metrics.snapshot()
+            if snapshot.done or final:
+                self.metrics_var.set("\n".join(snapshot.summary_lines()))
+            # 分布は結果が増えたときだけ描き直す
+            if self.metrics.version != self._rendered_version:
+                self._rendered_version = self.metrics.version
+                self._draw_histogram(snapshot.histogram)
+            if not final:
+                self._metrics_job = self.window.after(
+                    METRICS_INTERVAL_MS, self._render_metrics
+                )
+        except tk.TclError:
+            # ウィンドウが閉じられた後
+            self._metrics_job = None
+
+    def _draw_histogram(self, counts):
+        """ファイルごとの処理時間の分布を棒グラフで描画"""
+        canvas = self.histogram_canvas
+        canvas.delete("all")
+        width = max(canvas.winfo_width(), 200)
+        height = int(canvas["height"])
+        label_height = 14
+        column = width / len(counts)
+        peak = max(counts) or 1
+        for i, (count, label) in enumerate(zip(counts, histogram_labels())):
+            bar = (height - label_height - 2) * count / peak
+            x0 = i * column + 2
+            canvas.create_rectangle(
+                x0,
+                height - label_height - bar,
+                x0 + column - 4,
+                height - label_height,
+                fill="#4a90d9",
+                width=0,
+            )
+            canvas.create_text(
+                x0 + column / 2 - 2,
+                height - label_height / 2,
+                text=label,
+                font=("", 7),
+            )
+
     def add_log(self, message: str):
         """ログメッセージを追加"""
         self.log_text.insert(tk.END, message + "\n")
@@ -160,12 +267,16 @@ class ProgressWindow:
 
     def _cancel(self):
         """処理をキャンセル"""
-        self.is_cancelled = True
+        self.cancel_token.cancel()
         self.cancel_button.config(state="disabled")
         self.add_log("キャンセルが要求されました...")
 
     def finish(self, success: bool = True):
         """処理完了"""
+        if self._metrics_job is not None:
+            self.window.after_cancel(self._metrics_job)
+            self._metrics_job = None
+        self._render_metrics(final=True)
         self.cancel_button.config(state="disabled")
         self.close_button.config(state="normal")
 
@@ -178,6 +289,9 @@ class ProgressWindow:
 
     def _close(self):
         """ウィンドウを閉じる"""
+        if self._metrics_job is not None:
+            self.window.after_cancel(self._metrics_job)
+            self._metrics_job = None
         self.window.destroy()
 
 
@@ -215,9 +329,84 @@ class SettingsFrame(ttk.LabelFrame):
         )
         size_spin.grid(row=1, column=1, sticky="w", pady=(10, 0))
 
+        # カラーマネジメント設定
+        ttk.Label(self, text="ICCプロファイル:").grid(
+            row=2, column=0, sticky="w", padx=(0, 10), pady=(10, 0)
+        )
+        self.color_var = tk.StringVar(value=COLOR_LABELS["none"])
+        color_combo = ttk.Combobox(
+            self,
+            textvariable=self.color_var,
+            values=list(COLOR_LABELS.values()),
+            state="readonly",
+            width=24,
+        )
+        color_combo.grid(row=2, column=1, sticky="w", pady=(10, 0))
+
+        # 画質目標（SSIM）設定。NumPyがなければ選択できない
+        available = importlib.util.find_spec("numpy") is not None
+        self.target_enabled_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self,
+            text="画質目標 (SSIM):" if available else "画質目標 (NumPyが必要):",
+            variable=self.target_enabled_var,
+            state="normal" if available else "disabled",
+        ).grid(row=3, column=0, sticky="w", padx=(0, 10), pady=(10, 0))
+        self.target_ssim_var = tk.DoubleVar(value=DEFAULT_TARGET_SSIM)
+        ttk.Spinbox(
+            self,
+            from_=0.9,
+            to=0.999,
+            increment=0.005,
+            textvariable=self.target_ssim_var,
+            width=10,
+            state="normal" if available else "disabled",
+        ).grid(row=3, column=1, sticky="w", pady=(10, 0))
+
+        # バックグラウンド処理（優先度を下げ、読み書きの帯域を制限する）
+        self.background_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self, text="バックグラウンド (MB/s):", variable=self.background_var
+        ).grid(row=4, column=0, sticky="w", padx=(0, 10), pady=(10, 0))
+        self.io_limit_var = tk.DoubleVar(value=DEFAULT_IO_LIMIT_MB)
+        ttk.Spinbox(
+            self,
+            from_=1,
+            to=1000,
+            increment=5,
+            textvariable=self.io_limit_var,
+            width=10,
+        ).grid(row=4, column=1, sticky="w", pady=(10, 0))
+
+        # 高負荷時の一時停止。ロードアベレージがなければ選択できない
+        self.pause_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self,
+            text="高負荷時に一時停止",
+            variable=self.pause_var,
+            state="normal" if load_per_cpu() is not None else "disabled",
+        ).grid(row=5, column=0, columnspan=2, sticky="w", pady=(10, 0))
+
     def get_settings(self) -> dict:
         """設定値を取得"""
         return {
             "quality": self.quality_var.get(),
             "max_long_side": self.max_size_var.get(),
+            "color": next(
+                mode
+                for mode, label in COLOR_LABELS.items()
+                if label == self.color_var.get()
+            ),
+            "target_ssim": (
+                self.target_ssim_var.get() if self.target_enabled_var.get() else None
+            ),
         }
+
+    def get_throttle(self) -> Optional[Throttle]:
+        """バックグラウンド処理の帯域・負荷の制限を取得（使わない場合None）"""
+        if not self.background_var.get():
+            return None
+        return Throttle(
+            self.io_limit_var.get() * 1024 * 1024,
+            pause_load=PAUSE_LOAD if self.pause_var.get() else None,
+        )
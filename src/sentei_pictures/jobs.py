@@ -0,0 +1,494 @@
+"""
+ジョブスケジューラー
+reduce/choice/workflowジョブを優先度順（またはフェアシェア）で共有ワーカープールで実行する
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+from .api import STATUS_NOT_FOUND, CancelToken, choose, reduce_directory
+
+if TYPE_CHECKING:
+    from .core.autotune import BatchTuning
+    from .core.worker_pool import WorkerPool
+
+# ジョブの状態
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# ジョブ種別ごとの必須ディレクトリパラメーター
+JOB_KINDS = {
+    "reduce": ("input_dir", "output_dir"),
+    "choice": ("original_dir", "output_dir", "selected_dir"),
+    "workflow": ("original_dir", "reduced_dir", "selected_dir", "output_dir"),
+}
+
+# 実行時に作成される（存在しなくてよい）ディレクトリパラメーター
+OUTPUT_DIR_PARAMS = ("output_dir", "reduced_dir")
+
+# スケジューリング方針
+POLICY_PRIORITY = "priority"
+POLICY_FAIR = "fair"
+POLICIES = (POLICY_PRIORITY, POLICY_FAIR)
+
+
+class Job:
+    """スケジューラーで管理するジョブ"""
+
+    def __init__(
+        self,
+        kind: str,
+        params: dict,
+        priority: int = 0,
+        group: Optional[str] = None,
+        name: Optional[str] = None,
+    ):
+        """
+        Args:
+            kind: ジョブ種別（"reduce"、"choice" または "workflow"）
+            params: ジョブのパラメーター（ディレクトリと処理設定）
+            priority: 優先度（大きいほど先に実行）
+            group: フェアシェアの単位（省略時はジョブごと）
+            name: 表示用の名前（省略時はID）
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.priority = priority
+        self.group = group or self.id
+        self.name = name or self.id
+        self.state = JOB_QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.total = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.not_found = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cancel_token = CancelToken()
+        self._events: List[dict] = []
+        self._condition = threading.Condition()
+
+    @property
+    def done(self) -> int:
+        """処理済みファイル数"""
+        return self.succeeded + self.failed + self.not_found
+
+    @property
+    def finished(self) -> bool:
+        """ジョブが終了しているかどうか"""
+        return self.state in FINISHED_STATES
+
+    def record(self, result, offset: int = 0):
+        """
+        ファイル1件分の結果を記録してイベントを通知
+
+        Args:
+            result: 結果レコード
+            offset: 前のステップまでのファイル数（workflowの2ステップ目で使う）
+        """
+        with self._condition:
+            self.total = offset + result.total
+            if result.ok:
+                self.succeeded += 1
+            elif result.status == STATUS_NOT_FOUND:
+                self.not_found += 1
+            else:
+                self.failed += 1
+            self.bytes_in += result.bytes_in
+            self.bytes_out += result.bytes_out
+            self._events.append(result.as_dict())
+            self._condition.notify_all()
+
+    def set_state(self, state: str, error: Optional[str] = None):
+        """状態を更新してイベント待ちに通知"""
+        with self._condition:
+            self.state = state
+            self.error = error
+            if state == JOB_RUNNING:
+                self.started_at = time.time()
+            elif state in FINISHED_STATES:
+                self.finished_at = time.time()
+            self._condition.notify_all()
+
+    def events(self, timeout: Optional[float] = None) -> Iterator[dict]:
+        """
+        結果イベントを先頭から順に返す（ジョブ終了まで新しいイベントを待つ）
+
+        Args:
+            timeout: 新しいイベントを待つ最大秒数（省略時は無制限）
+
+        Yields:
+            dict: 結果レコードの辞書
+        """
+        index = 0
+        while True:
+            with self._condition:
+                while index >= len(self._events) and not self.finished:
+                    if not self._condition.wait(timeout):
+                        return
+                pending = self._events[index:]
+                finished = self.finished
+            yield from pending
+            index += len(pending)
+            if finished and not pending:
+                return
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """ジョブの終了を待つ（終了していればTrue）"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.finished, timeout)
+
+    def as_dict(self) -> dict:
+        """ジョブの状態をJSONに変換できる辞書で返す"""
+        with self._condition:
+            return {
+                "id": self.id,
+                "name": self.name,
+                "kind": self.kind,
+                "priority": self.priority,
+                "group": self.group,
+                "state": self.state,
+                "error": self.error,
+                "params": self.params,
+                "total": self.total,
+                "done": self.done,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "not_found": self.not_found,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+def validate_job(
+    kind: str,
+    params: dict,
+    priority: int = 0,
+    group: Optional[str] = None,
+    name: Optional[str] = None,
+):
+    """
+    ジョブのパラメーターを検証
+
+    Raises:
+        ValueError: 種別が不明、ディレクトリ指定が不正、colorが不明、
+            target_ssimが範囲外・NumPyがない場合、または値の型が正しくない場合
+    """
+    if not isinstance(kind, str) or kind not in JOB_KINDS:
+        raise ValueError(f"不明なジョブ種別です: {kind}")
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise ValueError(f"priority には整数を指定してください: {priority!r}")
+    for key, value in (("group", group), ("name", name)):
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{key} には文字列を指定してください: {value!r}")
+
+    for key in JOB_KINDS[kind]:
+        if not params.get(key):
+            raise ValueError(f"{key} を指定してください")
+    for key, value in params.items():
+        if key.endswith("_dir") and not isinstance(value, (str, os.PathLike)):
+            raise ValueError(f"{key} にはパスを文字列で指定してください: {value!r}")
+    for key in JOB_KINDS[kind]:
+        if key not in OUTPUT_DIR_PARAMS and not Path(params[key]).is_dir():
+            raise ValueError(f"ディレクトリが存在しません: {params[key]}")
+
+    for key, low, high in (("quality", 1, 100), ("max_long_side", 1, None)):
+        value = params.get(key)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"{key} には整数を指定してください: {value!r}")
+        if value < low or (high is not None and value > high):
+            limit = f"{low}〜{high}" if high is not None else f"{low}以上"
+            raise ValueError(f"{key} は{limit}で指定してください: {value}")
+    if "color" in params:
+        from .core.color import check_color_mode
+
+        if not isinstance(params["color"], str):
+            raise ValueError(f"color には文字列を指定してください: {params['color']!r}")
+        check_color_mode(params["color"])
+    target_ssim = params.get("target_ssim")
+    if target_ssim is not None:
+        from .core.quality import check_target_ssim
+
+        if isinstance(target_ssim, bool) or not isinstance(target_ssim, (int, float)):
+            raise ValueError(f"target_ssim には数値を指定してください: {target_ssim!r}")
+        try:
+            check_target_ssim(target_ssim)
+        except ImportError as e:
+            raise ValueError(str(e)) from None
+
+
+def _make_copier(tuning: Optional["BatchTuning"], copies: Optional[int]):
+    """choiceで使う並列コピー（自動調整・並列数の指定がなければNone）"""
+    if tuning is None and (copies is None or copies <= 1):
+        return None
+    from .core.copier import AdaptiveCopier
+
+    if tuning is not None:
+        return AdaptiveCopier(tuner=tuning.copies)
+    return AdaptiveCopier(max_copies=copies, min_copies=copies, initial_copies=copies)
+
+
+def run_job(
+    job: Job,
+    pool: Optional["WorkerPool"] = None,
+    tuning: Optional["BatchTuning"] = None,
+    copies: Optional[int] = None,
+):
+    """
+    ジョブを実行して結果を記録（例外はジョブの失敗として記録する）
+
+    Args:
+        job: 実行するジョブ
+        pool: reduceで使うワーカープール（省略時は並列処理なし）
+        tuning: 指定時はワーカー数とコピーの並列数を処理速度から自動調整する
+        copies: choiceで同時に実行するコピーの数（省略時・1は並列コピーなし。
+            tuningの指定時は使わない）
+    """
+    if job.state != JOB_RUNNING:
+        job.set_state(JOB_RUNNING)
+    params = job.params
+    try:
+        output_dir = Path(params["output_dir"])
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        if job.kind in ("reduce", "workflow"):
+            from .core.image_processor import ImageProcessor
+
+            processor = ImageProcessor(
+                max_long_side=params.get("max_long_side", 3000),
+                quality=params.get("quality", 87),
+                color=params.get("color", "none"),
+                target_ssim=params.get("target_ssim"),
+            )
+            if job.kind == "reduce":
+                input_dir, reduce_dir = Path(params["input_dir"]), output_dir
+            else:
+                input_dir = Path(params["original_dir"])
+                reduce_dir = Path(params["reduced_dir"])
+                reduce_dir.mkdir(parents=True, exist_ok=True)
+            for result in reduce_directory(
+                input_dir,
+                reduce_dir,
+                processor,
+                cancel=job.cancel_token,
+                pool=pool,
+                tuner=tuning.workers if tuning is not None else None,
+            ):
+                job.record(result)
+
+        if job.kind in ("choice", "workflow"):
+            offset = job.total
+            for result in choose(
+                Path(params["original_dir"]),
+                output_dir,
+                Path(params["selected_dir"]),
+                cancel=job.cancel_token,
+                copier=_make_copier(tuning, copies),
+            ):
+                job.record(result, offset)
+    except Exception as e:
+        job.set_state(JOB_FAILED, str(e))
+        return
+
+    job.set_state(JOB_CANCELLED if job.cancel_token.cancelled else JOB_DONE)
+
+
+class JobScheduler:
+    """優先度付きキューでジョブを実行するスケジューラー"""
+
+    def __init__(
+        self,
+        pool: Optional["WorkerPool"] = None,
+        max_concurrent_jobs: int = 1,
+        policy: str = POLICY_PRIORITY,
+        tuning: Optional["BatchTuning"] = None,
+        copies: Optional[int] = None,
+    ):
+        """
+        Args:
+            pool: 全ジョブで共有するワーカープール（省略時は並列処理なし）
+            max_concurrent_jobs: 同時に実行するジョブ数
+            policy: "priority"（優先度順）または "fair"（実行中のジョブが
+                少ないグループを優先し、グループ内は優先度順）
+            tuning: 全ジョブで共有する自動調整（ワーカー数・コピーの並列数）
+            copies: choiceで同時に実行するコピーの数（tuningの指定時は使わない）
+
+        Raises:
+            ValueError: 方針が不明な場合
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"不明なスケジューリング方針です: {policy}")
+        self.pool = pool
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.policy = policy
+        self.tuning = tuning
+        self.copies = copies
+        self._running_groups: Dict[str, int] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+    def start(self):
+        """ジョブ実行スレッドを起動"""
+        with self._condition:
+            if self._threads:
+                return
+            for i in range(self.max_concurrent_jobs):
+                thread = threading.Thread(
+                    target=self._run_loop, name=f"sentei-job-{i}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    @property
+    def alive(self) -> bool:
+        """ジョブ実行スレッドが1つ以上動いているかどうか"""
+        with self._condition:
+            return any(thread.is_alive() for thread in self._threads)
+
+    def submit(
+        self,
+        kind: str,
+        params: dict,
+        priority: int = 0,
+        group: Optional[str] = None,
+        name: Optional[str] = None,
+    ) -> Job:
+        """
+        ジョブを登録
+
+        Args:
+            kind: ジョブ種別（"reduce"、"choice" または "workflow"）
+            params: ジョブのパラメーター
+            priority: 優先度（大きいほど先に実行、同じなら登録順）
+            group: フェアシェアの単位（省略時はジョブごと）
+            name: 表示用の名前
+
+        Returns:
+            Job: 登録したジョブ
+
+        Raises:
+            ValueError: パラメーターが不正な場合
+        """
+        validate_job(kind, params, priority, group, name)
+        job = Job(kind, params, priority, group, name)
+        with self._condition:
+            self._jobs[job.id] = job
+            heapq.heappush(self._queue, (-priority, next(self._sequence), job))
+            self._condition.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """IDでジョブを取得"""
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        """登録済みのジョブを登録順に取得"""
+        with self._condition:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        ジョブをキャンセル（待機中ならすぐに、実行中なら次のファイルの前に停止）
+
+        Returns:
+            Optional[Job]: 対象のジョブ（存在しなければNone）
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_token.cancel()
+        with self._condition:
+            if job.state == JOB_QUEUED:
+                job.set_state(JOB_CANCELLED)
+        return job
+
+    def _next_job(self) -> Optional[Job]:
+        """次に実行するジョブを取得（停止時はNone）"""
+        with self._condition:
+            while True:
+                while self._queue and self._queue[0][2].state != JOB_QUEUED:
+                    heapq.heappop(self._queue)
+                if self._stopping:
+                    return None
+                if self._queue:
+                    job = self._pop_next()
+                    job.set_state(JOB_RUNNING)
+                    running = self._running_groups
+                    running[job.group] = running.get(job.group, 0) + 1
+                    return job
+                self._condition.wait()
+
+    def _pop_next(self) -> Job:
+        """方針に従ってキューから次のジョブを取り出す（ロック取得済みで呼ぶ）"""
+        if self.policy == POLICY_PRIORITY:
+            return heapq.heappop(self._queue)[2]
+
+        # フェアシェア: 実行中のジョブが最も少ないグループの中で最も優先度が高いジョブ
+        running = self._running_groups
+        index = min(
+            range(len(self._queue)),
+            key=lambda i: (
+                self._queue[i][2].state != JOB_QUEUED,
+                running.get(self._queue[i][2].group, 0),
+                self._queue[i][:2],
+            ),
+        )
+        entry = self._queue[index]
+        self._queue[index] = self._queue[-1]
+        self._queue.pop()
+        heapq.heapify(self._queue)
+        return entry[2]
+
+    def _run_loop(self):
+        """ジョブ実行スレッドのメインループ"""
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                run_job(job, self.pool, self.tuning, self.copies)
+            except Exception as e:
+                # 想定外の例外でも実行スレッドを止めずに次のジョブへ進む
+                job.set_state(JOB_FAILED, str(e))
+            finally:
+                with self._condition:
+                    self._running_groups[job.group] -= 1
+
+    def shutdown(self, cancel_running: bool = True):
+        """スケジューラーを停止（待機中のジョブはキャンセルされる）"""
+        with self._condition:
+            self._stopping = True
+            for job in self._jobs.values():
+                if job.state == JOB_QUEUED or cancel_running:
+                    job.cancel_token.cancel()
+                if job.state == JOB_QUEUED:
+                    job.set_state(JOB_CANCELLED)
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
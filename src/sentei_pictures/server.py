@@ -0,0 +1,185 @@
+"""
+ジョブサーバー
+localhostのHTTPでreduce/choiceジョブを受け付けるデーモン
+
+エンドポイント:
+    GET    /jobs               ジョブ一覧
+    POST   /jobs               ジョブ登録（JSON: {"kind", "priority", "group", "name", ...}）
+    GET    /jobs/<id>          ジョブの状態
+    GET    /jobs/<id>/events   結果イベントのストリーム（1行1件のJSON）
+    POST   /jobs/<id>/cancel   ジョブのキャンセル（DELETE /jobs/<id> も可）
+"""
+
+import json
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from .jobs import JobScheduler
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """ジョブAPIのリクエストハンドラー"""
+
+    server: "JobServer"
+
+    def log_message(self, format, *args):
+        """アクセスログは出力しない"""
+
+    def _send_json(self, status: HTTPStatus, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, message: str):
+        self._send_json(status, {"error": message})
+
+    def _route(self):
+        """パスを (ジョブID, サブリソース) に分解（/jobs 以外はNone）"""
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if parts[0] != "jobs" or len(parts) > 3:
+            return None
+        job_id = parts[1] if len(parts) > 1 else None
+        action = parts[2] if len(parts) > 2 else None
+        return job_id, action
+
+    def do_GET(self):
+        route = self._route()
+        if route is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "not found")
+            return
+
+        job_id, action = route
+        scheduler = self.server.scheduler
+        if job_id is None:
+            self._send_json(HTTPStatus.OK, [job.as_dict() for job in scheduler.list()])
+            return
+
+        job = scheduler.get(job_id)
+        if job is None:
+            self._send_error(HTTPStatus.NOT_FOUND, f"ジョブが存在しません: {job_id}")
+        elif action is None:
+            self._send_json(HTTPStatus.OK, job.as_dict())
+        elif action == "events":
+            self._stream_events(job)
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "not found")
+
+    def _stream_events(self, job):
+        """結果イベントをジョブ終了まで1行ずつ送信し、最後にジョブの状態を送る"""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for event in job.events():
+                line = json.dumps({"type": "result", **event}, ensure_ascii=False)
+                self.wfile.write(line.encode("utf-8") + b"\n")
+                self.wfile.flush()
+            line = json.dumps({"type": "job", **job.as_dict()}, ensure_ascii=False)
+            self.wfile.write(line.encode("utf-8") + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def do_POST(self):
+        route = self._route()
+        if route is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "not found")
+            return
+
+        job_id, action = route
+        if job_id is not None:
+            if action == "cancel":
+                self._cancel(job_id)
+            else:
+                self._send_error(HTTPStatus.NOT_FOUND, "not found")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            data = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(data, dict):
+                raise ValueError("JSONオブジェクトを送信してください")
+            kind = data.pop("kind", None)
+            priority = data.pop("priority", 0)
+            if isinstance(priority, bool) or not isinstance(priority, (int, str)):
+                raise ValueError("priorityには整数を指定してください")
+            priority = int(priority)
+            group = data.pop("group", None)
+            name = data.pop("name", None)
+            job = self.server.scheduler.submit(kind, data, priority, group, name)
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+
+        self._send_json(HTTPStatus.CREATED, job.as_dict())
+
+    def do_DELETE(self):
+        route = self._route()
+        if route is None or route[0] is None or route[1] is not None:
+            self._send_error(HTTPStatus.NOT_FOUND, "not found")
+            return
+        self._cancel(route[0])
+
+    def _cancel(self, job_id: str):
+        job = self.server.scheduler.cancel(job_id)
+        if job is None:
+            self._send_error(HTTPStatus.NOT_FOUND, f"ジョブが存在しません: {job_id}")
+        else:
+            self._send_json(HTTPStatus.OK, job.as_dict())
+
+
+class JobServer(ThreadingHTTPServer):
+    """ジョブスケジューラーを持つHTTPサーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, address, scheduler: JobScheduler):
+        """
+        Args:
+            address: (ホスト, ポート)。ポート0で空きポートを使う
+            scheduler: ジョブを実行するスケジューラー
+        """
+        super().__init__(address, JobRequestHandler)
+        self.scheduler = scheduler
+
+    @property
+    def url(self) -> str:
+        """サーバーのベースURL"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        self.scheduler.start()
+        super().serve_forever(poll_interval)
+
+    def server_close(self):
+        super().server_close()
+        self.scheduler.shutdown()
+
+
+def create_server(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    scheduler: Optional[JobScheduler] = None,
+) -> JobServer:
+    """
+    ジョブサーバーを作成（serve_foreverで起動する）
+
+    Args:
+        host: 待ち受けるホスト
+        port: 待ち受けるポート（0で空きポート）
+        scheduler: スケジューラー（省略時は共有ワーカープールを使う）
+
+    Returns:
+        JobServer: 作成したサーバー
+    """
+    if scheduler is None:
+        from .core.worker_pool import get_shared_pool
+
+        scheduler = JobScheduler(get_shared_pool())
+    return JobServer((host, port), scheduler)
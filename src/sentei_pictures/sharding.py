@@ -0,0 +1,506 @@
+"""
+シャード分散処理
+共有ファイルシステム上の作業ディレクトリを介して、複数ホストのワーカーでreduceを分担する
+
+作業ディレクトリの構成:
+    job.json              入出力ディレクトリ・処理設定・リース期間
+    shards/<id>.json      シャードに含まれるファイル名の一覧
+    leases/<id>.lease     処理中のワーカーのリース（O_EXCLで作成、期限切れは回収）
+    done/<id>.json        完了したシャードの集計結果
+
+リースは一定間隔で更新され、期限（expires_at）を過ぎたリースは他のワーカーが
+アトミックなリネームで回収して処理をやり直す。ホスト間の時刻はNTP等で同期されている前提。
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from .api import CancelToken, ReduceResult, reduce_directory
+from .core.file_matcher import FileMatcher
+
+if TYPE_CHECKING:
+    from .core.worker_pool import WorkerPool
+
+DEFAULT_SHARD_SIZE = 200
+DEFAULT_LEASE_SECONDS = 60.0
+
+
+def _write_json_atomic(path: Path, data: dict):
+    """一時ファイルに書いてからリネームしてJSONをアトミックに書き込む"""
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path) -> Optional[dict]:
+    """JSONを読み込む（存在しない・書き込み途中の場合はNone）"""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _restore_lease(expired_path: Path, lease_path: Path):
+    """
+    誤って回収したリースを元の名前に戻す
+
+    戻すまでの間に別のワーカーがリースを作っていれば上書きしない（戻せなかった
+    リースの持ち主は次の更新で回収されたことに気づいて処理をやめる）。
+    """
+    try:
+        os.link(expired_path, lease_path)
+    except FileExistsError:
+        pass
+    os.unlink(expired_path)
+
+
+def default_worker_id() -> str:
+    """ホスト名・PID・乱数からワーカーIDを作成"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class Lease:
+    """シャードのリース"""
+
+    __slots__ = ("shard_id", "worker", "path", "expires_at")
+
+    def __init__(self, shard_id: str, worker: str, path: Path, expires_at: float):
+        self.shard_id = shard_id
+        self.worker = worker
+        self.path = path
+        self.expires_at = expires_at
+
+
+class ShardStatus:
+    """作業ディレクトリ全体の進捗"""
+
+    def __init__(self):
+        self.total_shards = 0
+        self.done_shards = 0
+        self.leased_shards = 0
+        self.expired_leases = 0
+        self.total_files = 0
+        self.done_files = 0
+        self.failed_files = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.workers: Dict[str, int] = {}
+
+    @property
+    def complete(self) -> bool:
+        """全シャードが完了したかどうか"""
+        return self.done_shards == self.total_shards
+
+    @property
+    def elapsed(self) -> float:
+        """最初のシャード開始からの経過秒数（完了済みなら完了まで）"""
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.complete else time.time()
+        return max(end - self.started_at, 1e-9)
+
+    @property
+    def files_per_second(self) -> float:
+        """全ワーカー合計のスループット（ファイル/秒）"""
+        return self.done_files / self.elapsed if self.started_at else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        """全ワーカー合計のスループット（入力MB/秒）"""
+        if not self.started_at:
+            return 0.0
+        return self.bytes_in / (1024 * 1024) / self.elapsed
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """残り時間の見積もり（秒）"""
+        rate = self.files_per_second
+        if rate <= 0:
+            return None
+        return (self.total_files - self.done_files) / rate
+
+
+class ShardWorkDir:
+    """シャード分散処理の作業ディレクトリ"""
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: 作業ディレクトリ（initで作成済みのもの）
+        """
+        self.path = Path(path)
+        self.shards_dir = self.path / "shards"
+        self.leases_dir = self.path / "leases"
+        self.done_dir = self.path / "done"
+        self._config: Optional[dict] = None
+
+    @classmethod
+    def create(
+        cls,
+        path: Path,
+        input_dir: Path,
+        output_dir: Path,
+        settings: Optional[dict] = None,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ) -> "ShardWorkDir":
+        """
+        入力ディレクトリのJPEGファイルをシャードに分割して作業ディレクトリを作成
+
+        Args:
+            path: 作業ディレクトリ
+            input_dir: 入力ディレクトリ（全ワーカーから同じパスで見えること）
+            output_dir: 出力ディレクトリ（全ワーカーから同じパスで見えること）
+            settings: ImageProcessorの設定（max_long_side, quality）
+            shard_size: 1シャードあたりのファイル数
+            lease_seconds: リースの有効期間（秒）
+
+        Returns:
+            ShardWorkDir: 作成した作業ディレクトリ
+
+        Raises:
+            FileExistsError: 作業ディレクトリが既に初期化されている場合
+            ValueError: shard_sizeが1未満、またはlease_secondsが0以下の場合
+        """
+        if shard_size < 1:
+            raise ValueError(f"シャードサイズは1以上で指定してください: {shard_size}")
+        if not lease_seconds > 0:
+            raise ValueError(f"リースの有効期間は0より大きい値を指定してください: {lease_seconds}")
+        workdir = cls(path)
+        workdir.path.mkdir(parents=True, exist_ok=True)
+        if (workdir.path / "job.json").exists():
+            raise FileExistsError(f"作業ディレクトリは初期化済みです: {workdir.path}")
+
+        for directory in (workdir.shards_dir, workdir.leases_dir, workdir.done_dir):
+            directory.mkdir(exist_ok=True)
+
+        names = sorted(f.name for f in FileMatcher.get_jpeg_files(Path(input_dir)))
+        for number, start in enumerate(range(0, len(names), shard_size)):
+            _write_json_atomic(
+                workdir.shards_dir / f"{number:06d}.json",
+                {"files": names[start : start + shard_size]},
+            )
+
+        _write_json_atomic(
+            workdir.path / "job.json",
+            {
+                "input_dir": str(Path(input_dir).resolve()),
+                "output_dir": str(Path(output_dir).resolve()),
+                "settings": settings or {},
+                "total_files": len(names),
+                "lease_seconds": lease_seconds,
+                "created_at": time.time(),
+            },
+        )
+        return workdir
+
+    @property
+    def config(self) -> dict:
+        """job.jsonの内容"""
+        if self._config is None:
+            config = _read_json(self.path / "job.json")
+            if config is None:
+                raise FileNotFoundError(f"作業ディレクトリではありません: {self.path}")
+            self._config = config
+        return self._config
+
+    @property
+    def lease_seconds(self) -> float:
+        return float(self.config["lease_seconds"])
+
+    def shard_ids(self) -> List[str]:
+        """全シャードのID"""
+        return sorted(p.stem for p in self.shards_dir.glob("*.json"))
+
+    def read_shard(self, shard_id: str) -> List[str]:
+        """シャードに含まれるファイル名"""
+        return _read_json(self.shards_dir / f"{shard_id}.json")["files"]
+
+    def is_done(self, shard_id: str) -> bool:
+        """シャードが完了しているかどうか"""
+        return (self.done_dir / f"{shard_id}.json").exists()
+
+    def try_acquire(self, shard_id: str, worker: str) -> Optional[Lease]:
+        """
+        シャードのリースを取得（他のワーカーが有効なリースを持っていればNone）
+
+        期限切れのリースは一意な名前へのリネームで回収してから取得し直す。
+        期限切れを確認してからリネームするまでに、他のワーカーが同じリースを回収して
+        新しいリースを作っている場合がある。このためリネームしたファイルを読み直し、
+        確認したリースでなければ元に戻して取得を諦める。
+        """
+        if self.is_done(shard_id):
+            return None
+
+        lease_path = self.leases_dir / f"{shard_id}.lease"
+        for _ in range(2):
+            expires_at = time.time() + self.lease_seconds
+            try:
+                fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                holder = _read_json(lease_path)
+                if not self._is_expired(lease_path, holder):
+                    return None
+                expired_path = lease_path.with_name(
+                    f"{lease_path.name}.expired.{worker}"
+                )
+                try:
+                    os.rename(lease_path, expired_path)
+                except FileNotFoundError:
+                    return None
+                if _read_json(expired_path) != holder or not self._is_expired(
+                    expired_path, holder
+                ):
+                    # 他のワーカーが回収して作り直した有効なリースだった
+                    _restore_lease(expired_path, lease_path)
+                    return None
+                continue
+
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"worker": worker, "expires_at": expires_at}, f)
+            if self.is_done(shard_id):
+                # 取得の直前に他のワーカーが完了させていた
+                os.unlink(lease_path)
+                return None
+            return Lease(shard_id, worker, lease_path, expires_at)
+        return None
+
+    def _is_expired(self, lease_path: Path, holder: Optional[dict]) -> bool:
+        """
+        リースが期限切れかどうか
+
+        作成直後（書き込み前）に停止したワーカーのリースは中身を読めないため、
+        ファイルの更新日時からリース期間を過ぎていれば期限切れとみなす。
+        """
+        if holder is not None:
+            return holder["expires_at"] <= time.time()
+        try:
+            modified = lease_path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return modified + self.lease_seconds <= time.time()
+
+    def renew(self, lease: Lease, progress: Optional[dict] = None) -> bool:
+        """
+        リースの期限を延長
+
+        確認してから書き換えるまでに回収・再取得されたリースを上書きしないよう、
+        新しい内容を一時ファイルに書いてから、リースを一意な名前にリネームして
+        自分のリースであることを確認し、一時ファイルを元の名前にリンクする。
+        リネームしている間に他のワーカーがリースを取得していれば延長を諦める。
+
+        Args:
+            lease: 延長するリース
+            progress: リースに記録する処理中シャードの進捗
+
+        Returns:
+            bool: 延長できた場合True（他のワーカーに回収されていればFalse）
+        """
+        expires_at = time.time() + self.lease_seconds
+        renewed_path = lease.path.with_name(
+            f".{lease.path.name}.{uuid.uuid4().hex}.tmp"
+        )
+        renewed_path.write_text(
+            json.dumps(
+                {"worker": lease.worker, "expires_at": expires_at, **(progress or {})},
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        held_path = lease.path.with_name(f"{lease.path.name}.renew.{lease.worker}")
+        try:
+            try:
+                os.rename(lease.path, held_path)
+            except FileNotFoundError:
+                return False
+            holder = _read_json(held_path)
+            if holder is None or holder["worker"] != lease.worker:
+                # 他のワーカーが回収して作り直したリースだった
+                _restore_lease(held_path, lease.path)
+                return False
+            try:
+                os.link(renewed_path, lease.path)
+            except FileExistsError:
+                # リネームしている間に他のワーカーがリースを取得した
+                os.unlink(held_path)
+                return False
+            os.unlink(held_path)
+        finally:
+            renewed_path.unlink(missing_ok=True)
+        lease.expires_at = expires_at
+        return True
+
+    def release(self, lease: Lease):
+        """リースを解放（自分のリースでなければ何もしない）"""
+        holder = _read_json(lease.path)
+        if holder is not None and holder["worker"] == lease.worker:
+            try:
+                os.unlink(lease.path)
+            except FileNotFoundError:
+                pass
+
+    def mark_done(self, lease: Lease, record: dict):
+        """シャードの完了を記録してリースを解放"""
+        _write_json_atomic(self.done_dir / f"{lease.shard_id}.json", record)
+        self.release(lease)
+
+    def claim_next(self, worker: str) -> Optional[Lease]:
+        """未完了のシャードを先頭から順にリース取得を試みる"""
+        for shard_id in self.shard_ids():
+            lease = self.try_acquire(shard_id, worker)
+            if lease is not None:
+                return lease
+        return None
+
+    def status(self) -> ShardStatus:
+        """完了記録とリースから全体の進捗を集計"""
+        status = ShardStatus()
+        status.total_files = self.config["total_files"]
+        shard_ids = self.shard_ids()
+        status.total_shards = len(shard_ids)
+        now = time.time()
+
+        for shard_id in shard_ids:
+            record = _read_json(self.done_dir / f"{shard_id}.json")
+            if record is not None:
+                status.done_shards += 1
+            else:
+                record = _read_json(self.leases_dir / f"{shard_id}.lease")
+                if record is None:
+                    continue
+                if record["expires_at"] < now:
+                    status.expired_leases += 1
+                    continue
+                status.leased_shards += 1
+                if "started_at" not in record:
+                    # 取得直後で進捗がまだ記録されていない
+                    continue
+
+            status.done_files += record.get("files_done", 0)
+            status.failed_files += record.get("failed", 0)
+            status.bytes_in += record.get("bytes_in", 0)
+            status.bytes_out += record.get("bytes_out", 0)
+            worker = record["worker"]
+            status.workers[worker] = status.workers.get(worker, 0) + record.get(
+                "files_done", 0
+            )
+            started_at = record["started_at"]
+            if status.started_at is None or started_at < status.started_at:
+                status.started_at = started_at
+            finished_at = record.get("finished_at")
+            if finished_at and (
+                status.finished_at is None or finished_at > status.finished_at
+            ):
+                status.finished_at = finished_at
+
+        return status
+
+
+def _process_shard(
+    workdir: ShardWorkDir,
+    lease: Lease,
+    pool: Optional["WorkerPool"],
+    on_result: Optional[Callable[[ReduceResult], None]],
+) -> bool:
+    """
+    リース済みのシャードを処理（リース更新用のスレッドを並行して動かす）
+
+    Returns:
+        bool: 完了を記録できた場合True（処理中にリースを失った場合False）
+    """
+    from .core.image_processor import ImageProcessor
+
+    config = workdir.config
+    input_dir = Path(config["input_dir"])
+    output_dir = Path(config["output_dir"])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    processor = ImageProcessor(**config["settings"])
+    files = [input_dir / name for name in workdir.read_shard(lease.shard_id)]
+
+    progress = {
+        "worker": lease.worker,
+        "started_at": time.time(),
+        "files_done": 0,
+        "failed": 0,
+        "bytes_in": 0,
+        "bytes_out": 0,
+    }
+    lost = CancelToken()
+    stop_renewing = threading.Event()
+
+    def renew_loop():
+        while not stop_renewing.wait(workdir.lease_seconds / 3):
+            if not workdir.renew(lease, dict(progress)):
+                lost.cancel()
+                return
+
+    renewer = threading.Thread(target=renew_loop, daemon=True)
+    renewer.start()
+    try:
+        for result in reduce_directory(
+            input_dir, output_dir, processor, cancel=lost, files=files, pool=pool
+        ):
+            progress["files_done"] += 1
+            progress["bytes_in"] += result.bytes_in
+            progress["bytes_out"] += result.bytes_out
+            if not result.ok:
+                progress["failed"] += 1
+            if on_result is not None:
+                on_result(result)
+    finally:
+        stop_renewing.set()
+        renewer.join()
+
+    if lost.cancelled:
+        return False
+    progress["finished_at"] = time.time()
+    workdir.mark_done(lease, progress)
+    return True
+
+
+def run_worker(
+    path: Path,
+    worker: Optional[str] = None,
+    pool: Optional["WorkerPool"] = None,
+    on_result: Optional[Callable[[ReduceResult], None]] = None,
+    poll_interval: Optional[float] = None,
+) -> int:
+    """
+    全シャードが完了するまでシャードを取得して処理する
+
+    他のワーカーが処理中のシャードしか残っていない場合は、
+    そのワーカーが停止してリースが期限切れになるのを待って回収する。
+
+    Args:
+        path: 作業ディレクトリ
+        worker: ワーカーID（省略時はホスト名・PIDから作成）
+        pool: ワーカープール（省略時は並列処理なし）
+        on_result: ファイル1件ごとに呼ばれるコールバック
+        poll_interval: 空きシャードを待つ間隔（省略時はリース期間の1/4、最大2秒）
+
+    Returns:
+        int: このワーカーが完了させたシャード数
+    """
+    workdir = ShardWorkDir(path)
+    worker = worker or default_worker_id()
+    if poll_interval is None:
+        poll_interval = min(workdir.lease_seconds / 4, 2.0)
+
+    completed = 0
+    while True:
+        lease = workdir.claim_next(worker)
+        if lease is not None:
+            if _process_shard(workdir, lease, pool, on_result):
+                completed += 1
+            continue
+        if all(workdir.is_done(shard_id) for shard_id in workdir.shard_ids()):
+            return completed
+        time.sleep(poll_interval)
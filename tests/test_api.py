@@ -0,0 +1,119 @@
+"""Tests for the streaming API."""
+
+from PIL import Image
+
+from sentei_pictures.api import (
+    STATUS_FAILED,
+    STATUS_NOT_FOUND,
+    STATUS_OK,
+    CancelToken,
+    ChoiceResult,
+    ReduceResult,
+    choose,
+    reduce_directory,
+)
+from sentei_pictures.core.image_processor import ImageProcessor
+from sentei_pictures.core.worker_pool import WorkerPool
+
+
+def _make_jpeg(path, size=(400, 300)):
+    Image.new("RGB", size, (120, 80, 40)).save(path, "JPEG")
+
+
+class TestReduceDirectory:
+    """reduce_directory のテスト"""
+
+    def test_yields_result_per_file(self, tmp_path, capsys):
+        """1ファイルごとに結果を返し、標準出力には何も書かないことをテスト"""
+        src = tmp_path / "src"
+        out = tmp_path / "out"
+        src.mkdir()
+        out.mkdir()
+        _make_jpeg(src / "a.jpg", (400, 300))
+        _make_jpeg(src / "b.jpg", (100, 50))
+
+        processor = ImageProcessor(max_long_side=200)
+        results = sorted(
+            reduce_directory(src, out, processor), key=lambda r: r.path.name
+        )
+
+        assert [r.status for r in results] == [STATUS_OK, STATUS_OK]
+        assert [r.total for r in results] == [2, 2]
+        assert results[0].original_size == (400, 300)
+        assert results[0].new_size == (200, 150)
+        assert results[0].resized is True
+        assert results[1].resized is False
+        assert results[0].bytes_in > 0 and results[0].bytes_out > 0
+        assert (out / "a.jpg").exists()
+        assert capsys.readouterr().out == ""
+
+    def test_failure_is_reported_in_record(self, tmp_path):
+        """読み込めないファイルはエラーとして記録されることをテスト"""
+        (tmp_path / "broken.jpg").write_bytes(b"not a jpeg")
+
+        results = list(reduce_directory(tmp_path, tmp_path / "missing"))
+
+        assert len(results) == 1
+        assert results[0].status == STATUS_FAILED
+        assert results[0].error
+
+    def test_cancel_stops_iteration(self, tmp_path):
+        """キャンセル後は次のファイルに進まないことをテスト"""
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            _make_jpeg(tmp_path / name)
+        out = tmp_path / "out"
+        out.mkdir()
+
+        token = CancelToken()
+        results = []
+        for result in reduce_directory(tmp_path, out, cancel=token):
+            results.append(result)
+            token.cancel()
+
+        assert len(results) == 1
+
+    def test_pool_results_keep_input_order(self, tmp_path):
+        """ワーカープール使用時も入力順に結果が返ることをテスト"""
+        out = tmp_path / "out"
+        out.mkdir()
+        files = []
+        for i in range(5):
+            files.append(tmp_path / f"{i}.jpg")
+            _make_jpeg(files[-1])
+
+        pool = WorkerPool(max_workers=2)
+        try:
+            results = list(reduce_directory(tmp_path, out, files=files, pool=pool))
+        finally:
+            pool.shutdown()
+
+        assert [r.path for r in results] == files
+        assert [r.index for r in results] == [1, 2, 3, 4, 5]
+        assert all(r.ok for r in results)
+
+    def test_result_records_use_slots(self):
+        """結果レコードが__dict__を持たないことをテスト"""
+        assert not hasattr(ReduceResult(1, 1, None), "__dict__")
+        assert not hasattr(ChoiceResult(1, 1, None), "__dict__")
+
+
+class TestChoose:
+    """choose のテスト"""
+
+    def test_copies_matching_originals(self, tmp_path):
+        """選定ファイルに対応する元画像がコピーされることをテスト"""
+        original = tmp_path / "original"
+        selected = tmp_path / "selected"
+        out = tmp_path / "out"
+        for directory in (original, selected, out):
+            directory.mkdir()
+        _make_jpeg(original / "IMG_001.JPG")
+        _make_jpeg(selected / "IMG_001.jpg")
+        _make_jpeg(selected / "IMG_999.jpg")
+
+        results = {r.path.name: r for r in choose(original, out, selected)}
+
+        assert results["IMG_001.jpg"].status == STATUS_OK
+        assert results["IMG_001.jpg"].source_path == original / "IMG_001.JPG"
+        assert results["IMG_001.jpg"].bytes_out == (out / "IMG_001.JPG").stat().st_size
+        assert results["IMG_999.jpg"].status == STATUS_NOT_FOUND
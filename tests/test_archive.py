@@ -0,0 +1,403 @@
+"""Tests for reading reduce/choice sources from and writing outputs to archives."""
+
+import io
+import os
+import tarfile
+import threading
+import time
+import zipfile
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.api import choose_names, reduce_directory
+from sentei_pictures.cli import choice, reduce
+from sentei_pictures.core.archive import (
+    ArchiveError,
+    ArchiveMember,
+    ArchiveWriter,
+    open_archive_source,
+)
+from sentei_pictures.core.file_matcher import FileMatcher
+from sentei_pictures.core.header_parser import read_header
+from sentei_pictures.core.worker_pool import WorkerPool
+
+
+def _make_jpeg(path, size=(64, 48), colour=(0, 0, 0)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", size, colour).save(path, "JPEG")
+    return path
+
+
+def _make_source(tmp_path, suffix, count=3, compression=zipfile.ZIP_STORED):
+    """shoot/IMG_<n>.JPG と notes.txt を含むアーカイブを作成"""
+    originals = tmp_path / "originals"
+    files = [
+        _make_jpeg(originals / f"IMG_{i}.JPG", (320, 240), (i * 40, 0, 0))
+        for i in range(count)
+    ]
+    (originals / "notes.txt").write_text("memo")
+    path = tmp_path / f"shoot{suffix}"
+    if suffix == ".zip":
+        with zipfile.ZipFile(path, "w", compression) as zf:
+            for f in sorted(originals.iterdir()):
+                zf.write(f, f"shoot/{f.name}")
+    else:
+        with tarfile.open(path, "w") as tf:
+            for f in sorted(originals.iterdir()):
+                tf.add(f, f"shoot/{f.name}")
+    return path, files
+
+
+class TestArchiveSource:
+    """アーカイブからの読み込みのテスト"""
+
+    @pytest.mark.parametrize("suffix", [".zip", ".tar"])
+    def test_listing_and_reading(self, tmp_path, suffix):
+        """一覧がアーカイブ内の画像だけになり、内容と更新日時を読めることをテスト"""
+        path, files = _make_source(tmp_path, suffix)
+
+        members = FileMatcher.get_jpeg_files(path)
+
+        assert [m.name for m in members] == ["IMG_0.JPG", "IMG_1.JPG", "IMG_2.JPG"]
+        assert len(FileMatcher.get_image_files(path)) == 3
+        for member, original in zip(members, files):
+            assert member.read_bytes() == original.read_bytes()
+            assert member.stat().st_size == original.stat().st_size
+            assert abs(member.stat().st_mtime - original.stat().st_mtime) <= 2
+            assert read_header(member).size == (320, 240)
+
+    def test_tar_member_stream_is_seekable(self, tmp_path):
+        """TAR内のファイルのストリームがファイルの範囲内でシークできることをテスト"""
+        path, files = _make_source(tmp_path, ".tar", count=1)
+        (member,) = FileMatcher.get_jpeg_files(path)
+        data = files[0].read_bytes()
+
+        with member.open() as f:
+            f.seek(-10, os.SEEK_END)
+            assert f.read() == data[-10:]
+            f.seek(2)
+            assert f.read(4) == data[2:6]
+            assert f.read(len(data)) == data[6:]
+
+    def test_index_matches_by_stem(self, tmp_path):
+        """アーカイブから作成した索引で拡張子・大文字小文字違いを検索できることをテスト"""
+        path, _ = _make_source(tmp_path, ".zip")
+
+        index = FileMatcher.build_index(path)
+
+        assert index.find("img_1.jpg").member == "shoot/IMG_1.JPG"
+        assert FileMatcher.find_matching_file("IMG_2.png", path).name == "IMG_2.JPG"
+        assert index.find("IMG_9.jpg") is None
+
+    def test_listing_is_cached_until_archive_changes(self, tmp_path):
+        """アーカイブが変更されるまで一覧を読み直さないことをテスト"""
+        path, _ = _make_source(tmp_path, ".zip")
+
+        first = open_archive_source(path)
+        assert open_archive_source(path) is first
+
+        with zipfile.ZipFile(path, "a") as zf:
+            zf.writestr("shoot/IMG_9.JPG", b"x")
+        assert len(open_archive_source(path).jpeg_files()) == 4
+
+    def test_broken_archive_raises_archive_error(self, tmp_path):
+        """壊れたアーカイブはArchiveErrorになることをテスト"""
+        path = tmp_path / "broken.zip"
+        path.write_bytes(b"not a zip")
+
+        with pytest.raises(ArchiveError):
+            open_archive_source(path)
+
+    def test_member_pickles(self, tmp_path):
+        """ワーカープロセスに渡せるよう、pickleできることをテスト"""
+        import pickle
+
+        path, _ = _make_source(tmp_path, ".tar", count=1)
+        (member,) = FileMatcher.get_jpeg_files(path)
+
+        restored = pickle.loads(pickle.dumps(member))
+
+        assert isinstance(restored, ArchiveMember)
+        assert restored == member
+        assert restored.read_bytes() == member.read_bytes()
+
+
+class TestArchiveWriter:
+    """ArchiveWriter のテスト"""
+
+    def test_zip_is_stored_and_keeps_file_mtime(self, tmp_path):
+        """ZIPが無圧縮で書き込まれ、ファイルの更新日時を引き継ぐことをテスト"""
+        source = tmp_path / "a.jpg"
+        source.write_bytes(os.urandom(5000))
+        os.utime(source, (1_600_000_000, 1_600_000_000))
+
+        with ArchiveWriter(tmp_path / "out.zip") as archive:
+            archive.add_file("a.jpg", source)
+            archive.add_bytes("b.jpg", b"bbb")
+
+        with zipfile.ZipFile(tmp_path / "out.zip") as zf:
+            assert zf.namelist() == ["a.jpg", "b.jpg"]
+            assert zf.read("a.jpg") == source.read_bytes()
+            assert zf.read("b.jpg") == b"bbb"
+            info = zf.getinfo("a.jpg")
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert info.date_time == time.localtime(1_600_000_000)[:6]
+        assert archive.volumes == [tmp_path / "out.zip"]
+
+    def test_tar(self, tmp_path):
+        """TARに書き込めることをテスト"""
+        with ArchiveWriter(tmp_path / "out.tar") as archive:
+            archive.add_bytes("a.jpg", b"aaa", mtime=1_600_000_000)
+
+        with tarfile.open(tmp_path / "out.tar") as tf:
+            member = tf.getmember("a.jpg")
+            assert tf.extractfile(member).read() == b"aaa"
+            assert member.mtime == 1_600_000_000
+
+    @pytest.mark.parametrize("suffix", [".zip", ".tar"])
+    def test_volumes_stay_within_size(self, tmp_path, suffix):
+        """ボリュームが最大サイズを超えず、全エントリーが含まれることをテスト"""
+        volume_size = 64 * 1024
+        with ArchiveWriter(tmp_path / f"out{suffix}", volume_size) as archive:
+            for i in range(20):
+                archive.add_bytes(f"IMG_{i:02d}.jpg", os.urandom(10_000))
+            # 1ファイルで最大サイズを超える場合は単独のボリュームになる
+            archive.add_bytes("large.jpg", os.urandom(100_000))
+
+        assert [p.name for p in archive.volumes[:2]] == [
+            f"out.001{suffix}",
+            f"out.002{suffix}",
+        ]
+        names = []
+        for volume in archive.volumes:
+            if suffix == ".zip":
+                with zipfile.ZipFile(volume) as zf:
+                    members = zf.namelist()
+            else:
+                with tarfile.open(volume) as tf:
+                    members = tf.getnames()
+            if "large.jpg" in members:
+                assert members == ["large.jpg"]
+            else:
+                assert volume.stat().st_size <= volume_size
+            names += members
+        assert sorted(names) == sorted(
+            [f"IMG_{i:02d}.jpg" for i in range(20)] + ["large.jpg"]
+        )
+
+    def test_pending_bytes_are_bounded(self, tmp_path, monkeypatch):
+        """書き込み待ちが上限に達すると追加する側が待つことをテスト"""
+        release = threading.Event()
+        original = ArchiveWriter._write
+
+        def slow_write(self, *args):
+            release.wait(5)
+            original(self, *args)
+
+        monkeypatch.setattr(ArchiveWriter, "_write", slow_write)
+        archive = ArchiveWriter(tmp_path / "out.zip", max_pending_bytes=1000)
+        archive.add_bytes("a.jpg", b"x" * 800)
+        adder = threading.Thread(target=archive.add_bytes, args=("b.jpg", b"y" * 800))
+        adder.start()
+        adder.join(0.2)
+
+        assert adder.is_alive()
+        release.set()
+        adder.join(5)
+        archive.close()
+        with zipfile.ZipFile(tmp_path / "out.zip") as zf:
+            assert zf.namelist() == ["a.jpg", "b.jpg"]
+
+    def test_write_error_is_raised(self, tmp_path):
+        """書き込みスレッドの失敗がArchiveErrorとして送出されることをテスト"""
+        archive = ArchiveWriter(tmp_path / "out.zip")
+        archive.add_file("missing.jpg", tmp_path / "missing.jpg")
+
+        with pytest.raises(ArchiveError):
+            archive.close()
+
+    def test_duplicate_and_unknown_format_raise_value_error(self, tmp_path):
+        """重複した名前と対応していない拡張子はValueErrorになることをテスト"""
+        with pytest.raises(ValueError):
+            ArchiveWriter(tmp_path / "out.rar")
+
+        with ArchiveWriter(tmp_path / "out.zip") as archive:
+            archive.add_bytes("a.jpg", b"a")
+            with pytest.raises(ValueError):
+                archive.add_bytes("a.jpg", b"b")
+
+
+class TestReduceIntoArchive:
+    """アーカイブへのreduceのテスト"""
+
+    def test_parallel_reduce_writes_all_entries(self, tmp_path):
+        """並列に軽量化した結果が入力順にアーカイブに書き込まれることをテスト"""
+        files = [
+            _make_jpeg(tmp_path / "in" / f"IMG_{i}.jpg", (200, 100)) for i in range(6)
+        ]
+        pool = WorkerPool(max_workers=2)
+        try:
+            with ArchiveWriter(tmp_path / "out.zip") as archive:
+                results = list(
+                    reduce_directory(
+                        tmp_path / "in",
+                        tmp_path / "unused",
+                        files=files,
+                        pool=pool,
+                        archive=archive,
+                    )
+                )
+        finally:
+            pool.shutdown()
+
+        assert all(r.ok for r in results)
+        assert not (tmp_path / "unused").exists()
+        with zipfile.ZipFile(tmp_path / "out.zip") as zf:
+            assert zf.namelist() == [f.name for f in files]
+            for result in results:
+                data = zf.read(result.output_path.name)
+                assert len(data) == result.bytes_out
+                with Image.open(io.BytesIO(data)) as img:
+                    assert img.format == "JPEG"
+
+
+class TestReduceFromArchive:
+    """アーカイブを入力にしたreduce/choiceのテスト"""
+
+    @pytest.mark.parametrize(
+        "suffix, compression",
+        [(".zip", zipfile.ZIP_STORED), (".zip", zipfile.ZIP_DEFLATED), (".tar", 0)],
+    )
+    def test_parallel_reduce_from_archive(self, tmp_path, suffix, compression):
+        """ワーカープロセスでアーカイブ内の画像を軽量化できることをテスト"""
+        path, _ = _make_source(tmp_path, suffix, count=4, compression=compression)
+        (tmp_path / "out").mkdir()
+        pool = WorkerPool(max_workers=2)
+        try:
+            results = list(reduce_directory(path, tmp_path / "out", pool=pool))
+        finally:
+            pool.shutdown()
+
+        assert all(r.ok for r in results), [r.error for r in results]
+        assert results[0].as_dict()["path"] == f"{path}/shoot/IMG_0.JPG"
+        assert sorted(p.name for p in (tmp_path / "out").iterdir()) == [
+            f"IMG_{i}.JPG" for i in range(4)
+        ]
+
+    def test_choose_extracts_originals(self, tmp_path):
+        """choiceでアーカイブ内の元画像を更新日時ごと書き出すことをテスト"""
+        path, files = _make_source(tmp_path, ".tar")
+        (tmp_path / "out").mkdir()
+
+        results = list(choose_names(path, tmp_path / "out", ["img_2.jpg", "IMG_7"]))
+
+        assert [r.status for r in results] == ["ok", "not_found"]
+        output = tmp_path / "out" / "IMG_2.JPG"
+        assert output.read_bytes() == files[2].read_bytes()
+        assert int(output.stat().st_mtime) == int(files[2].stat().st_mtime)
+
+    def test_archive_to_archive(self, tmp_path):
+        """アーカイブからアーカイブへ元画像を移せることをテスト"""
+        path, files = _make_source(tmp_path, ".zip")
+
+        with ArchiveWriter(tmp_path / "picks.tar") as archive:
+            results = list(
+                choose_names(path, tmp_path / "unused", ["IMG_1"], archive=archive)
+            )
+
+        assert results[0].ok
+        with tarfile.open(tmp_path / "picks.tar") as tf:
+            assert tf.extractfile("IMG_1.JPG").read() == files[1].read_bytes()
+
+
+class TestArchiveCli:
+    """保存先が .zip / .tar の reduce / choice コマンドのテスト"""
+
+    def test_reduce_to_zip_volumes(self, tmp_path, capsys):
+        """reduceで保存先を.zipにすると、ボリュームに分割して書き込むことをテスト"""
+        for i in range(4):
+            _make_jpeg(tmp_path / "in" / f"IMG_{i}.jpg")
+        args = reduce.build_parser().parse_args(
+            [
+                str(tmp_path / "in"),
+                str(tmp_path / "out" / "delivery.zip"),
+                "-j",
+                "1",
+                "--volume-size",
+                "1",
+            ]
+        )
+
+        assert reduce.execute(args) == 0
+
+        assert "アーカイブ:" in capsys.readouterr().out
+        with zipfile.ZipFile(tmp_path / "out" / "delivery.001.zip") as zf:
+            assert sorted(zf.namelist()) == [f"IMG_{i}.jpg" for i in range(4)]
+
+    def test_choice_list_to_tar(self, tmp_path):
+        """choiceで保存先を.tarにすると、元画像がそのまま書き込まれることをテスト"""
+        for i in range(3):
+            _make_jpeg(tmp_path / "orig" / f"IMG_{i}.JPG", colour=(i, 0, 0))
+        picks = tmp_path / "picks.txt"
+        picks.write_text("IMG_0\nIMG_2\nIMG_9\n")
+        args = choice.build_parser().parse_args(
+            [str(tmp_path / "orig"), str(tmp_path / "out.tar"), "--list", str(picks)]
+        )
+
+        assert choice.execute(args) == 0
+
+        with tarfile.open(tmp_path / "out.tar") as tf:
+            assert tf.getnames() == ["IMG_0.JPG", "IMG_2.JPG"]
+            assert (
+                tf.extractfile("IMG_2.JPG").read()
+                == (tmp_path / "orig" / "IMG_2.JPG").read_bytes()
+            )
+
+    @pytest.mark.parametrize(
+        "options",
+        [["--sync"], ["--checksum", "sha256"], ["--volume-size", "0"]],
+    )
+    def test_choice_rejects_unsupported_options(self, tmp_path, options):
+        """アーカイブで使えない指定はエラーになることをテスト"""
+        (tmp_path / "orig").mkdir()
+        picks = tmp_path / "picks.txt"
+        picks.write_text("IMG_0\n")
+        args = choice.build_parser().parse_args(
+            [str(tmp_path / "orig"), str(tmp_path / "out.zip"), "--list", str(picks)]
+            + options
+        )
+
+        assert choice.execute(args) == 1
+
+    def test_volume_size_requires_archive(self, tmp_path):
+        """保存先がディレクトリの場合の --volume-size はエラーになることをテスト"""
+        (tmp_path / "in").mkdir()
+        args = reduce.build_parser().parse_args(
+            [str(tmp_path / "in"), str(tmp_path / "out"), "--volume-size", "10"]
+        )
+
+        assert reduce.execute(args) == 1
+
+    def test_reduce_from_zip(self, tmp_path, capsys):
+        """reduceの入力に.zipを指定できることをテスト"""
+        path, _ = _make_source(tmp_path, ".zip")
+        args = reduce.build_parser().parse_args(
+            [str(path), str(tmp_path / "out"), "-j", "1"]
+        )
+
+        assert reduce.execute(args) == 0
+
+        assert "3個のJPEGファイルを処理します" in capsys.readouterr().out
+        assert len(list((tmp_path / "out").glob("*.JPG"))) == 3
+
+    def test_choice_from_archive_rejects_sync(self, tmp_path):
+        """本体の画像がアーカイブの場合の --sync はエラーになることをテスト"""
+        path, _ = _make_source(tmp_path, ".zip")
+        picks = tmp_path / "picks.txt"
+        picks.write_text("IMG_0\n")
+        args = choice.build_parser().parse_args(
+            [str(path), str(tmp_path / "out"), "--list", str(picks), "--sync"]
+        )
+
+        assert choice.execute(args) == 1
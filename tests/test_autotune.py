@@ -0,0 +1,202 @@
+"""Tests for throughput-based concurrency auto-tuning."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.api import _map_ordered
+from sentei_pictures.batch import BatchFile
+from sentei_pictures.cli.main import main
+from sentei_pictures.core.autotune import AutoTuner, BatchTuning
+from sentei_pictures.core.copier import AdaptiveCopier
+
+
+class FakeClock:
+    """テストで進める時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _run(tuner, clock, rate_of, files):
+    """並列数ごとの速度（件/秒）に従ってfiles件を処理したように記録する"""
+    for _ in range(files):
+        clock.now += 1 / rate_of(tuner.value)
+        tuner.record(1, 1024 * 1024)
+
+
+class TestAutoTuner:
+    """AutoTuner のテスト"""
+
+    def test_settles_on_fastest_value(self):
+        """最も速い並列数に数百件以内で確定することをテスト"""
+        clock = FakeClock()
+        logged = []
+        tuner = AutoTuner("workers", 1, 12, 2, on_decision=logged.append, clock=clock)
+
+        # 5並列が最も速い
+        _run(tuner, clock, lambda value: 10 * value if value <= 5 else 50 - value, 300)
+
+        assert tuner.settled
+        assert tuner.value == 5
+        assert logged == tuner.decisions
+        assert logged[0].value == 2 and logged[0].next_value == 3
+        assert logged[-1].next_value is None
+        assert "workers 2: 20.0件/秒, 20.0MB/秒 → 3" == str(logged[0])
+
+    def test_warm_up_sample_is_discarded(self):
+        """最初の区間は測定に使わないことをテスト"""
+        clock = FakeClock()
+        tuner = AutoTuner("workers", 1, 8, 2, sample_files=4, clock=clock)
+
+        _run(tuner, clock, lambda value: 1, 4)
+        assert tuner.decisions == []
+        _run(tuner, clock, lambda value: 10, 4)
+        assert tuner.decisions[0].files_per_second == pytest.approx(10)
+
+    def test_settles_after_max_samples(self):
+        """速度が上がり続けても最大の測定回数で確定することをテスト"""
+        clock = FakeClock()
+        tuner = AutoTuner("copies", 1, 100, 1, max_samples=3, clock=clock)
+
+        _run(tuner, clock, lambda value: 10 * value, 200)
+
+        assert tuner.settled
+        assert len(tuner.decisions) == 3
+        assert tuner.value == tuner.best_value == 3
+
+    def test_fixed_range_is_settled(self):
+        """最小と最大が同じ場合は調整しないことをテスト"""
+        tuner = AutoTuner("workers", 1, 1, 1)
+
+        assert tuner.settled
+        assert tuner.record(1, 100) is None
+
+    def test_summary_lines(self):
+        """確定した値をジョブファイルの設定として表示することをテスト"""
+        clock = FakeClock()
+        tuning = BatchTuning(8, 8, clock=clock)
+        # 最初の4並列より少ない3並列が最も速い
+        _run(tuning.workers, clock, lambda value: 30 - abs(value - 3), 300)
+
+        assert tuning.summary_lines() == ["workers = 3"]
+        assert [d.value for d in tuning.workers.decisions] == [4, 5, 3, 2]
+
+
+class _ThreadPool:
+    """WorkerPoolと同じsubmitを持つスレッドプール"""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers)
+
+    def submit(self, fn, *args):
+        return self._executor.submit(fn, *args)
+
+
+class TestTunedMapOrdered:
+    """_map_ordered の自動調整のテスト"""
+
+    def test_running_tasks_follow_tuner_value(self):
+        """実行中のタスク数が調整中の並列数以下で、結果が入力順になることをテスト"""
+        pool = _ThreadPool(8)
+        tuner = AutoTuner("workers", 1, 8, 2, sample_files=1000)
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def work(i):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            time.sleep(0.01 * (i % 3))
+            with lock:
+                running[0] -= 1
+            return i
+
+        results = list(_map_ordered(pool, work, [(i,) for i in range(30)], None, tuner))
+
+        assert results == list(range(30))
+        assert running[1] == 2
+
+
+class TestCopierAutoTune:
+    """AdaptiveCopier の自動調整のテスト"""
+
+    def test_copier_records_decisions(self, tmp_path):
+        """AutoTunerを渡すとファイル数で区切って測定することをテスト"""
+        tuner = AutoTuner("copies", 1, 4, 2, sample_files=4)
+        copier = AdaptiveCopier(tuner=tuner)
+        (tmp_path / "out").mkdir()
+        sources = []
+        for i in range(16):
+            source = tmp_path / f"{i}.bin"
+            source.write_bytes(b"x" * 1024)
+            sources.append(source)
+
+        list(copier.map(copier.copy, [(s, tmp_path / "out" / s.name) for s in sources]))
+
+        assert copier.tuner is tuner
+        assert len(tuner.decisions) >= 2
+        assert copier.stats.history[0][0] == 2
+
+
+class TestBatchAutoTune:
+    """ジョブファイルの自動調整のテスト"""
+
+    def test_load_scheduler_settings(self, tmp_path):
+        """[scheduler] の autotune・copies を読み込むことをテスト"""
+        (tmp_path / "in").mkdir()
+        path = tmp_path / "jobs.toml"
+        path.write_text(
+            '[scheduler]\nautotune = true\ncopies = 3\n\n[[jobs]]\ninput_dir = "in"\n'
+            'output_dir = "out"\n',
+            encoding="utf-8",
+        )
+
+        batch = BatchFile.load(path)
+
+        assert batch.autotune is True
+        assert batch.copies == 3
+
+    @pytest.mark.parametrize("line", ["copies = 0", 'autotune = "yes"'])
+    def test_load_rejects_invalid_settings(self, tmp_path, line):
+        """不正な autotune・copies はエラーになることをテスト"""
+        (tmp_path / "in").mkdir()
+        path = tmp_path / "jobs.toml"
+        path.write_text(
+            f'[scheduler]\n{line}\n\n[[jobs]]\ninput_dir = "in"\noutput_dir = "out"\n',
+            encoding="utf-8",
+        )
+
+        with pytest.raises(ValueError):
+            BatchFile.load(path)
+
+    def test_cli_logs_decisions_and_settings(self, tmp_path, capsys):
+        """--autotune で判断を表示し、確定した設定を表示することをテスト"""
+        for directory in ("orig", "sel"):
+            (tmp_path / directory).mkdir()
+        for i in range(48):
+            Image.new("RGB", (8, 8)).save(tmp_path / "orig" / f"{i:03d}.jpg")
+            Image.new("RGB", (8, 8)).save(tmp_path / "sel" / f"{i:03d}.jpg")
+        path = tmp_path / "jobs.toml"
+        path.write_text(
+            '[[jobs]]\nkind = "choice"\noriginal_dir = "orig"\n'
+            'selected_dir = "sel"\noutput_dir = "final"\n',
+            encoding="utf-8",
+        )
+
+        with pytest.raises(SystemExit) as exc_info:
+            main(["run", str(path), "-j", "1", "--autotune"])
+
+        assert exc_info.value.code == 0
+
+        out = capsys.readouterr().out
+        assert "自動調整: copies 2:" in out
+        assert "自動調整の結果" in out
+        assert len(list((tmp_path / "final").iterdir())) == 48
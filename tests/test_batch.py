@@ -0,0 +1,237 @@
+"""Tests for declarative batch job files."""
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.batch import BatchFile, run_batch
+from sentei_pictures.cli.main import main
+from sentei_pictures.jobs import JOB_DONE, JOB_FAILED, POLICY_FAIR, JobScheduler
+
+
+def _make_jpegs(directory, count, size=(64, 48)):
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        Image.new("RGB", size, (i, 0, 0)).save(directory / f"{i:03d}.jpg")
+
+
+def _write_job_file(tmp_path, text):
+    path = tmp_path / "jobs.toml"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+class TestBatchFile:
+    """BatchFile class のテスト"""
+
+    def test_load_resolves_paths_and_defaults(self, tmp_path):
+        """相対パスがジョブファイル基準で解決され、既定値が上書きされることをテスト"""
+        _make_jpegs(tmp_path / "a" / "in", 1)
+        path = _write_job_file(
+            tmp_path,
+            """
+[scheduler]
+concurrent_jobs = 2
+policy = "fair"
+
+[defaults]
+quality = 70
+max_long_side = 1000
+
+[[jobs]]
+name = "a"
+input_dir = "a/in"
+output_dir = "a/out"
+quality = 90
+priority = 3
+""",
+        )
+
+        batch = BatchFile.load(path)
+
+        assert batch.concurrent_jobs == 2
+        assert batch.policy == POLICY_FAIR
+        (job,) = batch.jobs
+        assert job.kind == "reduce"
+        assert job.priority == 3
+        assert job.params == {
+            "input_dir": str(tmp_path / "a" / "in"),
+            "output_dir": str(tmp_path / "a" / "out"),
+            "quality": 90,
+            "max_long_side": 1000,
+        }
+
+    def test_load_reports_invalid_job_by_name(self, tmp_path):
+        """不正なジョブは名前付きのエラーになることをテスト"""
+        path = _write_job_file(
+            tmp_path,
+            """
+[[jobs]]
+name = "broken"
+input_dir = "missing"
+output_dir = "out"
+""",
+        )
+
+        with pytest.raises(ValueError, match="ジョブ broken"):
+            BatchFile.load(path)
+
+    def test_load_rejects_unknown_keys(self, tmp_path):
+        """不明なキーはエラーになることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        path = _write_job_file(
+            tmp_path,
+            """
+[[jobs]]
+input_dir = "in"
+output_dir = "out"
+qualty = 80
+""",
+        )
+
+        with pytest.raises(ValueError, match="qualty"):
+            BatchFile.load(path)
+
+    @pytest.mark.parametrize("line", ["priority = [1]", 'group = ["x"]'])
+    def test_load_rejects_bad_priority_and_group(self, tmp_path, line):
+        """priority・groupの型が正しくない場合は名前付きのエラーになることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        path = _write_job_file(
+            tmp_path,
+            f"""
+[[jobs]]
+name = "broken"
+input_dir = "in"
+output_dir = "out"
+{line}
+""",
+        )
+
+        with pytest.raises(ValueError, match="ジョブ broken: (priority|group)"):
+            BatchFile.load(path)
+
+    @pytest.mark.parametrize("value", ["3", "[]", '{ path = "in" }'])
+    def test_load_rejects_non_string_dir(self, tmp_path, value):
+        """文字列でないディレクトリ指定は名前付きのエラーになることをテスト"""
+        path = _write_job_file(
+            tmp_path,
+            f"""
+[[jobs]]
+name = "broken"
+input_dir = {value}
+output_dir = "out"
+""",
+        )
+
+        with pytest.raises(ValueError, match="ジョブ broken: input_dir"):
+            BatchFile.load(path)
+
+
+class TestRunBatch:
+    """run_batch のテスト"""
+
+    def test_runs_reduce_and_workflow_jobs(self, tmp_path):
+        """reduceとworkflowのジョブがそれぞれの設定で実行されることをテスト"""
+        _make_jpegs(tmp_path / "shoot1", 2, size=(400, 300))
+        _make_jpegs(tmp_path / "shoot2", 3)
+        (tmp_path / "selected").mkdir()
+        (tmp_path / "selected" / "001.jpg").write_bytes(b"")
+        path = _write_job_file(
+            tmp_path,
+            """
+[[jobs]]
+name = "small"
+input_dir = "shoot1"
+output_dir = "shoot1-reduced"
+max_long_side = 100
+
+[[jobs]]
+name = "flow"
+kind = "workflow"
+original_dir = "shoot2"
+reduced_dir = "shoot2-reduced"
+selected_dir = "selected"
+output_dir = "final"
+""",
+        )
+        finished = []
+
+        jobs = run_batch(BatchFile.load(path), on_finish=finished.append)
+
+        assert [job.state for job in jobs] == [JOB_DONE, JOB_DONE]
+        assert sorted(job.name for job in finished) == ["flow", "small"]
+        with Image.open(tmp_path / "shoot1-reduced" / "000.jpg") as img:
+            assert img.size == (100, 75)
+        assert len(list((tmp_path / "shoot2-reduced").iterdir())) == 3
+        assert [p.name for p in (tmp_path / "final").iterdir()] == ["001.jpg"]
+        assert jobs[1].total == 4
+        assert jobs[1].succeeded == 4
+
+    def test_stops_waiting_when_scheduler_thread_dies(self, tmp_path, monkeypatch):
+        """実行スレッドが停止した場合は残りのジョブを失敗として終えることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        path = _write_job_file(
+            tmp_path,
+            """
+[[jobs]]
+input_dir = "in"
+output_dir = "out"
+""",
+        )
+
+        # ジョブを取り出した直後に実行スレッドが終了した状態にする
+        monkeypatch.setattr(JobScheduler, "_run_loop", JobScheduler._next_job)
+
+        jobs = run_batch(BatchFile.load(path), poll_interval=0.01)
+
+        assert [job.state for job in jobs] == [JOB_FAILED]
+
+    def test_cli_prints_summary(self, tmp_path, capsys):
+        """sentei run が全体のサマリーを表示することをテスト"""
+        _make_jpegs(tmp_path / "in", 2)
+        path = _write_job_file(
+            tmp_path,
+            """
+[[jobs]]
+name = "only"
+input_dir = "in"
+output_dir = "out"
+""",
+        )
+
+        with pytest.raises(SystemExit) as exc_info:
+            main(["run", str(path), "-j", "1"])
+
+        assert exc_info.value.code == 0
+        output = capsys.readouterr().out
+        assert "=== サマリー ===" in output
+        assert "ファイル: 2件" in output
+
+
+class TestFairShare:
+    """フェアシェアのスケジューリングのテスト"""
+
+    def _submit_jobs(self, scheduler, tmp_path):
+        _make_jpegs(tmp_path / "in", 1)
+        params = {"input_dir": str(tmp_path / "in")}
+        for name, group, priority in (("a1", "a", 10), ("a2", "a", 10), ("b1", "b", 0)):
+            scheduler.submit(
+                "reduce",
+                {**params, "output_dir": str(tmp_path / name)},
+                priority,
+                group,
+                name,
+            )
+
+    def test_priority_policy_runs_highest_priority_first(self, tmp_path):
+        """priorityでは優先度の高いジョブから取り出されることをテスト"""
+        scheduler = JobScheduler(max_concurrent_jobs=2)
+        self._submit_jobs(scheduler, tmp_path)
+
+        assert [scheduler._next_job().name for _ in range(2)] == ["a1", "a2"]
+
+    def test_fair_policy_spreads_running_jobs_across_groups(self, tmp_path):
+        """fairでは実行中のジョブが少ないグループが優先されることをテスト"""
+        scheduler = JobScheduler(max_concurrent_jobs=2, policy=POLICY_FAIR)
+        self._submit_jobs(scheduler, tmp_path)
+
+        assert [scheduler._next_job().name for _ in range(3)] == ["a1", "b1", "a2"]
@@ -0,0 +1,146 @@
+"""Tests for the SQLite catalog of originals."""
+
+import os
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.api import choose
+from sentei_pictures.core.catalog import Catalog, file_sha256
+from sentei_pictures.core.file_matcher import FileMatcher
+from sentei_pictures.core.image_processor import ImageProcessor
+from sentei_pictures.core.planner import plan_reduce
+
+
+def _make_jpeg(path, size=(64, 48), captured_at=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    img = Image.new("RGB", size)
+    exif = Image.Exif()
+    if captured_at:
+        exif[306] = captured_at
+    img.save(path, "JPEG", exif=exif)
+    return path
+
+
+def _bump_mtime(directory):
+    """ディレクトリの更新日時を確実に変える"""
+    stat = os.stat(directory)
+    os.utime(directory, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    with Catalog(tmp_path / "catalog.db") as catalog:
+        yield catalog
+
+
+class TestCatalog:
+    """Catalog class のテスト"""
+
+    def test_refresh_records_file_info(self, tmp_path, catalog):
+        """ファイル情報（画像サイズ・撮影日時・ハッシュ）が記録されることをテスト"""
+        path = _make_jpeg(
+            tmp_path / "orig" / "a.jpg", (120, 80), captured_at="2024:05:01 10:00:00"
+        )
+        (tmp_path / "orig" / "notes.txt").write_text("x")
+
+        stats = catalog.refresh(tmp_path / "orig", hashes=True)
+
+        assert stats.added == 1
+        (entry,) = catalog.entries(tmp_path / "orig", refresh=False)
+        assert entry.path == path
+        assert entry.dimensions == (120, 80)
+        assert entry.size == path.stat().st_size
+        assert entry.captured_at == "2024:05:01 10:00:00"
+        assert entry.sha256 == file_sha256(path)
+
+    def test_unchanged_directory_is_not_listed(self, tmp_path, catalog, monkeypatch):
+        """ディレクトリの更新日時が同じなら一覧しないことをテスト"""
+        _make_jpeg(tmp_path / "orig" / "a.jpg")
+        catalog.refresh(tmp_path / "orig")
+
+        def fail(*args):
+            raise AssertionError("scandir should not be called")
+
+        monkeypatch.setattr(os, "scandir", fail)
+
+        assert catalog.refresh(tmp_path / "orig").skipped
+        assert catalog.files(tmp_path / "orig") == [tmp_path / "orig" / "a.jpg"]
+
+    def test_refresh_detects_added_and_removed_files(self, tmp_path, catalog):
+        """追加・削除されたファイルが反映されることをテスト"""
+        _make_jpeg(tmp_path / "orig" / "a.jpg")
+        _make_jpeg(tmp_path / "orig" / "b.jpg")
+        catalog.refresh(tmp_path / "orig")
+
+        (tmp_path / "orig" / "a.jpg").unlink()
+        _make_jpeg(tmp_path / "orig" / "c.png")
+        _bump_mtime(tmp_path / "orig")
+        stats = catalog.refresh(tmp_path / "orig")
+
+        assert (stats.added, stats.removed, stats.unchanged) == (1, 1, 1)
+        assert [p.name for p in catalog.files(tmp_path / "orig")] == ["b.jpg", "c.png"]
+        assert [p.name for p in catalog.files(tmp_path / "orig", jpeg_only=True)] == [
+            "b.jpg"
+        ]
+
+    def test_full_refresh_detects_overwritten_file(self, tmp_path, catalog):
+        """full=Trueではその場で上書きされたファイルも反映されることをテスト"""
+        path = _make_jpeg(tmp_path / "orig" / "a.jpg", (64, 48))
+        catalog.refresh(tmp_path / "orig")
+
+        _make_jpeg(path, (32, 32))
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        stats = catalog.refresh(tmp_path / "orig", full=True)
+
+        assert stats.updated == 1
+        assert catalog.lookup([path])[path].dimensions == (32, 32)
+
+    def test_find_matching_file_follows_file_matcher_rules(self, tmp_path, catalog):
+        """完全一致・拡張子違い・大文字小文字違いの順で検索されることをテスト"""
+        orig = tmp_path / "orig"
+        for name in ("IMG_1.JPG", "img_1.png", "IMG_2.png"):
+            _make_jpeg(orig / name)
+
+        def find(name):
+            return FileMatcher.find_matching_file(name, orig, catalog)
+
+        assert find("IMG_1.JPG") == orig / "IMG_1.JPG"
+        assert find("img_1.jpg") == orig / "img_1.png"
+        assert find("IMG_2.jpg") == orig / "IMG_2.png"
+        assert find("img_2.jpg") == orig / "IMG_2.png"
+        assert find("IMG_3.jpg") is None
+
+
+class TestCatalogConsumers:
+    """カタログを使う処理のテスト"""
+
+    def test_choose_with_catalog(self, tmp_path, catalog):
+        """カタログを使ってchoiceが元画像をコピーすることをテスト"""
+        _make_jpeg(tmp_path / "orig" / "A.JPG")
+        _make_jpeg(tmp_path / "selected" / "a.jpg")
+        (tmp_path / "out").mkdir()
+
+        (result,) = choose(
+            tmp_path / "orig", tmp_path / "out", tmp_path / "selected", catalog=catalog
+        )
+
+        assert result.ok
+        assert (tmp_path / "out" / "A.JPG").exists()
+
+    def test_planner_uses_catalog_dimensions(self, tmp_path, catalog, monkeypatch):
+        """プランナーがカタログ済みのファイルのヘッダーを読まないことをテスト"""
+        files = [_make_jpeg(tmp_path / "orig" / f"{i}.jpg") for i in range(3)]
+        catalog.refresh(tmp_path / "orig")
+        processor = ImageProcessor()
+
+        def fail(path):
+            raise AssertionError("header should come from the catalog")
+
+        monkeypatch.setattr(processor, "get_image_info", fail)
+
+        estimate = plan_reduce(files, processor, catalog=catalog, sample_size=1)
+
+        assert estimate.file_count == 3
+        assert estimate.megapixels == pytest.approx(3 * 64 * 48 / 1_000_000)
@@ -0,0 +1,177 @@
+"""Tests for checksummed copies, delivery manifests and sentei verify."""
+
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.cli import choice, verify
+from sentei_pictures.core.checksum import (
+    VERIFY_EXTRA,
+    VERIFY_MISMATCH,
+    VERIFY_MISSING,
+    VERIFY_OK,
+    copy_with_checksum,
+    read_manifest,
+    update_manifest,
+    verify_directory,
+    write_manifest,
+)
+
+
+def _verify_args(directory, **kwargs):
+    parser = argparse.ArgumentParser()
+    verify.add_arguments(parser)
+    args = parser.parse_args([str(directory)])
+    for key, value in kwargs.items():
+        setattr(args, key, value)
+    return args
+
+
+class TestCopyWithChecksum:
+    """copy_with_checksum のテスト"""
+
+    @pytest.mark.parametrize("algorithm", ["sha256", "blake2b"])
+    def test_copies_and_hashes_in_one_pass(self, tmp_path, algorithm):
+        """コピーした内容と更新日時、ハッシュが正しいことをテスト"""
+        source = tmp_path / "a.bin"
+        data = os.urandom(2_500_000)
+        source.write_bytes(data)
+        os.utime(source, (1_600_000_000, 1_600_000_000))
+
+        size, digest = copy_with_checksum(
+            source, tmp_path / "b.bin", algorithm, buffer_size=1 << 20
+        )
+
+        assert size == len(data)
+        assert digest == hashlib.new(algorithm, data).hexdigest()
+        assert (tmp_path / "b.bin").read_bytes() == data
+        assert (tmp_path / "b.bin").stat().st_mtime == 1_600_000_000
+
+    def test_unknown_algorithm_raises_value_error(self, tmp_path):
+        """対応していないアルゴリズムはValueErrorになることをテスト"""
+        (tmp_path / "a.bin").write_bytes(b"x")
+
+        with pytest.raises(ValueError):
+            copy_with_checksum(tmp_path / "a.bin", tmp_path / "b.bin", "md5")
+
+
+class TestManifest:
+    """マニフェストのテスト"""
+
+    def test_round_trip_and_binary_marker(self, tmp_path):
+        """書き出したマニフェストと*付きの行を読めることをテスト"""
+        path = tmp_path / "SHA256SUMS"
+        write_manifest(path, {"b.jpg": "bb", "a b.jpg": "aa"})
+
+        assert path.read_text() == "aa  a b.jpg\nbb  b.jpg\n"
+        path.write_text(path.read_text() + "CC *c.jpg\n")
+        assert read_manifest(path) == {"a b.jpg": "aa", "b.jpg": "bb", "c.jpg": "cc"}
+
+    def test_update_merges_existing_entries(self, tmp_path):
+        """既存のマニフェストに追加・更新されることをテスト"""
+        update_manifest(tmp_path, {"a.jpg": "aa", "b.jpg": "bb"})
+        path = update_manifest(tmp_path, {"b.jpg": "b2", "c.jpg": "cc"})
+
+        assert read_manifest(path) == {"a.jpg": "aa", "b.jpg": "b2", "c.jpg": "cc"}
+
+    def test_malformed_line_raises_value_error(self, tmp_path):
+        """形式が正しくない行はValueErrorになることをテスト"""
+        (tmp_path / "SHA256SUMS").write_text("no-separator\n")
+
+        with pytest.raises(ValueError):
+            read_manifest(tmp_path / "SHA256SUMS")
+
+
+class TestVerifyDirectory:
+    """verify_directory のテスト"""
+
+    def test_reports_each_status(self, tmp_path):
+        """一致・不一致・欠落・マニフェスト外を判定することをテスト"""
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            (tmp_path / name).write_bytes(name.encode())
+        update_manifest(
+            tmp_path,
+            {
+                name: hashlib.sha256(name.encode()).hexdigest()
+                for name in ("a.jpg", "b.jpg", "c.jpg")
+            },
+        )
+        (tmp_path / "b.jpg").write_bytes(b"changed")
+        (tmp_path / "c.jpg").unlink()
+        (tmp_path / "d.jpg").write_bytes(b"new")
+
+        results = {r.name: r.status for r in verify_directory(tmp_path, max_workers=4)}
+
+        assert results == {
+            "a.jpg": VERIFY_OK,
+            "b.jpg": VERIFY_MISMATCH,
+            "c.jpg": VERIFY_MISSING,
+            "d.jpg": VERIFY_EXTRA,
+        }
+
+    def test_missing_manifest_raises(self, tmp_path):
+        """マニフェストがなければFileNotFoundErrorになることをテスト"""
+        with pytest.raises(FileNotFoundError):
+            list(verify_directory(tmp_path))
+
+
+class TestChecksumCli:
+    """choice --checksum と verify コマンドのテスト"""
+
+    @pytest.fixture
+    def delivery(self, tmp_path):
+        for i in range(6):
+            Image.new("RGB", (32, 32), (i, 0, 0)).save(tmp_path / f"IMG_{i}.JPG")
+        (tmp_path / "selected").mkdir()
+        for i in range(0, 6, 2):
+            Image.new("RGB", (4, 4)).save(tmp_path / "selected" / f"IMG_{i}.jpg")
+        parser = choice.build_parser()
+        args = parser.parse_args(
+            [
+                str(tmp_path),
+                str(tmp_path / "out"),
+                str(tmp_path / "selected"),
+                "--checksum",
+                "sha256",
+                "--copy-jobs",
+                "1",
+            ]
+        )
+        assert choice.execute(args) == 0
+        return tmp_path / "out"
+
+    def test_choice_writes_manifest(self, delivery):
+        """choice --checksum で保存先にSHA256SUMSが書き出されることをテスト"""
+        entries = read_manifest(delivery / "SHA256SUMS")
+
+        assert sorted(entries) == ["IMG_0.JPG", "IMG_2.JPG", "IMG_4.JPG"]
+        for name, digest in entries.items():
+            assert digest == hashlib.sha256((delivery / name).read_bytes()).hexdigest()
+
+    @pytest.mark.skipif(shutil.which("sha256sum") is None, reason="sha256sum がない")
+    def test_manifest_is_sha256sum_compatible(self, delivery):
+        """書き出したマニフェストをsha256sum -cで検証できることをテスト"""
+        subprocess.run(
+            ["sha256sum", "-c", "--quiet", "SHA256SUMS"], cwd=delivery, check=True
+        )
+
+    def test_verify_command(self, delivery, capsys):
+        """verifyコマンドが不一致で1を返すことをテスト"""
+        assert verify.execute(_verify_args(delivery, jobs=2)) == 0
+
+        (delivery / "IMG_2.JPG").write_bytes(b"corrupted")
+
+        assert verify.execute(_verify_args(delivery)) == 1
+        assert "不一致: IMG_2.JPG" in capsys.readouterr().out
+
+    def test_verify_strict_fails_on_extra_files(self, delivery):
+        """--strict ではマニフェスト外のファイルで1を返すことをテスト"""
+        (delivery / "extra.jpg").write_bytes(b"x")
+
+        assert verify.execute(_verify_args(delivery)) == 0
+        assert verify.execute(_verify_args(delivery, strict=True)) == 1
@@ -0,0 +1,53 @@
+"""Tests for the sentei subcommand dispatcher."""
+
+import subprocess
+import sys
+
+import pytest
+
+from sentei_pictures.cli.main import build_parser, main
+
+_STARTUP_SCRIPT = """
+import sys
+from sentei_pictures.cli.main import COMMANDS, main
+try:
+    main(["--help"])
+except SystemExit:
+    pass
+modules = ["PIL", "tkinter"] + [module for module, _ in COMMANDS.values()]
+print(",".join(m for m in modules if m in sys.modules), file=sys.stderr)
+"""
+
+
+def _modules_loaded_by_help():
+    completed = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return completed.stderr.strip().rpartition("\n")[2]
+
+
+class TestDispatcher:
+    """サブコマンドディスパッチャーのテスト"""
+
+    def test_help_does_not_import_heavy_modules(self):
+        """--help でPillow・tkinter・サブコマンドのモジュールが読み込まれないことをテスト"""
+        assert _modules_loaded_by_help() == ""
+
+    def test_only_selected_command_is_configured(self):
+        """選択したサブコマンドの引数だけが定義されることをテスト"""
+        args = build_parser("reduce").parse_args(["reduce", "in", "out"])
+        assert str(args.input_dir) == "in"
+        assert str(args.output_dir) == "out"
+
+    def test_reduce_runs_in_process(self, tmp_path, capsys):
+        """sys.argvを書き換えずにreduceが実行されることをテスト"""
+        original_argv = list(sys.argv)
+        with pytest.raises(SystemExit) as excinfo:
+            main(["reduce", str(tmp_path), str(tmp_path / "out")])
+
+        assert excinfo.value.code == 0
+        assert sys.argv == original_argv
+        assert "JPEGファイルが見つかりませんでした" in capsys.readouterr().out
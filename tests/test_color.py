@@ -0,0 +1,205 @@
+"""Tests for ICC colour management during reduce."""
+
+import io
+import struct
+
+import pytest
+from PIL import Image, ImageCms
+
+from sentei_pictures.core.color import (
+    clear_transform_cache,
+    srgb_icc,
+    transform_cache_size,
+)
+from sentei_pictures.core.image_processor import ImageProcessor
+
+# D50に順応したAdobe RGB (1998) の原色（Rの列・Gの列・Bの列）とガンマ
+ADOBE_RGB_COLORANTS = (
+    (0.60974, 0.31111, 0.01947),
+    (0.20528, 0.62567, 0.06087),
+    (0.14919, 0.06322, 0.74457),
+)
+ADOBE_RGB_GAMMA = 563 / 256
+
+
+def _s15(value):
+    return struct.pack(">i", round(value * 65536))
+
+
+def _matrix_profile(description, colorants, gamma):
+    """行列・トーンカーブ形式のRGBディスプレイプロファイル（ICC v2）を作成"""
+    desc = description.encode("ascii") + b"\0"
+    tags = [
+        (
+            b"desc",
+            b"desc\0\0\0\0"
+            + struct.pack(">I", len(desc))
+            + desc
+            + b"\0" * 8
+            + b"\0\0\0"
+            + b"\0" * 67,
+        ),
+        (b"cprt", b"text\0\0\0\0" + b"No copyright\0"),
+        (b"wtpt", b"XYZ \0\0\0\0" + _s15(0.9642) + _s15(1.0) + _s15(0.8249)),
+    ]
+    for sig, xyz in zip((b"rXYZ", b"gXYZ", b"bXYZ"), colorants):
+        tags.append((sig, b"XYZ \0\0\0\0" + b"".join(_s15(v) for v in xyz)))
+    curve = b"curv\0\0\0\0" + struct.pack(">IH", 1, round(gamma * 256)) + b"\0\0"
+    tags += [(sig, curve) for sig in (b"rTRC", b"gTRC", b"bTRC")]
+
+    offset = 128 + 4 + 12 * len(tags)
+    table = b""
+    data = b""
+    for sig, body in tags:
+        body += b"\0" * (-len(body) % 4)
+        table += sig + struct.pack(">II", offset + len(data), len(body))
+        data += body
+    size = offset + len(data)
+    header = (
+        struct.pack(">I", size)
+        + b"\0" * 4
+        + struct.pack(">I", 0x02100000)
+        + b"mntrRGB XYZ "
+        + struct.pack(">6H", 2024, 1, 1, 0, 0, 0)
+        + b"acsp"
+        + b"\0" * 24
+        + struct.pack(">I", 0)
+        + _s15(0.9642)
+        + _s15(1.0)
+        + _s15(0.8249)
+    )
+    header += b"\0" * (128 - len(header))
+    return header + struct.pack(">I", len(tags)) + table + data
+
+
+ADOBE_RGB_ICC = _matrix_profile(
+    "Adobe RGB compatible", ADOBE_RGB_COLORANTS, ADOBE_RGB_GAMMA
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_transform_cache()
+    yield
+    clear_transform_cache()
+
+
+def _save(path, colour=(40, 160, 60), icc=ADOBE_RGB_ICC, size=(64, 48)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    options = {"icc_profile": icc} if icc else {}
+    Image.new("RGB", size, colour).save(path, "JPEG", quality=100, **options)
+    return path
+
+
+def _centre(path):
+    with Image.open(path) as img:
+        return img.convert("RGB").getpixel((img.width // 2, img.height // 2))
+
+
+class TestProfiles:
+    """テスト用のプロファイルのテスト"""
+
+    def test_bundled_profile_is_valid(self):
+        """作成したプロファイルをlcmsで読めることをテスト"""
+        profile = ImageCms.ImageCmsProfile(io.BytesIO(ADOBE_RGB_ICC))
+
+        assert ImageCms.getProfileDescription(profile).strip() == (
+            "Adobe RGB compatible"
+        )
+
+
+class TestSrgbConversion:
+    """color="srgb" のテスト"""
+
+    def test_converts_to_srgb_and_embeds_srgb_profile(self, tmp_path):
+        """Adobe RGBの画像がsRGBに変換され、sRGBプロファイルが埋め込まれることをテスト"""
+        source = _save(tmp_path / "adobe.jpg")
+        output = tmp_path / "out.jpg"
+
+        ImageProcessor(color="srgb").reduce_image(source, output)
+
+        with Image.open(source) as img:
+            expected = ImageCms.profileToProfile(
+                img,
+                ImageCms.ImageCmsProfile(io.BytesIO(ADOBE_RGB_ICC)),
+                ImageCms.createProfile("sRGB"),
+                renderingIntent=ImageCms.Intent.PERCEPTUAL,
+            ).getpixel((32, 24))
+        actual = _centre(output)
+        assert all(abs(a - e) <= 3 for a, e in zip(actual, expected))
+        # Adobe RGBの緑はsRGBではより鮮やかな値になる
+        assert actual[1] - actual[0] > _centre(source)[1] - _centre(source)[0]
+        with Image.open(output) as img:
+            assert img.info["icc_profile"] == srgb_icc()
+
+    def test_transform_is_built_once_per_profile(self, tmp_path, monkeypatch):
+        """同じプロファイルの変換オブジェクトは1回だけ作成されることをテスト"""
+        built = []
+        original = ImageCms.buildTransform
+
+        def counting(*args, **kwargs):
+            built.append(args)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(ImageCms, "buildTransform", counting)
+        processor = ImageProcessor(color="srgb")
+        for i in range(4):
+            source = _save(tmp_path / f"in{i}.jpg", colour=(i * 40, 100, 50))
+            processor.reduce_image(source, tmp_path / f"out{i}.jpg")
+
+        assert len(built) == 1
+        assert transform_cache_size() == 1
+
+    def test_srgb_and_untagged_images_are_not_transformed(self, tmp_path, monkeypatch):
+        """sRGB・プロファイルなしの画像は変換しないことをテスト"""
+        monkeypatch.setattr(
+            ImageCms, "applyTransform", lambda *args: pytest.fail("transformed")
+        )
+        processor = ImageProcessor(color="srgb")
+        tagged = _save(tmp_path / "srgb.jpg", icc=srgb_icc())
+        untagged = _save(tmp_path / "plain.jpg", icc=None)
+
+        processor.reduce_image(tagged, tmp_path / "a.jpg")
+        processor.reduce_image(untagged, tmp_path / "b.jpg")
+
+        with Image.open(tmp_path / "b.jpg") as img:
+            assert "icc_profile" not in img.info
+
+    def test_broken_profile_is_ignored(self, tmp_path):
+        """壊れたプロファイルは無視して保存することをテスト"""
+        source = _save(tmp_path / "broken.jpg", icc=b"not a profile" * 10)
+
+        ImageProcessor(color="srgb").reduce_image(source, tmp_path / "out.jpg")
+
+        assert (tmp_path / "out.jpg").exists()
+
+
+class TestOtherModes:
+    """color="preserve" / "none" のテスト"""
+
+    def test_preserve_keeps_profile_and_pixels(self, tmp_path):
+        """preserveでは画素を変換せずにプロファイルを埋め込むことをテスト"""
+        source = _save(tmp_path / "adobe.jpg")
+
+        ImageProcessor(color="preserve").reduce_image(source, tmp_path / "out.jpg")
+
+        with Image.open(tmp_path / "out.jpg") as img:
+            assert img.info["icc_profile"] == ADOBE_RGB_ICC
+        assert all(
+            abs(a - b) <= 3
+            for a, b in zip(_centre(tmp_path / "out.jpg"), _centre(source))
+        )
+
+    def test_none_drops_profile(self, tmp_path):
+        """noneでは従来どおりプロファイルを破棄することをテスト"""
+        source = _save(tmp_path / "adobe.jpg")
+
+        ImageProcessor().reduce_image(source, tmp_path / "out.jpg")
+
+        with Image.open(tmp_path / "out.jpg") as img:
+            assert "icc_profile" not in img.info
+
+    def test_unknown_mode_raises_value_error(self):
+        """不明な方法はValueErrorになることをテスト"""
+        with pytest.raises(ValueError):
+            ImageProcessor(color="p3")
@@ -0,0 +1,211 @@
+"""Tests for contact sheets built from the reduce pass."""
+
+import pytest
+from PIL import Image, PdfParser
+
+from sentei_pictures.api import reduce_directory
+from sentei_pictures.cli import reduce
+from sentei_pictures.core.contact_sheet import ContactSheet, make_tile, parse_grid
+from sentei_pictures.core.image_processor import ImageProcessor
+from sentei_pictures.core.worker_pool import WorkerPool
+
+
+def _make_jpegs(directory, count=3, size=(640, 480)):
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        Image.new("RGB", size, (40 * i, 80, 160)).save(directory / f"IMG_{i}.jpg")
+
+
+def _tile(color="red"):
+    return Image.new("RGB", (60, 40), color)
+
+
+def _pdf_pages(path):
+    parser = PdfParser.PdfParser(str(path))
+    try:
+        return len(parser.pages)
+    finally:
+        parser.close()
+
+
+class TestMakeTile:
+    """make_tile のテスト"""
+
+    def test_downscales_keeping_aspect(self):
+        """長辺をタイルの大きさにしてRGBに変換することをテスト"""
+        tile = make_tile(Image.new("L", (900, 600)), 300)
+
+        assert tile.size == (300, 200)
+        assert tile.mode == "RGB"
+
+    def test_small_image_is_not_enlarged(self):
+        """タイルより小さい画像は拡大しないことをテスト"""
+        assert make_tile(Image.new("RGB", (120, 80)), 300).size == (120, 80)
+
+
+class TestParseGrid:
+    """parse_grid のテスト"""
+
+    def test_parse(self):
+        """列数x行数を解析することをテスト"""
+        assert parse_grid("4X8") == (4, 8)
+
+    @pytest.mark.parametrize("text", ["5", "0x3", "ax3", "5x"])
+    def test_invalid(self, text):
+        """不正な形式はエラーになることをテスト"""
+        with pytest.raises(ValueError):
+            parse_grid(text)
+
+
+class TestContactSheet:
+    """ContactSheet のテスト"""
+
+    def test_pdf_pages_are_appended(self, tmp_path):
+        """ページが埋まるごとに1つのPDFへページを追加することをテスト"""
+        sheet = ContactSheet(tmp_path / "sheet.pdf", columns=2, rows=2, tile_size=64)
+
+        for i in range(9):
+            sheet.add(f"IMG_{i}.jpg", _tile())
+            # 組み立て中のページは1枚だけ
+            assert sheet.page_count == (i + 1) // 4
+
+        assert sheet.close() == [tmp_path / "sheet.pdf"]
+        assert sheet.page_count == 3
+        assert _pdf_pages(tmp_path / "sheet.pdf") == 3
+        assert "3ページ、9枚" in sheet.summary_line()
+
+    def test_jpeg_page_per_file(self, tmp_path):
+        """保存先が .jpg の場合はページごとのファイルにすることをテスト"""
+        sheet = ContactSheet(tmp_path / "sheet.jpg", columns=3, rows=1, tile_size=64)
+
+        for i in range(4):
+            sheet.add(f"IMG_{i}.jpg", _tile())
+        files = sheet.close()
+
+        assert files == [tmp_path / "sheet_001.jpg", tmp_path / "sheet_002.jpg"]
+        with Image.open(files[0]) as page:
+            assert page.size == sheet.page_size
+
+    def test_tile_is_centered_in_cell(self, tmp_path):
+        """タイルを区画の中央に貼り付けることをテスト"""
+        sheet = ContactSheet(tmp_path / "sheet.jpg", columns=1, rows=1, tile_size=64)
+        sheet.add("a.jpg", Image.new("RGB", (64, 32), "black"))
+        sheet.close()
+
+        with Image.open(tmp_path / "sheet_001.jpg") as page:
+            # 区画の左上（16, 40+16）から上下に16pxずつの余白
+            assert page.getpixel((16 + 32, 56 + 8))[0] > 200
+            assert page.getpixel((16 + 32, 56 + 32))[0] < 60
+
+    def test_long_names_are_truncated(self, tmp_path):
+        """区画に収まらないファイル名を切り詰めることをテスト"""
+        sheet = ContactSheet(tmp_path / "sheet.pdf", tile_size=64)
+        sheet.add("short.jpg", _tile())
+
+        fitted = sheet._fit("a_very_long_file_name_from_the_camera_0001.jpg")
+
+        assert fitted.endswith("...")
+        assert sheet._draw.textlength(fitted, font=sheet._font) <= 64
+        assert sheet._fit("a.jpg") == "a.jpg"
+
+    def test_rejects_unknown_extension(self, tmp_path):
+        """.pdf / .jpg 以外の保存先はエラーになることをテスト"""
+        with pytest.raises(ValueError):
+            ContactSheet(tmp_path / "sheet.png")
+
+
+class TestReduceWithContactSheet:
+    """reduce_directory のコンタクトシートのテスト"""
+
+    @pytest.mark.parametrize("parallel", [False, True])
+    def test_tiles_from_reduced_images(self, tmp_path, parallel):
+        """縮小した画像のタイルを入力順にコンタクトシートへ追加することをテスト"""
+        _make_jpegs(tmp_path / "in")
+        (tmp_path / "in" / "IMG_9.jpg").write_bytes(b"broken")
+        (tmp_path / "out").mkdir()
+        processor = ImageProcessor(max_long_side=320)
+        added = []
+
+        class Recorder(ContactSheet):
+            def add(self, name, tile):
+                added.append((name, tile.size))
+                super().add(name, tile)
+
+        sheet = Recorder(tmp_path / "sheet.pdf", tile_size=100)
+        pool = WorkerPool(max_workers=1) if parallel else None
+        try:
+            results = list(
+                reduce_directory(
+                    tmp_path / "in",
+                    tmp_path / "out",
+                    processor,
+                    files=sorted((tmp_path / "in").iterdir()),
+                    pool=pool,
+                    contact_sheet=sheet,
+                )
+            )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        sheet.close()
+
+        # 失敗したファイルはタイルにしない
+        assert added == [(f"IMG_{i}.jpg", (100, 75)) for i in range(3)]
+        assert all(result.tile is None for result in results)
+        assert "tile" not in results[0].as_dict()
+        # 渡したプロセッサーは変更しない
+        assert processor.tile_size is None
+        assert _pdf_pages(tmp_path / "sheet.pdf") == 1
+
+    def test_reduce_image_returns_tile(self, tmp_path):
+        """tile_sizeを指定するとstatsにタイルを書き込むことをテスト"""
+        _make_jpegs(tmp_path / "in", 1, size=(1200, 600))
+        stats = {}
+
+        ImageProcessor(max_long_side=400, tile_size=50).reduce_image(
+            tmp_path / "in" / "IMG_0.jpg", tmp_path / "out.jpg", stats
+        )
+
+        assert stats["tile"].size == (50, 25)
+
+
+class TestContactSheetCli:
+    """reduce コマンドの --contact-sheet のテスト"""
+
+    def test_contact_sheet_option(self, tmp_path, capsys):
+        """--contact-sheet でコンタクトシートを作成することをテスト"""
+        _make_jpegs(tmp_path / "in", 5)
+        args = reduce.build_parser().parse_args(
+            [
+                str(tmp_path / "in"),
+                str(tmp_path / "out"),
+                "-j",
+                "1",
+                "--contact-sheet",
+                str(tmp_path / "sheet.jpg"),
+                "--contact-grid",
+                "2x2",
+            ]
+        )
+
+        assert reduce.execute(args) == 0
+
+        assert "2ページ、5枚" in capsys.readouterr().out
+        assert (tmp_path / "sheet_002.jpg").exists()
+
+    def test_invalid_grid(self, tmp_path, capsys):
+        """不正な列数x行数はエラーになることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        args = reduce.build_parser().parse_args(
+            [
+                str(tmp_path / "in"),
+                str(tmp_path / "out"),
+                "--contact-sheet",
+                str(tmp_path / "sheet.pdf"),
+                "--contact-grid",
+                "0x2",
+            ]
+        )
+
+        assert reduce.execute(args) == 1
+        assert "エラー" in capsys.readouterr().out
@@ -0,0 +1,140 @@
+"""Tests for the adaptive concurrent file copier."""
+
+import os
+import threading
+import time
+
+from PIL import Image
+
+from sentei_pictures.api import STATUS_NOT_FOUND, STATUS_OK, choose
+from sentei_pictures.core.copier import AdaptiveCopier, ConcurrencyTuner
+
+
+class TestConcurrencyTuner:
+    """ConcurrencyTuner のテスト"""
+
+    def test_climbs_while_rate_improves(self):
+        """速度が上がる間は並列数を増やすことをテスト"""
+        tuner = ConcurrencyTuner(1, 8, 2)
+
+        assert [tuner.update(rate) for rate in (10, 20, 30)] == [3, 4, 5]
+
+    def test_reverses_when_rate_drops(self):
+        """速度が上がらなくなると並列数を戻すことをテスト"""
+        tuner = ConcurrencyTuner(1, 8, 2)
+        tuner.update(10)  # 2 → 3
+        tuner.update(20)  # 3 → 4
+
+        assert tuner.update(19) == 3
+        assert tuner.best_value == 3
+        assert tuner.best_rate == 20
+
+    def test_stays_within_bounds(self):
+        """並列数が最小・最大の範囲に収まることをテスト"""
+        tuner = ConcurrencyTuner(1, 3, 3)
+        values = [tuner.update(rate) for rate in (10, 20, 30, 40, 50)]
+
+        assert all(1 <= value <= 3 for value in values)
+
+        tuner = ConcurrencyTuner(1, 1, 4)
+        assert tuner.value == 1
+        assert tuner.update(10) == 1
+
+
+class TestAdaptiveCopier:
+    """AdaptiveCopier のテスト"""
+
+    def test_map_keeps_input_order(self):
+        """完了順に関わらず結果が入力順に返ることをテスト"""
+        copier = AdaptiveCopier(max_copies=4, initial_copies=4)
+
+        def work(i):
+            time.sleep(0.02 * (5 - i))
+            return i
+
+        assert list(copier.map(work, [(i,) for i in range(6)])) == list(range(6))
+
+    def test_map_limits_running_tasks_to_concurrency(self):
+        """同時に実行するタスクが並列数以下になることをテスト"""
+        copier = AdaptiveCopier(max_copies=8, initial_copies=2, sample_seconds=60)
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def work(i):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return i
+
+        assert list(copier.map(work, [(i,) for i in range(10)])) == list(range(10))
+        assert peak[0] == 2
+
+    def test_map_stops_submitting_when_cancelled(self):
+        """キャンセル後は新しいタスクを投入しないことをテスト"""
+        copier = AdaptiveCopier(max_copies=1, initial_copies=1)
+        started = []
+
+        results = list(
+            copier.map(started.append, [(i,) for i in range(10)], lambda: bool(started))
+        )
+
+        assert started == [0]
+        assert len(results) == 1
+
+    def test_buffered_copy_preserves_content_and_mtime(self, tmp_path):
+        """バッファ指定のコピーで内容と更新日時が保たれることをテスト"""
+        source = tmp_path / "a.bin"
+        source.write_bytes(os.urandom(300_000))
+        os.utime(source, (1_600_000_000, 1_600_000_000))
+        copier = AdaptiveCopier(buffer_size=64 * 1024)
+
+        size, digest = copier.copy(source, tmp_path / "b.bin")
+
+        assert (size, digest) == (300_000, None)
+        assert (tmp_path / "b.bin").read_bytes() == source.read_bytes()
+        assert (tmp_path / "b.bin").stat().st_mtime == source.stat().st_mtime
+        assert (copier.stats.files, copier.stats.bytes) == (1, 300_000)
+
+    def test_records_rate_samples(self, tmp_path):
+        """測定間隔ごとに並列数と転送速度が記録されることをテスト"""
+        source = tmp_path / "a.bin"
+        source.write_bytes(b"x" * 1000)
+        copier = AdaptiveCopier(sample_seconds=0)
+
+        copier.copy(source, tmp_path / "b.bin")
+        copier.copy(source, tmp_path / "c.bin")
+
+        assert len(copier.stats.history) == 2
+        assert copier.stats.history[0][0] == 2
+
+
+class TestChooseWithCopier:
+    """並列コピーを使った choose のテスト"""
+
+    def test_copies_in_parallel_with_ordered_results(self, tmp_path):
+        """並列コピーでも結果が入力順で、全ファイルがコピーされることをテスト"""
+        original = tmp_path / "original"
+        selected = tmp_path / "selected"
+        out = tmp_path / "out"
+        for directory in (original, selected, out):
+            directory.mkdir()
+        names = [f"IMG_{i:03d}.jpg" for i in range(20)]
+        for name in names:
+            Image.new("RGB", (16, 16)).save(original / name.upper())
+            Image.new("RGB", (4, 4)).save(selected / name)
+        files = [selected / name for name in names] + [selected / "missing.jpg"]
+        copier = AdaptiveCopier(max_copies=4, initial_copies=4)
+
+        results = list(choose(original, out, selected, files=files, copier=copier))
+
+        assert [r.index for r in results] == list(range(1, 22))
+        assert [r.path for r in results] == files
+        assert all(r.status == STATUS_OK for r in results[:20])
+        assert results[20].status == STATUS_NOT_FOUND
+        assert len(list(out.iterdir())) == 20
+        assert copier.stats.files == 20
+        assert copier.stats.bytes == sum(r.bytes_out for r in results)
@@ -0,0 +1,166 @@
+"""Tests for the minimal image header parser."""
+
+import struct
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.core.header_parser import read_header, read_headers
+from sentei_pictures.core.image_processor import ImageProcessor
+
+
+def _exif(orientation=None, original=None, datetime=None, endian="<"):
+    """IFD0とExif IFDを持つEXIF（TIFF形式）を組み立てる"""
+    order = b"II" if endian == "<" else b"MM"
+    ifd0 = []
+    if orientation is not None:
+        ifd0.append((0x0112, 3, 1, struct.pack(endian + "HH", orientation, 0)))
+    strings = []
+    for tag, value in ((0x0132, datetime), (0x9003, original)):
+        if value is not None:
+            strings.append((tag, value.encode("ascii") + b"\x00"))
+    ifd0_strings = [item for item in strings if item[0] == 0x0132]
+    exif_strings = [item for item in strings if item[0] == 0x9003]
+    if exif_strings:
+        ifd0.append((0x8769, 4, 1, None))
+
+    ifd0_size = 2 + 12 * (len(ifd0) + len(ifd0_strings)) + 4
+    exif_offset = 8 + ifd0_size
+    exif_size = 2 + 12 * len(exif_strings) + 4 if exif_strings else 0
+    data_offset = exif_offset + exif_size
+    extra = b""
+
+    def ifd(entries):
+        nonlocal extra
+        body = struct.pack(endian + "H", len(entries))
+        for tag, kind, count, value in sorted(entries, key=lambda e: e[0]):
+            if value is None:
+                value = struct.pack(endian + "I", exif_offset)
+            elif kind == 2:
+                pointer = data_offset + len(extra)
+                extra += value
+                value = struct.pack(endian + "I", pointer)
+            body += struct.pack(endian + "HHI", tag, kind, count) + value
+        return body + struct.pack(endian + "I", 0)
+
+    entries = ifd0 + [(tag, 2, len(v), v) for tag, v in ifd0_strings]
+    tiff = order + struct.pack(endian + "HI", 42, 8) + ifd(entries)
+    if exif_strings:
+        tiff += ifd([(tag, 2, len(v), v) for tag, v in exif_strings])
+    return b"Exif\x00\x00" + tiff + extra
+
+
+class TestReadHeader:
+    """read_header のテスト"""
+
+    @pytest.mark.parametrize(
+        "suffix, options",
+        [
+            (".jpg", {}),
+            (".jpg", {"progressive": True}),
+            (".png", {}),
+            (".gif", {}),
+            (".bmp", {}),
+        ],
+    )
+    def test_size_matches_pillow(self, tmp_path, suffix, options):
+        """各形式で画像サイズがPillowと一致することをテスト"""
+        path = tmp_path / f"image{suffix}"
+        Image.new("RGB", (123, 45)).save(path, **options)
+
+        header = read_header(path)
+
+        with Image.open(path) as img:
+            assert header.size == img.size
+        assert header.format == Image.open(path).format
+
+    def test_jpeg_exif_orientation_and_capture_time(self, tmp_path):
+        """JPEGのEXIFから向きと撮影日時を読むことをテスト"""
+        path = tmp_path / "rotated.jpg"
+        exif = _exif(6, "2024:05:01 10:00:00", "2024:06:01 00:00:00")
+        Image.new("RGB", (40, 30)).save(path, exif=exif)
+
+        header = read_header(path)
+
+        assert header.orientation == 6
+        assert header.captured_at == "2024:05:01 10:00:00"
+        assert header.size == (40, 30)
+        assert header.display_size == (30, 40)
+
+    def test_capture_time_falls_back_to_datetime(self, tmp_path):
+        """DateTimeOriginalがなければDateTimeを使うことをテスト"""
+        path = tmp_path / "image.jpg"
+        Image.new("RGB", (8, 8)).save(path, exif=_exif(datetime="2023:01:02 03:04:05"))
+
+        assert read_header(path).captured_at == "2023:01:02 03:04:05"
+
+    def test_big_endian_exif(self, tmp_path):
+        """ビッグエンディアンのEXIFを読むことをテスト"""
+        path = tmp_path / "image.jpg"
+        exif = _exif(8, "2021:03:04 05:06:07", endian=">")
+        Image.new("RGB", (20, 10)).save(path, exif=exif)
+
+        header = read_header(path)
+
+        assert header.orientation == 8
+        assert header.captured_at == "2021:03:04 05:06:07"
+        assert header.size == (20, 10)
+
+    def test_png_exif(self, tmp_path):
+        """PNGのeXIfチャンクを読むことをテスト"""
+        path = tmp_path / "image.png"
+        Image.new("RGB", (16, 9)).save(path, exif=_exif(3, "2022:02:02 02:02:02"))
+
+        header = read_header(path)
+
+        assert header.orientation == 3
+        assert header.captured_at == "2022:02:02 02:02:02"
+
+    @pytest.mark.parametrize(
+        "data",
+        [b"", b"not an image", b"\xff\xd8\xff\xe0\x00", b"\x89PNG\r\n\x1a\n\x00"],
+    )
+    def test_unreadable_files_return_none(self, tmp_path, data):
+        """対応外・壊れたファイルはNoneを返すことをテスト"""
+        path = tmp_path / "broken.jpg"
+        path.write_bytes(data)
+
+        assert read_header(path) is None
+
+    def test_missing_file_returns_none(self, tmp_path):
+        """存在しないファイルはNoneを返すことをテスト"""
+        assert read_header(tmp_path / "missing.jpg") is None
+
+    def test_read_headers_keeps_order(self, tmp_path):
+        """並列に読んでも入力順で返すことをテスト"""
+        paths = []
+        for i in range(20):
+            path = tmp_path / f"{i}.jpg"
+            Image.new("RGB", (i + 1, 1)).save(path)
+            paths.append(path)
+
+        headers = read_headers(paths, max_workers=4)
+
+        assert [header.width for header in headers] == list(range(1, 21))
+
+
+class TestImageProcessorFastPath:
+    """get_image_info の高速パスのテスト"""
+
+    def test_get_image_info_skips_pillow_for_jpeg(self, tmp_path):
+        """JPEGではImage.openを使わずに画像サイズを取得することをテスト"""
+        path = tmp_path / "image.jpg"
+        Image.new("RGB", (64, 48)).save(path)
+
+        with patch("sentei_pictures.core.image_processor.Image.open") as mock_open:
+            assert ImageProcessor().get_image_info(path) == (64, 48)
+
+        mock_open.assert_not_called()
+
+    def test_get_image_info_falls_back_to_pillow(self, tmp_path):
+        """ヘッダーを読めない形式ではPillowにフォールバックすることをテスト"""
+        path = tmp_path / "image.tiff"
+        Image.new("RGB", (30, 20)).save(path)
+
+        assert ImageProcessor().get_image_info(path) == (30, 20)
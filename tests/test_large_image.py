@@ -0,0 +1,241 @@
+"""Tests for the bounded-memory path for giant images."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageChops
+
+from sentei_pictures.api import reduce_file
+from sentei_pictures.core import large_image
+from sentei_pictures.core.image_processor import ImageProcessor
+from sentei_pictures.core.large_image import (
+    draft_large,
+    is_large,
+    open_image,
+    resize_in_strips,
+)
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+def _panorama(size=(1200, 400)):
+    """模様のある横長の画像"""
+    noise = Image.effect_noise((size[0] // 8, size[1] // 8), 60).resize(size)
+    gradient = Image.linear_gradient("L").resize(size)
+    return Image.merge("RGB", (noise, gradient, noise.transpose(0)))
+
+
+def _max_diff(a, b):
+    return max(high for _, high in ImageChops.difference(a, b).getextrema())
+
+
+class TestResizeInStrips:
+    """resize_in_strips のテスト"""
+
+    def test_matches_full_resize(self):
+        """帯ごとの縮小が一括の縮小とほぼ同じ結果になることをテスト"""
+        img = _panorama()
+        size = (300, 100)
+
+        # 1帯が数行になるよう中間バッファを小さくする
+        result = resize_in_strips(img, size, strip_bytes=300 * 3 * 4 * 7)
+
+        assert result.size == size
+        assert _max_diff(result, img.resize(size, Image.Resampling.LANCZOS)) <= 1
+
+    def test_single_strip(self):
+        """中間バッファが十分大きい場合に1回で縮小することをテスト"""
+        img = _panorama((200, 100))
+
+        result = resize_in_strips(img, (50, 25))
+
+        assert _max_diff(result, img.resize((50, 25), Image.Resampling.LANCZOS)) <= 1
+
+
+class TestDraftAndOpen:
+    """draft_large・open_image のテスト"""
+
+    def test_draft_reduces_decoded_jpeg(self, tmp_path):
+        """JPEGが出力の大きさに合わせて縮小して復号されることをテスト"""
+        path = tmp_path / "pano.jpg"
+        _panorama((1600, 800)).save(path, quality=90)
+
+        with Image.open(path) as img:
+            draft_large(img, (200, 100))
+            # 出力のDRAFT_GAP倍以上で、元画像より小さい
+            assert img.size == (400, 200)
+            assert img.load() is not None
+
+    def test_draft_ignores_other_formats(self, tmp_path):
+        """JPEG以外は復号時に縮小しないことをテスト"""
+        path = tmp_path / "pano.png"
+        _panorama((400, 200)).save(path)
+
+        with Image.open(path) as img:
+            draft_large(img, (50, 25))
+            assert img.size == (400, 200)
+
+    def test_opens_beyond_pillow_limit(self, tmp_path, monkeypatch):
+        """Pillowの展開爆弾の上限を超える画像を開けることをテスト"""
+        path = tmp_path / "pano.png"
+        _panorama((400, 200)).save(path)
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+
+        with open(path, "rb") as stream, open_image(stream) as img:
+            assert img.size == (400, 200)
+        assert Image.MAX_IMAGE_PIXELS == 1000
+
+    def test_open_keeps_global_limit(self, tmp_path, monkeypatch):
+        """上限を超える画像を開く間もPillowの上限（他のスレッドの検査）を変えないことをテスト"""
+        path = tmp_path / "pano.png"
+        _panorama((400, 200)).save(path)
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+        factory, accept = Image.OPEN["PNG"]
+        limits = []
+
+        def recording_factory(fp, filename):
+            limits.append(Image.MAX_IMAGE_PIXELS)
+            return factory(fp, filename)
+
+        monkeypatch.setitem(Image.OPEN, "PNG", (recording_factory, accept))
+
+        with open_image(path) as img:
+            assert img.size == (400, 200)
+            assert img.load() is not None
+
+        assert limits and set(limits) == {1000}
+        assert img.fp is None
+
+    def test_rejects_beyond_cap(self, tmp_path, monkeypatch):
+        """省メモリ処理の上限を超える画像を拒否することをテスト"""
+        path = tmp_path / "pano.png"
+        _panorama((400, 200)).save(path)
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+        monkeypatch.setattr(large_image, "MAX_LARGE_IMAGE_PIXELS", 10_000)
+
+        with pytest.raises(Image.DecompressionBombError):
+            open_image(path)
+
+    def test_is_large(self):
+        """画素数のしきい値の判定をテスト"""
+        assert is_large((8000, 5000), 40_000_000)
+        assert not is_large((7999, 5000), 40_000_000)
+
+
+class TestReduceLarge:
+    """ImageProcessor の省メモリ処理のテスト"""
+
+    def test_reduce_large_jpeg(self, tmp_path):
+        """しきい値以上のJPEGを正しい大きさで縮小することをテスト"""
+        path = tmp_path / "pano.jpg"
+        img = _panorama((1600, 400))
+        img.save(path, quality=95)
+        processor = ImageProcessor(max_long_side=400, large_image_pixels=100_000)
+
+        result = reduce_file(processor, path, tmp_path / "small.jpg")
+
+        assert result.ok
+        assert result.original_size == (1600, 400)
+        assert result.new_size == (400, 100)
+        with Image.open(tmp_path / "small.jpg") as small:
+            assert small.size == (400, 100)
+            expected = img.resize((400, 100), Image.Resampling.LANCZOS)
+            # 復号時の縮小とJPEGの劣化を許容する
+            diff = ImageChops.difference(small.convert("RGB"), expected)
+            assert max(diff.convert("L").getdata()) < 64
+
+    def test_reduce_large_png_with_alpha(self, tmp_path):
+        """しきい値以上のRGBA画像を縮小後にRGBへ変換することをテスト"""
+        path = tmp_path / "pano.png"
+        _panorama((800, 200)).convert("RGBA").save(path)
+        processor = ImageProcessor(max_long_side=200, large_image_pixels=100_000)
+
+        result = reduce_file(processor, path, tmp_path / "small.jpg")
+
+        assert result.ok
+        with Image.open(tmp_path / "small.jpg") as small:
+            assert small.size == (200, 50)
+            assert small.mode == "RGB"
+
+    def test_reduce_large_palette_image_with_lanczos(self, tmp_path):
+        """しきい値以上のパレット画像をRGBに変換してからLANCZOSで縮小することをテスト"""
+        path = tmp_path / "stripes.png"
+        # 1ピクセル幅の白黒の縦縞（NEARESTでは白か黒の一色になる）
+        stripes = Image.frombytes("L", (800, 200), bytes([0, 255]) * 400 * 200)
+        stripes.convert("P").save(path)
+        processor = ImageProcessor(max_long_side=200, large_image_pixels=100_000)
+
+        result = reduce_file(processor, path, tmp_path / "small.jpg")
+
+        assert result.ok
+        with Image.open(tmp_path / "small.jpg") as small:
+            assert small.mode == "RGB"
+            low, high = small.convert("L").getextrema()
+            assert 100 < low <= high < 156
+
+    def test_large_image_already_small_enough(self, tmp_path):
+        """縮小不要な大きな画像はそのままの大きさで保存することをテスト"""
+        path = tmp_path / "pano.jpg"
+        _panorama((800, 200)).save(path)
+        processor = ImageProcessor(max_long_side=1000, large_image_pixels=100_000)
+
+        result = reduce_file(processor, path, tmp_path / "out.jpg")
+
+        assert result.new_size == (800, 200)
+        with Image.open(tmp_path / "out.jpg") as out:
+            assert out.size == (800, 200)
+
+
+# ru_maxrssは親プロセスの値を引き継ぐため、子プロセス自身のVmHWMで測る
+_MEASURE = """
+import sys
+from sentei_pictures.core.image_processor import ImageProcessor
+
+
+def peak_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+
+
+pixels = None if sys.argv[3] == "none" else int(sys.argv[3])
+processor = ImageProcessor(max_long_side=3000, large_image_pixels=pixels)
+before = peak_kb()
+processor.reduce_image(sys.argv[1], sys.argv[2])
+print((peak_kb() - before) // 1024)
+"""
+
+
+class TestPeakMemory:
+    """ピークメモリ使用量のテスト"""
+
+    def _peak_mb(self, source, output, pixels):
+        completed = subprocess.run(
+            [sys.executable, "-c", _MEASURE, str(source), str(output), pixels],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={"PYTHONPATH": str(SRC)},
+        )
+        return int(completed.stdout)
+
+    def test_peak_rss_is_bounded(self, tmp_path):
+        """巨大な画像の縮小でピークメモリが元画像の大きさに比例しないことをテスト"""
+        if not Path("/proc/self/status").exists():
+            pytest.skip("ピークメモリの計測にLinuxの/proc/self/statusを使う")
+
+        # 16000×4000（6400万画素、Pillowの保持で256MB）
+        source = tmp_path / "giant.jpg"
+        _panorama((16000, 4000)).save(source, quality=85)
+
+        bounded = self._peak_mb(source, tmp_path / "bounded.jpg", "40000000")
+        full = self._peak_mb(source, tmp_path / "full.jpg", "none")
+
+        # 省メモリ処理は1/2で復号（8000×2000で64MB）し、帯ごとに縮小する
+        assert bounded < 128
+        assert full > 256
+        with Image.open(tmp_path / "bounded.jpg") as out:
+            assert out.size == (3000, 750)
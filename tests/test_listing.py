@@ -0,0 +1,214 @@
+"""Tests for the cached directory listing and the background scanner."""
+
+import os
+import threading
+
+import pytest
+
+from sentei_pictures.core import listing
+from sentei_pictures.core.file_matcher import FileMatcher
+from sentei_pictures.core.listing import (
+    LIST_IMAGES,
+    LIST_JPEG,
+    DirectoryScanner,
+    ListingCache,
+    ScanCancelled,
+    scan_directory,
+)
+
+
+def _touch(directory, *names):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (directory / name).write_bytes(b"x")
+
+
+def _bump_mtime(directory):
+    """ディレクトリの更新日時を確実に変える"""
+    stat = os.stat(directory)
+    os.utime(directory, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestScanDirectory:
+    """scan_directory のテスト"""
+
+    def test_matches_file_matcher(self, tmp_path):
+        """FileMatcherと同じファイルを一覧することをテスト"""
+        _touch(tmp_path, "a.jpg", "b.JPEG", "c.png", "d.txt", ".jpg")
+        (tmp_path / "sub.jpg").mkdir()
+
+        assert sorted(scan_directory(tmp_path, LIST_IMAGES)) == sorted(
+            FileMatcher.get_image_files(tmp_path)
+        )
+        assert sorted(scan_directory(tmp_path, LIST_JPEG)) == sorted(
+            FileMatcher.get_jpeg_files(tmp_path)
+        )
+
+    def test_cancelled_raises(self, tmp_path):
+        """cancelledがTrueを返すとScanCancelledになることをテスト"""
+        _touch(tmp_path, "a.jpg")
+
+        with pytest.raises(ScanCancelled):
+            scan_directory(tmp_path, cancelled=lambda: True)
+
+    def test_unknown_kind_raises_value_error(self, tmp_path):
+        """不明な一覧の種類はValueErrorになることをテスト"""
+        with pytest.raises(ValueError):
+            scan_directory(tmp_path, "raw")
+
+
+class TestListingCache:
+    """ListingCache のテスト"""
+
+    def test_reuses_listing_until_directory_changes(self, tmp_path, monkeypatch):
+        """ディレクトリの更新日時が変わるまで再走査しないことをテスト"""
+        _touch(tmp_path, "a.jpg", "b.png")
+        cache = ListingCache()
+        scans = []
+        original = listing.scan_directory
+
+        def counting(*args, **kwargs):
+            scans.append(args[0])
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(listing, "scan_directory", counting)
+
+        assert [p.name for p in cache.jpeg_files(tmp_path)] == ["a.jpg"]
+        assert [p.name for p in cache.jpeg_files(tmp_path)] == ["a.jpg"]
+        assert len(scans) == 1
+
+        # 種類ごとに別の一覧になる
+        assert len(cache.image_files(tmp_path)) == 2
+        assert len(scans) == 2
+
+        _touch(tmp_path, "c.jpg")
+        _bump_mtime(tmp_path)
+        assert sorted(p.name for p in cache.jpeg_files(tmp_path)) == [
+            "a.jpg",
+            "c.jpg",
+        ]
+        assert len(scans) == 3
+
+    def test_returns_copies(self, tmp_path):
+        """返した一覧を変更してもキャッシュに影響しないことをテスト"""
+        _touch(tmp_path, "a.jpg")
+        cache = ListingCache()
+
+        cache.image_files(tmp_path).clear()
+
+        assert len(cache.image_files(tmp_path)) == 1
+
+    def test_missing_directory_raises(self, tmp_path):
+        """存在しないディレクトリはFileNotFoundErrorになることをテスト"""
+        with pytest.raises(FileNotFoundError):
+            ListingCache().image_files(tmp_path / "missing")
+
+
+class TestDirectoryScanner:
+    """DirectoryScanner のテスト"""
+
+    def _wait(self, event):
+        assert event.wait(5), "scanner did not report a result"
+
+    def test_reports_listing_from_background_thread(self, tmp_path):
+        """一覧をワーカースレッドから通知することをテスト"""
+        _touch(tmp_path, "a.jpg", "b.jpg")
+        scanner = DirectoryScanner(ListingCache())
+        done = threading.Event()
+        results = []
+
+        def callback(token, files, error):
+            results.append((token, files, error, threading.current_thread()))
+            done.set()
+
+        token = scanner.request(tmp_path, callback, LIST_JPEG)
+        self._wait(done)
+
+        (reported, files, error, thread) = results[0]
+        assert reported == token and scanner.is_current(token)
+        assert sorted(p.name for p in files) == ["a.jpg", "b.jpg"]
+        assert error is None
+        assert thread is not threading.current_thread()
+
+    def test_reports_errors(self, tmp_path):
+        """走査の失敗を例外として通知することをテスト"""
+        scanner = DirectoryScanner(ListingCache())
+        done = threading.Event()
+        results = []
+
+        def callback(token, files, error):
+            results.append((files, error))
+            done.set()
+
+        scanner.request(tmp_path / "missing", callback)
+        self._wait(done)
+
+        files, error = results[0]
+        assert files is None
+        assert isinstance(error, FileNotFoundError)
+
+    def test_stale_requests_are_dropped(self, tmp_path, monkeypatch):
+        """新しい要求が来ると古い要求の結果を通知しないことをテスト"""
+        _touch(tmp_path / "old", "a.jpg")
+        _touch(tmp_path / "new", "b.jpg")
+        scanner = DirectoryScanner(ListingCache())
+        started = threading.Event()
+        release = threading.Event()
+        original = listing.scan_directory
+
+        def slow(directory, kind=LIST_IMAGES, cancelled=None):
+            if directory.name == "old":
+                started.set()
+                release.wait(5)
+            return original(directory, kind, cancelled)
+
+        monkeypatch.setattr(listing, "scan_directory", slow)
+        done = threading.Event()
+        results = []
+
+        def callback(token, files, error):
+            results.append([p.name for p in files])
+            done.set()
+
+        old_token = scanner.request(tmp_path / "old", callback)
+        assert started.wait(5)
+        new_token = scanner.request(tmp_path / "new", callback)
+        release.set()
+        self._wait(done)
+
+        assert not scanner.is_current(old_token)
+        assert scanner.is_current(new_token)
+        assert results == [["b.jpg"]]
+
+    def test_new_request_cancels_running_scan(self, tmp_path, monkeypatch):
+        """走査中に新しい要求が来ると走査を中止し、通知しないことをテスト"""
+        _touch(tmp_path / "big", *(f"{i}.jpg" for i in range(50)))
+        _touch(tmp_path / "next", "a.jpg")
+        scanner = DirectoryScanner(ListingCache())
+        done = threading.Event()
+        results = []
+        checks = []
+
+        def callback(token, files, error):
+            results.append([p.name for p in files])
+            done.set()
+
+        original = listing.scan_directory
+
+        def interrupted(directory, kind=LIST_IMAGES, cancelled=None):
+            def check():
+                if directory.name == "big":
+                    checks.append(directory)
+                    if len(checks) == 1:
+                        scanner.request(tmp_path / "next", callback)
+                return cancelled()
+
+            return original(directory, kind, check)
+
+        monkeypatch.setattr(listing, "scan_directory", interrupted)
+        scanner.request(tmp_path / "big", callback)
+        self._wait(done)
+
+        assert len(checks) == 1
+        assert results == [["a.jpg"]]
+        assert len(scanner.cache) == 1
@@ -0,0 +1,153 @@
+"""Tests for throughput metrics collected from result records."""
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.api import STATUS_FAILED, ReduceResult, choose, reduce_directory
+from sentei_pictures.core.copier import AdaptiveCopier
+from sentei_pictures.core.metrics import (
+    ThroughputMeter,
+    format_duration,
+    histogram_labels,
+)
+
+_MB = 1024 * 1024
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _result(elapsed=0.1, bytes_in=_MB, bytes_out=_MB // 4, worker="w1", **kwargs):
+    result = ReduceResult(
+        0, 0, None, bytes_in=bytes_in, bytes_out=bytes_out, elapsed=elapsed, **kwargs
+    )
+    result.worker = worker
+    return result
+
+
+class TestThroughputMeter:
+    """ThroughputMeter のテスト"""
+
+    def test_rates_eta_and_saved_bytes(self):
+        """速度・残り時間・削減容量を集計することをテスト"""
+        clock = FakeClock()
+        meter = ThroughputMeter(total=20, window=5.0, clock=clock)
+        clock.now += 2
+        for _ in range(4):
+            meter.record(_result())
+
+        snapshot = meter.snapshot()
+
+        assert snapshot.done == 4
+        assert snapshot.files_per_second == pytest.approx(2.0)
+        assert snapshot.mb_per_second == pytest.approx(2.0)
+        assert snapshot.eta == pytest.approx(8.0)
+        assert snapshot.bytes_saved == 4 * (_MB - _MB // 4)
+
+    def test_rate_is_rolling(self):
+        """直近の期間より前の結果は速度に含めないことをテスト"""
+        clock = FakeClock()
+        meter = ThroughputMeter(total=10, window=5.0, clock=clock)
+        for _ in range(5):
+            meter.record(_result())
+        clock.now += 10
+        meter.record(_result())
+
+        snapshot = meter.snapshot()
+
+        assert snapshot.done == 6
+        assert snapshot.files_per_second == pytest.approx(1 / 5)
+
+    def test_failures_skipped_copies_and_eta_without_total(self):
+        """失敗とコピー省略は転送量・削減容量に含めないことをテスト"""
+        clock = FakeClock()
+        meter = ThroughputMeter(clock=clock)
+        clock.now += 1
+        meter.record(_result(bytes_out=0, status=STATUS_FAILED))
+        meter.record(_result(bytes_out=0))
+
+        snapshot = meter.snapshot()
+
+        assert snapshot.failed == 1
+        assert snapshot.mb_per_second == 0
+        assert snapshot.bytes_saved == 0
+        assert snapshot.eta is None
+
+    def test_utilisation_and_histogram(self):
+        """ワーカーごとの稼働率と処理時間の分布を集計することをテスト"""
+        clock = FakeClock()
+        meter = ThroughputMeter(clock=clock)
+        clock.now += 10
+        meter.record(_result(elapsed=0.01, worker="a"))
+        meter.record(_result(elapsed=4.0, worker="b"))
+        meter.record(_result(elapsed=6.0, worker="b"))
+        meter.record(_result(elapsed=30.0, worker="c"))
+
+        snapshot = meter.snapshot()
+
+        assert list(snapshot.utilisation) == ["a", "b", "c"]
+        assert snapshot.utilisation["a"] == pytest.approx(0.001)
+        assert snapshot.utilisation["b"] == pytest.approx(1.0)
+        assert snapshot.utilisation["c"] == 1.0
+        assert len(snapshot.histogram) == len(histogram_labels())
+        assert snapshot.histogram[0] == 1
+        assert snapshot.histogram[-2] == 1
+        assert snapshot.histogram[-1] == 2
+        assert "W2 100%" in "\n".join(snapshot.summary_lines())
+
+    def test_version_changes_only_on_record(self):
+        """結果を集計したときだけversionが変わることをテスト"""
+        meter = ThroughputMeter()
+        version = meter.version
+        meter.snapshot()
+        assert meter.version == version
+
+        meter.record(_result())
+        assert meter.version == version + 1
+
+
+class TestFormatDuration:
+    """format_duration のテスト"""
+
+    @pytest.mark.parametrize(
+        "seconds,expected",
+        [(12.4, "12秒"), (185, "3分05秒"), (3720, "1時間02分")],
+    )
+    def test_format(self, seconds, expected):
+        """秒数の表示形式をテスト"""
+        assert format_duration(seconds) == expected
+
+
+class TestResultWorker:
+    """結果レコードのworkerのテスト"""
+
+    def test_engines_record_worker(self, tmp_path):
+        """reduce・choiceの結果に処理したワーカーが記録されることをテスト"""
+        original = tmp_path / "original"
+        original.mkdir()
+        for i in range(3):
+            Image.new("RGB", (32, 32)).save(original / f"IMG_{i}.jpg")
+        (tmp_path / "reduced").mkdir()
+        (tmp_path / "out").mkdir()
+
+        reduced = list(reduce_directory(original, tmp_path / "reduced"))
+        copied = list(
+            choose(
+                original,
+                tmp_path / "out",
+                tmp_path / "reduced",
+                copier=AdaptiveCopier(max_copies=2, initial_copies=2),
+            )
+        )
+
+        assert all(r.worker for r in reduced + copied)
+        assert "worker" in reduced[0].as_dict()
+        meter = ThroughputMeter(total=6)
+        for result in reduced + copied:
+            meter.record(result)
+        assert meter.snapshot().done == 6
@@ -0,0 +1,207 @@
+"""Tests for the shared-memory decode/encode pipeline."""
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.api import CancelToken, reduce_directory, reduce_file
+from sentei_pictures.cli import reduce
+from sentei_pictures.core.image_processor import ImageProcessor
+from sentei_pictures.core.pipeline import (
+    ShmPipeline,
+    SlabPool,
+    decode_to_slab,
+    encode_from_slab,
+    slab_bytes,
+)
+
+
+def _make_jpegs(directory, count=4):
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        Image.effect_noise((480, 320), 40 + i).convert("RGB").save(
+            directory / f"IMG_{i}.jpg"
+        )
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    pipeline = ShmPipeline(1, 1)
+    yield pipeline
+    pipeline.close()
+
+
+@pytest.fixture
+def slabs():
+    slabs = SlabPool(2, slab_bytes(200))
+    yield slabs
+    slabs.close()
+
+
+class TestSlabPool:
+    """SlabPool のテスト"""
+
+    def test_acquire_and_release(self, slabs):
+        """空いているスラブを順に使い回すことをテスト"""
+        first = slabs.acquire()
+        second = slabs.acquire()
+
+        assert first != second
+        assert slabs.acquire() is None
+        slabs.release(first)
+        assert slabs.available == 1
+        assert slabs.acquire() == first
+
+
+class TestSlabHandoff:
+    """decode_to_slab・encode_from_slab のテスト"""
+
+    def test_output_matches_reduce_file(self, tmp_path, slabs):
+        """スラブを経由した保存が通常の処理と同じJPEGになることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        source = tmp_path / "in" / "IMG_0.jpg"
+        processor = ImageProcessor(max_long_side=200)
+
+        frame = decode_to_slab(processor, source, slabs.acquire())
+        stats, bytes_out, _ = encode_from_slab(processor, frame, tmp_path / "a.jpg")
+        reduce_file(processor, source, tmp_path / "b.jpg")
+
+        assert frame.data is None
+        assert frame.mode == "RGBX"
+        assert frame.new_size == (200, 133)
+        assert stats == {"quality": 87}
+        assert (tmp_path / "a.jpg").read_bytes() == (tmp_path / "b.jpg").read_bytes()
+        assert bytes_out == (tmp_path / "a.jpg").stat().st_size
+
+    def test_encoder_reads_slab_without_copy(self, tmp_path, slabs):
+        """保存側がスラブの画素をそのまま参照することをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        processor = ImageProcessor(max_long_side=200)
+        name = slabs.acquire()
+        frame = decode_to_slab(processor, tmp_path / "in" / "IMG_0.jpg", name)
+
+        # 復号後にスラブを書き換えると保存される画像も変わる
+        slab = slabs._slabs[[s.name for s in slabs._slabs].index(name)]
+        slab.buf[:] = bytes(slabs.size)
+        encode_from_slab(processor, frame, tmp_path / "black.jpg")
+
+        with Image.open(tmp_path / "black.jpg") as img:
+            assert img.convert("L").getextrema() == (0, 0)
+
+    def test_falls_back_to_pickle(self, tmp_path):
+        """スラブに収まらない画像は画素をpickleで渡すことをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        processor = ImageProcessor(max_long_side=200)
+        small = SlabPool(1, 16)
+        try:
+            frame = decode_to_slab(
+                processor, tmp_path / "in" / "IMG_0.jpg", small.acquire()
+            )
+        finally:
+            small.close()
+        encode_from_slab(processor, frame, tmp_path / "out.jpg")
+
+        assert frame.slab is None
+        assert frame.mode == "RGB"
+        assert len(frame.data) == 200 * 133 * 3
+        with Image.open(tmp_path / "out.jpg") as img:
+            assert img.size == (200, 133)
+
+
+class TestReducePipelined:
+    """reduce_directory の共有メモリのパイプラインのテスト"""
+
+    def test_results_in_order(self, tmp_path, pipeline):
+        """結果が入力順で、通常の処理と同じ出力になりスラブがすべて返ることをテスト"""
+        _make_jpegs(tmp_path / "in", 6)
+        (tmp_path / "in" / "IMG_3.jpg").write_bytes(b"broken")
+        (tmp_path / "out").mkdir()
+        processor = ImageProcessor(max_long_side=240)
+
+        files = sorted((tmp_path / "in").iterdir())
+
+        results = list(
+            reduce_directory(
+                tmp_path / "in",
+                tmp_path / "out",
+                processor,
+                files=files,
+                pipeline=pipeline,
+            )
+        )
+
+        assert [r.path.name for r in results] == [f"IMG_{i}.jpg" for i in range(6)]
+        assert [r.index for r in results] == list(range(1, 7))
+        assert [r.ok for r in results] == [True, True, True, False, True, True]
+        assert results[0].new_size == (240, 160)
+        assert results[0].bytes_in > 0 and results[0].bytes_out > 0
+        expected = reduce_file(
+            processor, tmp_path / "in" / "IMG_0.jpg", tmp_path / "expected.jpg"
+        )
+        assert expected.ok
+        assert (tmp_path / "out" / "IMG_0.jpg").read_bytes() == (
+            tmp_path / "expected.jpg"
+        ).read_bytes()
+        slabs = pipeline.slabs_for(processor)
+        assert slabs.available == len(slabs)
+
+    def test_cancel_returns_slabs(self, tmp_path, pipeline):
+        """キャンセルしても使用中のスラブが返されることをテスト"""
+        _make_jpegs(tmp_path / "in", 6)
+        (tmp_path / "out").mkdir()
+        cancel = CancelToken()
+        processor = ImageProcessor(max_long_side=240)
+        results = []
+
+        for result in reduce_directory(
+            tmp_path / "in", tmp_path / "out", processor, cancel, pipeline=pipeline
+        ):
+            results.append(result)
+            cancel.cancel()
+
+        assert len(results) == 1
+        slabs = pipeline.slabs_for(processor)
+        assert slabs.available == len(slabs)
+
+    def test_rejects_archive(self, tmp_path, pipeline):
+        """アーカイブへの書き込みとは併用できないことをテスト"""
+        with pytest.raises(ValueError):
+            list(
+                reduce_directory(
+                    tmp_path, tmp_path, archive=object(), pipeline=pipeline
+                )
+            )
+
+
+class TestPipelineCli:
+    """reduce コマンドの --pipeline のテスト"""
+
+    def test_pipeline_option(self, tmp_path, capsys):
+        """--pipeline で全ファイルを軽量化することをテスト"""
+        _make_jpegs(tmp_path / "in")
+        args = reduce.build_parser().parse_args(
+            [
+                str(tmp_path / "in"),
+                str(tmp_path / "out"),
+                "-j",
+                "2",
+                "--pipeline",
+                "--max-long-side",
+                "200",
+            ]
+        )
+
+        assert reduce.execute(args) == 0
+
+        assert "完了: 4/4個" in capsys.readouterr().out
+        with Image.open(tmp_path / "out" / "IMG_0.jpg") as img:
+            assert img.size == (200, 133)
+
+    def test_pipeline_rejects_archive_output(self, tmp_path, capsys):
+        """保存先がアーカイブの場合はエラーになることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        args = reduce.build_parser().parse_args(
+            [str(tmp_path / "in"), str(tmp_path / "out.zip"), "--pipeline"]
+        )
+
+        assert reduce.execute(args) == 1
+        assert "--pipeline" in capsys.readouterr().out
@@ -0,0 +1,171 @@
+"""Tests for the dry-run reduce planner."""
+
+import random
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.api import CancelToken
+from sentei_pictures.cli.main import main
+from sentei_pictures.core.image_processor import ImageProcessor
+from sentei_pictures.core.planner import format_duration, free_space, plan_reduce
+
+
+def _make_noise_jpegs(directory, sizes):
+    """圧縮率が実写に近くなるようにノイズ画像を作成"""
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(0)
+    paths = []
+    for i, size in enumerate(sizes):
+        data = bytes(rng.getrandbits(8) for _ in range(size[0] * size[1] * 3))
+        path = directory / f"{i:03d}.jpg"
+        Image.frombytes("RGB", size, data).save(path, quality=95)
+        paths.append(path)
+    return paths
+
+
+class TestPlanReduce:
+    """plan_reduce のテスト"""
+
+    def test_estimates_output_bytes_close_to_actual(self, tmp_path):
+        """推定出力サイズが実際の出力サイズに近いことをテスト"""
+        sizes = [(160, 120)] * 6 + [(400, 300)] * 6
+        files = _make_noise_jpegs(tmp_path / "in", sizes)
+        processor = ImageProcessor(max_long_side=200, quality=70)
+
+        estimate = plan_reduce(files, processor, tmp_path / "out", sample_size=4)
+
+        actual = 0
+        for path in files:
+            output_path = tmp_path / "actual" / path.name
+            output_path.parent.mkdir(exist_ok=True)
+            processor.reduce_image(path, output_path)
+            actual += output_path.stat().st_size
+        assert estimate.file_count == 12
+        assert estimate.sample_count == 4
+        assert estimate.estimated_bytes_out == pytest.approx(actual, rel=0.2)
+        assert not (tmp_path / "out").exists()
+
+    def test_counts_unreadable_files(self, tmp_path):
+        """読み取れないファイルは数えられて見積もりから除外されることをテスト"""
+        files = _make_noise_jpegs(tmp_path, [(32, 32)])
+        broken = tmp_path / "broken.jpg"
+        broken.write_bytes(b"not a jpeg")
+
+        estimate = plan_reduce(files + [broken], ImageProcessor())
+
+        assert estimate.file_count == 1
+        assert estimate.unreadable == 1
+        assert estimate.free_bytes is None
+
+    def test_reports_insufficient_space(self, tmp_path):
+        """空き容量を超える出力は不足として判定されることをテスト"""
+        files = _make_noise_jpegs(tmp_path, [(64, 64)])
+
+        estimate = plan_reduce(files, ImageProcessor(), tmp_path)
+        estimate.free_bytes = estimate.estimated_bytes_out - 1
+
+        assert not estimate.fits
+        assert any("不足" in line for line in estimate.summary_lines())
+
+    def test_cancelled_plan_stops_before_sampling(self, tmp_path, monkeypatch):
+        """キャンセルされた見積もりはサンプルをエンコードせずにNoneを返すことをテスト"""
+        files = _make_noise_jpegs(tmp_path, [(32, 32)] * 3)
+        processor = ImageProcessor()
+        cancel = CancelToken()
+        original = processor.get_image_info
+
+        def get_image_info(path):
+            cancel.cancel()
+            return original(path)
+
+        monkeypatch.setattr(processor, "get_image_info", get_image_info)
+        monkeypatch.setattr(processor, "reduce_image", pytest.fail)
+
+        assert plan_reduce(files, processor, cancel=cancel) is None
+
+    def test_failed_sample_falls_back_within_stratum(self, tmp_path, monkeypatch):
+        """サンプルに失敗した層は同じ層の別のファイルで見積もることをテスト"""
+        files = _make_noise_jpegs(tmp_path, [(64, 48)] * 8)
+        processor = ImageProcessor()
+        expected = plan_reduce(files, processor, sample_size=2)
+        original = processor.reduce_image
+        failed = []
+
+        def reduce_image(path, output):
+            if not failed:
+                failed.append(path)
+                raise OSError("broken")
+            return original(path, output)
+
+        monkeypatch.setattr(processor, "reduce_image", reduce_image)
+        estimate = plan_reduce(files, processor, sample_size=2)
+
+        assert estimate.sample_count == 2
+        assert estimate.skipped_strata == 0
+        assert estimate.estimated_bytes_out == pytest.approx(
+            expected.estimated_bytes_out, rel=0.2
+        )
+
+    def test_skipped_strata_are_scaled_from_sampled_bytes(self, tmp_path, monkeypatch):
+        """サンプルできなかった層の分を他の層の比率で補うことをテスト"""
+        files = _make_noise_jpegs(tmp_path, [(64, 48)] * 4 + [(32, 24)] * 4)
+        processor = ImageProcessor()
+        expected = plan_reduce(files, processor, sample_size=2)
+        original = processor.reduce_image
+
+        def reduce_image(path, output):
+            # 画素数の小さい層は全て失敗させる
+            if int(path.stem) >= 4:
+                raise OSError("broken")
+            return original(path, output)
+
+        monkeypatch.setattr(processor, "reduce_image", reduce_image)
+        estimate = plan_reduce(files, processor, sample_size=2)
+
+        assert estimate.sample_count == 1
+        assert estimate.skipped_strata == 1
+        assert estimate.estimated_bytes_out > expected.estimated_bytes_out * 0.7
+        assert any("1個" in line and "補って" in line for line in estimate.summary_lines())
+
+    def test_all_samples_failed_assumes_input_size(self, tmp_path, monkeypatch):
+        """全てのサンプルに失敗したら出力を入力と同じサイズと見なすことをテスト"""
+        files = _make_noise_jpegs(tmp_path, [(32, 32)] * 3)
+        processor = ImageProcessor()
+
+        def reduce_image(path, output):
+            raise OSError("broken")
+
+        monkeypatch.setattr(processor, "reduce_image", reduce_image)
+        estimate = plan_reduce(files, processor, sample_size=2)
+
+        assert estimate.sample_count == 0
+        assert estimate.skipped_strata == 2
+        assert estimate.estimated_bytes_out == estimate.bytes_in
+
+    def test_free_space_uses_existing_parent(self, tmp_path):
+        """未作成の出力先は存在する親ディレクトリで空き容量を調べることをテスト"""
+        assert free_space(tmp_path / "a" / "b") == free_space(tmp_path)
+
+    def test_format_duration(self):
+        """処理時間の表示形式をテスト"""
+        assert format_duration(5.2) == "5秒"
+        assert format_duration(125) == "2分5秒"
+        assert format_duration(3720) == "1時間2分"
+
+
+class TestPlanCommand:
+    """reduce --plan のテスト"""
+
+    def test_plan_does_not_write_output(self, tmp_path, capsys):
+        """--planでは見積もりだけを表示して出力しないことをテスト"""
+        _make_noise_jpegs(tmp_path / "in", [(64, 48)] * 3)
+
+        with pytest.raises(SystemExit) as exc_info:
+            main(["reduce", "--plan", str(tmp_path / "in"), str(tmp_path / "out")])
+
+        assert exc_info.value.code == 0
+        output = capsys.readouterr().out
+        assert "推定出力サイズ" in output
+        assert "出力先の空き容量" in output
+        assert not (tmp_path / "out").exists()
@@ -0,0 +1,136 @@
+"""Tests for perceptual-quality targeting."""
+
+import io
+
+import pytest
+from PIL import Image, ImageFilter
+
+from sentei_pictures.api import reduce_file
+from sentei_pictures.cli import reduce
+from sentei_pictures.core.image_processor import ImageProcessor
+from sentei_pictures.core.quality import choose_quality, encode_jpeg, luma, ssim
+
+# SSIMの計算にはNumPy（オプションの依存関係）が必要
+np = pytest.importorskip("numpy")
+
+
+def _detailed(size=(400, 300)):
+    return Image.effect_noise(size, 60).convert("RGB")
+
+
+def _flat(size=(400, 300)):
+    return Image.linear_gradient("L").resize(size).convert("RGB")
+
+
+class TestSsim:
+    """ssim のテスト"""
+
+    def test_identical_images_score_one(self):
+        """同一の画像のSSIMが1になることをテスト"""
+        reference = luma(_detailed())
+
+        assert ssim(reference, reference.copy()) == pytest.approx(1.0)
+
+    def test_score_drops_with_distortion(self):
+        """劣化が大きいほどSSIMが下がることをテスト"""
+        img = _detailed()
+        reference = luma(img)
+        slight = luma(img.filter(ImageFilter.GaussianBlur(0.5)))
+        heavy = luma(img.filter(ImageFilter.GaussianBlur(3)))
+
+        assert 1.0 > ssim(reference, slight) > ssim(reference, heavy)
+
+    def test_luma_is_downsampled(self):
+        """輝度画像が長辺max_sideまで縮小されることをテスト"""
+        assert luma(_flat((2000, 1000)), max_side=500).shape == (250, 500)
+
+    def test_shape_mismatch_raises_value_error(self):
+        """大きさが異なる画像はValueErrorになることをテスト"""
+        with pytest.raises(ValueError):
+            ssim(np.zeros((10, 10)), np.zeros((10, 12)))
+
+
+class TestChooseQuality:
+    """choose_quality のテスト"""
+
+    def test_meets_target_with_bounded_trials(self):
+        """目標を満たし、試しエンコードが上限以内であることをテスト"""
+        img = _detailed()
+
+        choice = choose_quality(img, 0.95, max_trials=5)
+
+        assert choice.ssim >= 0.95
+        assert choice.trials <= 5
+        with Image.open(io.BytesIO(choice.data)) as decoded:
+            assert ssim(luma(img), luma(decoded)) == pytest.approx(choice.ssim)
+        # 1つ下の品質では目標を満たさない（最小の品質を選んでいる）
+        if choice.quality > 40 and choice.trials < 5:
+            lower = encode_jpeg(img, choice.quality - 1, optimize=False)
+            with Image.open(io.BytesIO(lower)) as decoded:
+                assert ssim(luma(img), luma(decoded)) < 0.95
+
+    def test_flat_image_gets_lower_quality(self):
+        """平坦な画像は細かい模様の画像より低い品質が選ばれることをテスト"""
+        flat = choose_quality(_flat(), 0.98)
+        detailed = choose_quality(_detailed(), 0.98)
+
+        assert flat.quality < detailed.quality
+
+    def test_unreachable_target_uses_max_quality(self):
+        """目標を満たせない場合は上限の品質になることをテスト"""
+        choice = choose_quality(_detailed(), 1.0, max_quality=90)
+
+        assert choice.quality == 90
+
+
+class TestTargetSsimProcessing:
+    """画質目標を使った reduce のテスト"""
+
+    def test_reduce_file_records_quality_and_ssim(self, tmp_path):
+        """結果レコードに選んだ品質とSSIMが記録されることをテスト"""
+        source = tmp_path / "in.jpg"
+        _flat((800, 600)).save(source, quality=95)
+        processor = ImageProcessor(max_long_side=400, target_ssim=0.98)
+
+        result = reduce_file(processor, source, tmp_path / "out.jpg")
+
+        assert result.ok, result.error
+        assert result.ssim >= 0.98
+        assert result.quality < 87
+        assert result.bytes_out == (tmp_path / "out.jpg").stat().st_size
+        with Image.open(tmp_path / "out.jpg") as img:
+            assert img.size == (400, 300)
+
+    def test_fixed_quality_records_quality_only(self, tmp_path):
+        """固定品質では設定の品質だけが記録されることをテスト"""
+        source = tmp_path / "in.jpg"
+        _flat().save(source)
+
+        result = reduce_file(ImageProcessor(quality=70), source, tmp_path / "out.jpg")
+
+        assert (result.quality, result.ssim) == (70, None)
+
+    @pytest.mark.parametrize("value", [0, 1.5])
+    def test_out_of_range_target_raises_value_error(self, value):
+        """範囲外の目標値はValueErrorになることをテスト"""
+        with pytest.raises(ValueError):
+            ImageProcessor(target_ssim=value)
+
+    def test_cli_prints_chosen_quality(self, tmp_path, capsys):
+        """--target-ssim で選んだ品質とSSIMが表示されることをテスト"""
+        (tmp_path / "in").mkdir()
+        _flat().save(tmp_path / "in" / "a.jpg", quality=95)
+        args = reduce.build_parser().parse_args(
+            [
+                str(tmp_path / "in"),
+                str(tmp_path / "out"),
+                "-j",
+                "1",
+                "--target-ssim",
+                "0.98",
+            ]
+        )
+
+        assert reduce.execute(args) == 0
+
+        assert "（SSIM 0.9" in capsys.readouterr().out
@@ -0,0 +1,216 @@
+"""Tests for selection lists used as choice input."""
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.api import STATUS_NOT_FOUND, STATUS_OK, choose_names
+from sentei_pictures.cli import choice
+from sentei_pictures.core.catalog import Catalog
+from sentei_pictures.core.file_matcher import FileIndex, FileMatcher
+from sentei_pictures.core.selection import read_entries, read_selection, read_xmp
+
+_XMP_ATTRIBUTES = """<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about="" xmlns:xmp="http://ns.adobe.com/xap/1.0/"
+   xmp:Rating="{rating}" xmp:Label="{label}"/>
+ </rdf:RDF>
+</x:xmpmeta>
+"""
+
+_XMP_ELEMENTS = """<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about="" xmlns:xmp="http://ns.adobe.com/xap/1.0/">
+   <xmp:Rating>{rating}</xmp:Rating>
+   <xmp:Label>{label}</xmp:Label>
+  </rdf:Description>
+ </rdf:RDF>
+</x:xmpmeta>
+"""
+
+
+def _make_jpeg(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (8, 8)).save(path, "JPEG")
+    return path
+
+
+class TestReadSelection:
+    """選定リストの読み込みのテスト"""
+
+    def test_text_list(self, tmp_path):
+        """テキストの選定リストで空行・コメント・パス・重複を扱うことをテスト"""
+        path = tmp_path / "picks.txt"
+        path.write_text(
+            "# 選定結果\nIMG_0001.jpg\n\n/reduced/IMG_0002.jpg\n"
+            "C:\\reduced\\IMG_0003.jpg\nIMG_0001.jpg\n",
+            encoding="utf-8",
+        )
+
+        assert read_selection(path) == ["IMG_0001.jpg", "IMG_0002.jpg", "IMG_0003.jpg"]
+
+    def test_csv_with_header_and_rating(self, tmp_path):
+        """ヘッダー付きCSVの評価・ラベルで絞り込めることをテスト"""
+        path = tmp_path / "picks.csv"
+        path.write_text(
+            "Rating,FileName,Label\n5,a.jpg,Red\n2,b.jpg,Red\n,c.jpg,\n4,d.jpg,Blue\n",
+            encoding="utf-8",
+        )
+
+        assert read_selection(path) == ["a.jpg", "b.jpg", "c.jpg", "d.jpg"]
+        assert read_selection(path, min_rating=4) == ["a.jpg", "d.jpg"]
+        assert read_selection(path, labels=["red"]) == ["a.jpg", "b.jpg"]
+        assert read_selection(path, min_rating=3, labels=["Red"]) == ["a.jpg"]
+
+    def test_csv_without_header(self, tmp_path):
+        """ヘッダーのないCSVは1列目をファイル名として読むことをテスト"""
+        path = tmp_path / "picks.csv"
+        path.write_text("a.jpg,keep\nb.jpg,keep\n", encoding="utf-8")
+
+        assert read_selection(path) == ["a.jpg", "b.jpg"]
+
+    @pytest.mark.parametrize("template", [_XMP_ATTRIBUTES, _XMP_ELEMENTS])
+    def test_xmp_sidecar(self, tmp_path, template):
+        """XMPサイドカーの評価とラベルを読むことをテスト（属性形式・要素形式）"""
+        path = tmp_path / "IMG_0001.CR2.xmp"
+        path.write_text(template.format(rating=4, label="Green"), encoding="utf-8")
+
+        entry = read_xmp(path)
+
+        assert (entry.name, entry.rating, entry.label) == ("IMG_0001.CR2", 4, "Green")
+
+    def test_xmp_directory_with_threshold(self, tmp_path):
+        """XMPサイドカーのディレクトリを評価のしきい値で絞り込めることをテスト"""
+        sidecars = tmp_path / "xmp"
+        sidecars.mkdir()
+        for name, rating in (("a", 5), ("b", 1), ("c", -1), ("d", 3)):
+            (sidecars / f"{name}.xmp").write_text(
+                _XMP_ATTRIBUTES.format(rating=rating, label=""), encoding="utf-8"
+            )
+        (sidecars / "notes.txt").write_text("x")
+
+        assert [e.name for e in read_entries(sidecars)] == ["a", "b", "c", "d"]
+        assert read_selection(sidecars, min_rating=3) == ["a", "d"]
+
+    def test_broken_xmp_raises_value_error(self, tmp_path):
+        """XMLとして読めないXMPはValueErrorになることをテスト"""
+        path = tmp_path / "a.xmp"
+        path.write_text("<x:xmpmeta", encoding="utf-8")
+
+        with pytest.raises(ValueError):
+            read_xmp(path)
+
+
+class TestFileIndex:
+    """FileIndex のテスト"""
+
+    def test_follows_find_matching_file_rules(self, tmp_path):
+        """完全一致・拡張子違い・大文字小文字違いの順で検索されることをテスト"""
+        for name in ("IMG_1.JPG", "img_1.png", "IMG_2.png"):
+            _make_jpeg(tmp_path / name)
+        (tmp_path / "IMG_3.txt").write_text("x")
+
+        index = FileMatcher.build_index(tmp_path)
+
+        assert len(index) == 3
+        assert index.find("IMG_1.JPG") == tmp_path / "IMG_1.JPG"
+        assert index.find("img_1.jpg") == tmp_path / "img_1.png"
+        assert index.find("IMG_2.jpg") == tmp_path / "IMG_2.png"
+        assert index.find("img_2") == tmp_path / "IMG_2.png"
+        assert index.find("IMG_3.jpg") is None
+
+    def test_matches_catalog_index(self, tmp_path):
+        """カタログから作成した索引が走査した索引と同じ結果になることをテスト"""
+        for name in ("A.JPG", "a.png", "B.jpeg"):
+            _make_jpeg(tmp_path / "orig" / name)
+
+        with Catalog(tmp_path / "catalog.db") as catalog:
+            from_catalog = FileMatcher.build_index(tmp_path / "orig", catalog)
+        scanned = FileIndex(tmp_path / "orig", (tmp_path / "orig").iterdir())
+
+        for name in ("A.jpg", "a.jpg", "b.JPG", "c.jpg"):
+            assert from_catalog.find(name) == scanned.find(name)
+
+
+class TestChooseNames:
+    """choose_names のテスト"""
+
+    def test_resolves_names_with_single_scan(self, tmp_path, monkeypatch):
+        """ファイル名ごとに元画像ディレクトリを走査しないことをテスト"""
+        original = tmp_path / "original"
+        for i in range(5):
+            _make_jpeg(original / f"IMG_{i}.JPG")
+        out = tmp_path / "out"
+        out.mkdir()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("find_matching_file should not be called")
+
+        monkeypatch.setattr(FileMatcher, "find_matching_file", fail)
+
+        results = list(
+            choose_names(original, out, ["img_0.jpg", "IMG_3.jpg", "IMG_9.jpg"])
+        )
+
+        assert [r.status for r in results] == [
+            STATUS_OK,
+            STATUS_OK,
+            STATUS_NOT_FOUND,
+        ]
+        assert [r.index for r in results] == [1, 2, 3]
+        assert results[0].source_path == original / "IMG_0.JPG"
+        assert sorted(p.name for p in out.iterdir()) == ["IMG_0.JPG", "IMG_3.JPG"]
+
+
+class TestChoiceCli:
+    """choice コマンドの選定リスト対応のテスト"""
+
+    def _parse(self, argv):
+        parser = choice.build_parser()
+        return parser.parse_args(argv)
+
+    def test_list_copies_originals(self, tmp_path, capsys):
+        """--list で選定フォルダーなしに元画像をコピーすることをテスト"""
+        _make_jpeg(tmp_path / "orig" / "IMG_1.JPG")
+        _make_jpeg(tmp_path / "orig" / "IMG_2.JPG")
+        picks = tmp_path / "picks.csv"
+        picks.write_text("filename,rating\nIMG_1.jpg,5\nIMG_2.jpg,1\n")
+
+        args = self._parse(
+            [
+                str(tmp_path / "orig"),
+                str(tmp_path / "out"),
+                "--list",
+                str(picks),
+                "--min-rating",
+                "3",
+            ]
+        )
+
+        assert choice.execute(args) == 0
+        assert [p.name for p in (tmp_path / "out").iterdir()] == ["IMG_1.JPG"]
+        assert "1/1個のファイルをコピーしました" in capsys.readouterr().out
+
+    def test_list_with_selected_dir_is_rejected(self, tmp_path):
+        """--list と選定フォルダーを同時に指定するとエラーになることをテスト"""
+        (tmp_path / "orig").mkdir()
+        picks = tmp_path / "picks.txt"
+        picks.write_text("a.jpg\n")
+        args = self._parse(
+            [
+                str(tmp_path / "orig"),
+                str(tmp_path / "out"),
+                str(tmp_path / "selected"),
+                "--list",
+                str(picks),
+            ]
+        )
+
+        assert choice.execute(args) == 1
+
+    def test_filters_require_list(self, tmp_path):
+        """--list なしの --min-rating はエラーになることをテスト"""
+        args = self._parse(
+            [str(tmp_path), str(tmp_path / "out"), str(tmp_path), "--min-rating", "3"]
+        )
+
+        assert choice.execute(args) == 1
@@ -0,0 +1,214 @@
+"""Tests for the job scheduler and HTTP job server."""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from PIL import Image
+
+from sentei_pictures import jobs
+from sentei_pictures.jobs import (
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JobScheduler,
+)
+from sentei_pictures.server import create_server
+
+
+def _make_jpegs(directory, count):
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        Image.new("RGB", (64, 48), (i, 0, 0)).save(directory / f"{i:03d}.jpg")
+
+
+def _request(method, url, data=None):
+    body = json.dumps(data).encode("utf-8") if data is not None else None
+    request = urllib.request.Request(url, data=body, method=method)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return response.status, response.read().decode("utf-8")
+
+
+@pytest.fixture
+def server():
+    """空きポートでサーバーを起動（並列処理なし）"""
+    server = create_server(port=0, scheduler=JobScheduler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestJobScheduler:
+    """JobScheduler class のテスト"""
+
+    def test_runs_jobs_in_priority_order(self, tmp_path):
+        """優先度の高いジョブから実行されることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        scheduler = JobScheduler()
+        params = {"input_dir": str(tmp_path / "in")}
+        low = scheduler.submit("reduce", {**params, "output_dir": str(tmp_path / "a")})
+        high = scheduler.submit(
+            "reduce", {**params, "output_dir": str(tmp_path / "b")}, priority=10
+        )
+
+        scheduler.start()
+        try:
+            assert low.wait(10) and high.wait(10)
+        finally:
+            scheduler.shutdown()
+
+        assert high.started_at <= low.started_at
+        assert low.state == high.state == JOB_DONE
+
+    def test_cancel_queued_job(self, tmp_path):
+        """待機中のジョブをキャンセルできることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        scheduler = JobScheduler()
+        job = scheduler.submit(
+            "reduce",
+            {"input_dir": str(tmp_path / "in"), "output_dir": str(tmp_path / "out")},
+        )
+        assert job.state == JOB_QUEUED
+
+        scheduler.cancel(job.id)
+        scheduler.start()
+        scheduler.shutdown()
+
+        assert job.state == JOB_CANCELLED
+        assert not (tmp_path / "out").exists()
+
+    def test_unexpected_error_does_not_stop_scheduler(self, tmp_path, monkeypatch):
+        """ジョブの想定外の例外で実行スレッドが止まらないことをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        original = jobs.run_job
+
+        def run_job(job, *args):
+            if job.name == "broken":
+                raise TypeError("broken")
+            original(job, *args)
+
+        monkeypatch.setattr(jobs, "run_job", run_job)
+        scheduler = JobScheduler()
+        params = {
+            "input_dir": str(tmp_path / "in"),
+            "output_dir": str(tmp_path / "out"),
+        }
+        broken = scheduler.submit("reduce", params, name="broken")
+        ok = scheduler.submit("reduce", params)
+
+        scheduler.start()
+        try:
+            assert broken.wait(10) and ok.wait(10)
+        finally:
+            scheduler.shutdown()
+
+        assert broken.state == JOB_FAILED
+        assert broken.error == "broken"
+        assert ok.state == JOB_DONE
+
+    def test_rejects_invalid_job(self, tmp_path):
+        """不正なジョブがValueErrorになることをテスト"""
+        scheduler = JobScheduler()
+        with pytest.raises(ValueError):
+            scheduler.submit("unknown", {})
+        with pytest.raises(ValueError):
+            scheduler.submit(
+                "reduce",
+                {"input_dir": str(tmp_path / "missing"), "output_dir": str(tmp_path)},
+            )
+
+
+class TestJobServer:
+    """HTTPジョブサーバーのテスト"""
+
+    def test_submit_and_stream_events(self, server, tmp_path):
+        """ジョブを登録して結果イベントをストリームで受け取れることをテスト"""
+        _make_jpegs(tmp_path / "in", 3)
+        status, body = _request(
+            "POST",
+            f"{server.url}/jobs",
+            {
+                "kind": "reduce",
+                "input_dir": str(tmp_path / "in"),
+                "output_dir": str(tmp_path / "out"),
+                "quality": 70,
+            },
+        )
+        assert status == 201
+        job_id = json.loads(body)["id"]
+
+        _, body = _request("GET", f"{server.url}/jobs/{job_id}/events")
+        events = [json.loads(line) for line in body.splitlines()]
+
+        assert [e["type"] for e in events] == ["result"] * 3 + ["job"]
+        assert all(e["status"] == "ok" for e in events[:3])
+        assert events[-1]["state"] == JOB_DONE
+        assert events[-1]["succeeded"] == 3
+
+        _, body = _request("GET", f"{server.url}/jobs")
+        assert [job["id"] for job in json.loads(body)] == [job_id]
+
+    def test_bad_request(self, server):
+        """不正なジョブが400になることをテスト"""
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            _request("POST", f"{server.url}/jobs", {"kind": "unknown"})
+        assert excinfo.value.code == 400
+
+    @pytest.mark.parametrize("priority", [None, [1], {"value": 1}, "high", True])
+    def test_bad_priority(self, server, tmp_path, priority):
+        """整数でないpriorityが400になることをテスト"""
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            _request(
+                "POST",
+                f"{server.url}/jobs",
+                {
+                    "kind": "reduce",
+                    "input_dir": str(tmp_path),
+                    "output_dir": str(tmp_path / "out"),
+                    "priority": priority,
+                },
+            )
+        assert excinfo.value.code == 400
+
+    @pytest.mark.parametrize(
+        "fields",
+        [
+            {"kind": ["reduce"]},
+            {"input_dir": 5},
+            {"group": ["a"]},
+            {"name": {"x": 1}},
+            {"quality": "80"},
+            {"quality": 0},
+            {"max_long_side": 1.5},
+            {"color": ["srgb"]},
+            {"target_ssim": "x"},
+        ],
+    )
+    def test_bad_field_types(self, server, tmp_path, fields):
+        """型が正しくないフィールドが400になり、後続のジョブが実行されることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        params = {
+            "kind": "reduce",
+            "input_dir": str(tmp_path / "in"),
+            "output_dir": str(tmp_path / "out"),
+        }
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            _request("POST", f"{server.url}/jobs", {**params, **fields})
+        assert excinfo.value.code == 400
+
+        server.scheduler.start()
+        _, body = _request("POST", f"{server.url}/jobs", params)
+        job = server.scheduler.get(json.loads(body)["id"])
+        assert job.wait(10)
+        assert job.state == JOB_DONE
+
+    def test_unknown_job(self, server):
+        """存在しないジョブが404になることをテスト"""
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            _request("POST", f"{server.url}/jobs/nope/cancel")
+        assert excinfo.value.code == 404
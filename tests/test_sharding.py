@@ -0,0 +1,283 @@
+"""Tests for sharded multi-worker processing."""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from sentei_pictures import sharding
+from sentei_pictures.cli.main import main
+from sentei_pictures.sharding import ShardWorkDir, run_worker
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+
+def _make_jpegs(directory, count):
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        Image.new("RGB", (64, 48), (i, 0, 0)).save(directory / f"{i:03d}.jpg")
+
+
+def _start_worker(workdir, worker_id):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(SRC_DIR), env.get("PYTHONPATH")])
+    )
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "sentei_pictures.cli.main",
+            "shard",
+            "work",
+            str(workdir),
+            "-j",
+            "1",
+            "--worker-id",
+            worker_id,
+        ],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+
+
+class TestShardWorkDir:
+    """ShardWorkDir class のテスト"""
+
+    def test_create_splits_files_into_shards(self, tmp_path):
+        """ファイルが指定サイズのシャードに分割されることをテスト"""
+        _make_jpegs(tmp_path / "in", 5)
+        workdir = ShardWorkDir.create(
+            tmp_path / "work", tmp_path / "in", tmp_path / "out", shard_size=2
+        )
+
+        assert workdir.shard_ids() == ["000000", "000001", "000002"]
+        assert workdir.read_shard("000002") == ["004.jpg"]
+        assert workdir.config["total_files"] == 5
+
+    @pytest.mark.parametrize("options", [{"shard_size": 0}, {"lease_seconds": 0}])
+    def test_create_rejects_non_positive_values(self, tmp_path, options):
+        """シャードサイズ・リースの有効期間が0以下ならエラーになることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+
+        with pytest.raises(ValueError):
+            ShardWorkDir.create(
+                tmp_path / "work", tmp_path / "in", tmp_path / "out", **options
+            )
+        assert not (tmp_path / "work").exists()
+
+    def test_lease_is_exclusive(self, tmp_path):
+        """有効なリースは他のワーカーが取得できないことをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        workdir = ShardWorkDir.create(
+            tmp_path / "work", tmp_path / "in", tmp_path / "out"
+        )
+
+        lease = workdir.try_acquire("000000", "a")
+
+        assert lease is not None
+        assert workdir.try_acquire("000000", "b") is None
+        assert workdir.renew(lease)
+
+    def test_expired_lease_is_reclaimed(self, tmp_path):
+        """停止したワーカーの期限切れリースが回収されて処理されることをテスト"""
+        _make_jpegs(tmp_path / "in", 3)
+        workdir = ShardWorkDir.create(
+            tmp_path / "work", tmp_path / "in", tmp_path / "out", shard_size=2
+        )
+        dead_lease = workdir.leases_dir / "000000.lease"
+        dead_lease.write_text(
+            json.dumps({"worker": "dead", "expires_at": time.time() - 1})
+        )
+
+        completed = run_worker(tmp_path / "work", worker="alive", poll_interval=0.01)
+
+        assert completed == 2
+        assert sorted(p.name for p in (tmp_path / "out").iterdir()) == [
+            "000.jpg",
+            "001.jpg",
+            "002.jpg",
+        ]
+        status = workdir.status()
+        assert status.complete
+        assert status.done_files == 3
+        assert status.workers == {"alive": 3}
+
+    def test_stale_worker_cannot_renew_reclaimed_lease(self, tmp_path):
+        """回収されたリースは元のワーカーが更新できないことをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        workdir = ShardWorkDir.create(
+            tmp_path / "work", tmp_path / "in", tmp_path / "out", lease_seconds=0.01
+        )
+        stale = workdir.try_acquire("000000", "stale")
+        time.sleep(0.05)
+
+        fresh = workdir.try_acquire("000000", "fresh")
+
+        assert fresh is not None
+        assert not workdir.renew(stale)
+
+    def test_renew_does_not_overwrite_reclaimed_lease(self, tmp_path, monkeypatch):
+        """確認した後に回収・再取得されたリースを更新で上書きしないことをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        workdir = ShardWorkDir.create(
+            tmp_path / "work", tmp_path / "in", tmp_path / "out"
+        )
+        stale = workdir.try_acquire("000000", "stale")
+        original = sharding._read_json
+
+        def read_json(path):
+            # 更新中のワーカーが確認する直前に、別のワーカーがリースを回収して取得し直す
+            if ".renew." in path.name:
+                os.unlink(path)
+                os.link(stale.path.with_name("fresh"), path)
+            return original(path)
+
+        fresh_lease = {"worker": "fresh", "expires_at": time.time() + 60}
+        stale.path.with_name("fresh").write_text(json.dumps(fresh_lease))
+        monkeypatch.setattr(sharding, "_read_json", read_json)
+
+        assert not workdir.renew(stale)
+        monkeypatch.undo()
+        assert json.loads(stale.path.read_text())["worker"] == "fresh"
+        os.unlink(stale.path.with_name("fresh"))
+        assert [p.name for p in workdir.leases_dir.iterdir()] == ["000000.lease"]
+
+    def test_renew_gives_up_if_lease_taken_while_renewing(self, tmp_path, monkeypatch):
+        """更新中に他のワーカーがリースを取得したら延長を諦めることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        workdir = ShardWorkDir.create(
+            tmp_path / "work", tmp_path / "in", tmp_path / "out"
+        )
+        lease = workdir.try_acquire("000000", "a")
+        original = sharding._read_json
+        taken = []
+
+        def read_json(path):
+            if ".renew." in path.name and not taken:
+                taken.append(workdir.try_acquire("000000", "b"))
+            return original(path)
+
+        monkeypatch.setattr(sharding, "_read_json", read_json)
+
+        assert not workdir.renew(lease)
+        assert taken[0] is not None
+        assert json.loads(lease.path.read_text())["worker"] == "b"
+        assert [p.name for p in workdir.leases_dir.iterdir()] == ["000000.lease"]
+
+    def test_racing_reclaimers_take_one_lease(self, tmp_path):
+        """2つのワーカーが同じ期限切れリースを同時に回収しても1つだけが取得することをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        workdir = ShardWorkDir.create(
+            tmp_path / "work", tmp_path / "in", tmp_path / "out"
+        )
+        lease_path = workdir.leases_dir / "000000.lease"
+
+        for round_number in range(30):
+            lease_path.write_text(
+                json.dumps({"worker": "dead", "expires_at": time.time() - 1})
+            )
+            barrier = threading.Barrier(2)
+            leases = {}
+
+            def reclaim(worker):
+                barrier.wait()
+                leases[worker] = workdir.try_acquire("000000", worker)
+
+            threads = [
+                threading.Thread(target=reclaim, args=(f"w{i}-{round_number}",))
+                for i in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            acquired = [lease for lease in leases.values() if lease is not None]
+            assert len(acquired) == 1
+            assert json.loads(lease_path.read_text())["worker"] == acquired[0].worker
+            os.unlink(lease_path)
+
+    def test_reclaim_does_not_steal_fresh_lease(self, tmp_path, monkeypatch):
+        """期限切れを確認した後に作り直されたリースは回収しないことをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        workdir = ShardWorkDir.create(
+            tmp_path / "work", tmp_path / "in", tmp_path / "out"
+        )
+        fresh = workdir.try_acquire("000000", "a")
+        stale = {"worker": "dead", "expires_at": time.time() - 1}
+        reads = []
+        original = sharding._read_json
+
+        def read_json(path):
+            # 最初の読み込みだけ、回収される前の期限切れのリースを読んだことにする
+            reads.append(path)
+            return stale if len(reads) == 1 else original(path)
+
+        monkeypatch.setattr(sharding, "_read_json", read_json)
+
+        assert workdir.try_acquire("000000", "b") is None
+        monkeypatch.undo()
+        assert json.loads(fresh.path.read_text())["worker"] == "a"
+        assert workdir.renew(fresh)
+        assert [p.name for p in workdir.leases_dir.iterdir()] == ["000000.lease"]
+
+    def test_empty_lease_expires_by_mtime(self, tmp_path):
+        """書き込み前に停止したワーカーの空のリースが期間後に回収されることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        workdir = ShardWorkDir.create(
+            tmp_path / "work", tmp_path / "in", tmp_path / "out", lease_seconds=30
+        )
+        empty = workdir.leases_dir / "000000.lease"
+        empty.touch()
+
+        assert workdir.try_acquire("000000", "b") is None
+        past = time.time() - 31
+        os.utime(empty, (past, past))
+        lease = workdir.try_acquire("000000", "b")
+
+        assert lease is not None
+        assert json.loads(empty.read_text())["worker"] == "b"
+
+
+class TestShardWorkers:
+    """複数ワーカープロセスでの処理のテスト"""
+
+    @pytest.mark.parametrize(
+        "options", [["--shard-size", "0"], ["--lease", "0"], ["--lease", "-5"]]
+    )
+    def test_init_rejects_non_positive_values(self, tmp_path, capsys, options):
+        """shard init で0以下の値が引数エラーになることをテスト"""
+        _make_jpegs(tmp_path / "in", 1)
+        argv = ["shard", "init", str(tmp_path / "in"), str(tmp_path / "out")]
+
+        with pytest.raises(SystemExit) as exc_info:
+            main(argv + [str(tmp_path / "work")] + options)
+
+        assert exc_info.value.code == 2
+        assert not (tmp_path / "work").exists()
+
+    def test_multiple_workers_complete_all_shards(self, tmp_path):
+        """複数のワーカープロセスで全ファイルが一度ずつ処理されることをテスト"""
+        _make_jpegs(tmp_path / "in", 12)
+        workdir = ShardWorkDir.create(
+            tmp_path / "work", tmp_path / "in", tmp_path / "out", shard_size=2
+        )
+
+        workers = [_start_worker(tmp_path / "work", f"w{i}") for i in range(3)]
+        for worker in workers:
+            output, _ = worker.communicate(timeout=60)
+            assert worker.returncode == 0, output.decode("utf-8", "replace")
+
+        assert len(list((tmp_path / "out").glob("*.jpg"))) == 12
+        status = workdir.status()
+        assert status.complete
+        assert status.done_files == 12
+        assert sum(status.workers.values()) == 12
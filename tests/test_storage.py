@@ -0,0 +1,451 @@
+"""Tests for the local and S3-compatible storage backends."""
+
+import io
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.api import choose_names, reduce_directory
+from sentei_pictures.cli import choice, reduce
+from sentei_pictures.core import storage
+from sentei_pictures.core.file_matcher import FileMatcher
+from sentei_pictures.core.header_parser import read_header
+from sentei_pictures.core.storage import (
+    LocalStorage,
+    S3Storage,
+    StorageObject,
+    open_location,
+)
+
+
+class FakeS3Error(Exception):
+    """botocoreのClientErrorと同じ形のエラー"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    """boto3のS3クライアントのメソッドを持つメモリ上のオブジェクトストア"""
+
+    def __init__(self, page_size=1000, part_delay=0.0):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+        self.page_size = page_size
+        self.part_delay = part_delay
+        self.active_parts = 0
+        self.max_active_parts = 0
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls.append(name)
+
+    def count(self, name):
+        return self.calls.count(name)
+
+    def _put(self, bucket, key, data):
+        self.objects[bucket, key] = (bytes(data), datetime.now(timezone.utc))
+
+    def _get(self, bucket, key):
+        if (bucket, key) not in self.objects:
+            raise FakeS3Error("NoSuchKey")
+        return self.objects[bucket, key]
+
+    def list_objects_v2(self, Bucket, Prefix="", Delimiter=None, **kwargs):
+        self._call("list_objects_v2")
+        keys = sorted(
+            key
+            for bucket, key in self.objects
+            if bucket == Bucket
+            and key.startswith(Prefix)
+            and not (Delimiter and Delimiter in key[len(Prefix) :])
+        )
+        start = int(kwargs.get("ContinuationToken", 0))
+        page = keys[start : start + self.page_size]
+        response = {
+            "Contents": [
+                {
+                    "Key": key,
+                    "Size": len(self.objects[Bucket, key][0]),
+                    "LastModified": self.objects[Bucket, key][1],
+                }
+                for key in page
+            ],
+            "IsTruncated": start + self.page_size < len(keys),
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = str(start + self.page_size)
+        return response
+
+    def head_object(self, Bucket, Key):
+        self._call("head_object")
+        if (Bucket, Key) not in self.objects:
+            raise FakeS3Error("404")
+        data, modified = self.objects[Bucket, Key]
+        return {"ContentLength": len(data), "LastModified": modified}
+
+    def get_object(self, Bucket, Key, Range=None):
+        self._call("get_object")
+        data, _ = self._get(Bucket, Key)
+        if Range is not None:
+            start, end = Range[len("bytes=") :].split("-")
+            data = data[int(start) : int(end) + 1]
+        return {"Body": io.BytesIO(data)}
+
+    def put_object(self, Bucket, Key, Body):
+        self._call("put_object")
+        self._put(Bucket, Key, Body)
+        return {}
+
+    def create_multipart_upload(self, Bucket, Key):
+        self._call("create_multipart_upload")
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self._call("upload_part")
+        with self._lock:
+            self.active_parts += 1
+            self.max_active_parts = max(self.max_active_parts, self.active_parts)
+        time.sleep(self.part_delay)
+        self.uploads[UploadId][PartNumber] = bytes(Body)
+        with self._lock:
+            self.active_parts -= 1
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def upload_part_copy(
+        self, Bucket, Key, UploadId, PartNumber, CopySource, CopySourceRange
+    ):
+        self._call("upload_part_copy")
+        data, _ = self._get(CopySource["Bucket"], CopySource["Key"])
+        start, end = CopySourceRange[len("bytes=") :].split("-")
+        self.uploads[UploadId][PartNumber] = data[int(start) : int(end) + 1]
+        return {"CopyPartResult": {"ETag": f"etag-{PartNumber}"}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self._call("complete_multipart_upload")
+        parts = self.uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        assert numbers == sorted(parts)
+        self._put(Bucket, Key, b"".join(parts[number] for number in numbers))
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._call("abort_multipart_upload")
+        self.uploads.pop(UploadId, None)
+        return {}
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self._call("copy_object")
+        data, _ = self._get(CopySource["Bucket"], CopySource["Key"])
+        self._put(Bucket, Key, data)
+        return {}
+
+
+def _jpeg_bytes(size=(320, 240), colour=(200, 0, 0)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, colour).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client():
+    return FakeS3Client()
+
+
+@pytest.fixture
+def shared_client(monkeypatch, client):
+    """CLIが作成するS3Storageが使うプロセス共有のクライアントを差し替える"""
+    monkeypatch.setitem(
+        storage._clients, (None, storage.DEFAULT_MAX_CONNECTIONS), client
+    )
+    return client
+
+
+def _bucket(client, prefix="shoot/original", count=3):
+    originals = S3Storage("photos", prefix, client=client)
+    for i in range(count):
+        originals.write_bytes(f"IMG_{i}.JPG", _jpeg_bytes(colour=(i * 40, 0, 0)))
+    originals.write_bytes("notes.txt", b"memo")
+    # 下の階層のファイルは一覧に含めない
+    originals.write_bytes("raw/IMG_0.CR3", b"raw")
+    return originals
+
+
+class TestS3Storage:
+    """S3Storage のテスト"""
+
+    def test_listing_pages_and_skips_nested_keys(self, client):
+        """一覧が直下のファイルだけで、複数ページを続けて取得することをテスト"""
+        client.page_size = 2
+        originals = _bucket(client)
+
+        files = FileMatcher.get_jpeg_files(originals)
+
+        assert sorted(f.name for f in files) == ["IMG_0.JPG", "IMG_1.JPG", "IMG_2.JPG"]
+        assert all(isinstance(f, StorageObject) for f in files)
+        assert str(files[0]).startswith("s3://photos/shoot/original/IMG_")
+        assert client.count("list_objects_v2") == 2
+
+    def test_header_is_read_with_ranged_get(self, client, monkeypatch):
+        """ヘッダーだけを範囲読み込みで読み、ファイル全体を取得しないことをテスト"""
+        monkeypatch.setattr(storage, "RANGE_SIZE", 1024)
+        originals = S3Storage("photos", "shoot", client=client)
+        data = _jpeg_bytes((2000, 1500))
+        originals.write_bytes("IMG_0.JPG", data)
+        (member,) = originals.jpeg_files()
+
+        assert read_header(member).size == (2000, 1500)
+        assert 0 < client.count("get_object") < len(data) // 1024
+
+    def test_stat_and_missing_object(self, client):
+        """存在しないキーはNone・FileNotFoundErrorになることをテスト"""
+        originals = _bucket(client, count=1)
+
+        assert originals.stat("IMG_0.JPG").size > 0
+        assert originals.stat("IMG_9.JPG") is None
+        assert not (originals / "IMG_9.JPG").exists()
+        with pytest.raises(FileNotFoundError):
+            originals.open_read("IMG_9.JPG")
+
+    def test_small_write_is_single_put(self, client):
+        """パートより小さい書き込みはput_objectの1回になることをテスト"""
+        output = S3Storage("photos", "out", client=client, part_size=1024)
+
+        output.write_bytes("a.jpg", b"x" * 100)
+
+        assert client.objects["photos", "out/a.jpg"][0] == b"x" * 100
+        assert client.count("put_object") == 1
+        assert client.count("create_multipart_upload") == 0
+
+    def test_multipart_upload_is_concurrent(self, client):
+        """大きな書き込みはパートを並列にアップロードして順に結合することをテスト"""
+        client.part_delay = 0.05
+        output = S3Storage(
+            "photos", "out", client=client, part_size=1000, upload_workers=3
+        )
+        data = bytes(range(256)) * 40
+
+        with output.open_write("big.jpg") as f:
+            for offset in range(0, len(data), 700):
+                f.write(data[offset : offset + 700])
+
+        assert client.objects["photos", "out/big.jpg"][0] == data
+        assert client.count("upload_part") == 11
+        assert 1 < client.max_active_parts <= 3
+
+    def test_failed_write_aborts_upload(self, client):
+        """書き込み中に例外が起きるとアップロードを破棄することをテスト"""
+        output = S3Storage("photos", "out", client=client, part_size=1000)
+
+        with pytest.raises(RuntimeError):
+            with output.open_write("big.jpg") as f:
+                f.write(b"x" * 2500)
+                raise RuntimeError("interrupted")
+
+        assert ("photos", "out/big.jpg") not in client.objects
+        assert client.count("abort_multipart_upload") == 1
+        assert client.uploads == {}
+
+    def test_copy_is_server_side(self, client, monkeypatch):
+        """同じクライアントのコピーはサーバー側で行い、内容を読まないことをテスト"""
+        originals = _bucket(client, count=1)
+        output = S3Storage("delivery", "final", client=client)
+        (member,) = originals.jpeg_files()
+
+        output.put(member, "IMG_0.JPG")
+        # 上限を超える大きさはパートごとにサーバー側でコピーする
+        monkeypatch.setattr(storage, "MAX_COPY_OBJECT", 100)
+        monkeypatch.setattr(storage, "COPY_PART_SIZE", 300)
+        output.copy(member, "IMG_0_parts.JPG")
+
+        expected = client.objects["photos", "shoot/original/IMG_0.JPG"][0]
+        assert client.objects["delivery", "final/IMG_0.JPG"][0] == expected
+        assert client.objects["delivery", "final/IMG_0_parts.JPG"][0] == expected
+        assert client.count("copy_object") == 1
+        assert client.count("upload_part_copy") == (len(expected) + 299) // 300
+        assert client.count("get_object") == 0
+
+    def test_injected_client_is_not_pickled(self, client):
+        """指定したクライアントはワーカープロセスに渡せないことをテスト"""
+        import pickle
+
+        with pytest.raises(TypeError):
+            pickle.dumps(S3Storage("photos", client=client))
+        restored = pickle.loads(pickle.dumps(S3Storage("photos", "a/b")))
+        assert restored.url("x.jpg") == "s3://photos/a/b/x.jpg"
+
+    def test_open_location(self):
+        """URLはS3Storage、それ以外はパスになることをテスト"""
+        location = open_location("s3://photos/shoot/original/")
+
+        assert isinstance(location, S3Storage)
+        assert (location.bucket, location.prefix) == ("photos", "shoot/original/")
+        assert location.name == "original"
+        assert str(open_location("photos/shoot")) == "photos/shoot"
+        with pytest.raises(ValueError):
+            open_location("s3:///shoot")
+
+
+class TestLocalStorage:
+    """LocalStorage のテスト"""
+
+    def test_write_is_atomic_and_copy_keeps_mtime(self, tmp_path):
+        """書き込みは確定時に置き換わり、コピーは更新日時を保つことをテスト"""
+        local = LocalStorage(tmp_path / "a")
+
+        with pytest.raises(RuntimeError):
+            with local.open_write("x.jpg") as f:
+                f.write(b"partial")
+                raise RuntimeError("interrupted")
+        local.write_bytes("y.jpg", b"data")
+        (member,) = local.list()
+        LocalStorage(tmp_path / "b").put(member, "y.jpg")
+
+        assert sorted(p.name for p in (tmp_path / "a").iterdir()) == ["y.jpg"]
+        assert member.read_bytes() == b"data"
+        assert (tmp_path / "b" / "y.jpg").stat().st_mtime == member.mtime
+
+    def test_upload_to_s3(self, tmp_path, client):
+        """ローカルのファイルをS3にストリームで書き込むことをテスト"""
+        (tmp_path / "a").mkdir()
+        (tmp_path / "a" / "x.jpg").write_bytes(b"x" * 3000)
+        (member,) = LocalStorage(tmp_path / "a").list()
+        output = S3Storage("photos", "out", client=client, part_size=1024)
+
+        assert output.put(member, "x.jpg") == 3000
+        assert client.objects["photos", "out/x.jpg"][0] == b"x" * 3000
+        assert client.count("upload_part") == 3
+
+
+class TestApiWithStorage:
+    """reduce_directory・choose_names のストレージ対応のテスト"""
+
+    def test_reduce_between_buckets(self, client):
+        """ストレージの元画像を軽量化してストレージに書き込むことをテスト"""
+        from sentei_pictures.core.image_processor import ImageProcessor
+
+        originals = _bucket(client)
+        output = S3Storage("photos", "shoot/reduced", client=client)
+
+        results = list(
+            reduce_directory(originals, output, ImageProcessor(max_long_side=100))
+        )
+
+        assert [r.ok for r in results] == [True, True, True]
+        assert (
+            results[0]
+            .as_dict()["output_path"]
+            .startswith("s3://photos/shoot/reduced/IMG_")
+        )
+        data = client.objects["photos", "shoot/reduced/IMG_0.JPG"][0]
+        with Image.open(io.BytesIO(data)) as img:
+            assert img.size == (100, 75)
+
+    def test_reduce_records_write_failures(self, client, monkeypatch):
+        """書き込みに失敗したファイルは失敗として記録して続けることをテスト"""
+        originals = _bucket(client, count=2)
+        output = S3Storage("photos", "reduced", client=client)
+        monkeypatch.setattr(
+            client, "put_object", lambda **kwargs: (_ for _ in ()).throw(OSError("x"))
+        )
+
+        results = list(reduce_directory(originals, output))
+
+        assert [r.status for r in results] == ["failed", "failed"]
+        assert results[0].error == "x"
+
+    def test_choose_from_s3_to_local(self, tmp_path, client):
+        """ストレージの元画像をローカルに書き出すことをテスト"""
+        originals = _bucket(client)
+
+        results = list(choose_names(originals, tmp_path, ["img_1.jpg", "IMG_9.jpg"]))
+
+        assert [r.status for r in results] == ["ok", "not_found"]
+        assert (tmp_path / "IMG_1.JPG").read_bytes() == (
+            client.objects["photos", "shoot/original/IMG_1.JPG"][0]
+        )
+
+    def test_sync_is_rejected(self, tmp_path, client):
+        """ストレージでは差分同期を使えないことをテスト"""
+        from sentei_pictures.core.sync import SyncPolicy
+
+        with pytest.raises(ValueError):
+            list(
+                choose_names(
+                    _bucket(client), tmp_path, ["IMG_0.JPG"], sync=SyncPolicy()
+                )
+            )
+
+
+class TestStorageCli:
+    """reduce・choice コマンドの s3:// のテスト"""
+
+    def test_reduce_s3_to_s3(self, shared_client, capsys):
+        """s3:// の入力・保存先で軽量化することをテスト"""
+        _bucket(shared_client, "shoot/original")
+        args = reduce.build_parser().parse_args(
+            [
+                "s3://photos/shoot/original",
+                "s3://photos/shoot/reduced",
+                "-j",
+                "1",
+                "--max-long-side",
+                "100",
+            ]
+        )
+
+        assert reduce.execute(args) == 0
+
+        assert "完了: 3/3個" in capsys.readouterr().out
+        assert ("photos", "shoot/reduced/IMG_2.JPG") in shared_client.objects
+
+    def test_choice_copies_server_side(self, tmp_path, shared_client, capsys):
+        """同じストレージの元画像はサーバー側でコピーすることをテスト"""
+        _bucket(shared_client, "shoot/original")
+        picks = tmp_path / "picks.txt"
+        picks.write_text("IMG_0.jpg\nIMG_2.jpg\n")
+        args = choice.build_parser().parse_args(
+            [
+                "s3://photos/shoot/original",
+                "s3://photos/shoot/final",
+                "--list",
+                str(picks),
+                "--copy-jobs",
+                "4",
+            ]
+        )
+
+        assert choice.execute(args) == 0
+
+        assert "完了: 2/2個" in capsys.readouterr().out
+        assert ("photos", "shoot/final/IMG_2.JPG") in shared_client.objects
+        assert shared_client.count("copy_object") == 2
+        assert shared_client.count("get_object") == 0
+
+    @pytest.mark.parametrize(
+        "command, options",
+        [
+            (reduce, ["--pipeline"]),
+            (reduce, ["--plan"]),
+            (choice, ["--list", "picks.txt", "--sync"]),
+        ],
+    )
+    def test_rejects_unsupported_options(self, tmp_path, capsys, command, options):
+        """ストレージでは使えないオプションはエラーになることをテスト"""
+        (tmp_path / "picks.txt").write_text("IMG_0.jpg\n")
+        (tmp_path / "in").mkdir()
+        options = [str(tmp_path / o) if o.endswith(".txt") else o for o in options]
+        args = command.build_parser().parse_args(
+            [str(tmp_path / "in"), "s3://photos/out"] + options
+        )
+
+        assert command.execute(args) == 1
+        assert "ストレージ" in capsys.readouterr().out
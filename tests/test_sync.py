@@ -0,0 +1,183 @@
+"""Tests for incremental choice sync."""
+
+import os
+import shutil
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.api import choose_names
+from sentei_pictures.cli import choice
+from sentei_pictures.core.checksum import read_manifest
+from sentei_pictures.core.sync import (
+    QUARANTINE_DIR,
+    SYNC_ADDED,
+    SYNC_UNCHANGED,
+    SYNC_UPDATED,
+    SyncPolicy,
+    find_deselected,
+    prune_outputs,
+)
+
+
+def _make_jpeg(path, color=(0, 0, 0)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (16, 16), color).save(path, "JPEG")
+    return path
+
+
+class TestSyncPolicy:
+    """SyncPolicy のテスト"""
+
+    def test_action(self, tmp_path):
+        """保存先の有無・サイズ・更新日時で扱いが決まることをテスト"""
+        source = tmp_path / "a.jpg"
+        source.write_bytes(b"abc")
+        destination = tmp_path / "out.jpg"
+        policy = SyncPolicy()
+
+        assert policy.action(source, destination) == SYNC_ADDED
+
+        shutil.copy2(source, destination)
+        assert policy.action(source, destination) == SYNC_UNCHANGED
+
+        stat = source.stat()
+        os.utime(destination, (stat.st_atime, stat.st_mtime + 60))
+        assert policy.action(source, destination) == SYNC_UPDATED
+
+        destination.write_bytes(b"abcd")
+        shutil.copystat(source, destination)
+        assert policy.action(source, destination) == SYNC_UPDATED
+
+    def test_hash_detects_same_size_and_mtime(self, tmp_path):
+        """サイズと更新日時が同じでも内容が違えばハッシュで検出することをテスト"""
+        source = tmp_path / "a.jpg"
+        source.write_bytes(b"abc")
+        destination = tmp_path / "out.jpg"
+        destination.write_bytes(b"xyz")
+        shutil.copystat(source, destination)
+
+        assert SyncPolicy().action(source, destination) == SYNC_UNCHANGED
+        assert SyncPolicy("sha256").action(source, destination) == SYNC_UPDATED
+
+    def test_unknown_checksum_raises_value_error(self):
+        """対応していないチェックサムはValueErrorになることをテスト"""
+        with pytest.raises(ValueError):
+            SyncPolicy("md5")
+
+
+class TestPrune:
+    """選定から外れたファイルの削除・退避のテスト"""
+
+    def test_find_deselected_keeps_protected_and_non_images(self, tmp_path):
+        """保持するファイル・保護するstem・画像以外は対象外になることをテスト"""
+        for name in ("a.jpg", "b.jpg", "C.JPG", "notes.txt"):
+            (tmp_path / name).write_bytes(b"x")
+
+        deselected = find_deselected(tmp_path, keep={"a.jpg"}, protect_stems=["c"])
+
+        assert deselected == [tmp_path / "b.jpg"]
+
+    def test_quarantine_moves_files(self, tmp_path):
+        """退避では .deselected/<日時>/ に移動することをテスト"""
+        (tmp_path / "b.jpg").write_bytes(b"x")
+
+        pruned = prune_outputs([tmp_path / "b.jpg"], "quarantine")
+
+        assert pruned == [tmp_path / "b.jpg"]
+        assert not (tmp_path / "b.jpg").exists()
+        (moved,) = (tmp_path / QUARANTINE_DIR).glob("*/b.jpg")
+        assert moved.read_bytes() == b"x"
+
+    def test_unknown_mode_raises_value_error(self, tmp_path):
+        """不明な方法はValueErrorになることをテスト"""
+        with pytest.raises(ValueError):
+            prune_outputs([], "archive")
+
+
+class TestChooseSync:
+    """差分同期の choose のテスト"""
+
+    def test_second_run_copies_nothing(self, tmp_path, monkeypatch):
+        """2回目の同期では同一のファイルをコピーしないことをテスト"""
+        for i in range(3):
+            _make_jpeg(tmp_path / "orig" / f"IMG_{i}.JPG")
+        (tmp_path / "out").mkdir()
+        names = [f"IMG_{i}.jpg" for i in range(3)]
+        first = list(
+            choose_names(tmp_path / "orig", tmp_path / "out", names, sync=SyncPolicy())
+        )
+        assert [r.sync_action for r in first] == [SYNC_ADDED] * 3
+
+        def fail(*args, **kwargs):
+            raise AssertionError("unchanged files should not be copied")
+
+        monkeypatch.setattr(shutil, "copy2", fail)
+        second = list(
+            choose_names(tmp_path / "orig", tmp_path / "out", names, sync=SyncPolicy())
+        )
+
+        assert [r.sync_action for r in second] == [SYNC_UNCHANGED] * 3
+        assert all(r.ok and r.bytes_out == 0 for r in second)
+
+
+class TestChoiceSyncCli:
+    """choice --sync --prune のテスト"""
+
+    def _run(self, tmp_path, names, *options):
+        picks = tmp_path / "picks.txt"
+        picks.write_text("\n".join(names) + "\n")
+        args = choice.build_parser().parse_args(
+            [str(tmp_path / "orig"), str(tmp_path / "out"), "--list", str(picks)]
+            + list(options)
+        )
+        return choice.execute(args)
+
+    def test_revision_moves_only_the_delta(self, tmp_path, capsys):
+        """選定の修正で差分だけがコピー・退避されることをテスト"""
+        for i in range(5):
+            _make_jpeg(tmp_path / "orig" / f"IMG_{i}.JPG", (i, 0, 0))
+        options = ("--sync", "--prune", "quarantine", "--checksum", "sha256")
+        assert self._run(tmp_path, ["IMG_0", "IMG_1", "IMG_2"], *options) == 0
+        capsys.readouterr()
+
+        # IMG_1を外し、IMG_3を追加し、IMG_2の元画像を差し替える
+        replaced = tmp_path / "orig" / "IMG_2.JPG"
+        Image.new("RGB", (40, 30), (255, 255, 255)).save(replaced)
+        stat = replaced.stat()
+        os.utime(replaced, (stat.st_atime, stat.st_mtime + 60))
+        assert self._run(tmp_path, ["IMG_0", "IMG_2", "IMG_3"], *options) == 0
+
+        output = capsys.readouterr().out
+        assert "差分: 追加 1, 更新 1, 変更なし 1, 退避 1" in output
+        out = tmp_path / "out"
+        assert sorted(p.name for p in out.glob("*.JPG")) == [
+            "IMG_0.JPG",
+            "IMG_2.JPG",
+            "IMG_3.JPG",
+        ]
+        assert list((out / QUARANTINE_DIR).glob("*/IMG_1.JPG"))
+        assert sorted(read_manifest(out / "SHA256SUMS")) == [
+            "IMG_0.JPG",
+            "IMG_2.JPG",
+            "IMG_3.JPG",
+        ]
+
+    def test_not_found_selection_is_not_pruned(self, tmp_path):
+        """元画像が見つからない選定の保存先ファイルは削除しないことをテスト"""
+        _make_jpeg(tmp_path / "orig" / "IMG_0.JPG")
+        _make_jpeg(tmp_path / "out" / "IMG_9.JPG")
+        _make_jpeg(tmp_path / "out" / "old.jpg")
+
+        assert (
+            self._run(tmp_path, ["IMG_0", "IMG_9"], "--sync", "--prune", "delete") == 0
+        )
+
+        assert sorted(p.name for p in (tmp_path / "out").iterdir()) == [
+            "IMG_0.JPG",
+            "IMG_9.JPG",
+        ]
+
+    def test_prune_requires_sync(self, tmp_path):
+        """--sync なしの --prune はエラーになることをテスト"""
+        assert self._run(tmp_path, ["IMG_0"], "--prune", "delete") == 1
@@ -0,0 +1,262 @@
+"""Tests for the low-impact background mode."""
+
+import os
+
+import pytest
+from PIL import Image
+
+from sentei_pictures.api import CancelToken, reduce_directory
+from sentei_pictures.cli import reduce
+from sentei_pictures.core import throttle as throttle_module
+from sentei_pictures.core.throttle import POLL_SECONDS, Throttle, TokenBucket
+from sentei_pictures.core.worker_pool import WorkerPool
+
+MB = 1024 * 1024
+
+
+class FakeClock:
+    """sleepで進む時計"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _make_jpegs(directory, count=3):
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        Image.effect_noise((320, 240), 40).convert("RGB").save(
+            directory / f"IMG_{i}.jpg"
+        )
+
+
+class TestTokenBucket:
+    """TokenBucket のテスト"""
+
+    def test_burst_then_debt(self):
+        """容量までは待たず、超過分は帯域に応じて待つことをテスト"""
+        clock = FakeClock()
+        bucket = TokenBucket(10 * MB, clock=clock)
+
+        bucket.consume(20 * MB)
+        assert bucket.delay() == 0
+        bucket.consume(5 * MB)
+        assert bucket.delay() == pytest.approx(0.5)
+
+        clock.now += 0.5
+        assert bucket.delay() == 0
+
+    def test_refill_is_capped_at_burst(self):
+        """長く使わなくても容量を超えて貯まらないことをテスト"""
+        clock = FakeClock()
+        bucket = TokenBucket(1 * MB, burst=2 * MB, clock=clock)
+        clock.now += 60
+
+        bucket.consume(3 * MB)
+
+        assert bucket.delay() == pytest.approx(1.0)
+
+    def test_rejects_non_positive_rate(self):
+        """0以下の帯域はエラーになることをテスト"""
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+
+
+class TestThrottle:
+    """Throttle のテスト"""
+
+    def test_average_rate_is_limited(self):
+        """読み書きの平均が上限以下になるよう待つことをテスト"""
+        clock = FakeClock()
+        throttle = Throttle(10 * MB, clock=clock, sleep=clock.sleep)
+
+        for _ in range(20):
+            throttle.wait()
+            throttle.account(5 * MB)
+        throttle.wait()
+
+        # 100MBのうち容量（2秒分の20MB）を超える80MBに8秒かかる
+        assert throttle.elapsed == pytest.approx(8.0)
+        assert throttle.throttled == pytest.approx(8.0)
+        assert throttle.throughput == pytest.approx(12.5 * MB)
+        assert "実効スループット: 12.5MB/s" in throttle.summary_line()
+
+    def test_reserved_bytes_limit_files_in_flight(self):
+        """投入時に差し引いた分で待ち、処理後は差分だけを差し引くことをテスト"""
+        clock = FakeClock()
+        throttle = Throttle(10 * MB, clock=clock, sleep=clock.sleep)
+
+        # 処理が終わる前に2ファイル（30MB）を投入すると容量（20MB）を超える
+        for _ in range(2):
+            throttle.wait()
+            throttle.reserve(15 * MB)
+        throttle.wait()
+        assert throttle.throttled == pytest.approx(1.0)
+        assert throttle.bytes == 0
+
+        throttle.account(20 * MB, reserved=15 * MB)
+        throttle.wait()
+        assert throttle.throttled == pytest.approx(1.5)
+        assert throttle.bytes == 20 * MB
+
+    def test_pauses_while_load_is_high(self):
+        """ロードアベレージが高い間は一時停止することをテスト"""
+        clock = FakeClock()
+        loads = iter([2.0, 1.5, 0.5])
+        throttle = Throttle(
+            pause_load=0.8, clock=clock, sleep=clock.sleep, load=lambda: next(loads)
+        )
+
+        throttle.wait()
+
+        assert throttle.paused == pytest.approx(2 * POLL_SECONDS)
+        assert throttle.throttled == 0
+
+    def test_cancel_stops_waiting(self):
+        """キャンセル後は待機をやめることをテスト"""
+        clock = FakeClock()
+        cancel = CancelToken()
+        throttle = Throttle(
+            pause_load=0.8, clock=clock, sleep=lambda s: cancel.cancel(), load=lambda: 9
+        )
+
+        throttle.wait(cancel)
+
+        assert cancel.cancelled
+
+    def test_unknown_load_does_not_pause(self):
+        """ロードアベレージを取得できない場合は一時停止しないことをテスト"""
+        clock = FakeClock()
+        throttle = Throttle(
+            pause_load=0.8, clock=clock, sleep=clock.sleep, load=lambda: None
+        )
+
+        throttle.wait()
+
+        assert clock.sleeps == []
+
+
+class TestReduceWithThrottle:
+    """reduce_directory の帯域制限のテスト"""
+
+    @pytest.mark.parametrize("parallel", [False, True])
+    def test_reduce_waits_and_accounts_bytes(self, tmp_path, parallel):
+        """ファイルごとに待機し、読み書きしたバイト数を記録することをテスト"""
+        _make_jpegs(tmp_path / "in")
+        (tmp_path / "out").mkdir()
+        waits = []
+
+        reserved = []
+
+        class Recorder(Throttle):
+            def wait(self, cancel=None):
+                waits.append(cancel)
+                super().wait(cancel)
+
+            def reserve(self, nbytes):
+                reserved.append(nbytes)
+                super().reserve(nbytes)
+
+        throttle = Recorder()
+        pool = WorkerPool(max_workers=2) if parallel else None
+        try:
+            results = list(
+                reduce_directory(
+                    tmp_path / "in", tmp_path / "out", pool=pool, throttle=throttle
+                )
+            )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        assert len(waits) == 3
+        assert throttle.bytes == sum(r.bytes_in + r.bytes_out for r in results)
+        assert sorted(reserved) == sorted(r.bytes_in for r in results)
+
+    def test_cancel_while_waiting(self, tmp_path):
+        """待機中にキャンセルすると次のファイルに進まないことをテスト"""
+        _make_jpegs(tmp_path / "in")
+        (tmp_path / "out").mkdir()
+        cancel = CancelToken()
+        throttle = Throttle(
+            1, sleep=lambda s: cancel.cancel(), load=lambda: None  # 1バイト/秒
+        )
+
+        results = list(
+            reduce_directory(
+                tmp_path / "in", tmp_path / "out", cancel=cancel, throttle=throttle
+            )
+        )
+
+        assert len(results) == 1
+
+
+class TestBackgroundPriority:
+    """優先度を下げたワーカーのテスト"""
+
+    @pytest.mark.skipif(not hasattr(os, "nice"), reason="os.nice が必要")
+    def test_background_workers_are_niced(self):
+        """backgroundのプールのワーカーはnice値が上がっていることをテスト"""
+        pool = WorkerPool(max_workers=1, background=True)
+        try:
+            assert pool.submit(os.nice, 0).result() > os.nice(0)
+        finally:
+            pool.shutdown()
+
+
+class TestBackgroundCli:
+    """reduce コマンドの --background のテスト"""
+
+    def test_background_reports_throughput(self, tmp_path, capsys, monkeypatch):
+        """--background で帯域を制限し、実効スループットを表示することをテスト"""
+        lowered = []
+        # テストのプロセスの優先度は下げない
+        monkeypatch.setattr(
+            throttle_module, "lower_priority", lambda: lowered.append(1)
+        )
+        _make_jpegs(tmp_path / "in")
+        args = reduce.build_parser().parse_args(
+            [str(tmp_path / "in"), str(tmp_path / "out"), "-j", "1", "--background"]
+        )
+
+        assert reduce.execute(args) == 0
+
+        out = capsys.readouterr().out
+        assert lowered == [1]
+        assert "実効スループット:" in out
+        assert "上限 20.0MB/s" in out
+
+    @pytest.mark.skipif(not hasattr(os, "getloadavg"), reason="ロードアベレージが必要")
+    def test_limits_without_background(self):
+        """--background なしでも帯域・負荷の制限を指定できることをテスト"""
+        args = reduce.build_parser().parse_args(
+            ["in", "out", "--io-limit", "5", "--pause-load", "0.9"]
+        )
+
+        throttle = reduce.get_throttle(args)
+
+        assert throttle.io_limit == 5 * MB
+        assert throttle.pause_load == 0.9
+
+    def test_no_throttle_by_default(self):
+        """指定しない場合は制限しないことをテスト"""
+        args = reduce.build_parser().parse_args(["in", "out"])
+
+        assert reduce.get_throttle(args) is None
+
+    @pytest.mark.parametrize("options", [["--io-limit", "-1"], ["--pause-load", "0"]])
+    def test_invalid_values_are_rejected(self, tmp_path, options):
+        """不正な値はエラーになることをテスト"""
+        (tmp_path / "in").mkdir()
+        args = reduce.build_parser().parse_args(
+            [str(tmp_path / "in"), str(tmp_path / "out")] + options
+        )
+
+        assert reduce.execute(args) == 1
@@ -0,0 +1,60 @@
+"""Tests for WorkerPool."""
+
+import os
+import sys
+import time
+
+from sentei_pictures.core.worker_pool import WorkerPool, get_shared_pool
+
+
+def _pillow_loaded() -> bool:
+    return "PIL.Image" in sys.modules
+
+
+class TestWorkerPool:
+    """WorkerPool class のテスト"""
+
+    def test_starts_lazily(self):
+        """最初のタスク投入までプロセスを起動しないことをテスト"""
+        pool = WorkerPool(max_workers=1)
+        try:
+            assert pool.started is False
+            assert pool.submit(os.getpid).result() != os.getpid()
+            assert pool.started is True
+        finally:
+            pool.shutdown()
+
+    def test_workers_are_reused_across_runs(self):
+        """2回目の実行で同じワーカープロセスが使われることをテスト"""
+        pool = WorkerPool(max_workers=1)
+        try:
+            first = pool.submit(os.getpid).result()
+            second = pool.submit(os.getpid).result()
+            assert first == second
+        finally:
+            pool.shutdown()
+
+    def test_workers_preload_pillow(self):
+        """ワーカー起動時にPillowが読み込まれていることをテスト"""
+        pool = WorkerPool(max_workers=1)
+        try:
+            assert pool.submit(_pillow_loaded).result() is True
+        finally:
+            pool.shutdown()
+
+    def test_idle_timeout_stops_workers(self):
+        """アイドルタイムアウト後にプロセスが終了し、再投入で再起動することをテスト"""
+        pool = WorkerPool(max_workers=1, idle_timeout=0.1)
+        try:
+            first = pool.submit(os.getpid).result()
+            deadline = time.monotonic() + 5
+            while pool.started and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert pool.started is False
+            assert pool.submit(os.getpid).result() != first
+        finally:
+            pool.shutdown()
+
+    def test_shared_pool_is_singleton(self):
+        """共有プールが同じインスタンスを返すことをテスト"""
+        assert get_shared_pool() is get_shared_pool()